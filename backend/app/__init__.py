@@ -15,11 +15,16 @@ app = Flask(__name__)
 app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL')
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
 app.config["JWT_SECRET_KEY"] = os.getenv('JWT_SECRET_KEY')
-db = SQLAlchemy(app)
+# Largest request body Werkzeug will read; expense imports are the biggest uploads
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_CONTENT_LENGTH', 256 * 1024 * 1024))
+bcrypt = Bcrypt(app)
+
+# Sessions pick the primary or a read replica (DATABASE_REPLICA_URLS) per request
+from .replicas import RoutingSession
+db = SQLAlchemy(app, session_options={'class_': RoutingSession})
 api = Api(app )
 jwt = JWTManager(app)
 migrate = Migrate(app,db)
-bcrypt = Bcrypt(app)
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = "Login"
@@ -0,0 +1,394 @@
+"""
+Expense archival to columnar cold storage
+Closed expenses older than ARCHIVE_RETENTION_YEARS are copied, with their approvals
+and flags, to zstd-compressed Parquet files under ARCHIVE_DIR (one directory per table,
+partitioned by year) and then deleted from the hot tables in small throttled chunks.
+Progress is checkpointed to a state file after every batch, so an interrupted run
+resumes where it stopped without archiving or deleting anything twice. Flags of
+remaining expenses that point at an archived one lose that reference. The archive
+stays readable through ArchiveReader.
+"""
+
+import os
+import json
+import glob
+import time
+import uuid
+import logging
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import select, delete, update, and_, or_
+
+from . import app, db
+from .models import Expense, Approval, ExpenseFlag, Employee
+from .columnar import arrow_schema, write_file, require_pyarrow
+from .reports import month_start, next_month
+
+logger = logging.getLogger(__name__)
+
+app.config.setdefault('ARCHIVE_DIR', os.getenv('ARCHIVE_DIR', os.path.join(os.getcwd(), 'storage', 'archive')))
+app.config.setdefault('ARCHIVE_RETENTION_YEARS', int(os.getenv('ARCHIVE_RETENTION_YEARS', 7)))
+app.config.setdefault('ARCHIVE_BATCH_SIZE', int(os.getenv('ARCHIVE_BATCH_SIZE', 10000)))
+app.config.setdefault('ARCHIVE_DELETE_CHUNK', int(os.getenv('ARCHIVE_DELETE_CHUNK', 1000)))
+# Pause between delete transactions so locks stay short and replicas keep up
+app.config.setdefault('ARCHIVE_THROTTLE_SECONDS', float(os.getenv('ARCHIVE_THROTTLE_SECONDS', 0.05)))
+app.config.setdefault('ARCHIVE_COMPRESSION', os.getenv('ARCHIVE_COMPRESSION', 'zstd'))
+
+# Expenses in these statuses can no longer change
+CLOSED_STATUSES = ('approved', 'rejected')
+STATE_FILE = '_state.json'
+
+# Archived table -> (model, columns written); expenses also carry their company for tenant filtering
+ARCHIVED_TABLES = {
+    'expenses': (Expense, list(Expense.__table__.columns) + [Employee.__table__.c.company_id]),
+    'approvals': (Approval, list(Approval.__table__.columns)),
+    'expense_flags': (ExpenseFlag, list(ExpenseFlag.__table__.columns)),
+}
+
+
+def archive_dir() -> str:
+    return app.config['ARCHIVE_DIR']
+
+
+def retention_cutoff(years: Optional[int] = None, today: Optional[date] = None) -> date:
+    """Expenses dated before this are eligible"""
+    years = app.config['ARCHIVE_RETENTION_YEARS'] if years is None else years
+    today = today or date.today()
+    try:
+        return today.replace(year=today.year - years)
+    except ValueError:  # 29 February
+        return today.replace(year=today.year - years, day=28)
+
+
+def _schema(table: str):
+    _, columns = ARCHIVED_TABLES[table]
+    return arrow_schema(columns)
+
+
+def _part_path(table: str, year: int, run_id: str, seq: int) -> str:
+    return os.path.join(archive_dir(), table, f"year={year}", f"part-{run_id}-{seq:06d}.parquet")
+
+
+# ---------------------------------------------------------------------------
+# Checkpoint state
+# ---------------------------------------------------------------------------
+
+def load_state() -> Dict[str, Any]:
+    path = os.path.join(archive_dir(), STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_state(state: Dict[str, Any]):
+    os.makedirs(archive_dir(), exist_ok=True)
+    path = os.path.join(archive_dir(), STATE_FILE)
+    with open(f"{path}.tmp", 'w') as f:
+        json.dump(state, f, indent=2, default=str)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(f"{path}.tmp", path)
+
+
+def archived_before() -> Optional[date]:
+    """Rollup months before this are built partly from archived rows and must not be rebuilt"""
+    value = load_state().get('archived_before')
+    return next_month(month_start(value)) if value else None
+
+
+# ---------------------------------------------------------------------------
+# Job
+# ---------------------------------------------------------------------------
+
+class ExpenseArchiver:
+    """Batch-by-batch copy to Parquet, then chunked delete, with a checkpoint in between"""
+
+    def __init__(self, cutoff: Optional[date] = None, batch_size: int = None, delete_chunk: int = None,
+                 throttle: float = None, progress: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.cutoff = cutoff
+        self.batch_size = batch_size or app.config['ARCHIVE_BATCH_SIZE']
+        self.delete_chunk = delete_chunk or app.config['ARCHIVE_DELETE_CHUNK']
+        self.throttle = app.config['ARCHIVE_THROTTLE_SECONDS'] if throttle is None else throttle
+        self.progress = progress
+        self.compression = app.config['ARCHIVE_COMPRESSION']
+
+    def _start(self) -> Dict[str, Any]:
+        state = load_state()
+        if state.get('status') == 'running':
+            logger.info("Resuming archive run %s at batch %d", state['run_id'], state['seq'] + 1)
+            return state
+        return {
+            **state,
+            "run_id": uuid.uuid4().hex[:12],
+            "status": "running",
+            "cutoff": (self.cutoff or retention_cutoff()).isoformat(),
+            "started_at": datetime.utcnow().isoformat(),
+            "last_date": None,
+            "last_id": None,
+            "seq": 0,
+            "pending_delete": None,
+            "rows": {table: 0 for table in ARCHIVED_TABLES},
+            "bytes": 0,
+            "elapsed_seconds": 0.0,
+        }
+
+    def _eligible(self, state):
+        query = (
+            select(*ARCHIVED_TABLES['expenses'][1])
+            .join(Employee, Employee.id == Expense.employee_id)
+            .where(Expense.date < date.fromisoformat(state['cutoff']), Expense.status.in_(CLOSED_STATUSES))
+        )
+        if state['last_date'] is not None:
+            last_date, last_id = date.fromisoformat(state['last_date']), uuid.UUID(state['last_id'])
+            query = query.where(or_(
+                Expense.date > last_date,
+                and_(Expense.date == last_date, Expense.id > last_id),
+            ))
+        return query.order_by(Expense.date, Expense.id).limit(self.batch_size)
+
+    def _write_batch(self, state, expenses) -> int:
+        """Write the batch's rows per table and year; returns bytes written"""
+        years = {row.id: row.date.year for row in expenses}
+        ids = list(years)
+        related = {
+            'approvals': db.session.execute(
+                select(*ARCHIVED_TABLES['approvals'][1]).where(Approval.expense_id.in_(ids))
+            ).all(),
+            'expense_flags': db.session.execute(
+                select(*ARCHIVED_TABLES['expense_flags'][1]).where(ExpenseFlag.expense_id.in_(ids))
+            ).all(),
+        }
+        # A resumed batch may cover other years than the interrupted attempt did
+        for path in self._batch_files(state, '*', state['seq']):
+            os.remove(path)
+        written = 0
+        for table, rows in (('expenses', expenses), *related.items()):
+            by_year = defaultdict(list)
+            for row in rows:
+                by_year[years[row.id if table == 'expenses' else row.expense_id]].append(tuple(row))
+            for year, year_rows in by_year.items():
+                path = _part_path(table, year, state['run_id'], state['seq'])
+                written += write_file(path, _schema(table), year_rows, compression=self.compression)
+            state['rows'][table] += len(rows)
+        return written
+
+    def _batch_files(self, state, table: str, seq: int) -> List[str]:
+        return glob.glob(os.path.join(archive_dir(), table, 'year=*', f"part-{state['run_id']}-{seq:06d}.parquet"))
+
+    def _delete_batch(self, state, seq: int) -> int:
+        """Delete the rows recorded in batch `seq`'s files, reading ids back from them"""
+        pa = require_pyarrow()
+        deleted = 0
+        # Children first, so the hot tables never hold approvals or flags of a deleted expense
+        for table, key in (('approvals', 'created_at'), ('expense_flags', None), ('expenses', 'date')):
+            model, _ = ARCHIVED_TABLES[table]
+            columns = ['id'] + ([key] if key else [])
+            rows = []
+            for path in self._batch_files(state, table, seq):
+                rows.extend(pa.parquet.read_table(path, columns=columns).to_pylist())
+            for start in range(0, len(rows), self.delete_chunk):
+                chunk = rows[start:start + self.delete_chunk]
+                ids = [uuid.UUID(row['id']) for row in chunk]
+                conditions = [model.id.in_(ids)]
+                if key:
+                    # Bounding the partition key lets Postgres prune to the partitions involved
+                    column = getattr(model, key)
+                    conditions += [column >= min(row[key] for row in chunk), column <= max(row[key] for row in chunk)]
+                with db.engine.begin() as connection:
+                    if table == 'expenses':
+                        # Flags of hot expenses may point at these; related_expense_id has no FK to clear them
+                        connection.execute(
+                            update(ExpenseFlag.__table__)
+                            .where(ExpenseFlag.related_expense_id.in_(ids))
+                            .values(related_expense_id=None)
+                        )
+                    deleted += connection.execute(delete(model.__table__).where(*conditions)).rowcount
+                if self.throttle:
+                    time.sleep(self.throttle)
+        return deleted
+
+    def run(self, max_batches: Optional[int] = None) -> Dict[str, Any]:
+        """Archive until nothing is eligible (or max_batches); safe to interrupt and re-run"""
+        require_pyarrow()
+        state = self._start()
+        save_state(state)
+        started = time.perf_counter()
+        elapsed_before = state['elapsed_seconds']
+        if state['pending_delete'] is not None:
+            self._delete_batch(state, state['pending_delete'])
+            state['pending_delete'] = None
+            save_state(state)
+
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            batch_started = time.perf_counter()
+            try:
+                expenses = db.session.execute(self._eligible(state)).all()
+                if not expenses:
+                    state['status'] = 'completed'
+                    state['completed_at'] = datetime.utcnow().isoformat()
+                    break
+                state['seq'] += 1
+                state['bytes'] += self._write_batch(state, expenses)
+            finally:
+                db.session.rollback()
+
+            # Checkpoint before deleting: a crash from here on resumes by finishing this delete
+            last = expenses[-1]
+            state['last_date'], state['last_id'] = last.date.isoformat(), str(last.id)
+            state['pending_delete'] = state['seq']
+            state['archived_before'] = max(state.get('archived_before') or state['cutoff'], state['cutoff'])
+            save_state(state)
+            self._delete_batch(state, state['seq'])
+            state['pending_delete'] = None
+            state['elapsed_seconds'] = round(elapsed_before + time.perf_counter() - started, 3)
+            save_state(state)
+            batches += 1
+
+            seconds = time.perf_counter() - batch_started
+            report = {
+                "batch": state['seq'],
+                "expenses": len(expenses),
+                "through": state['last_date'],
+                "rows": dict(state['rows']),
+                "bytes": state['bytes'],
+                "rows_per_second": round(len(expenses) / seconds, 1) if seconds else None,
+            }
+            logger.info("Archived batch %d: %d expenses through %s", state['seq'], len(expenses), state['last_date'])
+            if self.progress:
+                self.progress(report)
+
+        state['elapsed_seconds'] = round(elapsed_before + time.perf_counter() - started, 3)
+        save_state(state)
+        return archive_status(state)
+
+
+def archive_status(state: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    state = load_state() if state is None else state
+    if not state:
+        return {"status": "never_run", "archive_dir": archive_dir()}
+    elapsed = state.get('elapsed_seconds') or 0
+    return {
+        "run_id": state['run_id'],
+        "status": state['status'],
+        "cutoff": state['cutoff'],
+        "archived_through": state['last_date'],
+        "batches": state['seq'],
+        "rows": state['rows'],
+        "bytes": state['bytes'],
+        "elapsed_seconds": elapsed,
+        "expenses_per_second": round(state['rows']['expenses'] / elapsed, 1) if elapsed else None,
+        "archive_dir": archive_dir(),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Reading
+# ---------------------------------------------------------------------------
+
+class ArchiveReader:
+    """Filtered reads over the archived Parquet files; row groups outside the filter are skipped"""
+
+    def _dataset(self, table: str):
+        pa = require_pyarrow()
+        import pyarrow.dataset as ds
+        path = os.path.join(archive_dir(), table)
+        if not os.path.isdir(path):
+            return None
+        schema = _schema(table).append(pa.field('year', pa.int32()))
+        return ds.dataset(path, format='parquet', partitioning='hive', schema=schema,
+                          exclude_invalid_files=True)
+
+    def _years(self, table: str, date_from: Optional[date], date_to: Optional[date]) -> List[int]:
+        """Year partitions on disk inside the date bounds, newest first"""
+        years = []
+        for path in glob.glob(os.path.join(archive_dir(), table, 'year=*')):
+            try:
+                year = int(os.path.basename(path).split('=', 1)[1])
+            except ValueError:
+                continue
+            if (date_from is None or year >= date_from.year) and (date_to is None or year <= date_to.year):
+                years.append(year)
+        return sorted(years, reverse=True)
+
+    def expenses(self, company_id, date_from: Optional[date] = None, date_to: Optional[date] = None,
+                 filters: Optional[Dict[str, Any]] = None, columns: Optional[List[str]] = None,
+                 limit: int = 100, offset: int = 0, before: Optional[tuple] = None) -> List[Dict[str, Any]]:
+        """
+        Archived expenses newest first (date, then id, descending)
+
+        Year partitions are scanned newest first and scanning stops once offset + limit rows
+        are known; inside a year only the leading offset + limit rows are kept while its
+        batches stream in. before=(date, id) of a previous page's last row continues after it.
+        """
+        pa = require_pyarrow()
+        import pyarrow.dataset as ds
+        dataset = self._dataset('expenses')
+        if dataset is None:
+            return []
+        expression = ds.field('company_id') == str(company_id)
+        if date_from:
+            expression &= ds.field('date') >= date_from
+        if date_to:
+            expression &= ds.field('date') <= date_to
+        if before:
+            before_date, before_id = before
+            expression &= (ds.field('date') < before_date) | (
+                (ds.field('date') == before_date) & (ds.field('id') < str(before_id))
+            )
+            date_to = min(date_to, before_date) if date_to else before_date
+        for name, value in (filters or {}).items():
+            expression &= ds.field(name) == value
+
+        keep = offset + limit
+        order = [('date', 'descending'), ('id', 'descending')]
+        read_columns = sorted(set(columns) | {'date', 'id'}) if columns else None
+        found = []
+        found_rows = 0
+        for year in self._years('expenses', date_from, date_to):
+            leading = None
+            scanner = dataset.scanner(columns=read_columns, filter=expression & (ds.field('year') == year))
+            for batch in scanner.to_batches():
+                if not batch.num_rows:
+                    continue
+                chunk = pa.Table.from_batches([batch])
+                leading = chunk if leading is None else pa.concat_tables([leading, chunk])
+                leading = leading.sort_by(order).slice(0, keep)
+            if leading is not None:
+                found.append(leading)
+                found_rows += leading.num_rows
+                # Older partitions sort after everything already found
+                if found_rows >= keep:
+                    break
+        if not found:
+            return []
+        table = pa.concat_tables(found).slice(offset, limit)
+        if columns:
+            table = table.select(columns)
+        elif 'year' in table.column_names:
+            table = table.drop_columns(['year'])
+        return table.to_pylist()
+
+    def expense(self, company_id, expense_id) -> Optional[Dict[str, Any]]:
+        """One archived expense with its approvals and flags"""
+        import pyarrow.dataset as ds
+        dataset = self._dataset('expenses')
+        if dataset is None:
+            return None
+        expense_id = str(uuid.UUID(str(expense_id)))
+        rows = dataset.to_table(
+            filter=(ds.field('id') == expense_id) & (ds.field('company_id') == str(company_id))
+        ).to_pylist()
+        if not rows:
+            return None
+        expense = rows[0]
+        year = expense.pop('year')
+        for table in ('approvals', 'expense_flags'):
+            related = self._dataset(table)
+            expense[table] = [] if related is None else related.to_table(
+                filter=(ds.field('year') == year) & (ds.field('expense_id') == expense_id)
+            ).drop_columns(['year']).to_pylist()
+        return expense
@@ -0,0 +1,289 @@
+"""
+Async read API
+An ASGI app serving the read-heavy endpoints (/api/auth/me, expense listing, approval
+inbox, schema reads) on SQLAlchemy asyncio + asyncpg, so slow clients and long waits
+hold a coroutine instead of a thread and a pooled connection.
+Models are shared with models.py; run with `python serve.py --asgi`.
+"""
+
+import os
+import time
+import uuid
+import logging
+import contextlib
+from typing import Dict, Any, Optional
+
+from flask_jwt_extended import decode_token
+from sqlalchemy import select, func
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+try:
+    from starlette.applications import Starlette
+    from starlette.requests import Request
+    from starlette.responses import Response
+    from starlette.routing import Route
+except ImportError:  # optional: only needed for the async serving path
+    Starlette = None
+
+from . import app
+from .models import User, Employee, Expense, Approval
+from .serializers import serialize_many, init_json
+from .automap_manager import describe_table
+from .schema_snapshot import load_schema
+from .pagination import DEFAULT_PER_PAGE, MAX_PER_PAGE
+from .tenancy import COMPANY_CLAIM
+
+logger = logging.getLogger(__name__)
+
+app.config.setdefault('ASYNC_DATABASE_URL', os.getenv('ASYNC_DATABASE_URL'))
+app.config.setdefault('ASYNC_DB_POOL_SIZE', int(os.getenv('ASYNC_DB_POOL_SIZE', 10)))
+app.config.setdefault('ASYNC_DB_MAX_OVERFLOW', int(os.getenv('ASYNC_DB_MAX_OVERFLOW', 20)))
+app.config.setdefault('ASYNC_SCHEMA_CACHE_TTL', int(os.getenv('ASYNC_SCHEMA_CACHE_TTL', 300)))
+
+ASYNC_DRIVERS = {'postgresql': 'postgresql+asyncpg', 'sqlite': 'sqlite+aiosqlite'}
+
+
+def async_database_url(url: str):
+    """Swap the sync driver in DATABASE_URL for its asyncio counterpart"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for '{backend}' databases")
+    connect_args = {}
+    query = dict(parsed.query)
+    # asyncpg takes ssl= rather than libpq's sslmode=
+    sslmode = query.pop('sslmode', None)
+    if sslmode and sslmode != 'disable':
+        connect_args['ssl'] = 'require' if sslmode in ('require', 'prefer', 'allow') else True
+    return parsed.set(drivername=ASYNC_DRIVERS[backend], query=query), connect_args
+
+
+_engine = None
+_sessionmaker: Optional[async_sessionmaker] = None
+
+
+def get_async_engine():
+    global _engine, _sessionmaker
+    if _engine is None:
+        url, connect_args = async_database_url(
+            app.config['ASYNC_DATABASE_URL'] or app.config['SQLALCHEMY_DATABASE_URI']
+        )
+        options = {'pool_pre_ping': True, 'connect_args': connect_args}
+        if url.get_backend_name() == 'postgresql':
+            options.update(pool_size=app.config['ASYNC_DB_POOL_SIZE'], max_overflow=app.config['ASYNC_DB_MAX_OVERFLOW'])
+        _engine = create_async_engine(url, **options)
+        _sessionmaker = async_sessionmaker(_engine, expire_on_commit=False)
+    return _engine
+
+
+def async_session() -> AsyncSession:
+    get_async_engine()
+    return _sessionmaker()
+
+
+class JSONResponse(Response):
+    """Encodes with the Flask app's JSON provider (orjson when installed)"""
+    media_type = 'application/json'
+
+    def render(self, content: Any) -> bytes:
+        return app.json.dumps(content).encode()
+
+
+def error(message: str, status_code: int) -> JSONResponse:
+    return JSONResponse({"error": message}, status_code=status_code)
+
+
+class AuthError(Exception):
+    pass
+
+
+def current_identity(request: 'Request') -> Dict[str, Any]:
+    """Decode the access token exactly as flask_jwt_extended does for the sync API"""
+    header = request.headers.get('authorization', '')
+    if not header.lower().startswith('bearer '):
+        raise AuthError("Missing Authorization Header")
+    try:
+        with app.app_context():
+            claims = decode_token(header[7:])
+    except Exception as e:
+        raise AuthError(str(e))
+    if claims.get('type') != 'access':
+        raise AuthError("Only access tokens are allowed")
+    return claims
+
+
+async def current_company_id(session: AsyncSession, claims: Dict[str, Any]) -> Optional[uuid.UUID]:
+    """The caller's tenant from the token, as tenant_required resolves it for the sync API"""
+    if claims.get(COMPANY_CLAIM):
+        return uuid.UUID(claims[COMPANY_CLAIM])
+    # Tokens issued before the claim existed
+    return await session.scalar(select(User.company_id).where(User.id == uuid.UUID(claims['sub'])))
+
+
+def page_args(request: 'Request') -> tuple:
+    try:
+        page = max(int(request.query_params.get('page', 1)), 1)
+        per_page = min(max(int(request.query_params.get('per_page', DEFAULT_PER_PAGE)), 1), MAX_PER_PAGE)
+    except ValueError:
+        page, per_page = 1, DEFAULT_PER_PAGE
+    return page, per_page
+
+
+async def paginate(session: AsyncSession, query, request: 'Request') -> tuple:
+    page, per_page = page_args(request)
+    total = await session.scalar(select(func.count()).select_from(query.order_by(None).subquery()))
+    items = (await session.scalars(query.limit(per_page).offset((page - 1) * per_page))).all()
+    return items, {
+        "page": page,
+        "per_page": per_page,
+        "total": total,
+        "pages": (total + per_page - 1) // per_page if total else 0,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Endpoints
+# ---------------------------------------------------------------------------
+
+async def get_current_user(request: 'Request'):
+    """Same payload as GET /api/auth/me"""
+    try:
+        claims = current_identity(request)
+    except AuthError as e:
+        return error(str(e), 401)
+    try:
+        async with async_session() as session:
+            user = await session.get(User, uuid.UUID(claims['sub']))
+        if not user:
+            return error("User not found", 404)
+        return JSONResponse({
+            "user": {
+                "id": str(user.id),
+                "email": user.email,
+                "name": user.name,
+                "role": user.role.value,
+                "company_id": str(user.company_id),
+                "is_active": user.is_active,
+                "last_login": user.last_login.isoformat() if user.last_login else None,
+                "created_at": user.created_at.isoformat() if user.created_at else None
+            }
+        })
+    except Exception as e:
+        return error(str(e), 500)
+
+
+async def get_expenses(request: 'Request'):
+    """Expenses of the caller's company, newest first, paginated with ?page=&per_page="""
+    try:
+        claims = current_identity(request)
+    except AuthError as e:
+        return error(str(e), 401)
+    try:
+        async with async_session() as session:
+            company_id = await current_company_id(session, claims)
+            if company_id is None:
+                return error("User not found", 404)
+            query = (
+                select(Expense)
+                .join(Employee, Employee.id == Expense.employee_id)
+                .where(Employee.company_id == company_id)
+                .order_by(Expense.date.desc(), Expense.id)
+            )
+            expenses, pagination = await paginate(session, query, request)
+        return JSONResponse({"expenses": serialize_many(Expense, expenses), "pagination": pagination})
+    except Exception as e:
+        return error(str(e), 500)
+
+
+async def get_approval_inbox(request: 'Request'):
+    """Approvals waiting on the caller, oldest first, with their expenses"""
+    try:
+        claims = current_identity(request)
+    except AuthError as e:
+        return error(str(e), 401)
+    try:
+        status = request.query_params.get('status', 'pending')
+        async with async_session() as session:
+            query = (
+                select(Approval)
+                .where(Approval.approver_id == uuid.UUID(claims['sub']), Approval.status == status)
+                .order_by(Approval.created_at, Approval.id)
+            )
+            approvals, pagination = await paginate(session, query, request)
+            expense_ids = {approval.expense_id for approval in approvals}
+            expenses = (await session.scalars(
+                select(Expense).where(Expense.id.in_(expense_ids))
+            )).all() if expense_ids else []
+        return JSONResponse({
+            "approvals": serialize_many(Approval, approvals),
+            "expenses": serialize_many(Expense, expenses),
+            "pagination": pagination
+        })
+    except Exception as e:
+        return error(str(e), 500)
+
+
+_schema_cache: Dict[str, Any] = {}
+
+
+async def _reflected_tables() -> Dict[str, Any]:
+    cached = _schema_cache.get('tables')
+    if cached and time.monotonic() - cached[0] < app.config['ASYNC_SCHEMA_CACHE_TTL']:
+        return cached[1]
+    async with get_async_engine().connect() as connection:
+        snapshot = await connection.run_sync(load_schema)
+    tables = {name: describe_table(table) for name, table in snapshot.metadata.tables.items()}
+    _schema_cache['tables'] = (time.monotonic(), tables)
+    return tables
+
+
+async def get_all_tables(request: 'Request'):
+    """Same payload as GET /api/schema/tables, reflected once per ASYNC_SCHEMA_CACHE_TTL"""
+    try:
+        tables = list((await _reflected_tables()).values())
+        return JSONResponse({"tables": tables, "count": len(tables)})
+    except Exception as e:
+        return error(str(e), 500)
+
+
+async def get_table_schema(request: 'Request'):
+    try:
+        table_name = request.path_params['table_name']
+        schema = (await _reflected_tables()).get(table_name)
+        if schema is None:
+            return error(f"Table '{table_name}' not found", 404)
+        return JSONResponse(schema)
+    except Exception as e:
+        return error(str(e), 500)
+
+
+async def health(request: 'Request'):
+    return JSONResponse({"status": "healthy", "service": "exes-manen-backend-async"})
+
+
+@contextlib.asynccontextmanager
+async def lifespan(asgi):
+    yield
+    if _engine is not None:
+        await _engine.dispose()
+
+
+def create_asgi_app():
+    if Starlette is None:
+        raise RuntimeError("The async API needs starlette and uvicorn: pip install starlette uvicorn asyncpg")
+    init_json(app)
+    return Starlette(
+        routes=[
+            Route('/health', health),
+            Route('/api/auth/me', get_current_user),
+            Route('/api/expenses', get_expenses),
+            Route('/api/approvals/inbox', get_approval_inbox),
+            Route('/api/schema/tables', get_all_tables),
+            Route('/api/schema/tables/{table_name}', get_table_schema),
+        ],
+        lifespan=lifespan,
+    )
+
+
+asgi_app = create_asgi_app() if Starlette is not None else None
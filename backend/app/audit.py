@@ -0,0 +1,420 @@
+"""
+Audit log
+Committed ORM changes (and explicit admin events) are captured through session hooks,
+buffered in memory and appended to audit_events in batches by a background thread,
+so mutating requests never wait on an audit insert
+"""
+
+import os
+import enum
+import glob
+import json
+import time
+import uuid
+import atexit
+import logging
+import threading
+from collections import deque
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import islice
+from typing import Dict, List, Any, Optional
+
+from flask import g, has_request_context
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import event, insert, inspect, text
+
+from . import app, db
+from .models import (
+    Company, User, Employee, Department, Team, TeamMember, Role, UserRole, RolePermission,
+    ApprovalFlow, ApprovalRule, Expense, Approval, Receipt, AuditEvent
+)
+from .reports import month_start, next_month
+from .tenancy import owner_companies
+
+logger = logging.getLogger(__name__)
+
+app.config.setdefault('AUDIT_ENABLED', os.getenv('AUDIT_ENABLED', 'True').lower() == 'true')
+app.config.setdefault('AUDIT_BATCH_SIZE', int(os.getenv('AUDIT_BATCH_SIZE', 500)))
+app.config.setdefault('AUDIT_FLUSH_INTERVAL', float(os.getenv('AUDIT_FLUSH_INTERVAL', 1.0)))
+# Past this many buffered events the committing thread writes the backlog itself
+app.config.setdefault('AUDIT_MAX_BUFFER', int(os.getenv('AUDIT_MAX_BUFFER', 50000)))
+app.config.setdefault('AUDIT_SHUTDOWN_TIMEOUT', float(os.getenv('AUDIT_SHUTDOWN_TIMEOUT', 10)))
+app.config.setdefault('AUDIT_SPOOL_DIR', os.getenv(
+    'AUDIT_SPOOL_DIR', os.path.join(os.getcwd(), 'storage', 'audit-spool')
+))
+
+AUDITED_MODELS = (
+    Company, User, Employee, Department, Team, TeamMember, Role, UserRole, RolePermission,
+    ApprovalFlow, ApprovalRule, Expense, Approval, Receipt
+)
+REDACTED_FIELDS = {'password_hash'}
+MAX_BACKOFF_SECONDS = 30
+
+
+def _json_value(value):
+    if isinstance(value, (uuid.UUID, Decimal)):
+        return str(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    return value
+
+
+def _field_value(key, value):
+    if key in REDACTED_FIELDS:
+        return '[redacted]' if value is not None else None
+    return _json_value(value)
+
+
+def _actor_id() -> Optional[uuid.UUID]:
+    if not has_request_context():
+        return None
+    try:
+        identity = get_jwt_identity()
+    except Exception:
+        # No JWT was verified for this request
+        return None
+    return uuid.UUID(identity) if identity else None
+
+
+def _company_id(obj, owners: Optional[Dict[Any, uuid.UUID]] = None) -> Optional[uuid.UUID]:
+    if isinstance(obj, Company):
+        return obj.id
+    company_id = inspect(obj).dict.get('company_id')
+    if company_id is None and owners:
+        company_id = owners.get(obj)
+    if company_id is None and has_request_context():
+        company_id = g.get('tenant_company_id')
+    return company_id if company_id is None or isinstance(company_id, uuid.UUID) else uuid.UUID(str(company_id))
+
+
+def make_event(action: str, entity_type: str, entity_id=None, changes: Optional[Dict[str, Any]] = None,
+               company_id=None, actor_id=None) -> Dict[str, Any]:
+    return {
+        'id': uuid.uuid4(),
+        'occurred_at': datetime.utcnow(),
+        'company_id': company_id,
+        'actor_id': actor_id,
+        'action': action,
+        'entity_type': entity_type,
+        'entity_id': str(entity_id) if entity_id is not None else None,
+        'changes': json.dumps(changes, default=str) if changes else None,
+    }
+
+
+def _entity_event(obj, operation: str, actor_id, owners: Optional[Dict[Any, uuid.UUID]] = None) -> Optional[Dict[str, Any]]:
+    state = inspect(obj)
+    changes = {}
+    for attr in state.mapper.column_attrs:
+        key = attr.key
+        if operation == 'update':
+            history = state.attrs[key].history
+            if not history.has_changes():
+                continue
+            old = history.deleted[0] if history.deleted else None
+            new = history.added[0] if history.added else None
+            changes[key] = [_field_value(key, old), _field_value(key, new)]
+        elif operation == 'insert':
+            changes[key] = _field_value(key, state.dict.get(key))
+    if operation == 'update' and not changes:
+        return None
+    table = state.mapper.local_table.name
+    return make_event(
+        f"{table}.{operation}", table, state.dict.get('id'), changes,
+        company_id=_company_id(obj, owners), actor_id=actor_id
+    )
+
+
+def record_event(action: str, entity_type: str, entity_id=None, details: Optional[Dict[str, Any]] = None,
+                 company_id=None):
+    """
+    Queue a named event (e.g. 'admin.reset_password') with the current transaction;
+    it is written only if the transaction commits
+    """
+    if not app.config['AUDIT_ENABLED']:
+        return
+    if company_id is None and has_request_context():
+        company_id = g.get('tenant_company_id')
+    details = {key: _json_value(value) for key, value in (details or {}).items()}
+    db.session.info.setdefault('audit_pending', []).append(
+        make_event(action, entity_type, entity_id, details, company_id=company_id, actor_id=_actor_id())
+    )
+
+
+def record_rows(table: str, operation: str, rows: List[tuple], company_id=None):
+    """
+    Queue the events the flush hook would have recorded for rows written with Core
+    insert/update statements, which bypass the ORM
+
+    Args:
+        table: Table name, e.g. 'users'
+        operation: 'insert' or 'update'
+        rows: (entity_id, values, previous) tuples; previous holds the old values of an update
+        company_id: Tenant the rows belong to
+    """
+    if not app.config['AUDIT_ENABLED']:
+        return
+    actor_id = _actor_id()
+    pending = db.session.info.setdefault('audit_pending', [])
+    for entity_id, values, previous in rows:
+        if operation == 'update':
+            changes = {
+                key: [_field_value(key, previous.get(key)), _field_value(key, value)]
+                for key, value in values.items() if previous.get(key) != value
+            }
+            if not changes:
+                continue
+        else:
+            changes = {key: _field_value(key, value) for key, value in values.items()}
+        pending.append(make_event(f"{table}.{operation}", table, entity_id, changes,
+                                  company_id=company_id, actor_id=actor_id))
+
+
+@event.listens_for(db.session, 'after_flush')
+def _capture_changes(session, flush_context):
+    if not app.config['AUDIT_ENABLED']:
+        return
+    actor_id = _actor_id()
+    pending = session.info.setdefault('audit_pending', [])
+    changed = [
+        (operation, obj)
+        for operation, objects in (('insert', session.new), ('update', session.dirty), ('delete', session.deleted))
+        for obj in objects if isinstance(obj, AUDITED_MODELS)
+    ]
+    if not changed:
+        return
+    # Expenses, approvals, memberships and grants carry no company_id of their own
+    owners = owner_companies(session.connection(), [obj for _, obj in changed])
+    for operation, obj in changed:
+        audit_event = _entity_event(obj, operation, actor_id, owners)
+        if audit_event is not None:
+            pending.append(audit_event)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _enqueue_after_commit(session):
+    events = session.info.pop('audit_pending', None)
+    if events:
+        audit_log.enqueue(events)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_after_rollback(session):
+    session.info.pop('audit_pending', None)
+
+
+@event.listens_for(AuditEvent, 'before_update')
+@event.listens_for(AuditEvent, 'before_delete')
+def _reject_audit_mutation(mapper, connection, target):
+    raise RuntimeError("audit_events is append-only")
+
+
+# ---------------------------------------------------------------------------
+# Storage: monthly partitions on Postgres
+# ---------------------------------------------------------------------------
+
+def _partition_name(month: date) -> str:
+    return f"audit_events_{month.year:04d}_{month.month:02d}"
+
+
+def install_schema(connection):
+    """Default partition plus a trigger refusing UPDATE/DELETE (Postgres only)"""
+    if connection.dialect.name != 'postgresql':
+        return
+    connection.execute(text("CREATE TABLE IF NOT EXISTS audit_events_default PARTITION OF audit_events DEFAULT"))
+    connection.execute(text("""
+        CREATE OR REPLACE FUNCTION audit_events_append_only() RETURNS trigger AS $$
+        BEGIN
+            RAISE EXCEPTION 'audit_events is append-only';
+        END
+        $$ LANGUAGE plpgsql
+    """))
+    connection.execute(text("""
+        DO $$
+        BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'audit_events_append_only') THEN
+                CREATE TRIGGER audit_events_append_only BEFORE UPDATE OR DELETE ON audit_events
+                FOR EACH ROW EXECUTE FUNCTION audit_events_append_only();
+            END IF;
+        END
+        $$
+    """))
+
+
+def ensure_partition(connection, month: date):
+    if connection.dialect.name != 'postgresql':
+        return
+    connection.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {_partition_name(month)} PARTITION OF audit_events "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month(month).isoformat()}')"
+    ))
+
+
+# ---------------------------------------------------------------------------
+# Buffered writer
+# ---------------------------------------------------------------------------
+
+class AuditLog:
+    """In-memory buffer drained by one background thread in batches"""
+
+    def __init__(self):
+        self._buffer: deque = deque()
+        self._cond = threading.Condition()
+        # Held while a batch is written and removed, so shutdown never spools a batch twice
+        self._write_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._partitions = set()
+        self._schema_installed = False
+        self._atexit_registered = False
+        self.flushed_total = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self.last_flush_at: Optional[datetime] = None
+
+    def enqueue(self, events: List[Dict[str, Any]]):
+        with self._cond:
+            self._buffer.extend(events)
+            size = len(self._buffer)
+            if size >= app.config['AUDIT_BATCH_SIZE']:
+                self._cond.notify()
+        self._ensure_started()
+        if size > app.config['AUDIT_MAX_BUFFER']:
+            # Backpressure instead of dropping: this request pays for the backlog
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error("Inline audit flush failed with %d events buffered: %s", size, e)
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._closed = False
+            self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+            self._thread.start()
+            if not self._atexit_registered:
+                atexit.register(self.close)
+                self._atexit_registered = True
+
+    def _run(self):
+        with app.app_context():
+            self._replay_spool()
+            backoff = app.config['AUDIT_FLUSH_INTERVAL']
+            while True:
+                with self._cond:
+                    if not self._closed and len(self._buffer) < app.config['AUDIT_BATCH_SIZE']:
+                        self._cond.wait(timeout=backoff)
+                    if self._closed and not self._buffer:
+                        return
+                try:
+                    self.flush()
+                    backoff = app.config['AUDIT_FLUSH_INTERVAL']
+                except Exception as e:
+                    self.failures += 1
+                    self.last_error = str(e)
+                    backoff = min(backoff * 2, MAX_BACKOFF_SECONDS)
+                    logger.warning("Audit flush failed (%d events pending), retrying in %.1fs: %s",
+                                   len(self._buffer), backoff, e)
+                    if self._closed:
+                        return
+
+    def flush(self):
+        """Write everything currently buffered; a failed batch stays at the head of the buffer"""
+        batch_size = app.config['AUDIT_BATCH_SIZE']
+        with self._write_lock:
+            while True:
+                with self._cond:
+                    batch = list(islice(self._buffer, 0, batch_size))
+                if not batch:
+                    return
+                self._write(batch)
+                with self._cond:
+                    for _ in batch:
+                        self._buffer.popleft()
+                self.flushed_total += len(batch)
+                self.last_flush_at = datetime.utcnow()
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        with db.engine.begin() as connection:
+            if not self._schema_installed:
+                install_schema(connection)
+                self._schema_installed = True
+            for month in {month_start(row['occurred_at']) for row in batch} - self._partitions:
+                ensure_partition(connection, month)
+                self._partitions.add(month)
+            connection.execute(insert(AuditEvent.__table__), batch)
+
+    def close(self, timeout: Optional[float] = None):
+        """Drain the buffer on shutdown; whatever cannot be written is spooled to disk"""
+        timeout = app.config['AUDIT_SHUTDOWN_TIMEOUT'] if timeout is None else timeout
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if not self._buffer:
+            return
+        acquired = self._write_lock.acquire(timeout=timeout)
+        try:
+            with self._cond:
+                remaining = list(self._buffer)
+                self._buffer.clear()
+            self._spool(remaining)
+        finally:
+            if acquired:
+                self._write_lock.release()
+
+    def _spool(self, events: List[Dict[str, Any]]):
+        if not events:
+            return
+        spool_dir = app.config['AUDIT_SPOOL_DIR']
+        os.makedirs(spool_dir, exist_ok=True)
+        path = os.path.join(spool_dir, f"audit-{os.getpid()}-{int(time.time() * 1000)}.jsonl")
+        with open(path, 'w') as f:
+            for row in events:
+                f.write(json.dumps(row, default=_json_value) + '\n')
+        logger.warning("Spooled %d unwritten audit events to %s", len(events), path)
+
+    def _replay_spool(self):
+        """Write events spooled by a previous shutdown; files are removed only once written"""
+        for path in sorted(glob.glob(os.path.join(app.config['AUDIT_SPOOL_DIR'], 'audit-*.jsonl'))):
+            try:
+                with open(path) as f:
+                    rows = [json.loads(line) for line in f if line.strip()]
+                for row in rows:
+                    row['id'] = uuid.UUID(row['id'])
+                    row['occurred_at'] = datetime.fromisoformat(row['occurred_at'])
+                    for key in ('company_id', 'actor_id'):
+                        row[key] = uuid.UUID(row[key]) if row[key] else None
+                batch_size = app.config['AUDIT_BATCH_SIZE']
+                with self._write_lock:
+                    for start in range(0, len(rows), batch_size):
+                        self._write(rows[start:start + batch_size])
+                os.remove(path)
+                self.flushed_total += len(rows)
+                logger.info("Replayed %d spooled audit events from %s", len(rows), path)
+            except Exception as e:
+                logger.error("Could not replay audit spool %s: %s", path, e)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            pending = len(self._buffer)
+            oldest = self._buffer[0]['occurred_at'] if pending else None
+        return {
+            "enabled": app.config['AUDIT_ENABLED'],
+            "pending": pending,
+            "lag_seconds": round((datetime.utcnow() - oldest).total_seconds(), 3) if oldest else 0.0,
+            "flushed_total": self.flushed_total,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "last_flush_at": self.last_flush_at.isoformat() if self.last_flush_at else None,
+            "writer_alive": bool(self._thread and self._thread.is_alive()),
+        }
+
+
+audit_log = AuditLog()
@@ -3,31 +3,83 @@ SQLAlchemy Automap-based Schema Manager
 Uses SQLAlchemy's built-in automap extension for database introspection
 """
 
+import os
 from flask import current_app
-from sqlalchemy import create_engine, MetaData, inspect
-from sqlalchemy.ext.automap import automap_base
+from sqlalchemy import create_engine, MetaData, inspect, select, func, type_coerce, String, Uuid
 from sqlalchemy.orm import Session
 from . import db
+from .query_profiler import query_profiler
+from .replicas import read_engine
+from .columnar import ColumnarWriter, arrow_schema, record_batch
+from .schema_snapshot import load_schema
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Callable, Dict, List, Any, Optional
+
+# Rows fetched and encoded per record batch by export_table_data
+EXPORT_BATCH_SIZE = 50000
+# Upper bound on concurrent workers (and connections) for multi-table sweeps
+MAX_JOBS = 16
+
+
+def describe_table(table, table_name: str = None, model_class: str = None) -> Dict[str, Any]:
+    """Column, key and index description of a Table (shared by the sync and async schema endpoints)"""
+    return {
+        "table_name": table_name or table.name,
+        "model_class": model_class,
+        "columns": [
+            {
+                "name": col.name,
+                "type": str(col.type),
+                "nullable": col.nullable,
+                "default": str(col.default) if col.default is not None else None,
+                "autoincrement": col.autoincrement,
+                "primary_key": col.primary_key,
+                "comment": getattr(col, 'comment', None)
+            }
+            for col in table.columns
+        ],
+        "primary_keys": [col.name for col in table.primary_key.columns],
+        "foreign_keys": [
+            {
+                "constrained_columns": [col.name for col in fk.columns],
+                "referred_table": fk.referred_table.name,
+                "referred_columns": [element.column.name for element in fk.elements],
+                "name": fk.name
+            }
+            for fk in table.foreign_key_constraints
+        ],
+        "indexes": [
+            {
+                "name": idx.name,
+                "column_names": [col.name for col in idx.columns],
+                "unique": idx.unique
+            }
+            for idx in table.indexes
+        ]
+    }
 
 
 class AutomapManager:
     """Manages database schema operations using SQLAlchemy Automap"""
     
-    def __init__(self):
-        self.engine = db.engine
+    def __init__(self, engine=None, base=None, refresh: bool = False):
+        # Reflection and ad-hoc queries are read-only, so they run on a replica when one is configured
+        self.engine = engine if engine is not None else read_engine(db)
         self.inspector = inspect(self.engine)
-        self._base = None
+        self._base = base
         self._session = None
+        # Reflect again instead of trusting the schema snapshot
+        self.refresh = refresh
     
     @property
     def base(self):
-        """Get or create the automap base"""
+        """Get or create the automap base (from the schema snapshot while it is current)"""
         if self._base is None:
-            self._base = automap_base()
-            self._base.prepare(autoload_with=self.engine)
+            with self.engine.connect() as conn:
+                self._base = load_schema(conn, self.refresh).automap_base()
         return self._base
     
     @property
@@ -83,42 +135,7 @@ class AutomapManager:
     def get_table_info_from_automap(self, table_name: str, model_class) -> Dict[str, Any]:
         """Get table information from Automap model"""
         try:
-            table = model_class.__table__
-            
-            return {
-                "table_name": table_name,
-                "model_class": str(model_class),
-                "columns": [
-                    {
-                        "name": col.name,
-                        "type": str(col.type),
-                        "nullable": col.nullable,
-                        "default": str(col.default) if col.default is not None else None,
-                        "autoincrement": col.autoincrement,
-                        "primary_key": col.primary_key,
-                        "comment": getattr(col, 'comment', None)
-                    }
-                    for col in table.columns
-                ],
-                "primary_keys": [col.name for col in table.primary_key.columns],
-                "foreign_keys": [
-                    {
-                        "constrained_columns": [col.name for col in fk.constrained_columns],
-                        "referred_table": fk.referred_table.name,
-                        "referred_columns": [col.name for col in fk.referred_columns],
-                        "name": fk.name
-                    }
-                    for fk in table.foreign_keys
-                ],
-                "indexes": [
-                    {
-                        "name": idx.name,
-                        "column_names": [col.name for col in idx.columns],
-                        "unique": idx.unique
-                    }
-                    for idx in table.indexes
-                ]
-            }
+            return describe_table(model_class.__table__, table_name, str(model_class))
         except Exception as e:
             return {"table_name": table_name, "error": str(e)}
     
@@ -136,20 +153,19 @@ class AutomapManager:
     def get_table_data_sample(self, table_name: str, limit: int = 5) -> Dict[str, Any]:
         """Get a sample of data from a table using Automap"""
         try:
-            if table_name not in self.base.classes:
+            table = self.base.metadata.tables.get(table_name)
+            if table is None:
                 return {"error": f"Table '{table_name}' not found"}
             
-            model_class = getattr(self.base.classes, table_name)
-            
-            # Query using the automap model
-            results = self.session.query(model_class).limit(limit).all()
+            # Core select on the reflected table, so tables automap cannot map are covered too
+            results = self.session.execute(select(table).limit(limit)).all()
             
             # Convert to dictionaries
             sample_data = []
             for result in results:
                 row_dict = {}
-                for column in model_class.__table__.columns:
-                    value = getattr(result, column.name)
+                for column in table.columns:
+                    value = result._mapping[column.name]
                     # Convert datetime and other special types to string
                     if hasattr(value, 'isoformat'):
                         row_dict[column.name] = value.isoformat()
@@ -160,7 +176,7 @@ class AutomapManager:
             return {
                 "table_name": table_name,
                 "sample_data": sample_data,
-                "total_columns": len(model_class.__table__.columns),
+                "total_columns": len(table.columns),
                 "sample_size": len(sample_data)
             }
         except Exception as e:
@@ -169,11 +185,11 @@ class AutomapManager:
     def get_table_row_count(self, table_name: str) -> Dict[str, Any]:
         """Get the number of rows in a table using Automap"""
         try:
-            if table_name not in self.base.classes:
+            table = self.base.metadata.tables.get(table_name)
+            if table is None:
                 return {"error": f"Table '{table_name}' not found"}
             
-            model_class = getattr(self.base.classes, table_name)
-            count = self.session.query(model_class).count()
+            count = self.session.execute(select(func.count()).select_from(table)).scalar()
             
             return {
                 "table_name": table_name,
@@ -182,27 +198,37 @@ class AutomapManager:
         except Exception as e:
             return {"error": str(e)}
     
+    def _build_query(self, table_name: str, filters: Dict = None, limit: int = None):
+        """Automap query for query_table; returns (model_class, query, filtered column names)"""
+        model_class = getattr(self.base.classes, table_name)
+        query = self.session.query(model_class)
+        filter_columns = []
+        
+        # Apply filters if provided
+        if filters:
+            for column_name, value in filters.items():
+                if hasattr(model_class, column_name):
+                    column = getattr(model_class, column_name)
+                    query = query.filter(column == value)
+                    filter_columns.append(column_name)
+        
+        # Apply limit if provided
+        if limit:
+            query = query.limit(limit)
+        return model_class, query, filter_columns
+    
     def query_table(self, table_name: str, filters: Dict = None, limit: int = None) -> Dict[str, Any]:
         """Query a table with optional filters using Automap"""
         try:
             if table_name not in self.base.classes:
                 return {"error": f"Table '{table_name}' not found"}
             
-            model_class = getattr(self.base.classes, table_name)
-            query = self.session.query(model_class)
-            
-            # Apply filters if provided
-            if filters:
-                for column_name, value in filters.items():
-                    if hasattr(model_class, column_name):
-                        column = getattr(model_class, column_name)
-                        query = query.filter(column == value)
-            
-            # Apply limit if provided
-            if limit:
-                query = query.limit(limit)
+            model_class, query, filter_columns = self._build_query(table_name, filters, limit)
             
+            started = time.perf_counter()
             results = query.all()
+            query_profiler.record(self.engine, query.statement, table_name, filter_columns,
+                                  time.perf_counter() - started)
             
             # Convert to dictionaries
             data = []
@@ -226,6 +252,159 @@ class AutomapManager:
         except Exception as e:
             return {"error": str(e)}
     
+    def explain_query(self, table_name: str, filters: Dict = None, limit: int = None) -> Dict[str, Any]:
+        """Run a query_table query once and return its plan and index suggestions"""
+        try:
+            if table_name not in self.base.classes:
+                return {"error": f"Table '{table_name}' not found"}
+            
+            model_class, query, filter_columns = self._build_query(table_name, filters, limit)
+            result = query_profiler.profile(self.engine, query.statement, table_name, filter_columns)
+            result["filters_applied"] = filters or {}
+            return result
+        except Exception as e:
+            return {"error": str(e)}
+    
+    def export_table_data(self, table_name: str, output: str, filters: Dict = None, fmt: str = 'parquet',
+                          limit: int = None, batch_size: int = EXPORT_BATCH_SIZE, rows_per_file: int = None,
+                          compression: str = 'zstd') -> Dict[str, Any]:
+        """
+        Stream a reflected table (optionally filtered) into Parquet or Arrow IPC files
+
+        Rows are fetched batch_size at a time (a server-side cursor on Postgres) and
+        encoded straight into record batches, so memory holds one batch whatever the
+        table size. Column types come from reflection; tables without a primary key
+        are exported too. With rows_per_file the output is split into numbered files
+        next to `output` (name-00000.parquet, name-00001.parquet, ...).
+        """
+        try:
+            table = self.base.metadata.tables.get(table_name)
+            if table is None:
+                return {"error": f"Table '{table_name}' not found"}
+
+            # Drivers with a native uuid type hand back text already; skip parsing it into UUID objects and back
+            native_uuid = self.engine.dialect.supports_native_uuid
+            statement = select(*(
+                type_coerce(column, String).label(column.name) if native_uuid and isinstance(column.type, Uuid) else column
+                for column in table.columns
+            ))
+            filters_applied = {}
+            for column_name, value in (filters or {}).items():
+                if column_name in table.c:
+                    statement = statement.where(table.c[column_name] == value)
+                    filters_applied[column_name] = value
+            if limit:
+                statement = statement.limit(limit)
+
+            schema = arrow_schema(table.columns)
+            files = []
+            size = 0
+            exported = 0
+            writer = None
+            started = time.perf_counter()
+
+            def next_path():
+                if not rows_per_file:
+                    return output
+                root, extension = os.path.splitext(output)
+                return f"{root}-{len(files):05d}{extension}"
+
+            try:
+                with self.engine.connect() as conn:
+                    result = conn.execution_options(yield_per=batch_size).execute(statement)
+                    for rows in result.partitions():
+                        batch = record_batch(schema, rows)
+                        offset = 0
+                        while offset < batch.num_rows:
+                            if writer is None:
+                                writer = ColumnarWriter(next_path(), schema, fmt, compression)
+                            take = batch.num_rows - offset
+                            if rows_per_file:
+                                take = min(take, rows_per_file - writer.rows)
+                            writer.write(batch.slice(offset, take))
+                            offset += take
+                            exported += take
+                            if rows_per_file and writer.rows >= rows_per_file:
+                                size += writer.close()
+                                files.append(writer.path)
+                                writer = None
+                if writer is None and not files:
+                    # Empty result: still write a file carrying the schema
+                    writer = ColumnarWriter(next_path(), schema, fmt, compression)
+                if writer is not None:
+                    size += writer.close()
+                    files.append(writer.path)
+                    writer = None
+            except Exception:
+                if writer is not None:
+                    writer.abort()
+                raise
+
+            elapsed = time.perf_counter() - started
+            return {
+                "table_name": table_name,
+                "format": fmt,
+                "files": files,
+                "rows": exported,
+                "bytes": size,
+                "seconds": round(elapsed, 3),
+                "rows_per_second": round(exported / elapsed) if elapsed else None,
+                "filters_applied": filters_applied,
+                "limit_applied": limit
+            }
+        except Exception as e:
+            return {"error": str(e)}
+    
+    def table_names(self) -> List[str]:
+        """Every reflected table, including those automap cannot map (no primary key)"""
+        return sorted(self.base.metadata.tables)
+    
+    def for_each_table(self, method: str, table_names: List[str], jobs: int = 1,
+                       table_kwargs: Optional[Callable[[str], Dict[str, Any]]] = None, **kwargs) -> Dict[str, Any]:
+        """
+        Run a per-table method (get_table_row_count, get_table_data_sample, export_table_data, ...)
+        over many tables on a thread pool and collect the results
+
+        The schema is reflected once up front. Each worker gets its own manager and
+        session over a dedicated engine whose pool holds exactly `jobs` connections, so
+        the sweep neither waits on nor starves the application's pool; jobs is capped
+        at MAX_JOBS and the number of tables. table_kwargs(table_name) adds per-table
+        arguments (e.g. the output path of an export).
+        """
+        jobs = max(1, min(jobs, MAX_JOBS, len(table_names)))
+        base = self.base
+        engine = self.engine
+        if jobs > 1:
+            engine = create_engine(self.engine.url, pool_size=jobs, max_overflow=0, pool_pre_ping=True)
+        flask_app = current_app._get_current_object()
+        started = time.perf_counter()
+        
+        def run(table_name):
+            with flask_app.app_context():
+                worker = AutomapManager(engine, base)
+                try:
+                    extra = table_kwargs(table_name) if table_kwargs else {}
+                    return getattr(worker, method)(table_name, **kwargs, **extra)
+                except Exception as e:
+                    return {"error": str(e)}
+                finally:
+                    worker.close_session()
+        
+        try:
+            with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix='automap') as pool:
+                results = dict(zip(table_names, pool.map(run, table_names)))
+        finally:
+            if engine is not self.engine:
+                engine.dispose()
+        
+        return {
+            "results": results,
+            "errors": {name: result['error'] for name, result in results.items() if 'error' in result},
+            "tables": len(table_names),
+            "jobs": jobs,
+            "seconds": round(time.perf_counter() - started, 3)
+        }
+    
     def get_relationships(self, table_name: str) -> Dict[str, Any]:
         """Get relationship information for a table"""
         try:
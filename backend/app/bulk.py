@@ -0,0 +1,322 @@
+"""
+Bulk provisioning of users and companies
+Validates arrays of items up front, then writes them with batched multi-row
+upserts in one transaction, reporting an id or an error for every input item
+"""
+
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Any, Iterable, Optional
+
+from sqlalchemy import select, update, bindparam
+
+from . import db
+from .models import User, Company, UserRoleEnum
+from .audit import record_rows
+from .permissions import invalidate_on_commit
+
+# Rows per INSERT statement; keeps bind parameters well under Postgres' 65535 limit
+STATEMENT_BATCH_SIZE = 1000
+MAX_ITEMS = 50000
+CONFLICT_MODES = ('nothing', 'update')
+
+# company_id and role are never overwritten: an upsert must not move a user between
+# tenants or promote an existing account
+USER_UPDATE_COLUMNS = ('name', 'is_active')
+COMPANY_UPDATE_COLUMNS = ('country', 'currency_code')
+
+
+# The one error for company items the caller may not write, whether or not the name exists
+# elsewhere, so the endpoint does not reveal other tenants' company names
+COMPANY_UNAVAILABLE = "company name is not available"
+
+TRUE_VALUES = {'true', '1', 'yes'}
+FALSE_VALUES = {'false', '0', 'no'}
+
+
+class BulkRequestError(ValueError):
+    """Raised when the request as a whole is unusable"""
+
+
+def parse_bool(value, field: str) -> bool:
+    """JSON booleans, 0/1, or 'true'/'false'/'yes'/'no'/'1'/'0' strings; anything else is an error"""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str) and value.strip().lower() in TRUE_VALUES | FALSE_VALUES:
+        return value.strip().lower() in TRUE_VALUES
+    raise ValueError(f"{field} must be true or false")
+
+
+def coerce_role(value) -> UserRoleEnum:
+    """Turn a role name into UserRoleEnum, defaulting to employee"""
+    if value is None or value == '':
+        return UserRoleEnum.employee
+    if isinstance(value, UserRoleEnum):
+        return value
+    try:
+        return UserRoleEnum(str(value).strip().lower())
+    except ValueError:
+        raise ValueError(f"invalid role '{value}', expected one of {', '.join(r.value for r in UserRoleEnum)}")
+
+
+def _insert(table):
+    """Dialect insert supporting ON CONFLICT (Postgres in production, SQLite locally)"""
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
+
+def _batches(items: List, size: int = STATEMENT_BATCH_SIZE) -> Iterable[List]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _check_request(items, on_conflict):
+    if not isinstance(items, list) or not items:
+        raise BulkRequestError("Request body must contain a non-empty list of items")
+    if len(items) > MAX_ITEMS:
+        raise BulkRequestError(f"At most {MAX_ITEMS} items per request")
+    if on_conflict not in CONFLICT_MODES:
+        raise BulkRequestError(f"on_conflict must be one of {', '.join(CONFLICT_MODES)}")
+
+
+def _summary(results: List[Dict[str, Any]], started: float) -> Dict[str, Any]:
+    elapsed = time.perf_counter() - started
+    counts = {status: 0 for status in ('created', 'updated', 'skipped', 'error')}
+    for result in results:
+        counts[result['status']] += 1
+    return {
+        "results": results,
+        "created": counts['created'],
+        "updated": counts['updated'],
+        "skipped": counts['skipped'],
+        "failed": counts['error'],
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_second": round(len(results) / elapsed, 1) if elapsed > 0 else None,
+    }
+
+
+def bulk_create_users(items: List[Dict[str, Any]], company_id, on_conflict: str = 'nothing') -> Dict[str, Any]:
+    """
+    Create many users in the caller's company with INSERT ... ON CONFLICT (email)
+
+    Args:
+        items: dicts with email, name, role and optionally company_id
+        company_id: The caller's company; every user is created in it and items naming another are rejected
+        on_conflict: 'nothing' keeps existing users, 'update' overwrites name/is_active of users in the same company
+
+    Returns:
+        dict: per-item results in input order plus counts and throughput
+    """
+    _check_request(items, on_conflict)
+    started = time.perf_counter()
+    now = datetime.utcnow()
+    company_id = company_id if isinstance(company_id, uuid.UUID) else uuid.UUID(str(company_id))
+
+    results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+    rows = []
+    row_index = {}
+    for i, item in enumerate(items):
+        try:
+            if not isinstance(item, dict):
+                raise ValueError("item must be an object")
+            email = (item.get('email') or '').strip()
+            if not email or '@' not in email:
+                raise ValueError("valid email is required")
+            if not item.get('name'):
+                raise ValueError("name is required")
+            if email in row_index:
+                raise ValueError(f"duplicate of item {row_index[email]}")
+            if item.get('company_id') and uuid.UUID(str(item['company_id'])) != company_id:
+                raise ValueError("users can only be created in the caller's company")
+            rows.append({
+                'id': uuid.uuid4(),
+                'email': email,
+                'name': item['name'],
+                'role': coerce_role(item.get('role')),
+                'company_id': company_id,
+                'is_active': parse_bool(item.get('is_active', True), 'is_active'),
+                'created_at': now,
+            })
+            row_index[email] = i
+        except (ValueError, TypeError) as e:
+            results[i] = {"index": i, "status": "error", "error": str(e)}
+
+    try:
+        # Emails are unique across tenants, so look them up in every company
+        existing = {}
+        for batch in _batches([row['email'] for row in rows]):
+            existing.update((row.email, row) for row in db.session.execute(
+                select(User.email, User.id, User.company_id, *(User.__table__.c[column] for column in USER_UPDATE_COLUMNS))
+                .where(User.email.in_(batch)),
+                execution_options={'all_tenants': True}
+            ))
+
+        valid_rows = []
+        for row in rows:
+            found = existing.get(row['email'])
+            if found is not None and found.company_id != company_id:
+                i = row_index[row['email']]
+                results[i] = {"index": i, "status": "error", "error": "email is already registered"}
+            else:
+                valid_rows.append(row)
+
+        table = User.__table__
+        stmt = _insert(table)
+        if on_conflict == 'update':
+            # The WHERE also covers users created in another company after the lookup above
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.email],
+                set_={column: getattr(stmt.excluded, column) for column in USER_UPDATE_COLUMNS},
+                where=table.c.company_id == stmt.excluded.company_id
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=[table.c.email])
+        # One cached statement executed for all rows; SQLAlchemy's insertmanyvalues
+        # sends it as multi-row INSERT ... RETURNING pages of STATEMENT_BATCH_SIZE
+        returned = dict(db.session.execute(
+            stmt.returning(table.c.email, table.c.id),
+            valid_rows,
+            execution_options={'insertmanyvalues_page_size': STATEMENT_BATCH_SIZE}
+        ).all()) if valid_rows else {}
+
+        inserted, updated = [], []
+        for row in valid_rows:
+            i = row_index[row['email']]
+            if row['email'] in existing:
+                status = 'updated' if on_conflict == 'update' else 'skipped'
+                found = existing[row['email']]
+                user_id = found.id
+                if status == 'updated' and row['email'] in returned:
+                    updated.append((user_id, {column: row[column] for column in USER_UPDATE_COLUMNS}, found._asdict()))
+            else:
+                status = 'created' if row['email'] in returned else 'skipped'
+                user_id = returned.get(row['email'])
+                if user_id is not None:
+                    inserted.append((user_id, {**row, 'id': user_id}, None))
+            results[i] = {"index": i, "status": status, "id": str(user_id) if user_id else None, "email": row['email']}
+
+        # Core statements skip the ORM flush hooks, so queue their work here
+        record_rows('users', 'insert', inserted, company_id=company_id)
+        record_rows('users', 'update', updated, company_id=company_id)
+        invalidate_on_commit(user_id for user_id, _, _ in updated)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return _summary(results, started)
+
+
+def bulk_create_companies(items: List[Dict[str, Any]], company_id, on_conflict: str = 'nothing',
+                          allow_create: bool = False) -> Dict[str, Any]:
+    """
+    Create many companies, treating an existing company with the same name as a conflict
+
+    Company names have no unique constraint, so conflicts are resolved with one
+    name lookup per batch instead of ON CONFLICT; new rows go in as one executemany insert.
+    Only the caller's own company (company_id) can be updated, and new companies are
+    created only with allow_create (the platform-level company.create permission). Any
+    other item gets COMPANY_UNAVAILABLE.
+
+    Returns:
+        dict: per-item results in input order plus counts and throughput
+    """
+    _check_request(items, on_conflict)
+    started = time.perf_counter()
+    now = datetime.utcnow()
+    company_id = company_id if isinstance(company_id, uuid.UUID) else uuid.UUID(str(company_id))
+
+    results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+    rows = []
+    row_index = {}
+    for i, item in enumerate(items):
+        try:
+            if not isinstance(item, dict):
+                raise ValueError("item must be an object")
+            for field in ('name', 'country', 'currency_code'):
+                if not item.get(field):
+                    raise ValueError(f"{field} is required")
+            name = item['name'].strip()
+            if name in row_index:
+                raise ValueError(f"duplicate of item {row_index[name]}")
+            rows.append({
+                'id': uuid.uuid4(),
+                'name': name,
+                'country': item['country'],
+                'currency_code': str(item['currency_code']).upper(),
+                'created_at': now,
+            })
+            row_index[name] = i
+        except (ValueError, TypeError) as e:
+            results[i] = {"index": i, "status": "error", "error": str(e)}
+
+    try:
+        existing = {}
+        for batch in _batches([row['name'] for row in rows]):
+            existing.update((row.name, row) for row in db.session.execute(
+                select(Company.name, Company.id, *(Company.__table__.c[column] for column in COMPANY_UPDATE_COLUMNS))
+                .where(Company.name.in_(batch)),
+                execution_options={'all_tenants': True}
+            ))
+
+        owned_rows = []
+        for row in rows:
+            found = existing.get(row['name'])
+            if (found is None and allow_create) or (found is not None and found.id == company_id):
+                owned_rows.append(row)
+            else:
+                i = row_index[row['name']]
+                results[i] = {"index": i, "status": "error", "error": COMPANY_UNAVAILABLE}
+        rows = owned_rows
+
+        new_rows = [row for row in rows if row['name'] not in existing]
+        conflicting = [row for row in rows if row['name'] in existing]
+
+        if new_rows:
+            db.session.execute(
+                Company.__table__.insert(),
+                new_rows,
+                execution_options={'insertmanyvalues_page_size': STATEMENT_BATCH_SIZE}
+            )
+
+        if on_conflict == 'update' and conflicting:
+            table = Company.__table__
+            db.session.execute(
+                update(table)
+                .where(table.c.id == bindparam('b_id'))
+                .values({column: bindparam(f"b_{column}") for column in COMPANY_UPDATE_COLUMNS}),
+                [
+                    {'b_id': existing[row['name']].id, **{f"b_{column}": row[column] for column in COMPANY_UPDATE_COLUMNS}}
+                    for row in conflicting
+                ]
+            )
+
+        for row in rows:
+            i = row_index[row['name']]
+            if row['name'] in existing:
+                status = 'updated' if on_conflict == 'update' else 'skipped'
+                row_id = existing[row['name']].id
+            else:
+                status, row_id = 'created', row['id']
+            results[i] = {"index": i, "status": status, "id": str(row_id), "name": row['name']}
+
+        # Core statements skip the ORM flush hooks, so queue the audit events here
+        for row in new_rows:
+            record_rows('companies', 'insert', [(row['id'], row, None)], company_id=row['id'])
+        if on_conflict == 'update':
+            record_rows('companies', 'update', [
+                (company_id, {column: row[column] for column in COMPANY_UPDATE_COLUMNS}, existing[row['name']]._asdict())
+                for row in conflicting
+            ], company_id=company_id)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return _summary(results, started)
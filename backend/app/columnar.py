@@ -0,0 +1,179 @@
+"""
+Columnar (Arrow / Parquet) encoding of table rows
+Maps SQLAlchemy column types to Arrow types and turns batches of result rows into
+record batches, written as Parquet or Arrow IPC files. Used by the archive job and
+bulk exports; pyarrow is optional and only imported when one of them runs.
+"""
+
+import os
+import enum
+import json
+import uuid
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy import types
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('parquet', 'arrow')
+FILE_EXTENSIONS = {'parquet': '.parquet', 'arrow': '.arrow'}
+
+# Unconstrained NUMERIC (the models' amounts and salaries) is stored at this precision
+DEFAULT_DECIMAL = (38, 10)
+
+
+class ColumnarError(RuntimeError):
+    """Raised when pyarrow is missing or a format is not supported"""
+
+
+def require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet  # noqa: F401 - registers pyarrow.parquet
+        import pyarrow.ipc  # noqa: F401
+    except ImportError:
+        raise ColumnarError("Columnar files require pyarrow (pip install pyarrow)")
+    return pyarrow
+
+
+def arrow_type(column_type):
+    """Arrow type for a SQLAlchemy (or reflected dialect) column type"""
+    pa = require_pyarrow()
+    if isinstance(column_type, types.Uuid):
+        return pa.string()
+    if isinstance(column_type, types.Enum):
+        return pa.string()
+    if isinstance(column_type, types.Boolean):
+        return pa.bool_()
+    if isinstance(column_type, types.BigInteger):
+        return pa.int64()
+    if isinstance(column_type, types.SmallInteger):
+        return pa.int16()
+    if isinstance(column_type, types.Integer):
+        return pa.int32()
+    if isinstance(column_type, types.Float):
+        return pa.float64()
+    if isinstance(column_type, types.Numeric):
+        if column_type.precision:
+            return pa.decimal128(column_type.precision, column_type.scale or 0)
+        return pa.decimal128(*DEFAULT_DECIMAL)
+    if isinstance(column_type, types.DateTime):
+        return pa.timestamp('us', tz='UTC' if column_type.timezone else None)
+    if isinstance(column_type, types.Date):
+        return pa.date32()
+    if isinstance(column_type, types.Time):
+        return pa.time64('us')
+    if isinstance(column_type, types.Interval):
+        return pa.duration('us')
+    if isinstance(column_type, types.LargeBinary):
+        return pa.binary()
+    # String, Text, JSON, arrays and anything dialect-specific travel as text
+    return pa.string()
+
+
+def arrow_schema(columns: Iterable, extra: Optional[Dict[str, Any]] = None):
+    """Schema for table columns, plus optional extra name -> Arrow type fields"""
+    pa = require_pyarrow()
+    fields = [pa.field(column.name, arrow_type(column.type), nullable=column.nullable) for column in columns]
+    for name, field_type in (extra or {}).items():
+        fields.append(pa.field(name, field_type))
+    return pa.schema(fields)
+
+
+def _to_arrow_value(value):
+    if value is None:
+        return None
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    return value
+
+
+def _converter(field):
+    """Per-column conversion of Python values; only text columns need one (UUIDs, enums, JSON)"""
+    pa = require_pyarrow()
+    if pa.types.is_string(field.type):
+        return lambda values: [
+            value if value is None or isinstance(value, str) else str(_to_arrow_value(value))
+            for value in values
+        ]
+    # Numbers, booleans, dates and bytes come from the driver as types Arrow takes as is
+    return None
+
+
+def record_batch(schema, rows: Sequence[Sequence[Any]]):
+    """Record batch from result rows whose values are in schema order"""
+    pa = require_pyarrow()
+    columns = list(zip(*rows)) if rows else [() for _ in schema]
+    arrays = []
+    for field, values in zip(schema, columns):
+        convert = _converter(field)
+        arrays.append(pa.array(convert(values) if convert else values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+class ColumnarWriter:
+    """
+    Writes record batches to one Parquet or Arrow IPC file
+
+    Data goes to a temporary file that replaces `path` on close, so readers (and
+    resumed jobs) never see a partial file.
+    """
+
+    def __init__(self, path: str, schema, fmt: str = 'parquet', compression: str = 'zstd'):
+        if fmt not in FORMATS:
+            raise ColumnarError(f"Unsupported columnar format '{fmt}', expected {' or '.join(FORMATS)}")
+        pa = require_pyarrow()
+        self.path = path
+        self.schema = schema
+        self.rows = 0
+        self._temp_path = f"{path}.tmp"
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if fmt == 'parquet':
+            self._writer = pa.parquet.ParquetWriter(self._temp_path, schema, compression=compression)
+        else:
+            options = pa.ipc.IpcWriteOptions(compression=None if compression == 'none' else compression)
+            self._writer = pa.ipc.new_file(self._temp_path, schema, options=options)
+
+    def write(self, batch):
+        if batch.num_rows:
+            self._writer.write_batch(batch)
+            self.rows += batch.num_rows
+
+    def close(self) -> int:
+        """Finish the file and move it into place; returns its size in bytes"""
+        self._writer.close()
+        os.replace(self._temp_path, self.path)
+        return os.path.getsize(self.path)
+
+    def abort(self):
+        try:
+            self._writer.close()
+        finally:
+            if os.path.exists(self._temp_path):
+                os.remove(self._temp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+def write_file(path: str, schema, rows: List[Sequence[Any]], fmt: str = 'parquet', compression: str = 'zstd') -> int:
+    """Write rows as a single-batch file; returns its size in bytes"""
+    writer = ColumnarWriter(path, schema, fmt, compression)
+    try:
+        writer.write(record_batch(schema, rows))
+    except Exception:
+        writer.abort()
+        raise
+    return writer.close()
@@ -0,0 +1,162 @@
+"""
+Response compression
+Negotiates zstd, brotli or gzip from Accept-Encoding for text and JSON responses
+above COMPRESSION_MIN_SIZE; generator responses are compressed chunk by chunk as
+they stream. brotli and zstandard are optional, gzip always works.
+"""
+
+import os
+import zlib
+import logging
+from typing import Dict, Iterable, Iterator
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional: br is skipped in negotiation
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional: zstd is skipped in negotiation
+    zstandard = None
+
+from . import app
+
+logger = logging.getLogger(__name__)
+
+app.config.setdefault('COMPRESSION_ENABLED', os.getenv('COMPRESSION_ENABLED', 'True').lower() == 'true')
+# Bodies smaller than this are cheaper to send as-is
+app.config.setdefault('COMPRESSION_MIN_SIZE', int(os.getenv('COMPRESSION_MIN_SIZE', 1024)))
+# Server preference when the client accepts several encodings equally
+app.config.setdefault('COMPRESSION_ALGORITHMS', os.getenv('COMPRESSION_ALGORITHMS', 'zstd,br,gzip'))
+app.config.setdefault('COMPRESSION_GZIP_LEVEL', int(os.getenv('COMPRESSION_GZIP_LEVEL', 6)))
+# Brotli's default quality (11) is meant for static assets; 4-5 suits per-request compression
+app.config.setdefault('COMPRESSION_BROTLI_QUALITY', int(os.getenv('COMPRESSION_BROTLI_QUALITY', 4)))
+app.config.setdefault('COMPRESSION_ZSTD_LEVEL', int(os.getenv('COMPRESSION_ZSTD_LEVEL', 3)))
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json', 'application/x-ndjson', 'application/javascript', 'application/xml',
+    'text/html', 'text/plain', 'text/csv', 'text/css', 'text/xml',
+}
+
+
+class GzipEncoder:
+    name = 'gzip'
+
+    def __init__(self, level: int):
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+        return compressor.compress(data) + compressor.flush()
+
+    def stream(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            # Sync flush per chunk so the client can start parsing before the body ends
+            yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+
+
+class BrotliEncoder:
+    name = 'br'
+
+    def __init__(self, quality: int):
+        self.quality = quality
+
+    def compress(self, data: bytes) -> bytes:
+        return brotli.compress(data, mode=brotli.MODE_TEXT, quality=self.quality)
+
+    def stream(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=self.quality)
+        for chunk in chunks:
+            yield compressor.process(chunk) + compressor.flush()
+        yield compressor.finish()
+
+
+class ZstdEncoder:
+    name = 'zstd'
+
+    def __init__(self, level: int):
+        self.compressor = zstandard.ZstdCompressor(level=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self.compressor.compress(data)
+
+    def stream(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        compressor = self.compressor.compressobj()
+        for chunk in chunks:
+            yield compressor.compress(chunk) + compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        yield compressor.flush()
+
+
+def available_encoders(app) -> Dict[str, object]:
+    """Encoders in server preference order, skipping those whose library is missing"""
+    encoders = {}
+    for name in (name.strip() for name in app.config['COMPRESSION_ALGORITHMS'].split(',')):
+        if name == 'gzip':
+            encoders[name] = GzipEncoder(app.config['COMPRESSION_GZIP_LEVEL'])
+        elif name == 'br' and brotli is not None:
+            encoders[name] = BrotliEncoder(app.config['COMPRESSION_BROTLI_QUALITY'])
+        elif name == 'zstd' and zstandard is not None:
+            encoders[name] = ZstdEncoder(app.config['COMPRESSION_ZSTD_LEVEL'])
+    return encoders
+
+
+def negotiate(encoders: Dict[str, object]):
+    """Highest-quality encoding the client accepts; ties go to server preference"""
+    best, best_quality = None, 0
+    for name, encoder in encoders.items():
+        quality = request.accept_encodings.quality(name)
+        if quality > best_quality:
+            best, best_quality = encoder, quality
+    return best
+
+
+def _compressible(response) -> bool:
+    return (
+        200 <= response.status_code < 300
+        and response.status_code not in (204, 206)
+        and not response.direct_passthrough
+        and 'Content-Encoding' not in response.headers
+        and response.mimetype in COMPRESSIBLE_MIMETYPES
+    )
+
+
+def _chunks(iterable) -> Iterator[bytes]:
+    for chunk in iterable:
+        yield chunk.encode() if isinstance(chunk, str) else chunk
+
+
+def init_compression(app):
+    """Compress eligible responses after every request"""
+    if not app.config['COMPRESSION_ENABLED']:
+        return
+    encoders = available_encoders(app)
+    logger.info("Response compression enabled: %s", ', '.join(encoders))
+
+    @app.after_request
+    def _compress_response(response):
+        if not _compressible(response):
+            return response
+        response.vary.add('Accept-Encoding')
+        if not response.is_streamed and response.calculate_content_length() < app.config['COMPRESSION_MIN_SIZE']:
+            return response
+        encoder = negotiate(encoders)
+        if encoder is None:
+            return response
+
+        if response.is_streamed:
+            response.response = encoder.stream(_chunks(response.response))
+            response.headers.pop('Content-Length', None)
+        else:
+            response.set_data(encoder.compress(response.get_data()))
+        response.headers['Content-Encoding'] = encoder.name
+        # The encoded bytes differ from the identity ones, so the validator becomes weak;
+        # If-None-Match uses weak comparison, so cached ETags still revalidate to 304
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
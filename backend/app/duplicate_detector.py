@@ -0,0 +1,238 @@
+"""
+Duplicate expense detection
+Exact duplicates are found through the indexed expenses.fingerprint column; near
+duplicates through a range scan on (employee_id, currency, date) within a small window
+"""
+
+import os
+import re
+import uuid
+import bisect
+import hashlib
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from difflib import SequenceMatcher
+from typing import Dict, List, Any, Iterable, Optional
+
+from sqlalchemy import event, select, insert
+
+from . import app, db
+from .models import Expense, ExpenseFlag
+
+logger = logging.getLogger(__name__)
+
+app.config.setdefault('DUPLICATE_WINDOW_DAYS', int(os.getenv('DUPLICATE_WINDOW_DAYS', 3)))
+app.config.setdefault('DUPLICATE_AMOUNT_TOLERANCE', Decimal(os.getenv('DUPLICATE_AMOUNT_TOLERANCE', '0.01')))
+app.config.setdefault('DUPLICATE_DESCRIPTION_THRESHOLD', float(os.getenv('DUPLICATE_DESCRIPTION_THRESHOLD', 0.8)))
+
+EXACT_DUPLICATE = 'exact_duplicate'
+NEAR_DUPLICATE = 'near_duplicate'
+DUPLICATE_RECEIPT = 'duplicate_receipt'
+
+# Cap on matches reported per expense so a pathological history can't blow up a response
+MAX_MATCHES = 5
+
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+
+def normalize_description(description: Optional[str]) -> str:
+    """Lowercase, drop punctuation and collapse whitespace"""
+    if not description:
+        return ''
+    return _NON_ALNUM.sub(' ', description.lower()).strip()
+
+
+def _as_date(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    return value
+
+
+def _as_decimal(value) -> Decimal:
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+def expense_fingerprint(employee_id, amount, currency, expense_date, description) -> str:
+    """Stable hash of the fields that identify the same claim being submitted twice"""
+    key = '|'.join((
+        str(employee_id),
+        format(_as_decimal(amount).normalize(), 'f'),
+        str(currency).upper(),
+        _as_date(expense_date).isoformat(),
+        normalize_description(description),
+    ))
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+@event.listens_for(Expense, 'before_insert')
+@event.listens_for(Expense, 'before_update')
+def _set_fingerprint(mapper, connection, target):
+    if target.employee_id is None or target.amount is None or target.date is None:
+        return
+    target.fingerprint = expense_fingerprint(
+        target.employee_id, target.amount, target.currency, target.date, target.description
+    )
+
+
+class DuplicateDetector:
+    """Finds exact and near duplicates for single submissions and for import batches"""
+
+    def __init__(self, window_days: int = None, amount_tolerance: Decimal = None, description_threshold: float = None):
+        self.window = timedelta(days=app.config['DUPLICATE_WINDOW_DAYS'] if window_days is None else window_days)
+        self.amount_tolerance = _as_decimal(
+            app.config['DUPLICATE_AMOUNT_TOLERANCE'] if amount_tolerance is None else amount_tolerance
+        )
+        self.description_threshold = (
+            app.config['DUPLICATE_DESCRIPTION_THRESHOLD'] if description_threshold is None else description_threshold
+        )
+
+    def check(self, expense: Expense) -> List[Dict[str, Any]]:
+        """Return duplicate matches for one (possibly unflushed) expense"""
+        record = {
+            'id': expense.id,
+            'employee_id': expense.employee_id,
+            'amount': expense.amount,
+            'currency': expense.currency,
+            'date': expense.date,
+            'description': expense.description,
+        }
+        record['fingerprint'] = expense.fingerprint or expense_fingerprint(
+            record['employee_id'], record['amount'], record['currency'], record['date'], record['description']
+        )
+        return self.check_batch([record]).get(record['id'], [])
+
+    def check_batch(self, records: List[Dict[str, Any]]) -> Dict[Any, List[Dict[str, Any]]]:
+        """
+        Check a batch of expense records against stored expenses and each other
+
+        Each record needs id, employee_id, amount, currency, date, description and
+        fingerprint. Costs one indexed query for exact matches and one range scan
+        for near matches per batch, then a bisect per record.
+
+        Returns:
+            dict: record id -> list of matches for records that have any
+        """
+        if not records:
+            return {}
+        for record in records:
+            record['employee_id'] = _as_uuid(record['employee_id'])
+            record['date'] = _as_date(record['date'])
+            record['amount'] = _as_decimal(record['amount'])
+        batch_ids = {record['id'] for record in records}
+
+        # Exact: indexed fingerprint lookup, then earlier rows of the same batch. The date is
+        # part of the fingerprint, so bounding by it prunes to the partitions of the batch's months
+        exact = defaultdict(list)
+        for expense_id, fingerprint in db.session.execute(
+            select(Expense.id, Expense.fingerprint).where(
+                Expense.fingerprint.in_({record['fingerprint'] for record in records}),
+                Expense.date.in_({record['date'] for record in records}),
+            )
+        ):
+            if expense_id not in batch_ids:
+                exact[fingerprint].append(expense_id)
+
+        # Near: one range scan over the window around the batch's dates
+        earliest = min(record['date'] for record in records) - self.window
+        latest = max(record['date'] for record in records) + self.window
+        window_index = defaultdict(list)
+        for row in db.session.execute(
+            select(Expense.id, Expense.employee_id, Expense.currency, Expense.date, Expense.amount, Expense.description)
+            .where(
+                Expense.employee_id.in_({record['employee_id'] for record in records}),
+                Expense.date >= earliest,
+                Expense.date <= latest,
+            )
+        ):
+            if row.id not in batch_ids:
+                window_index[(row.employee_id, row.currency)].append(
+                    (row.date, row.id, _as_decimal(row.amount), normalize_description(row.description))
+                )
+        for entries in window_index.values():
+            entries.sort(key=lambda entry: (entry[0], str(entry[1])))
+
+        results = {}
+        for record in records:
+            matches = []
+            exact_ids = exact[record['fingerprint']]
+            for expense_id in exact_ids[:MAX_MATCHES]:
+                matches.append(_match(EXACT_DUPLICATE, expense_id, 1.0))
+
+            key = (record['employee_id'], record['currency'])
+            description = normalize_description(record.get('description'))
+            for expense_id, score in self._near_matches(window_index[key], record, description, set(exact_ids)):
+                if len(matches) >= MAX_MATCHES:
+                    break
+                matches.append(_match(NEAR_DUPLICATE, expense_id, score))
+            if matches:
+                results[record['id']] = matches
+
+            # Later rows in the batch are checked against this one
+            exact[record['fingerprint']].append(record['id'])
+            entries = window_index[key]
+            bisect.insort(entries, (record['date'], record['id'], record['amount'], description),
+                          key=lambda entry: (entry[0], str(entry[1])))
+        return results
+
+    def _near_matches(self, entries, record, description, skip_ids) -> Iterable[tuple]:
+        lower = bisect.bisect_left(entries, record['date'] - self.window, key=lambda entry: entry[0])
+        upper = bisect.bisect_right(entries, record['date'] + self.window, key=lambda entry: entry[0])
+        amount = record['amount']
+        tolerance = abs(amount) * self.amount_tolerance
+        for entry_date, expense_id, entry_amount, entry_description in entries[lower:upper]:
+            if expense_id in skip_ids or abs(entry_amount - amount) > tolerance:
+                continue
+            if description and entry_description:
+                score = SequenceMatcher(None, description, entry_description).ratio()
+                if score < self.description_threshold:
+                    continue
+            else:
+                score = self.description_threshold
+            yield expense_id, round(score, 3)
+
+    def flag_rows(self, expense_id, matches: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """ExpenseFlag rows for executemany inserts"""
+        now = datetime.utcnow()
+        return [
+            {
+                'id': uuid.uuid4(),
+                'expense_id': expense_id,
+                'flag_type': match['flag_type'],
+                'related_expense_id': _as_uuid(match['related_expense_id']),
+                'score': Decimal(str(match['score'])),
+                'created_at': now,
+            }
+            for match in matches
+        ]
+
+    def save_flags(self, flags_by_expense: Dict[Any, List[Dict[str, Any]]]):
+        """Insert flags for many expenses in one statement"""
+        rows = [
+            row
+            for expense_id, matches in flags_by_expense.items()
+            for row in self.flag_rows(expense_id, matches)
+        ]
+        if rows:
+            db.session.execute(insert(ExpenseFlag), rows)
+        return len(rows)
+
+
+def _as_uuid(value):
+    return value if isinstance(value, uuid.UUID) else uuid.UUID(str(value))
+
+
+def _match(flag_type: str, expense_id, score: float) -> Dict[str, Any]:
+    return {"flag_type": flag_type, "related_expense_id": str(expense_id), "score": score}
+
+
+def serialize_flag(flag: ExpenseFlag) -> Dict[str, Any]:
+    return {
+        "flag_type": flag.flag_type,
+        "related_expense_id": str(flag.related_expense_id) if flag.related_expense_id else None,
+        "score": str(flag.score) if flag.score is not None else None,
+        "created_at": flag.created_at.isoformat() if flag.created_at else None
+    }
@@ -0,0 +1,344 @@
+"""
+Batch expense import
+Streams CSV/XLSX uploads, validates rows in chunks and bulk-loads them in one transaction
+"""
+
+import csv
+import io
+import time
+import uuid
+import logging
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from typing import Dict, List, Any, Iterator, Optional, IO
+
+from sqlalchemy import select
+
+from . import app, db
+from .models import Expense, Employee
+from .reports import refresh_buckets, month_start
+from .duplicate_detector import DuplicateDetector, expense_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# Columns an import file must provide, and the optional ones we understand
+REQUIRED_COLUMNS = ('employee_id', 'amount', 'currency', 'category', 'date')
+OPTIONAL_COLUMNS = ('converted_amount', 'description', 'receipt_url')
+
+# Column order used for both COPY and executemany loads
+LOAD_COLUMNS = (
+    'id', 'employee_id', 'amount', 'currency', 'converted_amount', 'category',
+    'description', 'receipt_url', 'date', 'status', 'fingerprint', 'created_at'
+)
+
+DEFAULT_CHUNK_SIZE = 5000
+MAX_REPORTED_ERRORS = 1000
+
+
+class ImportFormatError(ValueError):
+    """Raised when an upload cannot be parsed at all (bad header, unknown format)"""
+
+
+def _parse_uuid(value):
+    if isinstance(value, uuid.UUID):
+        return value
+    return uuid.UUID(str(value).strip())
+
+
+def _parse_decimal(value):
+    if isinstance(value, Decimal):
+        return value
+    if isinstance(value, float):
+        # Spreadsheet cells come back as floats; go through str() to keep 12.3 as 12.3
+        value = repr(value)
+    try:
+        result = Decimal(str(value).strip().replace(',', ''))
+    except InvalidOperation:
+        raise ValueError(f"'{value}' is not a valid number")
+    if not result.is_finite():
+        raise ValueError(f"'{value}' is not a valid number")
+    return result
+
+
+def _parse_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value).strip()[:10])
+
+
+def _parse_currency(value):
+    code = str(value).strip().upper()
+    if len(code) != 3 or not code.isalpha():
+        raise ValueError(f"'{value}' is not a 3-letter currency code")
+    return code
+
+
+def _parse_text(value):
+    if value is None:
+        return None
+    text = str(value).strip()
+    return text or None
+
+
+# Per-column converters, applied to every row of every chunk
+CONVERTERS = {
+    'employee_id': _parse_uuid,
+    'amount': _parse_decimal,
+    'currency': _parse_currency,
+    'converted_amount': _parse_decimal,
+    'category': _parse_text,
+    'description': _parse_text,
+    'receipt_url': _parse_text,
+    'date': _parse_date,
+}
+
+
+def iter_csv_rows(stream: IO[bytes]) -> Iterator[tuple]:
+    """Yield (header, row) pairs from a binary CSV stream without reading it all"""
+    text_stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    try:
+        reader = csv.reader(text_stream)
+        header = next(reader, None)
+        if header is None:
+            raise ImportFormatError("File is empty")
+        yield [h.strip().lower() for h in header]
+        for row in reader:
+            yield row
+    finally:
+        # Don't let the wrapper close the underlying upload stream
+        text_stream.detach()
+
+
+def iter_xlsx_rows(stream: IO[bytes]) -> Iterator[tuple]:
+    """Yield the header and then each row of the first worksheet in read-only mode"""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportFormatError("XLSX import requires openpyxl (pip install openpyxl)")
+
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            raise ImportFormatError("File is empty")
+        yield [str(h).strip().lower() if h is not None else '' for h in header]
+        for row in rows:
+            yield row
+    finally:
+        workbook.close()
+
+
+def detect_format(filename: Optional[str], explicit: Optional[str] = None) -> str:
+    """Work out the upload format from an explicit value or the file extension"""
+    fmt = (explicit or '').lower() or (filename or '').rsplit('.', 1)[-1].lower()
+    if fmt not in ('csv', 'xlsx'):
+        raise ImportFormatError(f"Unsupported import format '{fmt}', expected csv or xlsx")
+    return fmt
+
+
+class ExpenseImporter:
+    """Validates and bulk-loads expense rows from a streamed upload"""
+
+    def __init__(self, chunk_size: int = DEFAULT_CHUNK_SIZE, strict: bool = False, check_duplicates: bool = True,
+                 company_id=None):
+        self.chunk_size = max(1, chunk_size)
+        self.strict = strict
+        # Tenant whose employees rows may reference; None (CLI imports) accepts any company
+        self.company_id = company_id
+        self.detector = DuplicateDetector() if check_duplicates else None
+        # Duplicate flags raised on imported rows: total count and a bounded sample for the report
+        self._flagged_count = 0
+        self._flagged = []
+        # employee_id -> company_id for every employee seen so far
+        self._known_employees = {}
+        # (company_id, month) rollup buckets touched by this import
+        self._touched_buckets = set()
+        self._use_copy = db.engine.dialect.name == 'postgresql'
+
+    def import_stream(self, stream: IO[bytes], filename: str = None, fmt: str = None) -> Dict[str, Any]:
+        """
+        Import expenses from a CSV or XLSX stream
+
+        Valid rows are loaded inside a single transaction. With ``strict`` any
+        invalid row rolls back the whole import.
+
+        Returns:
+            dict: counts, row-level errors and throughput
+        """
+        fmt = detect_format(filename, fmt)
+        rows = iter_csv_rows(stream) if fmt == 'csv' else iter_xlsx_rows(stream)
+
+        header = next(rows)
+        missing = [col for col in REQUIRED_COLUMNS if col not in header]
+        if missing:
+            raise ImportFormatError(f"Missing required columns: {', '.join(missing)}")
+        positions = {
+            col: header.index(col)
+            for col in REQUIRED_COLUMNS + OPTIONAL_COLUMNS
+            if col in header
+        }
+
+        started = time.perf_counter()
+        errors: List[Dict[str, Any]] = []
+        error_count = 0
+        imported = 0
+        processed = 0
+        chunk = []
+
+        try:
+            # Row numbers are 1-based and count the header, matching what a spreadsheet shows
+            for row_number, raw in enumerate(rows, start=2):
+                if not any(v not in (None, '') for v in raw):
+                    continue
+                chunk.append((row_number, raw))
+                if len(chunk) >= self.chunk_size:
+                    loaded, chunk_errors = self._process_chunk(chunk, positions)
+                    processed += len(chunk)
+                    imported += loaded
+                    error_count += len(chunk_errors)
+                    errors.extend(chunk_errors[:MAX_REPORTED_ERRORS - len(errors)])
+                    chunk = []
+            if chunk:
+                loaded, chunk_errors = self._process_chunk(chunk, positions)
+                processed += len(chunk)
+                imported += loaded
+                error_count += len(chunk_errors)
+                errors.extend(chunk_errors[:MAX_REPORTED_ERRORS - len(errors)])
+
+            if self.strict and error_count:
+                db.session.rollback()
+                imported = 0
+            else:
+                # COPY bypasses ORM flush hooks, so refresh the touched rollup buckets ourselves
+                if self._touched_buckets and app.config.get('REPORTS_ROLLUP_ON_WRITE'):
+                    refresh_buckets(db.session.connection(), self._touched_buckets)
+                db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        elapsed = time.perf_counter() - started
+        return {
+            "rows_processed": processed,
+            "rows_imported": imported,
+            "rows_failed": error_count,
+            "errors": errors,
+            "errors_truncated": error_count > len(errors),
+            "rows_flagged": self._flagged_count if imported else 0,
+            "flagged": self._flagged if imported else [],
+            "strict": self.strict,
+            "load_method": "copy" if self._use_copy else "executemany",
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(processed / elapsed, 1) if elapsed > 0 else None,
+        }
+
+    def _process_chunk(self, chunk: List[tuple], positions: Dict[str, int]) -> tuple:
+        """Convert a chunk, check employee references and load the valid rows"""
+        valid = []
+        errors = []
+        for row_number, raw in chunk:
+            record, row_errors = self._convert_row(raw, positions)
+            if row_errors:
+                errors.append({"row": row_number, "errors": row_errors})
+            else:
+                valid.append((row_number, record))
+
+        self._check_employees(valid, errors)
+        if not valid or (self.strict and errors):
+            return 0, errors
+
+        now = datetime.utcnow()
+        row_numbers = {}
+        records = []
+        for row_number, record in valid:
+            if record is None:
+                continue
+            record = self._finalize(record, now)
+            row_numbers[record['id']] = row_number
+            records.append(record)
+            self._touched_buckets.add((self._known_employees[record['employee_id']], month_start(record['date'])))
+
+        flags = self.detector.check_batch(records) if self.detector else {}
+
+        if self._use_copy:
+            self._load_copy(records)
+        else:
+            self._load_executemany(records)
+
+        if flags:
+            self.detector.save_flags(flags)
+            self._flagged_count += len(flags)
+            for expense_id, matches in flags.items():
+                if len(self._flagged) >= MAX_REPORTED_ERRORS:
+                    break
+                self._flagged.append({"row": row_numbers[expense_id], "expense_id": str(expense_id), "matches": matches})
+        return len(records), errors
+
+    def _convert_row(self, raw, positions: Dict[str, int]) -> tuple:
+        record = {}
+        row_errors = []
+        for col, pos in positions.items():
+            value = raw[pos] if pos < len(raw) else None
+            if value is None or value == '':
+                if col in REQUIRED_COLUMNS:
+                    row_errors.append(f"{col} is required")
+                record[col] = None
+                continue
+            try:
+                record[col] = CONVERTERS[col](value)
+            except (ValueError, TypeError) as e:
+                row_errors.append(f"{col}: {e}")
+        if row_errors:
+            return None, row_errors
+        if not record['category']:
+            return None, ["category is required"]
+        return record, None
+
+    def _check_employees(self, valid: List[tuple], errors: List[Dict[str, Any]]):
+        """Resolve unknown employee ids with one query per chunk"""
+        unknown = {record['employee_id'] for _, record in valid} - self._known_employees.keys()
+        if unknown:
+            query = select(Employee.id, Employee.company_id).where(Employee.id.in_(unknown))
+            if self.company_id is not None:
+                query = query.where(Employee.company_id == self.company_id)
+            found = db.session.execute(query).all()
+            self._known_employees.update(found)
+
+        for i, (row_number, record) in enumerate(valid):
+            if record['employee_id'] not in self._known_employees:
+                errors.append({"row": row_number, "errors": [f"employee_id {record['employee_id']} does not exist"]})
+                valid[i] = (row_number, None)
+        errors.sort(key=lambda e: e['row'])
+
+    def _finalize(self, record: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+        record['id'] = uuid.uuid4()
+        record['status'] = 'pending'
+        record['created_at'] = now
+        for col in OPTIONAL_COLUMNS:
+            record.setdefault(col, None)
+        record['fingerprint'] = expense_fingerprint(
+            record['employee_id'], record['amount'], record['currency'], record['date'], record['description']
+        )
+        return record
+
+    def _load_copy(self, records: List[Dict[str, Any]]):
+        """Stream a chunk into Postgres with COPY on the session's own connection"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for record in records:
+            writer.writerow(['' if record[col] is None else record[col] for col in LOAD_COLUMNS])
+        buffer.seek(0)
+
+        dbapi_connection = db.session.connection().connection
+        with dbapi_connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {Expense.__tablename__} ({', '.join(LOAD_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+                buffer
+            )
+
+    def _load_executemany(self, records: List[Dict[str, Any]]):
+        """Fallback for non-Postgres databases: a single executemany insert"""
+        db.session.execute(Expense.__table__.insert(), records)
@@ -0,0 +1,319 @@
+"""
+Org-chart hierarchy service
+Keeps a closure table of the Employee.manager_id chain so ancestor/descendant
+questions are single indexed lookups, plus a per-company in-memory tree cache
+"""
+
+import os
+import time
+import uuid
+import logging
+import threading
+from collections import defaultdict, deque
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Set
+
+from sqlalchemy import event, select, delete, insert, union, and_, inspect
+
+from . import app, db
+from .models import Employee, Department, Team, TeamMember, OrgClosure
+
+logger = logging.getLogger(__name__)
+
+app.config.setdefault('ORG_CACHE_TTL', int(os.getenv('ORG_CACHE_TTL', 60)))
+
+
+class HierarchyError(ValueError):
+    """Raised for changes that would make the manager chain cyclic"""
+
+
+def _as_uuid(value):
+    if value is None or isinstance(value, uuid.UUID):
+        return value
+    return uuid.UUID(str(value))
+
+
+# ---------------------------------------------------------------------------
+# Closure maintenance
+# ---------------------------------------------------------------------------
+
+def _ensure_node(connection, company_id, user_id):
+    exists = connection.execute(
+        select(OrgClosure.depth).where(
+            OrgClosure.ancestor_id == user_id,
+            OrgClosure.descendant_id == user_id
+        )
+    ).first()
+    if not exists:
+        connection.execute(insert(OrgClosure).values(
+            ancestor_id=user_id, descendant_id=user_id, company_id=company_id, depth=0
+        ))
+
+
+def attach(connection, company_id, user_id, manager_id):
+    """
+    Move user_id (with everyone under them) beneath manager_id, or make it a root when manager_id is None
+
+    Cost is proportional to |subtree| x |ancestors of the new manager|, not to the company size.
+    """
+    user_id, manager_id = _as_uuid(user_id), _as_uuid(manager_id)
+    _ensure_node(connection, company_id, user_id)
+
+    subtree = connection.execute(
+        select(OrgClosure.descendant_id, OrgClosure.depth).where(OrgClosure.ancestor_id == user_id)
+    ).all()
+    subtree_ids = [row.descendant_id for row in subtree]
+
+    if manager_id is not None and manager_id in subtree_ids:
+        raise HierarchyError(f"Making {manager_id} the manager of {user_id} would create a cycle")
+
+    # Detach: drop every path entering the subtree from outside it
+    connection.execute(
+        delete(OrgClosure).where(
+            OrgClosure.descendant_id.in_(subtree_ids),
+            OrgClosure.ancestor_id.notin_(subtree_ids)
+        )
+    )
+
+    if manager_id is None:
+        return
+
+    _ensure_node(connection, company_id, manager_id)
+    ancestors = connection.execute(
+        select(OrgClosure.ancestor_id, OrgClosure.depth).where(OrgClosure.descendant_id == manager_id)
+    ).all()
+    rows = [
+        {
+            'ancestor_id': ancestor.ancestor_id,
+            'descendant_id': node.descendant_id,
+            'company_id': company_id,
+            'depth': ancestor.depth + node.depth + 1,
+        }
+        for ancestor in ancestors
+        for node in subtree
+    ]
+    if rows:
+        connection.execute(insert(OrgClosure), rows)
+
+
+def rebuild_closure(company_id=None) -> Dict[str, Any]:
+    """Recompute the closure table from employees (all companies, or one)"""
+    started = time.perf_counter()
+    query = select(Employee.company_id, Employee.user_id, Employee.manager_id)
+    delete_stmt = delete(OrgClosure)
+    if company_id is not None:
+        query = query.where(Employee.company_id == company_id)
+        delete_stmt = delete_stmt.where(OrgClosure.company_id == company_id)
+
+    parents = defaultdict(dict)
+    for row in db.session.execute(query):
+        parents[row.company_id][row.user_id] = row.manager_id
+
+    try:
+        db.session.execute(delete_stmt)
+        total = 0
+        cycles = []
+        for company, parent_of in parents.items():
+            rows, company_cycles = _closure_rows(company, parent_of)
+            cycles.extend(company_cycles)
+            for start in range(0, len(rows), 5000):
+                db.session.execute(insert(OrgClosure), rows[start:start + 5000])
+            total += len(rows)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    org_cache.invalidate(company_id)
+    return {
+        "companies": len(parents),
+        "closure_rows": total,
+        "cycles_broken": [str(user_id) for user_id in cycles],
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def _closure_rows(company_id, parent_of: Dict[Any, Any]) -> tuple:
+    """Walk each node up its manager chain; a repeated node means a cycle, which is cut there"""
+    nodes = set(parent_of) | {manager for manager in parent_of.values() if manager is not None}
+    rows = []
+    cycles = []
+    for node in nodes:
+        seen = {node}
+        rows.append({'ancestor_id': node, 'descendant_id': node, 'company_id': company_id, 'depth': 0})
+        current, depth = parent_of.get(node), 1
+        while current is not None:
+            if current in seen:
+                cycles.append(node)
+                break
+            seen.add(current)
+            rows.append({'ancestor_id': current, 'descendant_id': node, 'company_id': company_id, 'depth': depth})
+            current, depth = parent_of.get(current), depth + 1
+    return rows, cycles
+
+
+@event.listens_for(db.session, 'after_flush')
+def _maintain_closure_after_flush(session, flush_context):
+    """Apply manager changes to the closure table in the same transaction"""
+    changes = []
+    for obj in session.new:
+        if isinstance(obj, Employee):
+            changes.append((obj.company_id, obj.user_id, obj.manager_id))
+    for obj in session.dirty:
+        if isinstance(obj, Employee) and inspect(obj).attrs.manager_id.history.has_changes():
+            changes.append((obj.company_id, obj.user_id, obj.manager_id))
+    for obj in session.deleted:
+        if isinstance(obj, Employee):
+            changes.append((obj.company_id, obj.user_id, None))
+
+    if not changes:
+        return
+    connection = session.connection()
+    for company_id, user_id, manager_id in changes:
+        attach(connection, _as_uuid(company_id), user_id, manager_id)
+    session.info.setdefault('org_companies_changed', set()).update(
+        _as_uuid(company_id) for company_id, _, _ in changes
+    )
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_cache_after_commit(session):
+    for company_id in session.info.pop('org_companies_changed', ()):
+        org_cache.invalidate(company_id)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_changes_after_rollback(session):
+    session.info.pop('org_companies_changed', None)
+
+
+# ---------------------------------------------------------------------------
+# Lookups
+# ---------------------------------------------------------------------------
+
+def descendants_query(user_id, max_depth: Optional[int] = None, include_self: bool = False):
+    """Select of descendant user ids; usable as a subquery ("all reports under X")"""
+    conditions = [OrgClosure.ancestor_id == _as_uuid(user_id)]
+    if not include_self:
+        conditions.append(OrgClosure.depth > 0)
+    if max_depth is not None:
+        conditions.append(OrgClosure.depth <= max_depth)
+    return select(OrgClosure.descendant_id).where(and_(*conditions))
+
+
+def managed_users_query(user_id):
+    """
+    Everyone a user oversees: their reporting line (closure), members of departments
+    they manage and members of teams they lead. Each branch is an indexed lookup.
+    """
+    user_id = _as_uuid(user_id)
+    return union(
+        descendants_query(user_id),
+        select(Employee.user_id)
+        .join(Department, Department.id == Employee.department_id)
+        .where(Department.manager_id == user_id, Employee.user_id != user_id),
+        select(TeamMember.user_id)
+        .join(Team, Team.id == TeamMember.team_id)
+        .where(Team.team_lead_id == user_id, TeamMember.is_active.is_(True), TeamMember.user_id != user_id),
+    )
+
+
+def descendants(user_id, max_depth: Optional[int] = None) -> List[Dict[str, Any]]:
+    rows = db.session.execute(
+        select(OrgClosure.descendant_id, OrgClosure.depth)
+        .where(OrgClosure.ancestor_id == _as_uuid(user_id), OrgClosure.depth > 0,
+               *([OrgClosure.depth <= max_depth] if max_depth is not None else []))
+        .order_by(OrgClosure.depth)
+    ).all()
+    return [{"user_id": str(row.descendant_id), "depth": row.depth} for row in rows]
+
+
+def ancestors(user_id) -> List[Dict[str, Any]]:
+    """Management chain from the direct manager upwards"""
+    rows = db.session.execute(
+        select(OrgClosure.ancestor_id, OrgClosure.depth)
+        .where(OrgClosure.descendant_id == _as_uuid(user_id), OrgClosure.depth > 0)
+        .order_by(OrgClosure.depth)
+    ).all()
+    return [{"user_id": str(row.ancestor_id), "depth": row.depth} for row in rows]
+
+
+def is_manager_of(manager_id, user_id) -> bool:
+    return db.session.execute(
+        select(OrgClosure.depth).where(
+            OrgClosure.ancestor_id == _as_uuid(manager_id),
+            OrgClosure.descendant_id == _as_uuid(user_id),
+            OrgClosure.depth > 0
+        )
+    ).first() is not None
+
+
+# ---------------------------------------------------------------------------
+# Per-company tree cache
+# ---------------------------------------------------------------------------
+
+class OrgTreeCache:
+    """Process-local cache of each company's manager tree, dropped on local writes or after a TTL"""
+
+    def __init__(self):
+        self._trees: Dict[Any, tuple] = {}
+        self._lock = threading.Lock()
+
+    def get(self, company_id) -> Dict[str, Any]:
+        company_id = _as_uuid(company_id)
+        entry = self._trees.get(company_id)
+        if entry and time.monotonic() - entry[0] < app.config['ORG_CACHE_TTL']:
+            return entry[1]
+        tree = self._load(company_id)
+        with self._lock:
+            self._trees[company_id] = (time.monotonic(), tree)
+        return tree
+
+    def invalidate(self, company_id=None):
+        with self._lock:
+            if company_id is None:
+                self._trees.clear()
+            else:
+                self._trees.pop(_as_uuid(company_id), None)
+
+    def _load(self, company_id) -> Dict[str, Any]:
+        edges = db.session.execute(
+            select(OrgClosure.ancestor_id, OrgClosure.descendant_id).where(
+                OrgClosure.company_id == company_id,
+                OrgClosure.depth == 1
+            )
+        ).all()
+        nodes = set(db.session.execute(
+            select(OrgClosure.descendant_id).where(OrgClosure.company_id == company_id, OrgClosure.depth == 0)
+        ).scalars())
+        children = defaultdict(list)
+        parent = {}
+        for manager_id, user_id in edges:
+            children[manager_id].append(user_id)
+            parent[user_id] = manager_id
+        roots = sorted((node for node in nodes if node not in parent), key=str)
+        return {"children": dict(children), "parent": parent, "roots": roots, "loaded_at": datetime.utcnow()}
+
+    def subtree(self, company_id, user_id) -> Set[Any]:
+        """Everyone under user_id, answered from the cached tree"""
+        children = self.get(company_id)["children"]
+        result = set()
+        queue = deque(children.get(_as_uuid(user_id), ()))
+        while queue:
+            node = queue.popleft()
+            if node not in result:
+                result.add(node)
+                queue.extend(children.get(node, ()))
+        return result
+
+    def as_nested(self, company_id) -> List[Dict[str, Any]]:
+        tree = self.get(company_id)
+        children = tree["children"]
+
+        def build(node):
+            return {"user_id": str(node), "reports": [build(child) for child in sorted(children.get(node, ()), key=str)]}
+
+        return [build(root) for root in tree["roots"]]
+
+
+org_cache = OrgTreeCache()
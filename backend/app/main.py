@@ -1,7 +1,14 @@
+import os
 from flask_cors import CORS
 from . import app, db
 from .routes import register_blueprints
 from .email_service import init_mail
+from .serializers import init_json
+from .outbox import init_outbox
+from .partitions import init_partitions
+from .replicas import init_replicas
+from .metrics import init_metrics
+from .compression import init_compression
 
 # Configure CORS for Flask
 CORS(app, origins=["http://localhost:3000", "http://0.0.0.0:3000", "http://192.168.29.141:3000"], supports_credentials=True)
@@ -9,9 +16,37 @@ CORS(app, origins=["http://localhost:3000", "http://0.0.0.0:3000", "http://192.1
 # Initialize email service
 init_mail(app)
 
+# Use orjson for responses when available
+init_json(app)
+
+# gunicorn.conf.py sets this so a preloading master never forks with live threads;
+# each worker starts its own in post_fork instead
+app.config.setdefault('DEFER_BACKGROUND_THREADS', os.getenv('DEFER_BACKGROUND_THREADS', 'False').lower() == 'true')
+
+
+def start_background_threads(app):
+    # Deliver queued emails from this process (disable with OUTBOX_DISPATCH_IN_PROCESS=false)
+    init_outbox(app)
+
+    # Create expense/approval partitions ahead of time (disable with PARTITION_MAINTENANCE_IN_PROCESS=false)
+    init_partitions(app)
+
+
+if not app.config['DEFER_BACKGROUND_THREADS']:
+    start_background_threads(app)
+
+# X-DB-Route header and read-your-writes cookie for replica routing (DATABASE_REPLICA_URLS)
+init_replicas(app)
+
 # Register all route blueprints
 register_blueprints(app)
 
+# Request/DB timing and /metrics (disable with METRICS_ENABLED=false)
+init_metrics(app)
+
+# gzip/brotli/zstd for JSON and text responses (disable with COMPRESSION_ENABLED=false)
+init_compression(app)
+
 @app.route("/")
 def root():
     return {"message": "Hello from Exes Manen Backend!"}
@@ -0,0 +1,489 @@
+"""
+Request and database instrumentation
+Per-request wall time, DB query count/time (cursor execute events), bcrypt and
+outbound email time, exported as Prometheus histograms on /metrics; repeated
+identical statements within one request are logged as likely N+1 patterns.
+With METRICS_MULTIPROC_DIR set (gunicorn.conf.py does), every worker writes its
+counters and histograms to a file there and /metrics merges all of them, so a
+scrape reports the whole server rather than the worker that answered.
+"""
+
+import os
+import glob
+import json
+import time
+import bisect
+import fcntl
+import logging
+import tempfile
+import threading
+from collections import Counter
+from functools import wraps
+from typing import Any, Dict, Optional, Tuple, Sequence
+
+from flask import g, request, has_request_context, Response
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from . import app, bcrypt
+
+logger = logging.getLogger(__name__)
+
+app.config.setdefault('METRICS_ENABLED', os.getenv('METRICS_ENABLED', 'True').lower() == 'true')
+# Optional bearer token protecting /metrics
+app.config.setdefault('METRICS_TOKEN', os.getenv('METRICS_TOKEN'))
+# Same statement executed this many times in one request is reported as N+1
+app.config.setdefault('METRICS_N_PLUS_ONE_THRESHOLD', int(os.getenv('METRICS_N_PLUS_ONE_THRESHOLD', 5)))
+# Shared directory for per-process snapshots; unset keeps metrics per process
+app.config.setdefault('METRICS_MULTIPROC_DIR', os.getenv('METRICS_MULTIPROC_DIR'))
+# How often a worker rewrites its snapshot (the answering worker always writes a fresh one)
+app.config.setdefault('METRICS_FLUSH_INTERVAL', float(os.getenv('METRICS_FLUSH_INTERVAL', 1)))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+
+
+class Histogram:
+    """Labelled cumulative histogram rendered in the Prometheus text format"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # per-bucket counts (+Inf last), sum, count
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self) -> Dict[Tuple, list]:
+        with self._lock:
+            return {labels: [list(series[0]), series[1], series[2]] for labels, series in self._series.items()}
+
+    @staticmethod
+    def merge(into: Dict[Tuple, list], series: Dict[Tuple, list]):
+        for labels, (counts, total, count) in series.items():
+            current = into.get(labels)
+            if current is None:
+                into[labels] = [list(counts), total, count]
+            else:
+                current[0] = [a + b for a, b in zip(current[0], counts)]
+                current[1] += total
+                current[2] += count
+
+    def render(self, series: Optional[Dict[Tuple, list]] = None):
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} histogram"
+        series = self.snapshot() if series is None else series
+        for label_values, (counts, total, count) in sorted(series.items()):
+            base = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(self.labels, label_values))
+            prefix = f"{base}," if base else ''
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}'
+            yield f'{self.name}_bucket{{{prefix}le="+Inf"}} {count}'
+            suffix = f"{{{base}}}" if base else ''
+            yield f"{self.name}_sum{suffix} {total}"
+            yield f"{self.name}_count{suffix} {count}"
+
+
+class CounterMetric:
+    kind = 'counter'
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def snapshot(self) -> Dict[Tuple, float]:
+        with self._lock:
+            return dict(self._values)
+
+    @staticmethod
+    def merge(into: Dict[Tuple, float], series: Dict[Tuple, float]):
+        for labels, value in series.items():
+            into[labels] = into.get(labels, 0) + value
+
+    def render(self, series: Optional[Dict[Tuple, float]] = None):
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} counter"
+        series = self.snapshot() if series is None else series
+        for label_values, value in sorted(series.items()):
+            base = ','.join(f'{name}="{_escape(v)}"' for name, v in zip(self.labels, label_values))
+            yield f"{self.name}{{{base}}} {value}" if base else f"{self.name} {value}"
+
+
+class GaugeMetric:
+    """
+    Value read from a callback at scrape time; with labels the callback returns {label values: value}
+
+    Gauges describe the answering process unless aggregate='sum', which adds up the
+    values last written by every live worker (e.g. sizes of per-process caches).
+    """
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, help_text: str, read, labels: Sequence[str] = (), aggregate: Optional[str] = None):
+        self.name = name
+        self.help_text = help_text
+        self.read = read
+        self.labels = tuple(labels)
+        self.aggregate = aggregate
+
+    def snapshot(self) -> Dict[Tuple, float]:
+        return dict(self.read()) if self.labels else {(): self.read()}
+
+    merge = staticmethod(CounterMetric.merge)
+
+    def render(self, series: Optional[Dict[Tuple, float]] = None):
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} gauge"
+        series = self.snapshot() if series is None else series
+        for label_values, value in sorted(series.items()):
+            if not self.labels:
+                yield f"{self.name} {value}"
+                continue
+            base = ','.join(f'{name}="{_escape(v)}"' for name, v in zip(self.labels, label_values))
+            yield f"{self.name}{{{base}}} {value}"
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+REQUEST_DURATION = Histogram('http_request_duration_seconds', 'Wall time per request',
+                             ('method', 'endpoint', 'status'))
+REQUEST_DB_QUERIES = Histogram('http_request_db_queries', 'Database queries per request',
+                               ('endpoint',), COUNT_BUCKETS)
+REQUEST_DB_TIME = Histogram('http_request_db_seconds', 'Time spent in database queries per request', ('endpoint',))
+DB_QUERY_DURATION = Histogram('db_query_duration_seconds', 'Duration of individual database queries')
+BCRYPT_DURATION = Histogram('bcrypt_duration_seconds', 'Time spent hashing or checking passwords', ('operation',))
+EMAIL_DURATION = Histogram('email_send_duration_seconds', 'Time spent sending email over SMTP', ('outcome',))
+N_PLUS_ONE = CounterMetric('db_repeated_statement_requests_total',
+                           'Requests that repeated one statement at least METRICS_N_PLUS_ONE_THRESHOLD times',
+                           ('endpoint',))
+
+METRICS = [REQUEST_DURATION, REQUEST_DB_QUERIES, REQUEST_DB_TIME, DB_QUERY_DURATION,
+           BCRYPT_DURATION, EMAIL_DURATION, N_PLUS_ONE]
+
+
+def register(metric):
+    """Add a metric defined elsewhere to the /metrics output"""
+    METRICS.append(metric)
+    return metric
+
+
+# ---------------------------------------------------------------------------
+# Aggregation across worker processes
+# ---------------------------------------------------------------------------
+
+ARCHIVE_FILE = 'retired.json'
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class MultiprocessStore:
+    """
+    One JSON snapshot per worker (<pid>.json) in METRICS_MULTIPROC_DIR
+
+    Workers rewrite their file every METRICS_FLUSH_INTERVAL seconds from a thread started
+    on their first request (never in a preloading master). Exiting workers fold their
+    counters into retired.json so totals survive worker recycling.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flusher: Optional[threading.Thread] = None
+
+    @property
+    def directory(self) -> Optional[str]:
+        return app.config['METRICS_MULTIPROC_DIR']
+
+    def _shared_metrics(self):
+        return [metric for metric in METRICS if metric.kind != 'gauge' or metric.aggregate]
+
+    @staticmethod
+    def _dump(series: Dict[str, Dict[Tuple, Any]]) -> Dict[str, list]:
+        return {name: [[list(labels), value] for labels, value in values.items()] for name, values in series.items()}
+
+    @staticmethod
+    def _load(path: str) -> Dict[str, Dict[Tuple, Any]]:
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return {name: {tuple(labels): value for labels, value in values} for name, values in data.items()}
+
+    def _write(self, path: str, series: Dict[str, Dict[Tuple, Any]]):
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self._dump(series), f)
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def flush(self):
+        """Write this process's current values"""
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            self._write(
+                os.path.join(self.directory, f"{os.getpid()}.json"),
+                {metric.name: metric.snapshot() for metric in self._shared_metrics()}
+            )
+
+    def ensure_flusher(self):
+        if self._flusher is not None and self._flusher.is_alive():
+            return
+        with self._lock:
+            if self._flusher is None or not self._flusher.is_alive():
+                self._flusher = threading.Thread(target=self._run, name='metrics-flusher', daemon=True)
+                self._flusher.start()
+
+    def _run(self):
+        while True:
+            time.sleep(app.config['METRICS_FLUSH_INTERVAL'])
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning("Could not write metrics snapshot: %s", e)
+
+    def collect(self) -> Dict[str, Dict[Tuple, Any]]:
+        """Merged values of every worker, dead ones included for counters and histograms"""
+        self.flush()
+        kinds = {metric.name: metric for metric in self._shared_metrics()}
+        merged: Dict[str, Dict[Tuple, Any]] = {name: {} for name in kinds}
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            name = os.path.basename(path)
+            live = name == ARCHIVE_FILE or _pid_alive(int(name.split('.')[0]))
+            for metric_name, series in self._load(path).items():
+                metric = kinds.get(metric_name)
+                if metric is None or (metric.kind == 'gauge' and (not live or name == ARCHIVE_FILE)):
+                    continue
+                metric.merge(merged[metric_name], series)
+        return merged
+
+    def retire(self):
+        """Fold this process's counters and histograms into retired.json and drop its file (worker exit)"""
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        archive = os.path.join(self.directory, ARCHIVE_FILE)
+        with open(os.path.join(self.directory, 'retired.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            retired = self._load(archive)
+            for metric in self._shared_metrics():
+                if metric.kind != 'gauge':
+                    metric.merge(retired.setdefault(metric.name, {}), metric.snapshot())
+            self._write(archive, retired)
+        own = os.path.join(self.directory, f"{os.getpid()}.json")
+        if os.path.exists(own):
+            os.remove(own)
+
+    def reset(self):
+        """Remove every snapshot (server start)"""
+        os.makedirs(self.directory, exist_ok=True)
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            os.remove(path)
+
+
+multiprocess_store = MultiprocessStore()
+
+
+class RequestStats:
+    __slots__ = ('started', 'queries', 'db_seconds', 'statements', 'bcrypt_seconds', 'email_seconds', 'recorded')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.statements = Counter()
+        self.bcrypt_seconds = 0.0
+        self.email_seconds = 0.0
+        self.recorded = False
+
+
+def _request_stats():
+    return g.get('_request_stats') if has_request_context() else None
+
+
+# ---------------------------------------------------------------------------
+# Database, bcrypt and email timing
+# ---------------------------------------------------------------------------
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('_query_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('_query_started')
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    DB_QUERY_DURATION.observe(elapsed)
+    stats = _request_stats()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+        stats.statements[statement] += 1
+
+
+@event.listens_for(Engine, 'handle_error')
+def _discard_failed_query(exception_context):
+    connection = exception_context.connection
+    if connection is not None and connection.info.get('_query_started'):
+        connection.info['_query_started'].pop()
+
+
+def timed(histogram: Histogram, label: str, attribute: str):
+    """Wrap a callable so its duration lands in histogram and on the current request"""
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return f(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                histogram.observe(elapsed, label)
+                stats = _request_stats()
+                if stats is not None:
+                    setattr(stats, attribute, getattr(stats, attribute) + elapsed)
+        return wrapper
+    return decorator
+
+
+def _instrument_email(mail):
+    send = mail.send
+
+    @wraps(send)
+    def timed_send(message):
+        started = time.perf_counter()
+        outcome = 'error'
+        try:
+            result = send(message)
+            outcome = 'sent'
+            return result
+        finally:
+            elapsed = time.perf_counter() - started
+            EMAIL_DURATION.observe(elapsed, outcome)
+            stats = _request_stats()
+            if stats is not None:
+                stats.email_seconds += elapsed
+
+    mail.send = timed_send
+
+
+# ---------------------------------------------------------------------------
+# Request hooks and /metrics
+# ---------------------------------------------------------------------------
+
+def _endpoint_label() -> str:
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+
+def _record(stats: RequestStats, status: int, method: Optional[str] = None, endpoint: Optional[str] = None):
+    stats.recorded = True
+    method = method or request.method
+    endpoint = endpoint or _endpoint_label()
+    elapsed = time.perf_counter() - stats.started
+    REQUEST_DURATION.observe(elapsed, method, endpoint, str(status))
+    REQUEST_DB_QUERIES.observe(stats.queries, endpoint)
+    REQUEST_DB_TIME.observe(stats.db_seconds, endpoint)
+
+    threshold = app.config['METRICS_N_PLUS_ONE_THRESHOLD']
+    if stats.statements:
+        statement, count = stats.statements.most_common(1)[0]
+        if count >= threshold:
+            N_PLUS_ONE.inc(endpoint)
+            logger.warning("Possible N+1 on %s %s: statement executed %d times (%d queries total): %s",
+                           method, endpoint, count, stats.queries, ' '.join(statement.split())[:300])
+    if multiprocess_store.directory:
+        multiprocess_store.ensure_flusher()
+    return elapsed
+
+
+def render_metrics() -> str:
+    merged = multiprocess_store.collect() if multiprocess_store.directory else {}
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render(merged.get(metric.name)))
+    return '\n'.join(lines) + '\n'
+
+
+def init_metrics(app):
+    """Install request hooks, bcrypt/email timing and the /metrics endpoint"""
+    if not app.config['METRICS_ENABLED']:
+        return
+    from .email_service import mail
+
+    bcrypt.generate_password_hash = timed(BCRYPT_DURATION, 'hash', 'bcrypt_seconds')(bcrypt.generate_password_hash)
+    bcrypt.check_password_hash = timed(BCRYPT_DURATION, 'check', 'bcrypt_seconds')(bcrypt.check_password_hash)
+    _instrument_email(mail)
+
+    @app.before_request
+    def _start_request_stats():
+        g._request_stats = RequestStats()
+
+    @app.after_request
+    def _finish_request_stats(response):
+        stats = g.get('_request_stats')
+        if stats is not None and not stats.recorded and response.is_streamed:
+            # The body (and its queries) is generated after this hook; record once it has been sent
+            stats.recorded = True
+            method, endpoint, status = request.method, _endpoint_label(), response.status_code
+            response.call_on_close(lambda: _record(stats, status, method, endpoint))
+        elif stats is not None and not stats.recorded:
+            elapsed = _record(stats, response.status_code)
+            # Visible in browser devtools and to proxies that understand Server-Timing
+            response.headers['Server-Timing'] = ', '.join((
+                f'app;dur={elapsed * 1000:.1f}',
+                f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.queries} queries"',
+                f'bcrypt;dur={stats.bcrypt_seconds * 1000:.1f}',
+                f'email;dur={stats.email_seconds * 1000:.1f}',
+            ))
+        return response
+
+    @app.teardown_request
+    def _record_failed_request(exception):
+        stats = g.get('_request_stats')
+        if stats is not None and not stats.recorded:
+            _record(stats, 500)
+
+    @app.route('/metrics')
+    def metrics():
+        token = app.config['METRICS_TOKEN']
+        if token and request.headers.get('Authorization') != f"Bearer {token}":
+            return {"error": "Unauthorized"}, 401
+        return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
@@ -62,7 +62,7 @@ class Permission(db.Model):
 class ApprovalFlow(db.Model):
     __tablename__ = 'approval_flows'
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    company_id = db.Column(UUID(as_uuid=True), db.ForeignKey('companies.id'), nullable=False)
+    company_id = db.Column(UUID(as_uuid=True), db.ForeignKey('companies.id'), nullable=False, index=True)
     sequence = db.Column(db.Integer, nullable=False)
     approver_role = db.Column(db.String, nullable=False)
     is_mandatory = db.Column(db.Boolean, nullable=False, default=True)
@@ -72,17 +72,17 @@ class ApprovalFlow(db.Model):
 class Department(db.Model):
     __tablename__ = 'departments'
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    company_id = db.Column(UUID(as_uuid=True), db.ForeignKey('companies.id'), nullable=False)
+    company_id = db.Column(UUID(as_uuid=True), db.ForeignKey('companies.id'), nullable=False, index=True)
     name = db.Column(db.String, nullable=False)
     description = db.Column(db.Text, nullable=True)
-    manager_id = db.Column(UUID(as_uuid=True), db.ForeignKey('users.id'), nullable=True)
+    manager_id = db.Column(UUID(as_uuid=True), db.ForeignKey('users.id'), nullable=True, index=True)
     created_at = db.Column(db.DateTime, nullable=True)
 
 # 5. Roles
 class Role(db.Model):
     __tablename__ = 'roles'
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    company_id = db.Column(UUID(as_uuid=True), db.ForeignKey('companies.id'), nullable=False)
+    company_id = db.Column(UUID(as_uuid=True), db.ForeignKey('companies.id'), nullable=False, index=True)
     name = db.Column(db.String, nullable=False)
     description = db.Column(db.Text, nullable=True)
     is_active = db.Column(db.Boolean, nullable=False, default=True)
@@ -92,7 +92,7 @@ class Role(db.Model):
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    company_id = db.Column(UUID(as_uuid=True), db.ForeignKey('companies.id'), nullable=False)
+    company_id = db.Column(UUID(as_uuid=True), db.ForeignKey('companies.id'), nullable=False, index=True)
     email = db.Column(db.String, nullable=False, unique=True)
     name = db.Column(db.String, nullable=False)
     password_hash = db.Column(db.String, nullable=True)
@@ -100,6 +100,8 @@ class User(UserMixin, db.Model):
     is_active = db.Column(db.Boolean, nullable=False, default=True)
     last_login = db.Column(db.DateTime, nullable=True)
     created_at = db.Column(db.DateTime, nullable=True)
+    # Bumped whenever the user's effective permissions change, so every process can tell its cached bitset is stale
+    permissions_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     # Relationships
     company = db.relationship('Company', foreign_keys=[company_id], backref='users', lazy=True)
@@ -108,7 +110,7 @@ class User(UserMixin, db.Model):
 class ApprovalRule(db.Model):
     __tablename__ = 'approval_rules'
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    company_id = db.Column(UUID(as_uuid=True), db.ForeignKey('companies.id'), nullable=False)
+    company_id = db.Column(UUID(as_uuid=True), db.ForeignKey('companies.id'), nullable=False, index=True)
     rule_type = db.Column(db.String, nullable=False)
     threshold = db.Column(db.Numeric, nullable=True)
     specific_approver_id = db.Column(UUID(as_uuid=True), db.ForeignKey('users.id'), nullable=True)
@@ -118,11 +120,11 @@ class ApprovalRule(db.Model):
 class Employee(db.Model):
     __tablename__ = 'employees'
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id = db.Column(UUID(as_uuid=True), db.ForeignKey('users.id'), nullable=False)
-    company_id = db.Column(UUID(as_uuid=True), db.ForeignKey('companies.id'), nullable=False)
+    user_id = db.Column(UUID(as_uuid=True), db.ForeignKey('users.id'), nullable=False, index=True)
+    company_id = db.Column(UUID(as_uuid=True), db.ForeignKey('companies.id'), nullable=False, index=True)
     employee_id = db.Column(db.String, nullable=True)
-    department_id = db.Column(UUID(as_uuid=True), db.ForeignKey('departments.id'), nullable=True)
-    manager_id = db.Column(UUID(as_uuid=True), db.ForeignKey('users.id'), nullable=True)
+    department_id = db.Column(UUID(as_uuid=True), db.ForeignKey('departments.id'), nullable=True, index=True)
+    manager_id = db.Column(UUID(as_uuid=True), db.ForeignKey('users.id'), nullable=True, index=True)
     hire_date = db.Column(db.Date, nullable=True)
     salary = db.Column(db.Numeric, nullable=True)
     is_active = db.Column(db.Boolean, nullable=False, default=True)
@@ -132,32 +134,34 @@ class Employee(db.Model):
 class RolePermission(db.Model):
     __tablename__ = 'role_permissions'
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    role_id = db.Column(UUID(as_uuid=True), db.ForeignKey('roles.id'), nullable=False)
-    permission_id = db.Column(UUID(as_uuid=True), db.ForeignKey('permissions.id'), nullable=False)
+    role_id = db.Column(UUID(as_uuid=True), db.ForeignKey('roles.id'), nullable=False, index=True)
+    permission_id = db.Column(UUID(as_uuid=True), db.ForeignKey('permissions.id'), nullable=False, index=True)
     created_at = db.Column(db.DateTime, nullable=True)
 
 # 10. Teams
 class Team(db.Model):
     __tablename__ = 'teams'
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    company_id = db.Column(UUID(as_uuid=True), db.ForeignKey('companies.id'), nullable=False)
+    company_id = db.Column(UUID(as_uuid=True), db.ForeignKey('companies.id'), nullable=False, index=True)
     name = db.Column(db.String, nullable=False)
     description = db.Column(db.Text, nullable=True)
-    team_lead_id = db.Column(UUID(as_uuid=True), db.ForeignKey('users.id'), nullable=True)
+    team_lead_id = db.Column(UUID(as_uuid=True), db.ForeignKey('users.id'), nullable=True, index=True)
     created_at = db.Column(db.DateTime, nullable=True)
 
 # 11. UserRoles
 class UserRole(db.Model):
     __tablename__ = 'user_roles'
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id = db.Column(UUID(as_uuid=True), db.ForeignKey('users.id'), nullable=False)
-    role_id = db.Column(UUID(as_uuid=True), db.ForeignKey('roles.id'), nullable=False)
+    user_id = db.Column(UUID(as_uuid=True), db.ForeignKey('users.id'), nullable=False, index=True)
+    role_id = db.Column(UUID(as_uuid=True), db.ForeignKey('roles.id'), nullable=False, index=True)
     assigned_by = db.Column(UUID(as_uuid=True), db.ForeignKey('users.id'), nullable=True)
     assigned_at = db.Column(db.DateTime, nullable=True)
     is_active = db.Column(db.Boolean, nullable=False, default=True)
     created_at = db.Column(db.DateTime, nullable=True)
 
 # 12. Expenses
+# On Postgres the table is range-partitioned by month on date (see app.partitions); the
+# partition key has to be part of the primary key, while the ORM keeps identifying rows by id
 class Expense(db.Model):
     __tablename__ = 'expenses'
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
@@ -167,31 +171,150 @@ class Expense(db.Model):
     converted_amount = db.Column(db.Numeric, nullable=True)
     category = db.Column(db.String, nullable=False)
     description = db.Column(db.Text, nullable=True)
-    receipt_url = db.Column(db.String, nullable=True)
-    date = db.Column(db.Date, nullable=False)
+    receipt_url = db.Column(db.String, nullable=True, index=True)
+    date = db.Column(db.Date, primary_key=True)
     status = db.Column(db.String, nullable=False, default='pending')
-    current_approver_id = db.Column(UUID(as_uuid=True), db.ForeignKey('users.id'), nullable=True)
+    current_approver_id = db.Column(UUID(as_uuid=True), db.ForeignKey('users.id'), nullable=True, index=True)
+    fingerprint = db.Column(db.String(64), nullable=True, index=True)
     created_at = db.Column(db.DateTime, nullable=True)
 
+    __table_args__ = (
+        # Near-duplicate window lookups: same employee and currency, nearby dates
+        db.Index('ix_expenses_employee_currency_date', 'employee_id', 'currency', 'date'),
+        {'postgresql_partition_by': 'RANGE (date)'},
+    )
+    __mapper_args__ = {'primary_key': [id]}
+
 # 13. TeamMembers
 class TeamMember(db.Model):
     __tablename__ = 'team_members'
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    team_id = db.Column(UUID(as_uuid=True), db.ForeignKey('teams.id'), nullable=False)
-    user_id = db.Column(UUID(as_uuid=True), db.ForeignKey('users.id'), nullable=False)
+    team_id = db.Column(UUID(as_uuid=True), db.ForeignKey('teams.id'), nullable=False, index=True)
+    user_id = db.Column(UUID(as_uuid=True), db.ForeignKey('users.id'), nullable=False, index=True)
     role = db.Column(db.String, nullable=True)
     joined_at = db.Column(db.DateTime, nullable=True)
     is_active = db.Column(db.Boolean, nullable=False, default=True)
     created_at = db.Column(db.DateTime, nullable=True)
 
 # 14. Approvals
+# Range-partitioned by month on created_at on Postgres (see app.partitions). Foreign keys
+# cannot target a partitioned table's id alone, so expense_id is a plain indexed column
 class Approval(db.Model):
     __tablename__ = 'approvals'
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    expense_id = db.Column(UUID(as_uuid=True), db.ForeignKey('expenses.id'), nullable=False)
-    approver_id = db.Column(UUID(as_uuid=True), db.ForeignKey('users.id'), nullable=False)
+    expense_id = db.Column(UUID(as_uuid=True), nullable=False, index=True)
+    approver_id = db.Column(UUID(as_uuid=True), db.ForeignKey('users.id'), nullable=False, index=True)
     sequence = db.Column(db.Integer, nullable=False)
     status = db.Column(db.String, nullable=False, default='pending')
     comments = db.Column(db.Text, nullable=True)
     acted_at = db.Column(db.DateTime, nullable=True)
-    created_at = db.Column(db.DateTime, nullable=True)
\ No newline at end of file
+    created_at = db.Column(db.DateTime, primary_key=True, default=datetime.utcnow)
+
+    __table_args__ = (
+        {'postgresql_partition_by': 'RANGE (created_at)'},
+    )
+    __mapper_args__ = {'primary_key': [id]}
+
+# 15. ExpenseRollups
+# Pre-aggregated spend per company/department/category/status/month, maintained by app.reports
+class ExpenseRollup(db.Model):
+    __tablename__ = 'expense_rollups'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    company_id = db.Column(UUID(as_uuid=True), db.ForeignKey('companies.id'), nullable=False)
+    department_id = db.Column(UUID(as_uuid=True), db.ForeignKey('departments.id'), nullable=True)
+    category = db.Column(db.String, nullable=False)
+    status = db.Column(db.String, nullable=False)
+    month = db.Column(db.Date, nullable=False)
+    expense_count = db.Column(db.Integer, nullable=False, default=0)
+    total_amount = db.Column(db.Numeric, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_expense_rollups_company_month', 'company_id', 'month'),
+        # One row per bucket; a NULL department is a bucket of its own (Postgres 15+)
+        db.UniqueConstraint(
+            'company_id', 'department_id', 'category', 'status', 'month',
+            name='uq_expense_rollups_bucket', postgresql_nulls_not_distinct=True
+        ),
+    )
+
+# 16. Receipts
+# Uploaded receipt files; content is stored once per SHA-256 and referenced per company
+class Receipt(db.Model):
+    __tablename__ = 'receipts'
+    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    company_id = db.Column(UUID(as_uuid=True), db.ForeignKey('companies.id'), nullable=False)
+    sha256 = db.Column(db.String(64), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    content_type = db.Column(db.String, nullable=True)
+    filename = db.Column(db.String, nullable=True)
+    thumbnail_status = db.Column(db.String, nullable=False, default='pending')
+    uploaded_by = db.Column(UUID(as_uuid=True), db.ForeignKey('users.id'), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.UniqueConstraint('company_id', 'sha256', name='uq_receipts_company_sha256'),
+    )
+
+# 17. ExpenseFlags
+# Review flags raised against an expense (duplicate detection and similar checks);
+# expense ids are not foreign keys because expenses is partitioned (see Approval)
+class ExpenseFlag(db.Model):
+    __tablename__ = 'expense_flags'
+    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    expense_id = db.Column(UUID(as_uuid=True), nullable=False, index=True)
+    flag_type = db.Column(db.String, nullable=False)
+    related_expense_id = db.Column(UUID(as_uuid=True), nullable=True)
+    score = db.Column(db.Numeric, nullable=True)
+    details = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=True)
+
+# 18. OrgClosure
+# Transitive closure of Employee.manager_id over user ids, maintained by app.hierarchy
+class OrgClosure(db.Model):
+    __tablename__ = 'org_closure'
+    ancestor_id = db.Column(UUID(as_uuid=True), db.ForeignKey('users.id'), primary_key=True)
+    descendant_id = db.Column(UUID(as_uuid=True), db.ForeignKey('users.id'), primary_key=True)
+    company_id = db.Column(UUID(as_uuid=True), db.ForeignKey('companies.id'), nullable=False, index=True)
+    depth = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_org_closure_descendant_depth', 'descendant_id', 'depth'),
+    )
+
+# 19. AuditEvents
+# Append-only; on Postgres the table is range-partitioned by month on occurred_at (see app.audit)
+class AuditEvent(db.Model):
+    __tablename__ = 'audit_events'
+    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    occurred_at = db.Column(db.DateTime, primary_key=True)
+    company_id = db.Column(UUID(as_uuid=True), nullable=True)
+    actor_id = db.Column(UUID(as_uuid=True), nullable=True)
+    action = db.Column(db.String, nullable=False)
+    entity_type = db.Column(db.String, nullable=False)
+    entity_id = db.Column(db.String, nullable=True)
+    changes = db.Column(db.Text, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_audit_events_company_occurred', 'company_id', 'occurred_at'),
+        db.Index('ix_audit_events_entity', 'entity_type', 'entity_id'),
+        {'postgresql_partition_by': 'RANGE (occurred_at)'},
+    )
+
+# 20. OutboxMessages
+# Side effects (emails) written in the same transaction as the change that causes them
+class OutboxMessage(db.Model):
+    __tablename__ = 'outbox_messages'
+    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    topic = db.Column(db.String, nullable=False)
+    payload = db.Column(db.Text, nullable=True)
+    status = db.Column(db.String, nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    available_at = db.Column(db.DateTime, nullable=False)
+    last_error = db.Column(db.Text, nullable=True)
+    sent_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_outbox_messages_status_available', 'status', 'available_at'),
+    )
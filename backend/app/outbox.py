@@ -0,0 +1,255 @@
+"""
+Transactional outbox
+Routes enqueue side effects (emails) as outbox_messages rows in the same transaction
+as the change that causes them; dispatcher workers claim due rows with
+SELECT ... FOR UPDATE SKIP LOCKED and deliver them outside the request.
+Passwords in a payload are stored encrypted and removed once the message is sent
+or has failed for good.
+"""
+
+import os
+import json
+import base64
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Any, Callable, List, Optional
+
+from cryptography.fernet import Fernet
+from sqlalchemy import event, select, func
+
+from . import app, db
+from .models import OutboxMessage
+from .email_service import send_welcome_email, send_password_reset_email, send_organization_welcome_email
+
+logger = logging.getLogger(__name__)
+
+app.config.setdefault('OUTBOX_DISPATCH_IN_PROCESS', os.getenv('OUTBOX_DISPATCH_IN_PROCESS', 'True').lower() == 'true')
+app.config.setdefault('OUTBOX_BATCH_SIZE', int(os.getenv('OUTBOX_BATCH_SIZE', 20)))
+app.config.setdefault('OUTBOX_POLL_INTERVAL', float(os.getenv('OUTBOX_POLL_INTERVAL', 5)))
+app.config.setdefault('OUTBOX_MAX_ATTEMPTS', int(os.getenv('OUTBOX_MAX_ATTEMPTS', 8)))
+app.config.setdefault('OUTBOX_RETRY_BASE_SECONDS', float(os.getenv('OUTBOX_RETRY_BASE_SECONDS', 30)))
+# Fernet key for sensitive payload fields; derived from SECRET_KEY / JWT_SECRET_KEY when unset
+app.config.setdefault('OUTBOX_ENCRYPTION_KEY', os.getenv('OUTBOX_ENCRYPTION_KEY'))
+
+PENDING, SENT, FAILED = 'pending', 'sent', 'failed'
+MAX_RETRY_DELAY = timedelta(hours=6)
+
+# Payload keys encrypted at rest and scrubbed once a message is sent or has failed for good
+SENSITIVE_KEYS = {'temp_password', 'new_password'}
+ENCRYPTED_PREFIX = 'fernet:'
+
+# topic -> callable(**payload) returning False (or raising) on failure
+HANDLERS: Dict[str, Callable[..., Any]] = {
+    'email.welcome_employee': send_welcome_email,
+    'email.password_reset': send_password_reset_email,
+    'email.organization_welcome': send_organization_welcome_email,
+}
+
+
+_fernet: Optional[Fernet] = None
+
+
+def _get_fernet() -> Fernet:
+    global _fernet
+    if _fernet is None:
+        key = app.config['OUTBOX_ENCRYPTION_KEY']
+        if not key:
+            secret = app.config.get('SECRET_KEY') or app.config.get('JWT_SECRET_KEY')
+            if not secret:
+                raise RuntimeError("Set OUTBOX_ENCRYPTION_KEY (or SECRET_KEY) to enqueue messages with passwords")
+            key = base64.urlsafe_b64encode(hashlib.sha256(f"outbox:{secret}".encode()).digest())
+        _fernet = Fernet(key)
+    return _fernet
+
+
+def _encrypt_sensitive(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        key: ENCRYPTED_PREFIX + _get_fernet().encrypt(str(value).encode()).decode()
+        if key in SENSITIVE_KEYS and value is not None else value
+        for key, value in payload.items()
+    }
+
+
+def _decrypt_sensitive(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        key: _get_fernet().decrypt(value[len(ENCRYPTED_PREFIX):].encode()).decode()
+        if key in SENSITIVE_KEYS and isinstance(value, str) and value.startswith(ENCRYPTED_PREFIX) else value
+        for key, value in payload.items()
+    }
+
+
+def _scrub(message: OutboxMessage):
+    """Drop sensitive fields from a message that will not be delivered again"""
+    payload = json.loads(message.payload) if message.payload else {}
+    if SENSITIVE_KEYS & payload.keys():
+        message.payload = json.dumps({k: v for k, v in payload.items() if k not in SENSITIVE_KEYS})
+
+
+def enqueue(topic: str, **payload) -> OutboxMessage:
+    """Add a message to the current transaction; it is delivered only if the transaction commits"""
+    if topic not in HANDLERS:
+        raise ValueError(f"No outbox handler for topic '{topic}'")
+    now = datetime.utcnow()
+    payload = _encrypt_sensitive(payload)
+    message = OutboxMessage(
+        topic=topic,
+        payload=json.dumps(payload, default=str),
+        status=PENDING,
+        attempts=0,
+        available_at=now,
+        created_at=now
+    )
+    db.session.add(message)
+    db.session.info['outbox_enqueued'] = True
+    return message
+
+
+@event.listens_for(db.session, 'after_commit')
+def _wake_dispatcher_after_commit(session):
+    if session.info.pop('outbox_enqueued', False):
+        outbox_dispatcher.wake()
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_after_rollback(session):
+    session.info.pop('outbox_enqueued', None)
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    return min(timedelta(seconds=app.config['OUTBOX_RETRY_BASE_SECONDS'] * 2 ** (attempts - 1)), MAX_RETRY_DELAY)
+
+
+def _deliver(message: OutboxMessage):
+    payload = _decrypt_sensitive(json.loads(message.payload) if message.payload else {})
+    if HANDLERS[message.topic](**payload) is False:
+        raise RuntimeError(f"{message.topic} handler reported failure")
+
+
+def dispatch_batch(batch_size: Optional[int] = None) -> Dict[str, int]:
+    """
+    Claim up to batch_size due messages and deliver them
+
+    Claimed rows stay locked until the batch commits, so concurrent workers skip
+    them rather than double-send; a worker that dies mid-batch rolls back and the
+    messages are picked up again (at-least-once, duplicates only on crashes).
+    """
+    batch_size = batch_size or app.config['OUTBOX_BATCH_SIZE']
+    now = datetime.utcnow()
+    counts = {"claimed": 0, "sent": 0, "retried": 0, "failed": 0}
+    try:
+        messages = db.session.execute(
+            select(OutboxMessage)
+            .where(OutboxMessage.status == PENDING, OutboxMessage.available_at <= now)
+            .order_by(OutboxMessage.available_at)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ).scalars().all()
+        counts["claimed"] = len(messages)
+
+        for message in messages:
+            message.attempts += 1
+            try:
+                _deliver(message)
+            except Exception as e:
+                message.last_error = str(e)[:2000]
+                if message.attempts >= app.config['OUTBOX_MAX_ATTEMPTS']:
+                    message.status = FAILED
+                    _scrub(message)
+                    counts["failed"] += 1
+                    logger.error("Outbox message %s (%s) failed permanently: %s", message.id, message.topic, e)
+                else:
+                    message.available_at = datetime.utcnow() + _retry_delay(message.attempts)
+                    counts["retried"] += 1
+                    logger.warning("Outbox message %s (%s) failed, attempt %d: %s",
+                                   message.id, message.topic, message.attempts, e)
+                continue
+            message.status = SENT
+            message.sent_at = datetime.utcnow()
+            message.last_error = None
+            _scrub(message)
+            counts["sent"] += 1
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return counts
+
+
+def dispatch_pending(batch_size: Optional[int] = None) -> Dict[str, int]:
+    """Dispatch batches until no due message is left"""
+    totals = {"claimed": 0, "sent": 0, "retried": 0, "failed": 0}
+    while True:
+        counts = dispatch_batch(batch_size)
+        for key, value in counts.items():
+            totals[key] += value
+        if counts["claimed"] == 0 or counts["sent"] + counts["failed"] == 0:
+            return totals
+
+
+def outbox_stats() -> Dict[str, Any]:
+    by_status = dict(db.session.execute(
+        select(OutboxMessage.status, func.count()).group_by(OutboxMessage.status)
+    ).all())
+    oldest = db.session.execute(
+        select(func.min(OutboxMessage.created_at)).where(OutboxMessage.status == PENDING)
+    ).scalar()
+    return {
+        "pending": by_status.get(PENDING, 0),
+        "sent": by_status.get(SENT, 0),
+        "failed": by_status.get(FAILED, 0),
+        "oldest_pending_seconds": round((datetime.utcnow() - oldest).total_seconds(), 3) if oldest else 0.0,
+    }
+
+
+class OutboxDispatcher:
+    """Polling worker threads; several processes (or threads) can run side by side"""
+
+    def __init__(self):
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+
+    def start(self, workers: int = 1):
+        with self._lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            self._stop.clear()
+            for i in range(len(self._threads), workers):
+                thread = threading.Thread(target=self._run, name=f'outbox-dispatcher-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def wake(self):
+        """Deliver newly committed messages now instead of at the next poll"""
+        if app.config['OUTBOX_DISPATCH_IN_PROCESS']:
+            self.start()
+            self._wake.set()
+
+    def stop(self, timeout: float = 10):
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _run(self):
+        with app.app_context():
+            while not self._stop.is_set():
+                self._wake.clear()
+                try:
+                    dispatch_pending()
+                except Exception as e:
+                    logger.error("Outbox dispatch failed: %s", e)
+                finally:
+                    db.session.remove()
+                self._wake.wait(app.config['OUTBOX_POLL_INTERVAL'])
+
+
+outbox_dispatcher = OutboxDispatcher()
+
+
+def init_outbox(app):
+    """Start an in-process dispatcher unless delivery is left to `expense_cli.py dispatch-outbox`"""
+    if app.config['OUTBOX_DISPATCH_IN_PROCESS']:
+        outbox_dispatcher.start()
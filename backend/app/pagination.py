@@ -0,0 +1,35 @@
+"""
+Pagination helpers for list endpoints
+"""
+
+from typing import Dict, Any
+
+from flask import request
+
+DEFAULT_PER_PAGE = 50
+MAX_PER_PAGE = 200
+
+
+def page_args() -> tuple:
+    """Read ?page= and ?per_page= with sane bounds"""
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', DEFAULT_PER_PAGE, type=int), 1), MAX_PER_PAGE)
+    return page, per_page
+
+
+def paginate(query) -> tuple:
+    """
+    Apply page/per_page from the request to a query
+
+    Returns:
+        tuple: (items on this page, pagination metadata)
+    """
+    page, per_page = page_args()
+    pagination = query.paginate(page=page, per_page=per_page, max_per_page=MAX_PER_PAGE, error_out=False)
+    meta: Dict[str, Any] = {
+        "page": pagination.page,
+        "per_page": pagination.per_page,
+        "total": pagination.total,
+        "pages": pagination.pages,
+    }
+    return pagination.items, meta
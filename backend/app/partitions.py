@@ -0,0 +1,186 @@
+"""
+Monthly range partitions for expenses and approvals
+On Postgres `expenses` is partitioned by date and `approvals` by created_at, one
+partition per month plus a default partition for anything outside the covered range.
+Partitions for the coming PARTITION_MONTHS_AHEAD months are created when the tables
+are, at startup and periodically by a maintenance thread; months that did land in
+the default partition are split out into their own partition on the next run.
+"""
+
+import os
+import logging
+import threading
+from contextlib import nullcontext
+from datetime import date
+from typing import Dict, List, Optional
+
+from sqlalchemy import event, text
+
+from . import app, db
+from .models import Expense, Approval
+from .reports import month_start, next_month
+
+logger = logging.getLogger(__name__)
+
+app.config.setdefault('PARTITION_MONTHS_AHEAD', int(os.getenv('PARTITION_MONTHS_AHEAD', 3)))
+app.config.setdefault('PARTITION_MAINTENANCE_IN_PROCESS', os.getenv('PARTITION_MAINTENANCE_IN_PROCESS', 'True').lower() == 'true')
+app.config.setdefault('PARTITION_MAINTENANCE_INTERVAL', float(os.getenv('PARTITION_MAINTENANCE_INTERVAL', 6 * 3600)))
+
+# Partitioned table -> range key column
+PARTITIONED_TABLES: Dict[str, str] = {
+    Expense.__tablename__: 'date',
+    Approval.__tablename__: 'created_at',
+}
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_{month.year:04d}_{month.month:02d}"
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def is_partitioned(connection, table: str) -> bool:
+    if connection.dialect.name != 'postgresql':
+        return False
+    return connection.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table))"
+    ), {"table": table}).scalar()
+
+
+def existing_partitions(connection, table: str) -> List[str]:
+    return list(connection.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(:table) ORDER BY c.relname"
+    ), {"table": table}).scalars())
+
+
+def install_default_partition(connection, table: str):
+    connection.execute(text(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT"))
+
+
+def ensure_partition(connection, table: str, month: date) -> bool:
+    """
+    Create the partition for one month if it is missing
+
+    Rows of that month already sitting in the default partition are moved into the
+    new partition before it is attached, which is what Postgres requires.
+
+    Returns:
+        bool: True if the partition was created
+    """
+    name = partition_name(table, month)
+    if connection.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar() is not None:
+        return False
+    key = PARTITIONED_TABLES[table]
+    lower, upper = month.isoformat(), next_month(month).isoformat()
+    connection.execute(text(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    if connection.execute(text("SELECT to_regclass(:name)"), {"name": f"{table}_default"}).scalar() is not None:
+        connection.execute(text(
+            f"WITH moved AS (DELETE FROM {table}_default WHERE {key} >= '{lower}' AND {key} < '{upper}' RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved"
+        ))
+    connection.execute(text(
+        f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM ('{lower}') TO ('{upper}')"
+    ))
+    return True
+
+
+def ensure_partitions(connection, first: date, last: date, tables=None) -> List[str]:
+    """Create monthly partitions covering first..last (inclusive) on every partitioned table"""
+    created = []
+    if connection.dialect.name != 'postgresql':
+        return created
+    for table in tables or PARTITIONED_TABLES:
+        if not is_partitioned(connection, table):
+            continue
+        install_default_partition(connection, table)
+        month = month_start(first)
+        while month <= month_start(last):
+            if ensure_partition(connection, table, month):
+                created.append(partition_name(table, month))
+            month = next_month(month)
+    return created
+
+
+def maintain_partitions(connection=None, months_ahead: Optional[int] = None) -> Dict[str, List[str]]:
+    """
+    Create partitions for this month and the months ahead, and split out any month
+    that landed in a default partition
+
+    Returns:
+        dict: table -> names of partitions created
+    """
+    months_ahead = app.config['PARTITION_MONTHS_AHEAD'] if months_ahead is None else months_ahead
+    this_month = month_start(date.today())
+    created: Dict[str, List[str]] = {}
+    with (db.engine.begin() if connection is None else nullcontext(connection)) as connection:
+        if connection.dialect.name != 'postgresql':
+            return created
+        # Several workers may run this at once; one at a time keeps CREATE/ATTACH from racing
+        connection.execute(text("SELECT pg_advisory_xact_lock(hashtext('partition_maintenance'))"))
+        for table, key in PARTITIONED_TABLES.items():
+            if not is_partitioned(connection, table):
+                continue
+            install_default_partition(connection, table)
+            months = {add_months(this_month, offset) for offset in range(months_ahead + 1)}
+            months.update(connection.execute(text(
+                f"SELECT DISTINCT date_trunc('month', {key})::date FROM {table}_default"
+            )).scalars())
+            created[table] = [
+                partition_name(table, month) for month in sorted(months)
+                if ensure_partition(connection, table, month)
+            ]
+            if created[table]:
+                logger.info("Created partitions: %s", ', '.join(created[table]))
+    return created
+
+
+@event.listens_for(Expense.__table__, 'after_create')
+@event.listens_for(Approval.__table__, 'after_create')
+def _create_initial_partitions(target, connection, **kw):
+    if connection.dialect.name != 'postgresql':
+        return
+    this_month = month_start(date.today())
+    ensure_partitions(connection, this_month, add_months(this_month, app.config['PARTITION_MONTHS_AHEAD']),
+                      tables=[target.name])
+
+
+class PartitionMaintainer:
+    """Daemon thread running maintain_partitions every PARTITION_MAINTENANCE_INTERVAL seconds"""
+
+    def __init__(self):
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='partition-maintainer', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        with app.app_context():
+            while not self._stop.is_set():
+                try:
+                    maintain_partitions()
+                except Exception as e:
+                    logger.error("Partition maintenance failed: %s", e)
+                self._stop.wait(app.config['PARTITION_MAINTENANCE_INTERVAL'])
+
+
+partition_maintainer = PartitionMaintainer()
+
+
+def init_partitions(app):
+    """Keep partitions ahead of time from this process unless `expense_cli.py maintain-partitions` runs from cron"""
+    if app.config['PARTITION_MAINTENANCE_IN_PROCESS']:
+        partition_maintainer.start()
@@ -0,0 +1,316 @@
+"""
+RBAC permission resolver
+Compiles a user's effective permissions (built-in role plus Role/RolePermission/UserRole
+grants) into an integer bitset, cached per user, so a permission check is one bit test.
+Every change bumps users.permissions_version in the same transaction; a cached bitset
+older than PERMISSION_REVALIDATE_SECONDS is checked against it with one primary-key
+lookup, so other processes pick up revocations within that interval.
+"""
+
+import os
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from functools import wraps
+from typing import Dict, List, Any, Iterable, Optional
+
+from flask import jsonify
+from flask_jwt_extended import verify_jwt_in_request, get_jwt, get_jwt_identity
+from sqlalchemy import event, select, update, inspect
+
+from . import app, db
+from .models import User, UserRoleEnum, Role, Permission, RolePermission, UserRole
+
+logger = logging.getLogger(__name__)
+
+app.config.setdefault('PERMISSION_CACHE_TTL', int(os.getenv('PERMISSION_CACHE_TTL', 300)))
+app.config.setdefault('PERMISSION_CACHE_SIZE', int(os.getenv('PERMISSION_CACHE_SIZE', 10000)))
+app.config.setdefault('PERMISSION_REVALIDATE_SECONDS', float(os.getenv('PERMISSION_REVALIDATE_SECONDS', 5)))
+# Accept the bitset embedded in the access token on a cache miss instead of compiling it.
+# Role changes then take effect for other processes only when tokens are reissued.
+app.config.setdefault('PERMISSION_TRUST_TOKEN', os.getenv('PERMISSION_TRUST_TOKEN', 'false').lower() == 'true')
+
+PERMISSION_CLAIM = 'perms'
+
+# Bit positions are part of issued tokens: only ever append to this list
+PERMISSIONS = (
+    'admin.access',
+    'expense.create',
+    'expense.view_own',
+    'expense.view_team',
+    'expense.view_all',
+    'expense.approve',
+    'expense.import',
+    'expense.delete',
+    'receipt.upload',
+    'report.view',
+    'org.view',
+    'user.view',
+    'user.manage',
+    'company.manage',
+    'role.manage',
+    'audit.view',
+    'company.create',
+)
+PERMISSION_BITS: Dict[str, int] = {name: 1 << i for i, name in enumerate(PERMISSIONS)}
+ALL_PERMISSIONS = (1 << len(PERMISSIONS)) - 1
+
+
+def mask_for(names: Iterable[str]) -> int:
+    """Bitset for permission names; unknown names are a programming error"""
+    mask = 0
+    for name in names:
+        try:
+            mask |= PERMISSION_BITS[name]
+        except KeyError:
+            raise ValueError(f"Unknown permission '{name}'")
+    return mask
+
+
+def names_for(bits: int) -> List[str]:
+    return [name for name, bit in PERMISSION_BITS.items() if bits & bit]
+
+
+# Platform-wide operations no tenant role implies; granted only through Role rows
+PLATFORM_PERMISSIONS = ('company.create',)
+
+# Baseline granted by User.role before any Role/UserRole assignments
+_EMPLOYEE_DEFAULTS = ('expense.create', 'expense.view_own', 'receipt.upload')
+ROLE_DEFAULTS = {
+    UserRoleEnum.admin: ALL_PERMISSIONS & ~mask_for(PLATFORM_PERMISSIONS),
+    UserRoleEnum.manager: mask_for(_EMPLOYEE_DEFAULTS + (
+        'expense.view_team', 'expense.approve', 'expense.import', 'report.view', 'user.view', 'org.view'
+    )),
+    UserRoleEnum.employee: mask_for(_EMPLOYEE_DEFAULTS),
+}
+
+
+def _as_uuid(value) -> uuid.UUID:
+    return value if isinstance(value, uuid.UUID) else uuid.UUID(str(value))
+
+
+def compile_permissions(user_id) -> Optional[int]:
+    """
+    Resolve a user's effective permissions from the database
+
+    Returns:
+        int: the bitset (0 for inactive users), or None if the user does not exist
+    """
+    compiled = _compile(user_id)
+    return compiled[0] if compiled is not None else None
+
+
+def _compile(user_id) -> Optional[tuple]:
+    """(bitset, permissions_version) of a user, or None if the user does not exist"""
+    user_id = _as_uuid(user_id)
+    user = db.session.execute(
+        select(User.role, User.is_active, User.permissions_version).where(User.id == user_id)
+    ).first()
+    if user is None:
+        return None
+    if not user.is_active:
+        return 0, user.permissions_version
+
+    bits = ROLE_DEFAULTS.get(user.role, 0)
+    granted = db.session.execute(
+        select(Permission.name)
+        .join(RolePermission, RolePermission.permission_id == Permission.id)
+        .join(UserRole, UserRole.role_id == RolePermission.role_id)
+        .join(Role, Role.id == UserRole.role_id)
+        .where(UserRole.user_id == user_id, UserRole.is_active.is_(True), Role.is_active.is_(True))
+    ).scalars()
+    for name in granted:
+        bit = PERMISSION_BITS.get(name)
+        if bit is None:
+            logger.warning("Ignoring permission '%s' granted in the database but unknown to the resolver", name)
+            continue
+        bits |= bit
+    return bits, user.permissions_version
+
+
+class PermissionCache:
+    """Process-local LRU of user id -> (compiled at, checked at, bitset, permissions_version)"""
+
+    def __init__(self):
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id) -> Optional[tuple]:
+        """(checked at, bitset, version) unless missing or past PERMISSION_CACHE_TTL"""
+        entry = self._entries.get(user_id)
+        if entry is None or time.monotonic() - entry[0] >= app.config['PERMISSION_CACHE_TTL']:
+            return None
+        return entry[1:]
+
+    def put(self, user_id, bits: int, version: Optional[int] = None):
+        now = time.monotonic()
+        with self._lock:
+            self._entries[user_id] = (now, now, bits, version)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > app.config['PERMISSION_CACHE_SIZE']:
+                self._entries.popitem(last=False)
+
+    def mark_checked(self, user_id):
+        """Record that the entry still matches the database version"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                self._entries[user_id] = (entry[0], time.monotonic()) + entry[2:]
+
+    def invalidate(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(str(user_id), None)
+
+
+permission_cache = PermissionCache()
+
+
+def permissions_for(user_id) -> Optional[int]:
+    """Cached bitset for a user id (string form, as in the JWT identity)"""
+    user_id = str(user_id)
+    entry = permission_cache.get(user_id)
+    if entry is not None:
+        checked_at, bits, version = entry
+        if time.monotonic() - checked_at < app.config['PERMISSION_REVALIDATE_SECONDS']:
+            return bits
+        # Another process may have changed this user's grants since we compiled them
+        current = db.session.execute(
+            select(User.permissions_version).where(User.id == _as_uuid(user_id))
+        ).scalar()
+        if current is not None and current == version:
+            permission_cache.mark_checked(user_id)
+            return bits
+    elif app.config['PERMISSION_TRUST_TOKEN']:
+        claim = get_jwt().get(PERMISSION_CLAIM)
+        if claim is not None:
+            # No version is known for a token bitset; it is re-checked after PERMISSION_REVALIDATE_SECONDS
+            bits = int(claim, 16)
+            permission_cache.put(user_id, bits)
+            return bits
+    compiled = _compile(user_id)
+    if compiled is None:
+        permission_cache.invalidate(user_id)
+        return None
+    permission_cache.put(user_id, *compiled)
+    return compiled[0]
+
+
+def permission_claims(user) -> Dict[str, Any]:
+    """JWT claims carrying the user's compiled bitset as hex"""
+    bits, version = _compile(user.id) or (0, None)
+    permission_cache.put(str(user.id), bits, version)
+    return {PERMISSION_CLAIM: format(bits, 'x')}
+
+
+def has_permission(user_id, name: str) -> bool:
+    return bool((permissions_for(user_id) or 0) & PERMISSION_BITS[name])
+
+
+def require_permission(*names):
+    """
+    Decorator requiring a valid JWT whose user holds every named permission
+
+    The mask is computed once at decoration time; each request does a cache
+    lookup and one AND.
+    """
+    mask = mask_for(names)
+
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            verify_jwt_in_request()
+            bits = permissions_for(get_jwt_identity())
+            if bits is None:
+                return jsonify({"error": "User not found"}), 404
+            if bits & mask != mask:
+                return jsonify({"error": "Permission denied", "required": list(names)}), 403
+            return f(*args, **kwargs)
+
+        return decorated_function
+
+    return decorator
+
+
+def sync_permissions() -> int:
+    """Insert Permission rows for registry entries missing from the table; returns the number added"""
+    existing = set(db.session.execute(select(Permission.name)).scalars())
+    missing = [name for name in PERMISSIONS if name not in existing]
+    now = datetime.utcnow()
+    for name in missing:
+        db.session.add(Permission(name=name, category=name.split('.', 1)[0], created_at=now))
+    db.session.commit()
+    return len(missing)
+
+
+def _bump_versions(connection, user_ids=(), role_ids=(), permission_ids=()):
+    """Increment permissions_version of the users, and of everyone holding the roles or permissions"""
+    users = User.__table__
+    conditions = []
+    if user_ids:
+        conditions.append(users.c.id.in_([_as_uuid(user_id) for user_id in user_ids]))
+    if permission_ids:
+        role_ids = set(role_ids) | set(connection.execute(
+            select(RolePermission.role_id).where(RolePermission.permission_id.in_(permission_ids))
+        ).scalars())
+    if role_ids:
+        conditions.append(users.c.id.in_(select(UserRole.user_id).where(UserRole.role_id.in_(role_ids))))
+    for condition in conditions:
+        connection.execute(update(users).where(condition).values(permissions_version=users.c.permissions_version + 1))
+
+
+def invalidate_on_commit(user_ids: Iterable):
+    """Mark these users' bitsets stale in every process; for Core writes the flush hook can't see"""
+    user_ids = {str(user_id) for user_id in user_ids}
+    if user_ids:
+        _bump_versions(db.session.connection(), user_ids)
+        db.session.info.setdefault('permission_users_changed', set()).update(user_ids)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _collect_permission_changes(session, flush_context):
+    """Bump permissions_version for every user whose bitset a flush may have changed"""
+    changed = session.info.setdefault('permission_users_changed', set())
+    user_ids, role_ids, permission_ids = set(), set(), set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, UserRole):
+            user_ids.update(str(user_id) for user_id in inspect(obj).attrs.user_id.history.sum() if user_id)
+        elif isinstance(obj, User) and obj not in session.new and obj not in session.deleted and (
+            inspect(obj).attrs.role.history.has_changes()
+            or inspect(obj).attrs.is_active.history.has_changes()
+        ):
+            user_ids.add(str(obj.id))
+        elif isinstance(obj, User) and obj in session.deleted:
+            changed.add(str(obj.id))
+        elif isinstance(obj, Role):
+            role_ids.add(obj.id)
+        elif isinstance(obj, RolePermission):
+            role_ids.update(role_id for role_id in inspect(obj).attrs.role_id.history.sum() if role_id)
+        elif isinstance(obj, Permission) and obj not in session.new:
+            permission_ids.add(obj.id)
+    if user_ids or role_ids or permission_ids:
+        # Core updates on the flush's connection, so they commit or roll back with it
+        _bump_versions(session.connection(), user_ids, role_ids, permission_ids)
+        changed.update(user_ids)
+        if role_ids or permission_ids:
+            changed.add(None)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_permissions_after_commit(session):
+    changed = session.info.pop('permission_users_changed', set())
+    if None in changed:
+        permission_cache.invalidate()
+        return
+    for user_id in changed:
+        permission_cache.invalidate(user_id)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_permission_changes_after_rollback(session):
+    session.info.pop('permission_users_changed', None)
@@ -0,0 +1,430 @@
+"""
+Slow-query profiler for generic table queries
+AutomapManager.query_table accepts any filter combination, so every execution is
+timed and aggregated by normalized statement fingerprint. Executions slower than
+QUERY_PROFILER_THRESHOLD_MS are sampled and their plan is captured in the
+background with EXPLAIN (ANALYZE, BUFFERS) (EXPLAIN QUERY PLAN on sqlite).
+Sequential scans are matched against the reflected index list to suggest indexes.
+With QUERY_PROFILER_MULTIPROC_DIR set (by default a directory under the gunicorn
+METRICS_MULTIPROC_DIR), every worker writes its statistics there and reports merge
+all of them, so they cover the whole server rather than the worker that answered.
+"""
+
+import os
+import re
+import glob
+import json
+import fcntl
+import time
+import random
+import hashlib
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Sequence
+
+from sqlalchemy import inspect
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from . import app
+
+logger = logging.getLogger(__name__)
+
+app.config.setdefault('QUERY_PROFILER_ENABLED', os.getenv('QUERY_PROFILER_ENABLED', 'True').lower() == 'true')
+app.config.setdefault('QUERY_PROFILER_THRESHOLD_MS', float(os.getenv('QUERY_PROFILER_THRESHOLD_MS', 100)))
+# Fraction of slow executions whose plan is captured
+app.config.setdefault('QUERY_PROFILER_SAMPLE_RATE', float(os.getenv('QUERY_PROFILER_SAMPLE_RATE', 1.0)))
+app.config.setdefault('QUERY_PROFILER_MAX_FINGERPRINTS', int(os.getenv('QUERY_PROFILER_MAX_FINGERPRINTS', 500)))
+# Upper bound for the re-execution done by EXPLAIN ANALYZE (Postgres only)
+app.config.setdefault('QUERY_PROFILER_EXPLAIN_TIMEOUT_MS', int(os.getenv('QUERY_PROFILER_EXPLAIN_TIMEOUT_MS', 5000)))
+# Shared by all workers of a server; unset means statistics stay per process
+app.config.setdefault('QUERY_PROFILER_MULTIPROC_DIR', os.getenv('QUERY_PROFILER_MULTIPROC_DIR') or (
+    os.path.join(os.environ['METRICS_MULTIPROC_DIR'], 'query-profiler') if os.getenv('METRICS_MULTIPROC_DIR') else None
+))
+# How often a worker rewrites its statistics file (the reporting worker always writes a fresh one)
+app.config.setdefault('QUERY_PROFILER_FLUSH_INTERVAL', float(os.getenv('QUERY_PROFILER_FLUSH_INTERVAL', 1)))
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|:\w+|\$\d+|\?|%s")
+_IN_LIST = re.compile(r"\bin\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_statement(statement: str) -> str:
+    """Strip literals and bind-parameter styles so equivalent queries compare equal"""
+    normalized = _STRING_LITERAL.sub('?', statement)
+    normalized = _PLACEHOLDER.sub('?', normalized)
+    normalized = _NUMBER_LITERAL.sub('?', normalized)
+    normalized = _IN_LIST.sub('IN (?)', normalized)
+    return _WHITESPACE.sub(' ', normalized).strip()
+
+
+def fingerprint(statement: str) -> str:
+    return hashlib.sha1(normalize_statement(statement).lower().encode()).hexdigest()[:16]
+
+
+# ---------------------------------------------------------------------------
+# Plan capture and analysis
+# ---------------------------------------------------------------------------
+
+class _Explain(Executable, ClauseElement):
+    """EXPLAIN of a select, compiled together with it so its binds go through the dialect's processors"""
+
+    inherit_cache = False
+
+    def __init__(self, statement, options: str = ''):
+        self.statement = statement
+        self.options = options
+
+
+@compiles(_Explain)
+def _compile_explain(element, compiler, **kw):
+    sql = f"EXPLAIN {element.options}{compiler.process(element.statement, **kw)}"
+    # Plan rows are read as the driver returns them, not through the select's column types
+    compiler._result_columns = []
+    return sql
+
+
+def explain(engine, statement) -> Dict[str, Any]:
+    """Run EXPLAIN for a SQLAlchemy select; the ANALYZE re-execution is rolled back"""
+    backend = engine.dialect.name
+    with engine.connect() as conn:
+        with conn.begin() as transaction:
+            if backend == 'postgresql':
+                conn.exec_driver_sql(
+                    f"SET LOCAL statement_timeout = {int(app.config['QUERY_PROFILER_EXPLAIN_TIMEOUT_MS'])}"
+                )
+                plan = conn.execute(_Explain(statement, '(ANALYZE, BUFFERS, FORMAT JSON) ')).scalar()
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                plan = plan[0]
+            elif backend == 'sqlite':
+                plan = [
+                    {"id": row[0], "parent": row[1], "detail": row[3]}
+                    for row in conn.execute(_Explain(statement, 'QUERY PLAN '))
+                ]
+            else:
+                plan = [row[0] for row in conn.execute(_Explain(statement))]
+            transaction.rollback()
+    return {"format": backend, "plan": plan}
+
+
+def _walk_postgres(node: Dict[str, Any]):
+    yield node
+    for child in node.get('Plans', []):
+        yield from _walk_postgres(child)
+
+
+def sequential_scans(captured: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Tables read without an index according to a captured plan"""
+    scans = []
+    if captured['format'] == 'postgresql':
+        for node in _walk_postgres(captured['plan']['Plan']):
+            if node.get('Node Type') == 'Seq Scan':
+                scans.append({
+                    "table": node.get('Relation Name'),
+                    "filter": node.get('Filter'),
+                    "rows_removed_by_filter": node.get('Rows Removed by Filter'),
+                    "shared_read_blocks": node.get('Shared Read Blocks'),
+                })
+    elif captured['format'] == 'sqlite':
+        for step in captured['plan']:
+            match = re.match(r"SCAN (?:TABLE )?(\w+)", step['detail'])
+            if match and 'USING' not in step['detail']:
+                scans.append({"table": match.group(1), "filter": None})
+    return scans
+
+
+def suggest_indexes(engine, table_name: str, filter_columns: Sequence[str]) -> List[Dict[str, Any]]:
+    """Propose an index for filter columns that no reflected index (or the PK) leads with"""
+    if not filter_columns:
+        return []
+    inspector = inspect(engine)
+    leading = set()
+    primary_key = inspector.get_pk_constraint(table_name).get('constrained_columns') or []
+    if primary_key:
+        leading.add(primary_key[0])
+    for index in inspector.get_indexes(table_name):
+        if index['column_names'] and index['column_names'][0]:
+            leading.add(index['column_names'][0])
+    for constraint in inspector.get_unique_constraints(table_name):
+        if constraint['column_names']:
+            leading.add(constraint['column_names'][0])
+
+    if any(column in leading for column in filter_columns):
+        return []
+    columns = sorted(filter_columns)
+    name = f"ix_{table_name}_{'_'.join(columns)}"[:63]
+    return [{
+        "table": table_name,
+        "columns": columns,
+        "existing_indexes": [index['name'] for index in inspector.get_indexes(table_name)],
+        "ddl": f"CREATE INDEX CONCURRENTLY {name} ON {table_name} ({', '.join(columns)})",
+    }]
+
+
+# ---------------------------------------------------------------------------
+# Aggregation
+# ---------------------------------------------------------------------------
+
+RETIRED_FILE = 'retired.json'
+RESET_MARKER = 'reset'
+
+
+def merge_entries(target: Dict[str, Dict[str, Any]], entries: Dict[str, Dict[str, Any]]):
+    """Fold one process's statistics into target: counts and time add up, the slowest plan wins"""
+    for key, entry in entries.items():
+        merged = target.get(key)
+        if merged is None:
+            target[key] = dict(entry)
+            continue
+        for field in ('calls', 'slow_calls', 'total_ms'):
+            merged[field] += entry[field]
+        merged['max_ms'] = max(merged['max_ms'], entry['max_ms'])
+        merged['last_seen'] = max(filter(None, (merged['last_seen'], entry['last_seen'])), default=None)
+        if entry['explain'] is not None and (merged['explained_at_ms'] or 0) < (entry['explained_at_ms'] or 0):
+            merged['explain'], merged['explained_at_ms'] = entry['explain'], entry['explained_at_ms']
+            merged['explain_error'] = entry['explain_error']
+        elif merged['explain'] is None and entry['explain_error']:
+            merged['explain_error'] = entry['explain_error']
+
+
+class QueryProfiler:
+    """Statement statistics per process, shared through files across workers, plus background EXPLAIN capture"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Serializes writes of this process's file
+        self._flush_lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._pending = set()
+        self._executor = None
+        self._flushed_at = 0.0
+        self._reset_seen = 0.0
+
+    @property
+    def directory(self) -> Optional[str]:
+        return app.config['QUERY_PROFILER_MULTIPROC_DIR']
+
+    def _submit(self, job, *args):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='query-explain')
+            executor = self._executor
+        return executor.submit(job, *args)
+
+    # -- sharing across workers ---------------------------------------------
+
+    @staticmethod
+    def _load(path: str) -> Dict[str, Any]:
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, path: str, data: Dict[str, Any]):
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f, default=str)
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def _apply_reset(self):
+        """Drop local statistics collected before another worker's reset"""
+        try:
+            reset_at = os.stat(os.path.join(self.directory, RESET_MARKER)).st_mtime
+        except OSError:
+            return
+        if reset_at > self._reset_seen:
+            with self._lock:
+                self._stats.clear()
+            self._reset_seen = reset_at
+
+    def flush(self):
+        """Write this process's statistics to its file"""
+        if not self.directory:
+            return
+        with self._flush_lock:
+            os.makedirs(self.directory, exist_ok=True)
+            self._apply_reset()
+            with self._lock:
+                data = {"pending": len(self._pending), "stats": {key: dict(entry) for key, entry in self._stats.items()}}
+            self._write(os.path.join(self.directory, f"{os.getpid()}.json"), data)
+            self._flushed_at = time.monotonic()
+
+    def _maybe_flush(self):
+        if self.directory and time.monotonic() - self._flushed_at >= app.config['QUERY_PROFILER_FLUSH_INTERVAL']:
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning("Could not write query profiler statistics: %s", e)
+
+    def _collect(self) -> tuple:
+        """(merged statistics, pending captures) of every worker, or of this process alone"""
+        if not self.directory:
+            with self._lock:
+                return {key: dict(entry) for key, entry in self._stats.items()}, len(self._pending)
+        self.flush()
+        merged: Dict[str, Dict[str, Any]] = {}
+        pending = 0
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            data = self._load(path)
+            merge_entries(merged, data.get('stats', {}))
+            pending += data.get('pending', 0)
+        return merged, pending
+
+    def retire(self):
+        """Fold this process's statistics into retired.json and drop its file (worker exit)"""
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, 'retired.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            archive = os.path.join(self.directory, RETIRED_FILE)
+            retired = self._load(archive).get('stats', {})
+            self._apply_reset()
+            with self._lock:
+                merge_entries(retired, self._stats)
+                self._stats.clear()
+            self._write(archive, {"pending": 0, "stats": retired})
+        own = os.path.join(self.directory, f"{os.getpid()}.json")
+        if os.path.exists(own):
+            os.remove(own)
+
+    def record(self, engine, statement, table_name: str, filter_columns: Sequence[str], duration: float):
+        """Account one execution; sample a plan capture when it was slow"""
+        if not app.config['QUERY_PROFILER_ENABLED']:
+            return
+        sql = str(statement.compile(dialect=engine.dialect))
+        key = fingerprint(sql)
+        duration_ms = duration * 1000
+        with self._lock:
+            entry = self._stats.get(key)
+            if entry is None:
+                if len(self._stats) >= app.config['QUERY_PROFILER_MAX_FINGERPRINTS']:
+                    # Drop the cheapest fingerprint to make room
+                    cheapest = min(self._stats, key=lambda k: self._stats[k]['total_ms'])
+                    del self._stats[cheapest]
+                entry = self._stats[key] = {
+                    "fingerprint": key,
+                    "statement": normalize_statement(sql),
+                    "table": table_name,
+                    "filter_columns": sorted(filter_columns),
+                    "calls": 0,
+                    "slow_calls": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "last_seen": None,
+                    "explain": None,
+                    "explain_error": None,
+                    "explained_at_ms": None,
+                }
+            entry['calls'] += 1
+            entry['total_ms'] += duration_ms
+            entry['max_ms'] = max(entry['max_ms'], duration_ms)
+            entry['last_seen'] = datetime.utcnow().isoformat()
+            slow = duration_ms >= app.config['QUERY_PROFILER_THRESHOLD_MS']
+            if slow:
+                entry['slow_calls'] += 1
+            # Keep the plan of the slowest sampled execution; one capture per fingerprint at a time
+            capture = (
+                slow
+                and key not in self._pending
+                and (entry['explained_at_ms'] is None or duration_ms > entry['explained_at_ms'])
+                and random.random() < app.config['QUERY_PROFILER_SAMPLE_RATE']
+            )
+            if capture:
+                self._pending.add(key)
+        if capture:
+            self._submit(self._capture, engine, statement, key, table_name, list(filter_columns), duration_ms)
+        self._maybe_flush()
+
+    def _capture(self, engine, statement, key, table_name, filter_columns, duration_ms):
+        try:
+            captured = explain(engine, statement)
+            scans = sequential_scans(captured)
+            suggestions = []
+            if any(scan['table'] in (None, table_name) for scan in scans) or captured['format'] not in ('postgresql', 'sqlite'):
+                suggestions = suggest_indexes(engine, table_name, filter_columns)
+            result = {"captured": captured, "sequential_scans": scans, "index_suggestions": suggestions}
+            error = None
+        except Exception as e:
+            logger.warning("EXPLAIN capture failed for %s: %s", key, e)
+            result, error = None, str(e)
+        with self._lock:
+            self._pending.discard(key)
+            entry = self._stats.get(key)
+            if entry is not None:
+                entry['explain_error'] = error
+                if result is not None:
+                    entry['explain'] = result
+                    entry['explained_at_ms'] = round(duration_ms, 3)
+        self._maybe_flush()
+
+    def profile(self, engine, statement, table_name: str, filter_columns: Sequence[str] = ()):
+        """Run the statement synchronously with its plan and index suggestions (CLI use)"""
+        started = time.perf_counter()
+        with engine.connect() as conn:
+            rows = len(conn.execute(statement).fetchall())
+        duration_ms = (time.perf_counter() - started) * 1000
+        captured = explain(engine, statement)
+        scans = sequential_scans(captured)
+        return {
+            "table": table_name,
+            "fingerprint": fingerprint(str(statement.compile(dialect=engine.dialect))),
+            "duration_ms": round(duration_ms, 3),
+            "rows": rows,
+            "captured": captured,
+            "sequential_scans": scans,
+            "index_suggestions": suggest_indexes(engine, table_name, filter_columns) if scans else [],
+        }
+
+    def report(self, limit: int = 50, sort: str = 'total_ms', slow_only: bool = True) -> Dict[str, Any]:
+        if sort not in ('total_ms', 'max_ms', 'mean_ms', 'calls', 'slow_calls'):
+            raise ValueError(f"Cannot sort by '{sort}'")
+        stats, pending = self._collect()
+        entries = [entry for entry in stats.values() if entry['slow_calls'] or not slow_only]
+        for entry in entries:
+            entry['mean_ms'] = round(entry['total_ms'] / entry['calls'], 3)
+            entry['total_ms'] = round(entry['total_ms'], 3)
+            entry['max_ms'] = round(entry['max_ms'], 3)
+        entries.sort(key=lambda entry: entry[sort], reverse=True)
+        suggestions = {}
+        for entry in entries:
+            for suggestion in (entry['explain'] or {}).get('index_suggestions', []):
+                suggestions[suggestion['ddl']] = suggestion
+        return {
+            "threshold_ms": app.config['QUERY_PROFILER_THRESHOLD_MS'],
+            "fingerprints": len(entries),
+            "pending_explains": pending,
+            "queries": entries[:limit],
+            "index_suggestions": list(suggestions.values()),
+        }
+
+    def reset(self):
+        """Clear the statistics of every worker (of this process without a shared directory)"""
+        with self._lock:
+            self._stats.clear()
+        if not self.directory:
+            return
+        with self._flush_lock:
+            os.makedirs(self.directory, exist_ok=True)
+            marker = os.path.join(self.directory, RESET_MARKER)
+            with open(marker, 'w'):
+                pass
+            # Other workers clear themselves when they next see the marker
+            self._reset_seen = os.stat(marker).st_mtime
+            for path in glob.glob(os.path.join(self.directory, '*.json')):
+                os.remove(path)
+
+
+query_profiler = QueryProfiler()
@@ -0,0 +1,307 @@
+"""
+Receipt storage pipeline
+Streams uploads to content-addressed storage (local disk or an S3-compatible
+endpoint), deduplicates by SHA-256 and builds thumbnails on a background worker pool
+"""
+
+import os
+import hashlib
+import logging
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Any, IO, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from . import app, db
+from .models import Receipt, Expense, Employee
+
+logger = logging.getLogger(__name__)
+
+app.config.setdefault('RECEIPT_STORAGE', os.getenv('RECEIPT_STORAGE', 'local'))
+app.config.setdefault('RECEIPT_STORAGE_DIR', os.getenv('RECEIPT_STORAGE_DIR', os.path.join(os.getcwd(), 'storage', 'receipts')))
+app.config.setdefault('RECEIPT_S3_BUCKET', os.getenv('RECEIPT_S3_BUCKET', 'receipts'))
+app.config.setdefault('RECEIPT_S3_ENDPOINT', os.getenv('RECEIPT_S3_ENDPOINT'))
+app.config.setdefault('RECEIPT_MAX_BYTES', int(os.getenv('RECEIPT_MAX_BYTES', 20 * 1024 * 1024)))
+app.config.setdefault('RECEIPT_THUMBNAIL_WORKERS', int(os.getenv('RECEIPT_THUMBNAIL_WORKERS', 2)))
+
+READ_CHUNK_SIZE = 64 * 1024
+THUMBNAIL_SIZE = (320, 320)
+
+# Magic numbers of the formats we accept, checked against the first bytes of the upload
+CONTENT_SIGNATURES = (
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'%PDF-', 'application/pdf'),
+)
+
+
+class ReceiptError(ValueError):
+    """Raised for uploads we refuse (too large, empty, unsupported type)"""
+
+
+def sniff_content_type(head: bytes) -> Optional[str]:
+    for signature, content_type in CONTENT_SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+
+def receipt_url(sha256: str) -> str:
+    return f"/api/receipts/{sha256}"
+
+
+class LocalReceiptStorage:
+    """Content-addressed files under RECEIPT_STORAGE_DIR, sharded by hash prefix"""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.tmp_dir = os.path.join(root, 'tmp')
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def path(self, sha256: str, kind: str = 'original') -> str:
+        name = sha256 if kind == 'original' else f"{sha256}.thumb.jpg"
+        return os.path.join(self.root, sha256[:2], sha256[2:4], name)
+
+    def exists(self, sha256: str, kind: str = 'original') -> bool:
+        return os.path.exists(self.path(sha256, kind))
+
+    def put(self, temp_path: str, sha256: str, kind: str = 'original'):
+        """Move a finished temp file into place; the temp dir shares the filesystem so this is a rename"""
+        target = self.path(sha256, kind)
+        if os.path.exists(target):
+            os.remove(temp_path)
+            return
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(temp_path, target)
+
+    def local_copy(self, sha256: str, kind: str = 'original') -> Tuple[str, bool]:
+        """Return a readable local path and whether the caller must delete it afterwards"""
+        return self.path(sha256, kind), False
+
+
+class S3ReceiptStorage(LocalReceiptStorage):
+    """S3-compatible object storage (e.g. MinIO locally); temp files still stage on local disk"""
+
+    def __init__(self, root: str, bucket: str, endpoint_url: Optional[str] = None):
+        super().__init__(root)
+        try:
+            import boto3
+        except ImportError:
+            raise RuntimeError("RECEIPT_STORAGE=s3 requires boto3 (pip install boto3)")
+        self.bucket = bucket
+        self.client = boto3.client('s3', endpoint_url=endpoint_url)
+
+    def key(self, sha256: str, kind: str = 'original') -> str:
+        return os.path.relpath(self.path(sha256, kind), self.root)
+
+    def exists(self, sha256: str, kind: str = 'original') -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.key(sha256, kind))
+            return True
+        except self.client.exceptions.ClientError:
+            return False
+
+    def put(self, temp_path: str, sha256: str, kind: str = 'original'):
+        try:
+            if not self.exists(sha256, kind):
+                self.client.upload_file(temp_path, self.bucket, self.key(sha256, kind))
+        finally:
+            os.remove(temp_path)
+
+    def local_copy(self, sha256: str, kind: str = 'original') -> Tuple[str, bool]:
+        fd, temp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        with os.fdopen(fd, 'wb') as f:
+            self.client.download_fileobj(self.bucket, self.key(sha256, kind), f)
+        return temp_path, True
+
+    def presigned_url(self, sha256: str, kind: str = 'original', expires_in: int = 300) -> str:
+        return self.client.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': self.bucket, 'Key': self.key(sha256, kind)},
+            ExpiresIn=expires_in
+        )
+
+
+_storage = None
+_thumbnail_pool = None
+
+
+def get_storage():
+    global _storage
+    if _storage is None:
+        root = app.config['RECEIPT_STORAGE_DIR']
+        if app.config['RECEIPT_STORAGE'] == 's3':
+            _storage = S3ReceiptStorage(root, app.config['RECEIPT_S3_BUCKET'], app.config['RECEIPT_S3_ENDPOINT'])
+        else:
+            _storage = LocalReceiptStorage(root)
+    return _storage
+
+
+def get_thumbnail_pool() -> ThreadPoolExecutor:
+    global _thumbnail_pool
+    if _thumbnail_pool is None:
+        _thumbnail_pool = ThreadPoolExecutor(
+            max_workers=app.config['RECEIPT_THUMBNAIL_WORKERS'],
+            thread_name_prefix='receipt-thumbnails'
+        )
+    return _thumbnail_pool
+
+
+def stream_to_storage(stream: IO[bytes], max_bytes: int) -> Tuple[str, int, str]:
+    """
+    Copy an upload stream to storage in fixed-size chunks while hashing it
+
+    Returns:
+        tuple: (sha256 hex digest, size in bytes, sniffed content type)
+    """
+    storage = get_storage()
+    digest = hashlib.sha256()
+    size = 0
+    content_type = None
+
+    fd, temp_path = tempfile.mkstemp(dir=storage.tmp_dir)
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = stream.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                if content_type is None:
+                    content_type = sniff_content_type(chunk[:16])
+                    if content_type is None:
+                        raise ReceiptError("Unsupported receipt type, expected JPEG, PNG, GIF, WebP or PDF")
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ReceiptError(f"Receipt exceeds the {max_bytes} byte limit")
+                digest.update(chunk)
+                out.write(chunk)
+        if size == 0:
+            raise ReceiptError("Receipt file is empty")
+
+        sha256 = digest.hexdigest()
+        storage.put(temp_path, sha256)
+        return sha256, size, content_type
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def save_receipt(stream: IO[bytes], company_id, uploaded_by=None, filename: str = None) -> Tuple[Receipt, bool]:
+    """
+    Store an uploaded receipt for a company
+
+    Returns:
+        tuple: (Receipt row, True if this company already had the same content)
+    """
+    sha256, size, content_type = stream_to_storage(stream, app.config['RECEIPT_MAX_BYTES'])
+
+    receipt = _find_receipt(company_id, sha256)
+    if receipt:
+        return receipt, True
+
+    receipt = Receipt(
+        company_id=company_id,
+        sha256=sha256,
+        size=size,
+        content_type=content_type,
+        filename=filename,
+        uploaded_by=uploaded_by,
+        thumbnail_status='ready' if get_storage().exists(sha256, 'thumbnail') else 'pending',
+        created_at=datetime.utcnow()
+    )
+    try:
+        # Savepoint, so losing the race on uq_receipts_company_sha256 leaves the transaction usable
+        with db.session.begin_nested():
+            db.session.add(receipt)
+    except IntegrityError:
+        existing = _find_receipt(company_id, sha256)
+        if existing is None:
+            raise
+        # The same content was uploaded concurrently and committed first
+        return existing, True
+    return receipt, False
+
+
+def _find_receipt(company_id, sha256: str) -> Optional[Receipt]:
+    return Receipt.query.filter_by(company_id=company_id, sha256=sha256).first()
+
+
+def duplicate_claims(sha256: str, company_id, exclude_expense_id=None) -> List[str]:
+    """The company's expense ids already claiming this receipt (indexed lookup on receipt_url)"""
+    query = (
+        select(Expense.id)
+        .join(Employee, Employee.id == Expense.employee_id)
+        .where(Expense.receipt_url == receipt_url(sha256), Employee.company_id == company_id)
+    )
+    if exclude_expense_id is not None:
+        query = query.where(Expense.id != exclude_expense_id)
+    return [str(expense_id) for expense_id in db.session.execute(query).scalars()]
+
+
+def schedule_thumbnail(sha256: str):
+    """Queue thumbnail generation; call after the receipt row is committed"""
+    get_thumbnail_pool().submit(_build_thumbnail, sha256)
+
+
+def _build_thumbnail(sha256: str):
+    storage = get_storage()
+    status = 'ready'
+    try:
+        if not storage.exists(sha256, 'thumbnail'):
+            status = _render_thumbnail(storage, sha256)
+    except Exception as e:
+        logger.error(f"Thumbnail generation failed for {sha256}: {e}")
+        status = 'failed'
+
+    with app.app_context():
+        try:
+            Receipt.query.filter_by(sha256=sha256).update({'thumbnail_status': status})
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Could not record thumbnail status for {sha256}: {e}")
+
+
+def _render_thumbnail(storage, sha256: str) -> str:
+    try:
+        from PIL import Image
+    except ImportError:
+        return 'skipped'
+
+    source_path, is_temp = storage.local_copy(sha256)
+    try:
+        with open(source_path, 'rb') as f:
+            if sniff_content_type(f.read(16)) == 'application/pdf':
+                return 'skipped'
+        with Image.open(source_path) as image:
+            image.thumbnail(THUMBNAIL_SIZE)
+            fd, thumb_path = tempfile.mkstemp(dir=storage.tmp_dir, suffix='.jpg')
+            os.close(fd)
+            image.convert('RGB').save(thumb_path, 'JPEG', quality=80)
+        storage.put(thumb_path, sha256, 'thumbnail')
+        return 'ready'
+    finally:
+        if is_temp:
+            os.remove(source_path)
+
+
+def serialize_receipt(receipt: Receipt) -> Dict[str, Any]:
+    return {
+        "id": str(receipt.id),
+        "sha256": receipt.sha256,
+        "size": receipt.size,
+        "content_type": receipt.content_type,
+        "filename": receipt.filename,
+        "url": receipt_url(receipt.sha256),
+        "thumbnail_url": f"{receipt_url(receipt.sha256)}/thumbnail",
+        "thumbnail_status": receipt.thumbnail_status,
+        "created_at": receipt.created_at.isoformat() if receipt.created_at else None
+    }
@@ -0,0 +1,382 @@
+"""
+Read replica routing
+With DATABASE_REPLICA_URLS set (comma-separated), db.session picks an engine once per
+session, which Flask-SQLAlchemy scopes to the request: sessions of GET/HEAD requests
+read from a streaming replica, everything else uses the primary. A session that
+flushes or executes DML moves to the primary for the rest of its life, and a user who
+committed a write keeps reading from the primary for DATABASE_READ_YOUR_WRITES_SECONDS
+(tracked per process by JWT identity, and across workers with a cookie). Replicas that
+are unreachable or more than DATABASE_REPLICA_MAX_LAG seconds behind are skipped.
+Decisions and lag are exported on /metrics and the route is echoed in X-DB-Route.
+
+To try it locally, run a second Postgres as a streaming standby of the first:
+
+    pg_basebackup -h localhost -p 5432 -U postgres -D /tmp/replica -R -X stream
+    pg_ctl -D /tmp/replica -o '-p 5433' start
+    DATABASE_REPLICA_URLS=postgresql://postgres@localhost:5433/exes python expense_cli.py replicas
+"""
+
+import os
+import time
+import logging
+import itertools
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+from flask import g, request, has_request_context
+from flask_jwt_extended import get_jwt_identity
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.sql.elements import TextClause
+
+from . import app
+from .metrics import CounterMetric, GaugeMetric, register
+
+logger = logging.getLogger(__name__)
+
+app.config.setdefault('DATABASE_REPLICA_URLS', os.getenv('DATABASE_REPLICA_URLS', ''))
+# After committing a write, the user's reads stay on the primary this long
+app.config.setdefault('DATABASE_READ_YOUR_WRITES_SECONDS', float(os.getenv('DATABASE_READ_YOUR_WRITES_SECONDS', 5)))
+app.config.setdefault('DATABASE_REPLICA_MAX_LAG', float(os.getenv('DATABASE_REPLICA_MAX_LAG', 10)))
+# Lag and reachability are re-checked lazily, at most this often per replica and process
+app.config.setdefault('DATABASE_REPLICA_CHECK_INTERVAL', float(os.getenv('DATABASE_REPLICA_CHECK_INTERVAL', 5)))
+app.config.setdefault('DATABASE_REPLICA_CONNECT_TIMEOUT', int(os.getenv('DATABASE_REPLICA_CONNECT_TIMEOUT', 2)))
+
+PRIMARY = 'primary'
+REPLICA = 'replica'
+READ_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS'))
+READ_STATEMENTS = frozenset(('SELECT', 'WITH', 'EXPLAIN', 'SHOW', 'VALUES'))
+READ_YOUR_WRITES_COOKIE = 'db_primary_until'
+
+# Seconds behind the primary; zero once everything received has been replayed,
+# so an idle primary does not make the replica look stale
+LAG_SQL = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+DB_ROUTES = register(CounterMetric(
+    'db_session_routes_total', 'Database sessions by chosen engine and reason', ('route', 'reason')
+))
+DB_REPLICA_SESSIONS = register(CounterMetric('db_replica_sessions_total', 'Sessions served by each replica', ('replica',)))
+
+
+class Replica:
+    """One replica engine and the outcome of its last lag check"""
+
+    def __init__(self, url: str, engine_options: Dict[str, Any]):
+        self.name = make_url(url).render_as_string(hide_password=True)
+        self.engine = create_engine(url, **engine_options)
+        self.lag: Optional[float] = None
+        self.error: Optional[str] = None
+        self.checked_at = 0.0
+        self._check_lock = threading.Lock()
+
+    def check(self):
+        try:
+            with self.engine.connect() as connection:
+                if connection.dialect.name == 'postgresql':
+                    self.lag = float(connection.execute(text(LAG_SQL)).scalar())
+                else:
+                    connection.execute(text('SELECT 1'))
+                    self.lag = 0.0
+            if self.error is not None:
+                logger.info("Replica %s is reachable again", self.name)
+            self.error = None
+        except Exception as e:
+            if self.error is None:
+                logger.warning("Replica %s is unreachable: %s", self.name, e)
+            self.lag, self.error = None, str(e)
+        self.checked_at = time.monotonic()
+
+    def refresh(self, interval: float):
+        """Check again if the last check is older than interval; other threads keep the previous result meanwhile"""
+        if time.monotonic() - self.checked_at < interval or not self._check_lock.acquire(blocking=False):
+            return
+        try:
+            self.check()
+        finally:
+            self._check_lock.release()
+
+    def usable(self, max_lag: float) -> bool:
+        return self.error is None and self.lag is not None and self.lag <= max_lag
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "replica": self.name,
+            "lag_seconds": self.lag,
+            "usable": self.usable(app.config['DATABASE_REPLICA_MAX_LAG']),
+            "error": self.error,
+            "checked_seconds_ago": round(time.monotonic() - self.checked_at, 1) if self.checked_at else None,
+        }
+
+
+class ReplicaPool:
+    """Replica engines built from DATABASE_REPLICA_URLS on first use, chosen round-robin among the usable ones"""
+
+    def __init__(self):
+        self._replicas: Optional[List[Replica]] = None
+        self._lock = threading.Lock()
+        self._counter = itertools.count()
+
+    @property
+    def replicas(self) -> List[Replica]:
+        if self._replicas is None:
+            with self._lock:
+                if self._replicas is None:
+                    self._replicas = self._build()
+        return self._replicas
+
+    def _build(self) -> List[Replica]:
+        urls = app.config['DATABASE_REPLICA_URLS']
+        if isinstance(urls, str):
+            urls = [url.strip() for url in urls.split(',') if url.strip()]
+        replicas = []
+        for url in urls:
+            options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+            options.setdefault('pool_pre_ping', True)
+            if make_url(url).get_backend_name() == 'postgresql':
+                options.setdefault('connect_args', {'connect_timeout': app.config['DATABASE_REPLICA_CONNECT_TIMEOUT']})
+            replicas.append(Replica(url, options))
+        if replicas:
+            logger.info("Routing reads to %d replica(s): %s", len(replicas), ', '.join(r.name for r in replicas))
+        return replicas
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.replicas)
+
+    def refresh(self, force: bool = False):
+        interval = 0 if force else app.config['DATABASE_REPLICA_CHECK_INTERVAL']
+        for replica in self.replicas:
+            replica.refresh(interval)
+
+    def choose(self) -> Optional[Replica]:
+        self.refresh()
+        max_lag = app.config['DATABASE_REPLICA_MAX_LAG']
+        usable = [replica for replica in self.replicas if replica.usable(max_lag)]
+        if not usable:
+            return None
+        return usable[next(self._counter) % len(usable)]
+
+    def status(self) -> List[Dict[str, Any]]:
+        self.refresh(force=True)
+        return [replica.status() for replica in self.replicas]
+
+    def dispose(self):
+        """Drop pooled connections inherited across fork()"""
+        for replica in self._replicas or ():
+            replica.engine.dispose(close=False)
+
+
+replica_pool = ReplicaPool()
+
+
+# ---------------------------------------------------------------------------
+# Read-your-writes
+# ---------------------------------------------------------------------------
+
+class RecentWriters:
+    """JWT identity -> monotonic deadline until which that user reads from the primary"""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._deadlines: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def mark(self, identity: str, seconds: float):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._deadlines) >= self.max_entries:
+                self._deadlines = {key: deadline for key, deadline in self._deadlines.items() if deadline > now}
+            self._deadlines[identity] = now + seconds
+
+    def active(self, identity: str) -> bool:
+        deadline = self._deadlines.get(identity)
+        return deadline is not None and deadline > time.monotonic()
+
+
+recent_writers = RecentWriters()
+
+
+def _current_identity() -> Optional[str]:
+    try:
+        return get_jwt_identity()
+    except Exception:
+        # No token was verified for this request
+        return None
+
+
+def _recently_wrote() -> bool:
+    try:
+        if float(request.cookies.get(READ_YOUR_WRITES_COOKIE, 0)) > time.time():
+            return True
+    except ValueError:
+        pass
+    identity = _current_identity()
+    return identity is not None and recent_writers.active(identity)
+
+
+def _remember_write():
+    seconds = app.config['DATABASE_READ_YOUR_WRITES_SECONDS']
+    g.db_primary_until = time.time() + seconds
+    identity = _current_identity()
+    if identity is not None:
+        recent_writers.mark(identity, seconds)
+
+
+# ---------------------------------------------------------------------------
+# Session routing
+# ---------------------------------------------------------------------------
+
+def _is_write(clause) -> bool:
+    if clause is None:
+        return False
+    if getattr(clause, 'is_dml', False) or getattr(clause, '_for_update_arg', None) is not None:
+        return True
+    if isinstance(clause, TextClause):
+        words = clause.text.split(None, 1)
+        return bool(words) and words[0].upper() not in READ_STATEMENTS
+    return False
+
+
+def _decide(session) -> Tuple[str, str]:
+    if has_request_context():
+        if g.get('db_use_primary'):
+            return PRIMARY, 'forced'
+        if _recently_wrote():
+            return PRIMARY, 'read_your_writes'
+        if request.method in READ_METHODS:
+            return REPLICA, 'read_request'
+    if session.info.get('replica_reads'):
+        return REPLICA, 'replica_reads'
+    return PRIMARY, 'write_request' if has_request_context() else 'no_request'
+
+
+def _count_route(route: str, reason: str, replica: Optional[Replica] = None):
+    DB_ROUTES.inc(route, reason)
+    if replica is not None:
+        DB_REPLICA_SESSIONS.inc(replica.name)
+
+
+def _set_route(session, route: str, reason: str, replica: Optional[Replica] = None):
+    session.info['db_route'] = (route, reason, replica)
+    _count_route(route, reason, replica)
+    if has_request_context():
+        g.db_route = route
+
+
+class RoutingSession(Session):
+    """db.session class sending a session's reads to a replica when its request allows it"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        # Explicit binds and SQLALCHEMY_BINDS engines are never rerouted
+        if bind is not None or engine is not self._db.engine or not replica_pool.enabled:
+            return engine
+
+        decision = self.info.get('db_route')
+        if self._flushing or _is_write(clause):
+            self.info['uncommitted_write'] = True
+            if decision is None or decision[0] != PRIMARY:
+                _set_route(self, PRIMARY, 'session_wrote')
+            self.info['wrote'] = True
+            return engine
+        if self.info.get('wrote'):
+            return engine
+
+        if decision is None:
+            route, reason = _decide(self)
+            replica = replica_pool.choose() if route == REPLICA else None
+            if route == REPLICA and replica is None:
+                route, reason = PRIMARY, 'replica_unavailable'
+            _set_route(self, route, reason, replica)
+            decision = self.info['db_route']
+        replica = decision[2]
+        return replica.engine if replica is not None else engine
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _track_committed_write(session):
+    if session.info.pop('uncommitted_write', False) and has_request_context():
+        _remember_write()
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _forget_rolled_back_write(session):
+    session.info.pop('uncommitted_write', None)
+
+
+def use_primary(session, reason: str = 'forced'):
+    """Send the rest of this session (and request) to the primary, e.g. before building a shared cache entry"""
+    if has_request_context():
+        g.db_use_primary = True
+    decision = session.info.get('db_route')
+    if replica_pool.enabled and (decision is None or decision[0] != PRIMARY):
+        _set_route(session, PRIMARY, reason)
+
+
+@contextmanager
+def replica_reads(session):
+    """Read from a replica inside this block even outside a GET request, unless the session has written"""
+    previous = session.info.pop('db_route', None)
+    session.info['replica_reads'] = True
+    try:
+        yield
+    finally:
+        session.info.pop('replica_reads', None)
+        if not session.info.get('wrote'):
+            session.info.pop('db_route', None)
+            if previous is not None:
+                session.info['db_route'] = previous
+
+
+def read_engine(db):
+    """Engine for standalone read-only work (schema reflection, exports): a usable replica or the primary"""
+    replica = replica_pool.choose() if replica_pool.enabled else None
+    if replica is not None:
+        _count_route(REPLICA, 'read_engine', replica)
+        return replica.engine
+    if replica_pool.enabled:
+        _count_route(PRIMARY, 'replica_unavailable')
+    return db.engine
+
+
+def replica_status() -> List[Dict[str, Any]]:
+    return replica_pool.status()
+
+
+def _lag_by_replica() -> Dict[Tuple[str], float]:
+    replica_pool.refresh()
+    return {(replica.name,): replica.lag if replica.lag is not None else -1 for replica in replica_pool.replicas}
+
+
+def _usable_by_replica() -> Dict[Tuple[str], int]:
+    max_lag = app.config['DATABASE_REPLICA_MAX_LAG']
+    return {(replica.name,): int(replica.usable(max_lag)) for replica in replica_pool.replicas}
+
+
+register(GaugeMetric('db_replica_lag_seconds', 'Replication lag at the last check, -1 when unreachable',
+                     _lag_by_replica, ('replica',)))
+register(GaugeMetric('db_replica_usable', 'Whether reads are routed to the replica (reachable and within max lag)',
+                     _usable_by_replica, ('replica',)))
+
+
+def init_replicas(app):
+    """Echo the route in X-DB-Route and carry the read-your-writes window to other workers in a cookie"""
+    @app.after_request
+    def _annotate_db_route(response):
+        route = g.get('db_route')
+        if route is not None:
+            response.headers['X-DB-Route'] = route
+        primary_until = g.get('db_primary_until')
+        if primary_until is not None:
+            response.set_cookie(READ_YOUR_WRITES_COOKIE, f"{primary_until:.3f}",
+                                max_age=int(app.config['DATABASE_READ_YOUR_WRITES_SECONDS']) + 1,
+                                httponly=True, samesite='Lax')
+        return response
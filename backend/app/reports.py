@@ -0,0 +1,356 @@
+"""
+Spend reporting backed by the expense_rollups table
+Rollups are refreshed per (company, month) bucket on every flush that touches
+an expense (or moves an employee between departments or companies), and can be
+fully rebuilt on a schedule with `expense_cli.py refresh-rollups`. On Postgres each
+bucket refresh holds a transaction-level advisory lock, so concurrent writers
+recompute a bucket one after the other instead of both inserting it.
+"""
+
+import os
+import uuid
+import logging
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, List, Any, Iterable, Optional, Set, Tuple
+
+from sqlalchemy import event, func, select, delete, insert, literal, and_, inspect, text
+
+from . import app, db
+from .models import Expense, Employee, Department, ExpenseRollup
+from .replicas import replica_reads
+
+logger = logging.getLogger(__name__)
+
+app.config.setdefault('REPORTS_ROLLUP_ON_WRITE', os.getenv('REPORTS_ROLLUP_ON_WRITE', 'True').lower() == 'true')
+
+GROUP_BY_COLUMNS = {
+    'category': ExpenseRollup.category,
+    'department': ExpenseRollup.department_id,
+    'status': ExpenseRollup.status,
+}
+TIME_BUCKETS = ('month', 'quarter', 'year')
+
+# Spend is reported in the company currency when a conversion exists
+SPEND_AMOUNT = func.coalesce(Expense.converted_amount, Expense.amount)
+
+
+def month_start(value) -> date:
+    """First day of the month containing value (accepts date, datetime or ISO string)"""
+    if isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    elif isinstance(value, datetime):
+        value = value.date()
+    return value.replace(day=1)
+
+
+def next_month(value: date) -> date:
+    return date(value.year + 1, 1, 1) if value.month == 12 else date(value.year, value.month + 1, 1)
+
+
+def _month_expression(dialect_name: str):
+    """SQL expression truncating Expense.date to the first of its month"""
+    if dialect_name == 'postgresql':
+        return func.date_trunc('month', Expense.date).cast(db.Date)
+    return func.date(Expense.date, 'start of month')
+
+
+def _rollup_select(month_expr, *conditions):
+    return (
+        select(
+            Employee.company_id,
+            Employee.department_id,
+            Expense.category,
+            Expense.status,
+            month_expr,
+            func.count(Expense.id),
+            func.coalesce(func.sum(SPEND_AMOUNT), 0),
+            literal(datetime.utcnow(), db.DateTime),
+        )
+        .select_from(Expense)
+        .join(Employee, Employee.id == Expense.employee_id)
+        .where(*conditions)
+        .group_by(Employee.company_id, Employee.department_id, Expense.category, Expense.status, month_expr)
+    )
+
+
+ROLLUP_INSERT_COLUMNS = (
+    'company_id', 'department_id', 'category', 'status', 'month',
+    'expense_count', 'total_amount', 'updated_at'
+)
+
+
+ROLLUP_LOCK = 'expense_rollups'
+
+
+def _lock_rollups(connection, bucket: Optional[Tuple[Any, date]] = None):
+    """
+    Advisory lock held until the transaction ends (Postgres only): shared on the whole
+    table plus exclusive on one bucket for refreshes, exclusive on the table for rebuilds
+    """
+    if connection.dialect.name != 'postgresql':
+        return
+    if bucket is None:
+        connection.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {'key': ROLLUP_LOCK})
+        return
+    company_id, month = bucket
+    connection.execute(text("SELECT pg_advisory_xact_lock_shared(hashtext(:key))"), {'key': ROLLUP_LOCK})
+    connection.execute(
+        text("SELECT pg_advisory_xact_lock(hashtext(:key))"),
+        {'key': f"{ROLLUP_LOCK}:{company_id}:{month.isoformat()}"}
+    )
+
+
+def refresh_buckets(connection, buckets: Iterable[Tuple[Any, date]]):
+    """
+    Recompute the rollup rows for the given (company_id, month) buckets
+
+    Buckets are locked in a fixed order so two transactions touching the same
+    buckets cannot deadlock; once the lock is held, the delete and insert read
+    everything committed by the previous holder.
+    """
+    for company_id, month in sorted(set(buckets), key=lambda bucket: (str(bucket[0]), bucket[1])):
+        _lock_rollups(connection, (company_id, month))
+        upper = next_month(month)
+        connection.execute(
+            delete(ExpenseRollup).where(
+                ExpenseRollup.company_id == company_id,
+                ExpenseRollup.month == month
+            )
+        )
+        connection.execute(
+            insert(ExpenseRollup).from_select(
+                ROLLUP_INSERT_COLUMNS,
+                _rollup_select(
+                    literal(month, db.Date),
+                    Employee.company_id == company_id,
+                    Expense.date >= month,
+                    Expense.date < upper,
+                )
+            )
+        )
+
+
+def refresh_all_rollups(company_id=None, since: Optional[date] = None) -> Dict[str, Any]:
+    """
+    Rebuild rollups from scratch, for one company or for every company
+
+    Months before `since` are left alone; pass it when older expenses have been
+    archived out of the table (see app.archive.archived_before).
+    """
+    started = datetime.utcnow()
+    connection = db.session.connection()
+    month_expr = _month_expression(connection.dialect.name)
+
+    delete_stmt = delete(ExpenseRollup)
+    conditions = []
+    if company_id is not None:
+        delete_stmt = delete_stmt.where(ExpenseRollup.company_id == company_id)
+        conditions.append(Employee.company_id == company_id)
+    if since is not None:
+        delete_stmt = delete_stmt.where(ExpenseRollup.month >= since)
+        conditions.append(Expense.date >= since)
+
+    try:
+        _lock_rollups(connection)
+        connection.execute(delete_stmt)
+        connection.execute(
+            insert(ExpenseRollup).from_select(ROLLUP_INSERT_COLUMNS, _rollup_select(month_expr, *conditions))
+        )
+        row_count = db.session.execute(select(func.count(ExpenseRollup.id))).scalar()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return {
+        "rollup_rows": row_count,
+        "company_id": str(company_id) if company_id else None,
+        "elapsed_seconds": round((datetime.utcnow() - started).total_seconds(), 3),
+    }
+
+
+def buckets_for_employees(connection, employee_months: Set[Tuple[Any, date]]) -> Set[Tuple[Any, date]]:
+    """Map (employee_id, month) pairs to (company_id, month) buckets with one lookup"""
+    employee_ids = {employee_id for employee_id, _ in employee_months}
+    if not employee_ids:
+        return set()
+    companies = dict(connection.execute(
+        select(Employee.id, Employee.company_id).where(Employee.id.in_(employee_ids))
+    ).all())
+    return {
+        (companies[employee_id], month)
+        for employee_id, month in employee_months
+        if employee_id in companies
+    }
+
+
+def buckets_for_moved_employees(connection, companies: Dict[Any, Set[Any]]) -> Set[Tuple[Any, date]]:
+    """
+    Buckets holding expenses of employees whose department or company changed
+
+    Args:
+        companies: employee_id -> every company the employee belonged to before or after the change
+    """
+    if not companies:
+        return set()
+    month_expr = _month_expression(connection.dialect.name)
+    months = connection.execute(
+        select(Expense.employee_id, month_expr).where(Expense.employee_id.in_(companies.keys())).distinct()
+    ).all()
+    return {
+        (company_id, month_start(month))
+        for employee_id, month in months
+        for company_id in companies[employee_id]
+    }
+
+
+@event.listens_for(db.session, 'after_flush')
+def _refresh_rollups_after_flush(session, flush_context):
+    """Keep rollups in step with expense and employee writes inside the same transaction"""
+    if not app.config.get('REPORTS_ROLLUP_ON_WRITE'):
+        return
+
+    # Rollups are keyed by the employee's current department and company
+    moved = {}
+    for obj in session.dirty:
+        if not isinstance(obj, Employee):
+            continue
+        state = inspect(obj)
+        if state.attrs.department_id.history.has_changes() or state.attrs.company_id.history.has_changes():
+            moved[_as_uuid(obj.id)] = {
+                _as_uuid(company_id) for company_id in state.attrs.company_id.history.sum() or [obj.company_id]
+                if company_id is not None
+            }
+
+    touched = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if not isinstance(obj, Expense):
+            continue
+        state = inspect(obj)
+        employee_history = state.attrs.employee_id.history
+        date_history = state.attrs.date.history
+        employee_ids = set(employee_history.sum()) or {obj.employee_id}
+        dates = set(date_history.sum()) or {obj.date}
+        for employee_id in employee_ids:
+            for value in dates:
+                if employee_id is not None and value is not None:
+                    touched.add((_as_uuid(employee_id), month_start(value)))
+
+    if touched or moved:
+        connection = session.connection()
+        refresh_buckets(
+            connection,
+            buckets_for_employees(connection, touched) | buckets_for_moved_employees(connection, moved)
+        )
+
+
+def _as_uuid(value):
+    return value if isinstance(value, uuid.UUID) else uuid.UUID(str(value))
+
+
+def get_spend_report(
+    company_id,
+    group_by: List[str],
+    bucket: Optional[str] = 'month',
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    statuses: Optional[List[str]] = None,
+    categories: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Answer a group-by / time-bucket spend query from the rollup table
+
+    Args:
+        company_id: Company whose spend is reported
+        group_by: Any of 'category', 'department', 'status'
+        bucket: 'month', 'quarter', 'year' or None for no time grouping
+        date_from / date_to: Inclusive month range
+        statuses / categories: Optional filters
+
+    Returns:
+        dict: rows with expense_count and total_amount per group
+    """
+    unknown = [g for g in group_by if g not in GROUP_BY_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unsupported group_by: {', '.join(unknown)}")
+    if bucket is not None and bucket not in TIME_BUCKETS:
+        raise ValueError(f"Unsupported bucket '{bucket}', expected one of {', '.join(TIME_BUCKETS)}")
+
+    columns = [GROUP_BY_COLUMNS[g].label(g) for g in group_by]
+    if bucket:
+        columns.append(ExpenseRollup.month.label('month'))
+
+    conditions = [ExpenseRollup.company_id == company_id]
+    if date_from:
+        conditions.append(ExpenseRollup.month >= month_start(date_from))
+    if date_to:
+        conditions.append(ExpenseRollup.month <= month_start(date_to))
+    if statuses:
+        conditions.append(ExpenseRollup.status.in_(statuses))
+    if categories:
+        conditions.append(ExpenseRollup.category.in_(categories))
+
+    query = (
+        select(
+            *columns,
+            func.sum(ExpenseRollup.expense_count).label('expense_count'),
+            func.sum(ExpenseRollup.total_amount).label('total_amount'),
+        )
+        .where(and_(*conditions))
+        .group_by(*columns)
+        .order_by(*columns)
+    )
+    # Report reads tolerate replica lag, wherever they are called from
+    with replica_reads(db.session):
+        results = db.session.execute(query).all()
+
+        department_names = {}
+        if 'department' in group_by:
+            department_ids = {row.department for row in results if row.department is not None}
+            if department_ids:
+                department_names = dict(db.session.execute(
+                    select(Department.id, Department.name).where(Department.id.in_(department_ids))
+                ).all())
+
+    # Fold months into coarser buckets; rollup rows per company are few, so this is cheap
+    groups = OrderedDict()
+    for row in results:
+        key = tuple(getattr(row, g) for g in group_by)
+        period = _format_period(row.month, bucket) if bucket else None
+        entry = groups.setdefault((key, period), [0, Decimal(0)])
+        entry[0] += int(row.expense_count or 0)
+        entry[1] += Decimal(row.total_amount or 0)
+
+    rows = []
+    for (key, period), (count, total) in groups.items():
+        item = {}
+        for name, value in zip(group_by, key):
+            if name == 'department':
+                item['department_id'] = str(value) if value else None
+                item['department_name'] = department_names.get(value)
+            else:
+                item[name] = value
+        if bucket:
+            item[bucket] = period
+        item['expense_count'] = count
+        item['total_amount'] = str(total)
+        rows.append(item)
+
+    return {
+        "company_id": str(company_id),
+        "group_by": group_by,
+        "bucket": bucket,
+        "rows": rows,
+        "count": len(rows),
+        "source": ExpenseRollup.__tablename__,
+    }
+
+
+def _format_period(month: date, bucket: str) -> str:
+    if bucket == 'year':
+        return f"{month.year}"
+    if bucket == 'quarter':
+        return f"{month.year}-Q{(month.month - 1) // 3 + 1}"
+    return f"{month.year}-{month.month:02d}"
@@ -0,0 +1,232 @@
+"""
+Response cache with ETags and conditional GET
+Read endpoints decorated with @cached_response keep their rendered JSON in a
+process-local, byte-bounded LRU keyed by route, tenant and query string. Each entry
+remembers the change versions of the tables it was built from; committed writes to
+those tables bump the versions (after_commit), so a stale entry is never served.
+Responses carry a strong ETag and answer If-None-Match with 304.
+"""
+
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict, defaultdict
+from functools import wraps
+from typing import Dict, Any, Optional, Sequence, Tuple
+
+from flask import request, Response, g
+from sqlalchemy import event
+
+from . import app, db
+from .metrics import CounterMetric, GaugeMetric, register
+from .replicas import use_primary
+
+logger = logging.getLogger(__name__)
+
+app.config.setdefault('RESPONSE_CACHE_ENABLED', os.getenv('RESPONSE_CACHE_ENABLED', 'True').lower() == 'true')
+app.config.setdefault('RESPONSE_CACHE_MAX_BYTES', int(os.getenv('RESPONSE_CACHE_MAX_BYTES', 64 * 1024 * 1024)))
+app.config.setdefault('RESPONSE_CACHE_MAX_ENTRIES', int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 10000)))
+# Versions are per process: the TTL bounds how long another worker's writes can go unseen
+app.config.setdefault('RESPONSE_CACHE_TTL', int(os.getenv('RESPONSE_CACHE_TTL', 30)))
+
+# Pseudo-table bumped on DDL and schema refreshes, for endpoints that reflect the database
+SCHEMA = '__schema__'
+
+CACHE_REQUESTS = register(CounterMetric(
+    'response_cache_requests_total', 'Cached endpoint lookups by outcome (hit, miss, not_modified)',
+    ('endpoint', 'result')
+))
+CACHE_EVICTIONS = register(CounterMetric('response_cache_evictions_total', 'Entries evicted to stay within bounds'))
+
+
+class TableVersions:
+    """Monotonic change counter per table name"""
+
+    def __init__(self):
+        self._versions: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def snapshot(self, tables: Sequence[str]) -> Tuple[int, ...]:
+        return tuple(self._versions[table] for table in tables)
+
+    def bump(self, tables):
+        with self._lock:
+            for table in tables:
+                self._versions[table] += 1
+
+
+class ResponseCache:
+    """LRU of rendered responses bounded by entry count and total body bytes"""
+
+    def __init__(self):
+        self._entries: OrderedDict = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.versions = TableVersions()
+
+    def get(self, key, tables: Sequence[str]) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if (
+                entry['versions'] != self.versions.snapshot(tables)
+                or time.monotonic() - entry['stored_at'] >= app.config['RESPONSE_CACHE_TTL']
+            ):
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry: Dict[str, Any]):
+        size = len(entry['body'])
+        if size > app.config['RESPONSE_CACHE_MAX_BYTES']:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += size
+            while (
+                self._bytes > app.config['RESPONSE_CACHE_MAX_BYTES']
+                or len(self._entries) > app.config['RESPONSE_CACHE_MAX_ENTRIES']
+            ):
+                self._remove(next(iter(self._entries)))
+                CACHE_EVICTIONS.inc()
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= len(entry['body'])
+
+    def invalidate(self, *tables):
+        """Bump table versions; with no tables, drop everything"""
+        if tables:
+            self.versions.bump(tables)
+            return
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes}
+
+
+response_cache = ResponseCache()
+
+register(GaugeMetric('response_cache_entries', 'Responses held in the cache', lambda: response_cache.stats()['entries'],
+                     aggregate='sum'))
+register(GaugeMetric('response_cache_bytes', 'Body bytes held in the cache', lambda: response_cache.stats()['bytes'],
+                     aggregate='sum'))
+
+
+def _cache_key() -> tuple:
+    return (
+        request.url_rule.rule,
+        str(g.get('tenant_company_id')),
+        tuple(sorted(request.args.items(multi=True))),
+    )
+
+
+def _respond(entry: Dict[str, Any]) -> Response:
+    response = Response(entry['body'], status=entry['status'], mimetype=entry['mimetype'])
+    _set_validators(response, entry['etag'])
+    return response.make_conditional(request)
+
+
+def _set_validators(response: Response, etag: str):
+    response.set_etag(etag)
+    # Clients may keep the body but must revalidate; Authorization decides what they see
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Authorization')
+
+
+def cached_response(*tables: str):
+    """
+    Decorator caching a GET view's JSON response until one of `tables` changes
+
+    Goes below @tenant_required so the tenant is part of the key.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if not app.config['RESPONSE_CACHE_ENABLED'] or request.method != 'GET':
+                return f(*args, **kwargs)
+            endpoint = request.url_rule.rule
+            key = _cache_key()
+            entry = response_cache.get(key, tables)
+            if entry is not None:
+                response = _respond(entry)
+                CACHE_REQUESTS.inc(endpoint, 'not_modified' if response.status_code == 304 else 'hit')
+                return response
+
+            # Snapshot before rendering so a write committed meanwhile invalidates the result
+            versions = response_cache.versions.snapshot(tables)
+            # Entries are shared by the tenant; built from a lagging replica they would outlive the versions
+            use_primary(db.session, 'response_cache')
+            response = app.make_response(f(*args, **kwargs))
+            CACHE_REQUESTS.inc(endpoint, 'miss')
+            if response.status_code != 200 or response.is_streamed:
+                return response
+            body = response.get_data()
+            entry = {
+                "body": body,
+                "status": response.status_code,
+                "mimetype": response.mimetype,
+                # Derived from the bytes, so every worker agrees on it for the same content
+                "etag": hashlib.sha1(body).hexdigest(),
+                "versions": versions,
+                "stored_at": time.monotonic(),
+            }
+            response_cache.put(key, entry)
+            _set_validators(response, entry['etag'])
+            return response.make_conditional(request)
+
+        return decorated_function
+
+    return decorator
+
+
+# ---------------------------------------------------------------------------
+# Invalidation
+# ---------------------------------------------------------------------------
+
+def _changed_tables(session):
+    return session.info.setdefault('response_cache_tables', set())
+
+
+@event.listens_for(db.session, 'after_flush')
+def _collect_flushed_tables(session, flush_context):
+    changed = _changed_tables(session)
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, '__table__', None)
+        if table is not None:
+            changed.add(table.name)
+
+
+@event.listens_for(db.session, 'do_orm_execute')
+def _collect_bulk_tables(execute_state):
+    """insert()/update()/delete() executed through the session bypass the flush"""
+    if execute_state.is_insert or execute_state.is_update or execute_state.is_delete:
+        table = getattr(execute_state.statement, 'table', None)
+        if table is not None:
+            _changed_tables(execute_state.session).add(table.name)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _bump_versions_after_commit(session):
+    changed = session.info.pop('response_cache_tables', None)
+    if changed:
+        response_cache.versions.bump(changed)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_tables_after_rollback(session):
+    session.info.pop('response_cache_tables', None)
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _schema_created(target, connection, **kw):
+    response_cache.invalidate(SCHEMA)
@@ -5,6 +5,12 @@ from .users import users_bp
 from .expenses import expenses_bp
 from .schema import schema_bp
 from .auth import auth_bp
+from .reports import reports_bp
+from .receipts import receipts_bp
+from .org import org_bp
+from .audit import audit_bp
+from .approvals import approvals_bp
+from .archive import archive_bp
 
 # List of all blueprints to register
 __all__ = [
@@ -12,7 +18,13 @@ __all__ = [
     'users_bp', 
     'expenses_bp',
     'schema_bp',
-    'auth_bp'
+    'auth_bp',
+    'reports_bp',
+    'receipts_bp',
+    'org_bp',
+    'audit_bp',
+    'approvals_bp',
+    'archive_bp'
 ]
 
 def register_blueprints(app):
@@ -22,3 +34,9 @@ def register_blueprints(app):
     app.register_blueprint(expenses_bp)
     app.register_blueprint(schema_bp)
     app.register_blueprint(auth_bp)
+    app.register_blueprint(reports_bp)
+    app.register_blueprint(receipts_bp)
+    app.register_blueprint(org_bp)
+    app.register_blueprint(audit_bp)
+    app.register_blueprint(approvals_bp)
+    app.register_blueprint(archive_bp)
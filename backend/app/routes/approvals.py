@@ -0,0 +1,34 @@
+import uuid
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import get_jwt_identity
+from ..models import Approval, Expense
+from ..serializers import serialize_many, requested_fields, load_fields
+from ..tenancy import tenant_required
+from ..pagination import paginate
+
+# Create a blueprint for approval routes
+approvals_bp = Blueprint('approvals', __name__, url_prefix='/api/approvals')
+
+@approvals_bp.route('/inbox', methods=['GET'])
+@tenant_required
+def get_approval_inbox():
+    """Approvals waiting on the caller, oldest first, with their expenses; ?fields= applies to both"""
+    try:
+        fields = requested_fields(Approval, Expense)
+        query = (
+            Approval.query
+            .filter(Approval.approver_id == uuid.UUID(get_jwt_identity()), Approval.status == request.args.get('status', 'pending'))
+            .order_by(Approval.created_at, Approval.id)
+        )
+        approvals, pagination = paginate(query)
+        expense_ids = {approval.expense_id for approval in approvals}
+        expenses = load_fields(Expense.query, Expense, fields).filter(Expense.id.in_(expense_ids)).all() if expense_ids else []
+        return jsonify({
+            "approvals": serialize_many(Approval, approvals, fields),
+            "expenses": serialize_many(Expense, expenses, fields),
+            "pagination": pagination
+        })
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
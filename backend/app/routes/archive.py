@@ -0,0 +1,104 @@
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+from flask import Blueprint, g, request, jsonify
+from ..models import Expense
+from ..archive import ArchiveReader, archive_status
+from ..serializers import requested_fields, EXCLUDED_COLUMNS
+from ..tenancy import tenant_required
+from ..permissions import require_permission
+from ..pagination import page_args
+
+# Create a blueprint for archived (cold storage) expense routes; read-only
+archive_bp = Blueprint('archive', __name__, url_prefix='/api/archive')
+
+archive_reader = ArchiveReader()
+
+FILTER_ARGS = ('status', 'category', 'currency', 'employee_id')
+CENTS = Decimal('0.01')
+
+
+def _decimal_str(value):
+    # Archived NUMERIC has a fixed scale; drop the zero padding beyond cents
+    quantized = value.quantize(CENTS)
+    return str(quantized if quantized == value else value.normalize())
+
+
+def _serialize(row):
+    """Same shapes as the live serializers: exact decimal strings, ISO dates, no internal columns"""
+    result = {}
+    for name, value in row.items():
+        if name in EXCLUDED_COLUMNS:
+            continue
+        if isinstance(value, Decimal):
+            value = _decimal_str(value)
+        elif isinstance(value, (date, datetime)):
+            value = value.isoformat()
+        result[name] = value
+    return result
+
+
+@archive_bp.route('/expenses', methods=['GET'])
+@tenant_required
+@require_permission('report.view')
+def get_archived_expenses():
+    """
+    Archived expenses of the caller's company, newest first; filter with from, to, status, category,
+    currency, employee_id. ?before_date=&before_id= (pagination.next) continue without an offset.
+    """
+    try:
+        fields = requested_fields(Expense)
+        page, per_page = page_args()
+        date_from, date_to = request.args.get('from'), request.args.get('to')
+        before_date, before_id = request.args.get('before_date'), request.args.get('before_id')
+        if bool(before_date) != bool(before_id):
+            raise ValueError("before_date and before_id must be given together")
+        before = (date.fromisoformat(before_date), uuid.UUID(before_id)) if before_date else None
+        expenses = archive_reader.expenses(
+            g.tenant_company_id,
+            date_from=date.fromisoformat(date_from) if date_from else None,
+            date_to=date.fromisoformat(date_to) if date_to else None,
+            filters={arg: request.args[arg] for arg in FILTER_ARGS if request.args.get(arg)},
+            columns=sorted(set(fields) | {'date', 'id'}) if fields else None,
+            limit=per_page,
+            offset=0 if before else (page - 1) * per_page,
+            before=before,
+        )
+        pagination = {"page": page, "per_page": per_page, "next": None}
+        if len(expenses) == per_page:
+            last = expenses[-1]
+            pagination["next"] = {"before_date": last['date'].isoformat(), "before_id": str(last['id'])}
+        results = [_serialize(expense) for expense in expenses]
+        if fields:
+            results = [{name: result[name] for name in fields if name in result} for result in results]
+        return jsonify({"expenses": results, "pagination": pagination})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@archive_bp.route('/expenses/<expense_id>', methods=['GET'])
+@tenant_required
+@require_permission('report.view')
+def get_archived_expense(expense_id):
+    """One archived expense with its approvals and flags"""
+    try:
+        expense = archive_reader.expense(g.tenant_company_id, expense_id)
+        if expense is None:
+            return jsonify({"error": "Archived expense not found"}), 404
+        for table in ('approvals', 'expense_flags'):
+            expense[table] = [_serialize(row) for row in expense[table]]
+        return jsonify(_serialize(expense))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@archive_bp.route('/status', methods=['GET'])
+@require_permission('admin.access')
+def get_archive_status():
+    """Progress of the current or last archival run"""
+    try:
+        return jsonify(archive_status())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
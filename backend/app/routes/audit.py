@@ -0,0 +1,49 @@
+import json
+from datetime import datetime
+from flask import Blueprint, request, jsonify
+from ..models import AuditEvent
+from ..audit import audit_log
+from ..serializers import serialize_many, requested_fields, load_fields
+from ..tenancy import tenant_required
+from ..permissions import require_permission
+from ..pagination import paginate
+
+# Create a blueprint for audit routes
+audit_bp = Blueprint('audit', __name__, url_prefix='/api/audit')
+
+@audit_bp.route('/events', methods=['GET'])
+@tenant_required
+@require_permission('audit.view')
+def get_audit_events():
+    """Audit trail for the caller's company, newest first; filter with entity_type, entity_id, actor_id, action, from, to"""
+    try:
+        fields = requested_fields(AuditEvent)
+        query = load_fields(AuditEvent.query, AuditEvent, fields)
+        for arg in ('entity_type', 'entity_id', 'actor_id', 'action'):
+            value = request.args.get(arg)
+            if value:
+                query = query.filter(getattr(AuditEvent, arg) == value)
+        if request.args.get('from'):
+            query = query.filter(AuditEvent.occurred_at >= datetime.fromisoformat(request.args['from']))
+        if request.args.get('to'):
+            query = query.filter(AuditEvent.occurred_at < datetime.fromisoformat(request.args['to']))
+        events, pagination = paginate(query.order_by(AuditEvent.occurred_at.desc(), AuditEvent.id))
+
+        results = serialize_many(AuditEvent, events, fields)
+        for result in results:
+            if 'changes' in result:
+                result['changes'] = json.loads(result['changes']) if result['changes'] else None
+        return jsonify({"events": results, "pagination": pagination})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@audit_bp.route('/status', methods=['GET'])
+@require_permission('admin.access')
+def get_audit_status():
+    """Writer health: buffered events, lag of the oldest one, failures"""
+    try:
+        return jsonify(audit_log.stats())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -12,9 +12,11 @@ import re
 
 from .. import db, bcrypt
 from ..models import User, Company, UserRoleEnum
+from ..tenancy import tenant_claims
+from ..permissions import require_permission, permission_claims, permissions_for, names_for
+from ..audit import record_event
+from ..outbox import enqueue
 from ..email_service import (
-    send_welcome_email, 
-    send_password_reset_email, 
     send_organization_welcome_email,
     generate_temp_password
 )
@@ -23,31 +25,8 @@ from ..email_service import (
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
 def require_admin_role(f):
-    """Decorator to require admin role"""
-    from functools import wraps
-    
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        try:
-            user_id = get_jwt_identity()
-            print(f"DEBUG: require_admin_role - JWT Identity: {user_id}")
-            user = User.query.filter_by(id=user_id).first()
-            print(f"DEBUG: require_admin_role - User found: {user}")
-            
-            if not user:
-                print("DEBUG: require_admin_role - User not found")
-                return jsonify({"error": "User not found"}), 404
-            
-            print(f"DEBUG: require_admin_role - User role: {user.role}")
-            if user.role != UserRoleEnum.admin:
-                print("DEBUG: require_admin_role - User is not admin")
-                return jsonify({"error": "Admin access required"}), 403
-            
-            return f(*args, **kwargs)
-        except Exception as e:
-            return jsonify({"error": str(e)}), 500
-    
-    return decorated_function
+    """Decorator to require admin access, resolved from the cached permission bitset"""
+    return require_permission('admin.access')(f)
 
 @auth_bp.route('/test', methods=['GET'])
 def test_endpoint():
@@ -199,21 +178,18 @@ def register():
         # Update company with owner_id
         company.owner_id = user.id
         
-        db.session.commit()
+        # Welcome email is delivered by the outbox dispatcher once this commits
+        enqueue(
+            'email.organization_welcome',
+            admin_email=user.email,
+            admin_name=user.name,
+            organization_name=company.name
+        )
         
-        # Send welcome email to organization admin
-        try:
-            send_organization_welcome_email(
-                admin_email=user.email,
-                admin_name=user.name,
-                organization_name=company.name
-            )
-        except Exception as email_error:
-            # Log email error but don't fail the registration
-            print(f"Failed to send welcome email: {email_error}")
+        db.session.commit()
         
         # Generate access token
-        access_token = create_access_token(identity=str(user.id))
+        access_token = create_access_token(identity=str(user.id), additional_claims={**tenant_claims(user), **permission_claims(user)})
         refresh_token = create_refresh_token(identity=str(user.id))
         
         return jsonify({
@@ -271,7 +247,7 @@ def login():
         db.session.commit()
         
         # Generate tokens
-        access_token = create_access_token(identity=str(user.id))
+        access_token = create_access_token(identity=str(user.id), additional_claims={**tenant_claims(user), **permission_claims(user)})
         refresh_token = create_refresh_token(identity=str(user.id))
         
         return jsonify({
@@ -324,6 +300,18 @@ def get_current_user():
         print(f"DEBUG: get_current_user - Error: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@auth_bp.route('/permissions', methods=['GET'])
+@jwt_required()
+def get_current_permissions():
+    """Effective permissions of the current user"""
+    try:
+        bits = permissions_for(get_jwt_identity())
+        if bits is None:
+            return jsonify({"error": "User not found"}), 404
+        return jsonify({"permissions": names_for(bits), "bitset": format(bits, 'x')}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @auth_bp.route('/refresh', methods=['POST'])
 @jwt_required(refresh=True)
 def refresh():
@@ -336,7 +324,7 @@ def refresh():
             return jsonify({"error": "User not found or inactive"}), 404
         
         # Generate new access token
-        access_token = create_access_token(identity=str(user.id))
+        access_token = create_access_token(identity=str(user.id), additional_claims={**tenant_claims(user), **permission_claims(user)})
         
         return jsonify({
             "access_token": access_token
@@ -470,19 +458,16 @@ def create_employee():
         )
         
         db.session.add(employee)
-        db.session.commit()
         
-        # Send welcome email to new employee
-        try:
-            send_welcome_email(
-                employee_email=employee.email,
-                employee_name=employee.name,
-                organization_name=admin_user.company.name,
-                temp_password=temp_password
-            )
-        except Exception as email_error:
-            # Log email error but don't fail the employee creation
-            print(f"Failed to send welcome email: {email_error}")
+        # Welcome email is delivered by the outbox dispatcher once this commits
+        enqueue(
+            'email.welcome_employee',
+            employee_email=employee.email,
+            employee_name=employee.name,
+            organization_name=admin_user.company.name,
+            temp_password=temp_password
+        )
+        db.session.commit()
         
         return jsonify({
             "message": "Employee created successfully",
@@ -555,6 +540,8 @@ def toggle_employee_status(employee_id):
         
         # Toggle status
         employee.is_active = not employee.is_active
+        record_event('admin.toggle_employee_status', 'users', employee.id,
+                     {"is_active": employee.is_active}, company_id=admin_user.company_id)
         db.session.commit()
         
         return jsonify({
@@ -598,20 +585,18 @@ def reset_employee_password(employee_id):
         
         # Update password
         employee.password_hash = new_hashed_password
+        record_event('admin.reset_employee_password', 'users', employee.id, company_id=admin_user.company_id)
+        
+        # Password reset email is delivered by the outbox dispatcher once this commits
+        enqueue(
+            'email.password_reset',
+            employee_email=employee.email,
+            employee_name=employee.name,
+            organization_name=admin_user.company.name,
+            new_password=new_password
+        )
         db.session.commit()
         
-        # Send password reset email to employee
-        try:
-            send_password_reset_email(
-                employee_email=employee.email,
-                employee_name=employee.name,
-                organization_name=admin_user.company.name,
-                new_password=new_password
-            )
-        except Exception as email_error:
-            # Log email error but don't fail the password reset
-            print(f"Failed to send password reset email: {email_error}")
-        
         return jsonify({
             "message": "Employee password reset successfully. New password has been sent to their email.",
             "employee": {
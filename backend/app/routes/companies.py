@@ -1,27 +1,29 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, g, request, jsonify
+from flask_jwt_extended import get_jwt_identity
 from .. import db
 from ..models import Company
+from ..serializers import serialize, serialize_many, requested_fields, load_fields
+from ..tenancy import tenant_required
+from ..pagination import paginate
+from ..permissions import require_permission, has_permission
+from ..response_cache import cached_response
+from ..bulk import bulk_create_companies, BulkRequestError
 
 # Create a blueprint for company routes
 companies_bp = Blueprint('companies', __name__, url_prefix='/api/companies')
 
 @companies_bp.route('', methods=['GET'])
+@tenant_required
+@cached_response('companies')
 def get_companies():
-    """Get all companies from the database"""
+    """Get the caller's company, paginated with ?page=&per_page=; ?fields= limits the columns"""
     try:
-        companies = Company.query.all()
-        return jsonify({
-            "companies": [
-                {
-                    "id": str(company.id),
-                    "name": company.name,
-                    "country": company.country,
-                    "currency_code": company.currency_code,
-                    "created_at": company.created_at.isoformat()
-                }
-                for company in companies
-            ]
-        })
+        fields = requested_fields(Company)
+        query = Company.query.order_by(Company.created_at, Company.id)
+        companies, pagination = paginate(load_fields(query, Company, fields))
+        return jsonify({"companies": serialize_many(Company, companies, fields), "pagination": pagination})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -39,13 +41,31 @@ def create_company():
         db.session.commit()
         return jsonify({
             "message": "Company created successfully",
-            "company": {
-                "id": str(company.id),
-                "name": company.name,
-                "country": company.country,
-                "currency_code": company.currency_code
-            }
+            "company": serialize(company)
         }), 201
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
+
+@companies_bp.route('/bulk', methods=['POST'])
+@tenant_required
+@require_permission('company.manage')
+def create_companies_bulk():
+    """
+    Update the caller's own company, or with company.create also create new ones, in one transaction;
+    body is {"items": [...], "on_conflict": "nothing"|"update"}
+    """
+    try:
+        data = request.get_json()
+        items = data.get('items') if isinstance(data, dict) else data
+        on_conflict = (data.get('on_conflict') if isinstance(data, dict) else None) or request.args.get('on_conflict', 'nothing')
+        result = bulk_create_companies(
+            items, g.tenant_company_id, on_conflict=on_conflict,
+            allow_create=has_permission(get_jwt_identity(), 'company.create')
+        )
+        return jsonify(result), 201 if result['created'] else 200
+    except BulkRequestError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
@@ -1,64 +1,210 @@
-from flask import Blueprint, request, jsonify
+import uuid
+from datetime import date, datetime
+from flask import Blueprint, Response, g, request, jsonify, stream_with_context
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import and_, or_
 from .. import db
-from ..models import Expense
+from ..models import Expense, ExpenseFlag, Employee
+from ..expense_import import ExpenseImporter, ImportFormatError, DEFAULT_CHUNK_SIZE, CONVERTERS
+from ..duplicate_detector import DuplicateDetector, serialize_flag
+from ..serializers import serialize, serialize_many, requested_fields, load_fields, stream_json
+from ..hierarchy import managed_users_query
+from ..tenancy import tenant_required
+from ..permissions import require_permission, has_permission
+from ..pagination import paginate
 
 # Create a blueprint for expense routes
 expenses_bp = Blueprint('expenses', __name__, url_prefix='/api/expenses')
 
+# Rows per streamed listing response
+STREAM_DEFAULT_LIMIT = 1000
+STREAM_MAX_LIMIT = 10000
+
+
+def _date_range(query):
+    """
+    Bound a query by ?from= / ?to= (inclusive ISO dates)
+
+    Expense.date is the partition key on Postgres, so bounded listings only touch the
+    partitions of those months.
+    """
+    date_from, date_to = request.args.get('from'), request.args.get('to')
+    if date_from:
+        query = query.filter(Expense.date >= date.fromisoformat(date_from))
+    if date_to:
+        query = query.filter(Expense.date <= date.fromisoformat(date_to))
+    return query
+
+
+def _after_cursor(query):
+    """Keyset page after ?before_date=&before_id= (the previous page's pagination.next), newest first"""
+    before_date, before_id = request.args.get('before_date'), request.args.get('before_id')
+    if not before_date and not before_id:
+        return query
+    if not (before_date and before_id):
+        raise ValueError("before_date and before_id must be given together")
+    before_date, before_id = date.fromisoformat(before_date), uuid.UUID(before_id)
+    return query.filter(or_(
+        Expense.date < before_date,
+        and_(Expense.date == before_date, Expense.id < before_id),
+    ))
+
+
+def _cursor(expense):
+    return {"before_date": expense.date.isoformat(), "before_id": str(expense.id)}
+
+
 @expenses_bp.route('', methods=['GET'])
+@tenant_required
+@require_permission('expense.view_own')
 def get_expenses():
-    """Get all expenses from the database"""
+    """
+    Expenses of the caller's company (only their own without expense.view_all), newest first,
+    streamed in batches; ?fields= limits the columns, ?from=/?to= the dates, ?limit= the rows
+    (at most STREAM_MAX_LIMIT), and ?before_date=&before_id= continue from pagination.next
+    """
     try:
-        expenses = Expense.query.all()
-        return jsonify({
-            "expenses": [
-                {
-                    "id": str(expense.id),
-                    "employee_id": str(expense.employee_id),
-                    "amount": float(expense.amount),
-                    "currency": expense.currency,
-                    "converted_amount": float(expense.converted_amount) if expense.converted_amount else None,
-                    "category": expense.category,
-                    "description": expense.description,
-                    "receipt_url": expense.receipt_url,
-                    "date": expense.date.isoformat(),
-                    "status": expense.status.value,
-                    "current_approver_id": str(expense.current_approver_id) if expense.current_approver_id else None,
-                    "created_at": expense.created_at.isoformat()
-                }
-                for expense in expenses
-            ]
-        })
+        fields = requested_fields(Expense)
+        query = _date_range(Expense.query)
+        caller = get_jwt_identity()
+        if not has_permission(caller, 'expense.view_all'):
+            query = query.join(Employee, Employee.id == Expense.employee_id).filter(
+                Employee.user_id == uuid.UUID(caller)
+            )
+        query = load_fields(_after_cursor(query).order_by(Expense.date.desc(), Expense.id.desc()), Expense, fields)
+        limit = min(max(request.args.get('limit', STREAM_DEFAULT_LIMIT, type=int), 1), STREAM_MAX_LIMIT)
+        body = stream_json('expenses', Expense, query, fields, limit=limit, cursor=_cursor)
+        return Response(stream_with_context(body), mimetype='application/json')
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@expenses_bp.route('/team', methods=['GET'])
+@tenant_required
+@require_permission('expense.view_team')
+def get_team_expenses():
+    """Expenses of everyone the caller manages (reporting line, departments, teams), paginated; ?from=/?to= bound the dates"""
+    try:
+        query = (
+            _date_range(Expense.query)
+            .join(Employee, Employee.id == Expense.employee_id)
+            .filter(Employee.user_id.in_(managed_users_query(get_jwt_identity())))
+            .order_by(Expense.date.desc(), Expense.id)
+        )
+        status = request.args.get('status')
+        if status:
+            query = query.filter(Expense.status == status)
+        fields = requested_fields(Expense)
+        expenses, pagination = paginate(load_fields(query, Expense, fields))
+        return jsonify({"expenses": serialize_many(Expense, expenses, fields), "pagination": pagination})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @expenses_bp.route('', methods=['POST'])
+@tenant_required
+@require_permission('expense.create')
 def create_expense():
-    """Create a new expense"""
+    """Create a new expense for the caller; other employees of the company need expense.import"""
     try:
         data = request.get_json()
-        expense = Expense(
-            employee_id=data['employee_id'],
-            amount=data['amount'],
-            currency=data['currency'],
-            category=data['category'],
-            description=data.get('description'),
-            receipt_url=data.get('receipt_url'),
-            date=data['date']
-        )
+        # Same converters as the bulk importer, so JSON strings become UUID/Decimal/date
+        try:
+            employee_id = CONVERTERS['employee_id'](data['employee_id'])
+            employee = db.session.get(Employee, employee_id)
+            if employee is None or employee.company_id != g.tenant_company_id:
+                return jsonify({"error": "Employee not found"}), 404
+            caller = get_jwt_identity()
+            if str(employee.user_id) != caller and not has_permission(caller, 'expense.import'):
+                return jsonify({"error": "Permission denied", "required": ["expense.import"]}), 403
+            expense = Expense(
+                employee_id=employee_id,
+                amount=CONVERTERS['amount'](data['amount']),
+                currency=CONVERTERS['currency'](data['currency']),
+                category=data['category'],
+                description=data.get('description'),
+                receipt_url=data.get('receipt_url'),
+                date=CONVERTERS['date'](data['date']),
+                status='pending',
+                created_at=datetime.utcnow()
+            )
+        except KeyError as e:
+            return jsonify({"error": f"{e.args[0]} is required"}), 400
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         db.session.add(expense)
+        db.session.flush()
+
+        # Duplicates are flagged for review, not rejected
+        detector = DuplicateDetector()
+        matches = detector.check(expense)
+        if matches:
+            detector.save_flags({expense.id: matches})
         db.session.commit()
         return jsonify({
             "message": "Expense created successfully",
-            "expense": {
-                "id": str(expense.id),
-                "employee_id": str(expense.employee_id),
-                "amount": float(expense.amount),
-                "currency": expense.currency,
-                "category": expense.category,
-                "status": expense.status.value
-            }
+            "duplicate_flags": matches,
+            "expense": serialize(expense)
         }), 201
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
+
+@expenses_bp.route('/import', methods=['POST'])
+@tenant_required
+@require_permission('expense.import')
+def import_expenses():
+    """Bulk import expenses for the caller's company from an uploaded CSV or XLSX file"""
+    try:
+        upload = request.files.get('file')
+        if upload is None:
+            return jsonify({"error": "file is required"}), 400
+
+        chunk_size = request.args.get('chunk_size', DEFAULT_CHUNK_SIZE, type=int)
+        strict = request.args.get('strict', 'false').lower() == 'true'
+        check_duplicates = request.args.get('check_duplicates', 'true').lower() == 'true'
+
+        importer = ExpenseImporter(
+            chunk_size=chunk_size, strict=strict, check_duplicates=check_duplicates, company_id=g.tenant_company_id
+        )
+        report = importer.import_stream(upload.stream, upload.filename, request.args.get('format'))
+        status_code = 201 if report['rows_imported'] else 422 if report['rows_failed'] else 200
+        return jsonify(report), status_code
+    except ImportFormatError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+@expenses_bp.route('/<expense_id>/flags', methods=['GET'])
+@tenant_required
+@require_permission('expense.view_own')
+def get_expense_flags(expense_id):
+    """Get review flags (e.g. duplicates) raised against an expense; others' expenses need expense.view_team or view_all"""
+    try:
+        expense = (
+            db.session.query(Expense.id, Employee.user_id)
+            .join(Employee, Employee.id == Expense.employee_id)
+            .filter(Expense.id == uuid.UUID(expense_id), Employee.company_id == g.tenant_company_id)
+            .first()
+        )
+        if expense is None:
+            return jsonify({"error": "Expense not found"}), 404
+        caller = get_jwt_identity()
+        if str(expense.user_id) != caller and not (
+            has_permission(caller, 'expense.view_team') or has_permission(caller, 'expense.view_all')
+        ):
+            return jsonify({"error": "Permission denied", "required": ["expense.view_team"]}), 403
+
+        flags = ExpenseFlag.query.filter_by(expense_id=expense.id).order_by(ExpenseFlag.created_at).all()
+        return jsonify({
+            "expense_id": expense_id,
+            "flags": [serialize_flag(flag) for flag in flags],
+            "count": len(flags)
+        })
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
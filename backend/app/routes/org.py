@@ -0,0 +1,71 @@
+import uuid
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import select
+from .. import db
+from ..models import User
+from ..hierarchy import descendants, ancestors, is_manager_of, org_cache
+from ..tenancy import tenant_required, current_company_id
+from ..permissions import has_permission
+
+# Create a blueprint for org-chart routes
+org_bp = Blueprint('org', __name__, url_prefix='/api/org')
+
+def _subject():
+    """
+    The user a request is about: the caller, or ?user_id= when the caller may look at them
+
+    Returns:
+        tuple: (user_id, None) or (None, error response)
+    """
+    caller = get_jwt_identity()
+    requested = request.args.get('user_id')
+    if not requested or requested == caller:
+        return caller, None
+    user_id = uuid.UUID(requested)
+    # Tenant-scoped lookup: users of other companies do not exist for this caller
+    if db.session.execute(select(User.id).where(User.id == user_id)).first() is None:
+        return None, (jsonify({"error": "User not found"}), 404)
+    # Managers see their own reporting line; anyone else needs org.view
+    if not is_manager_of(caller, user_id) and not has_permission(caller, 'org.view'):
+        return None, (jsonify({"error": "Permission denied", "required": ['org.view']}), 403)
+    return str(user_id), None
+
+@org_bp.route('/reports', methods=['GET'])
+@tenant_required
+def get_reports():
+    """Everyone under a user (default: the caller, others need org.view); ?depth=1 for direct reports only"""
+    try:
+        user_id, error = _subject()
+        if error:
+            return error
+        reports = descendants(user_id, request.args.get('depth', type=int))
+        return jsonify({"user_id": user_id, "reports": reports, "count": len(reports)})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@org_bp.route('/chain', methods=['GET'])
+@tenant_required
+def get_chain():
+    """Management chain above a user (default: the caller, others need org.view), nearest manager first"""
+    try:
+        user_id, error = _subject()
+        if error:
+            return error
+        chain = ancestors(user_id)
+        return jsonify({"user_id": user_id, "managers": chain, "count": len(chain)})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@org_bp.route('/tree', methods=['GET'])
+@tenant_required
+def get_tree():
+    """The caller's company org chart as nested reports, served from the tree cache"""
+    try:
+        return jsonify({"company_id": str(current_company_id()), "roots": org_cache.as_nested(current_company_id())})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,155 @@
+import re
+import uuid
+from flask import Blueprint, request, jsonify, send_file, redirect
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from werkzeug.exceptions import RequestEntityTooLarge
+from .. import app, db
+from ..models import User, Expense, Employee, Receipt
+from ..receipts import (
+    ReceiptError,
+    S3ReceiptStorage,
+    get_storage,
+    save_receipt,
+    duplicate_claims,
+    schedule_thumbnail,
+    serialize_receipt,
+    receipt_url
+)
+from ..duplicate_detector import DuplicateDetector, DUPLICATE_RECEIPT
+from ..permissions import require_permission, has_permission
+
+# Create a blueprint for receipt routes
+receipts_bp = Blueprint('receipts', __name__, url_prefix='/api/receipts')
+
+SHA256_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+# Multipart boundaries, headers and the expense_id field on top of the file itself
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+@receipts_bp.route('', methods=['POST'])
+@require_permission('receipt.upload')
+def upload_receipt():
+    """
+    Upload a receipt as multipart 'file' or as the raw request body, optionally attaching it to an
+    expense: the caller's own, or anyone's in their company with expense.approve
+    """
+    try:
+        user = db.session.get(User, uuid.UUID(get_jwt_identity()))
+        if not user:
+            return jsonify({"error": "User not found"}), 404
+
+        # Refuse before Werkzeug spools a multipart body that cannot fit
+        if request.content_length is not None and \
+                request.content_length > app.config['RECEIPT_MAX_BYTES'] + MULTIPART_OVERHEAD_BYTES:
+            return jsonify({"error": "Receipt is too large", "max_bytes": app.config['RECEIPT_MAX_BYTES']}), 413
+
+        upload = request.files.get('file')
+        if upload is not None:
+            stream, filename = upload.stream, upload.filename
+        else:
+            # Raw bodies are read straight off the socket in chunks
+            stream, filename = request.stream, request.args.get('filename')
+
+        expense_id = request.args.get('expense_id') or request.form.get('expense_id')
+        expense = None
+        if expense_id:
+            expense, owner_id = (
+                db.session.query(Expense, Employee.user_id)
+                .join(Employee, Employee.id == Expense.employee_id)
+                .filter(Expense.id == uuid.UUID(expense_id), Employee.company_id == user.company_id)
+                .first()
+            ) or (None, None)
+            if not expense:
+                return jsonify({"error": "Expense not found"}), 404
+            if owner_id != user.id and not has_permission(get_jwt_identity(), 'expense.approve'):
+                return jsonify({"error": "Permission denied", "required": ["expense.approve"]}), 403
+
+        receipt, deduplicated = save_receipt(stream, user.company_id, user.id, filename)
+
+        claims = []
+        if expense is not None:
+            claims = duplicate_claims(receipt.sha256, user.company_id, exclude_expense_id=expense.id)
+            expense.receipt_url = receipt_url(receipt.sha256)
+            if claims:
+                DuplicateDetector().save_flags({
+                    expense.id: [
+                        {"flag_type": DUPLICATE_RECEIPT, "related_expense_id": claim, "score": 1.0}
+                        for claim in claims
+                    ]
+                })
+
+        db.session.commit()
+
+        if receipt.thumbnail_status == 'pending':
+            schedule_thumbnail(receipt.sha256)
+
+        return jsonify({
+            "message": "Receipt already stored" if deduplicated else "Receipt uploaded successfully",
+            "receipt": serialize_receipt(receipt),
+            "deduplicated": deduplicated,
+            "expense_id": str(expense.id) if expense is not None else None,
+            "duplicate_claims": claims
+        }), 200 if deduplicated else 201
+    except RequestEntityTooLarge:
+        db.session.rollback()
+        return jsonify({"error": "Receipt is too large", "max_bytes": app.config['RECEIPT_MAX_BYTES']}), 413
+    except (ReceiptError, ValueError) as e:
+        # Refused upload, or a malformed expense_id
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+
+def _find_receipt(sha256):
+    user = db.session.get(User, uuid.UUID(get_jwt_identity()))
+    if not user or not SHA256_PATTERN.match(sha256):
+        return None
+    return Receipt.query.filter_by(company_id=user.company_id, sha256=sha256).first()
+
+
+def _send_stored(sha256, kind, mimetype, download_name=None):
+    storage = get_storage()
+    if isinstance(storage, S3ReceiptStorage):
+        return redirect(storage.presigned_url(sha256, kind))
+    if not storage.exists(sha256, kind):
+        return jsonify({"error": "File not available"}), 404
+    # Passing a path lets Werkzeug answer Range requests and hand the file to the
+    # server's wsgi.file_wrapper, which gunicorn serves with sendfile()
+    return send_file(
+        storage.path(sha256, kind),
+        mimetype=mimetype,
+        download_name=download_name,
+        conditional=True,
+        etag=sha256 if kind == 'original' else f"{sha256}-thumb",
+        max_age=86400
+    )
+
+
+@receipts_bp.route('/<sha256>', methods=['GET'])
+@jwt_required()
+def download_receipt(sha256):
+    """Download a receipt; supports Range and conditional requests"""
+    try:
+        receipt = _find_receipt(sha256)
+        if not receipt:
+            return jsonify({"error": "Receipt not found"}), 404
+        return _send_stored(sha256, 'original', receipt.content_type, receipt.filename or sha256)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@receipts_bp.route('/<sha256>/thumbnail', methods=['GET'])
+@jwt_required()
+def download_thumbnail(sha256):
+    """Download a receipt thumbnail once the worker pool has produced it"""
+    try:
+        receipt = _find_receipt(sha256)
+        if not receipt:
+            return jsonify({"error": "Receipt not found"}), 404
+        if receipt.thumbnail_status != 'ready':
+            return jsonify({"error": "Thumbnail not available", "thumbnail_status": receipt.thumbnail_status}), 404
+        return _send_stored(sha256, 'thumbnail', 'image/jpeg')
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
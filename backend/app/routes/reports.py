@@ -0,0 +1,49 @@
+from datetime import date
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import get_jwt_identity
+from ..models import User
+from ..reports import get_spend_report
+from ..permissions import require_permission
+
+# Create a blueprint for reporting routes
+reports_bp = Blueprint('reports', __name__, url_prefix='/api/reports')
+
+
+def _split_arg(name):
+    value = request.args.get(name)
+    return [v.strip() for v in value.split(',') if v.strip()] if value else []
+
+
+def _month_arg(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    # Accept both YYYY-MM and YYYY-MM-DD
+    return date.fromisoformat(value if len(value) > 7 else f"{value}-01")
+
+
+@reports_bp.route('/spend', methods=['GET'])
+@require_permission('report.view')
+def get_spend():
+    """Spend grouped by category/department/status and month/quarter/year for the caller's company"""
+    try:
+        user = User.query.filter_by(id=get_jwt_identity()).first()
+        if not user:
+            return jsonify({"error": "User not found"}), 404
+
+        bucket = request.args.get('bucket', 'month')
+        try:
+            report = get_spend_report(
+                company_id=user.company_id,
+                group_by=_split_arg('group_by') or ['category'],
+                bucket=None if bucket == 'none' else bucket,
+                date_from=_month_arg('from'),
+                date_to=_month_arg('to'),
+                statuses=_split_arg('status'),
+                categories=_split_arg('category'),
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify(report)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -1,5 +1,8 @@
 from flask import Blueprint, request, jsonify
 from ..automap_manager import AutomapManager
+from ..query_profiler import query_profiler
+from ..permissions import require_permission
+from ..response_cache import cached_response, response_cache, SCHEMA
 
 # Create a blueprint for schema routes
 schema_bp = Blueprint('schema', __name__, url_prefix='/api/schema')
@@ -16,6 +19,7 @@ def get_database_info():
         return jsonify({"error": str(e)}), 500
 
 @schema_bp.route('/tables', methods=['GET'])
+@cached_response(SCHEMA)
 def get_all_tables():
     """Get information about all tables in the database"""
     try:
@@ -80,6 +84,46 @@ def query_table(table_name):
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@schema_bp.route('/tables/<table_name>/explain', methods=['POST'])
+@require_permission('admin.access')
+def explain_table_query(table_name):
+    """Run a table query once and return its plan with index suggestions"""
+    try:
+        data = request.get_json() or {}
+        automap_manager = AutomapManager()
+        result = automap_manager.explain_query(table_name, data.get('filters', {}), data.get('limit'))
+        automap_manager.close_session()
+        if 'error' in result:
+            return jsonify(result), 400
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@schema_bp.route('/slow-queries', methods=['GET'])
+@require_permission('admin.access')
+def get_slow_queries():
+    """Slow table queries aggregated by fingerprint, with captured plans and index suggestions"""
+    try:
+        return jsonify(query_profiler.report(
+            limit=request.args.get('limit', 50, type=int),
+            sort=request.args.get('sort', 'total_ms'),
+            slow_only=request.args.get('all', 'false').lower() != 'true'
+        ))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@schema_bp.route('/slow-queries', methods=['DELETE'])
+@require_permission('admin.access')
+def reset_slow_queries():
+    """Clear the collected statistics of every worker"""
+    try:
+        query_profiler.reset()
+        return jsonify({"message": "Slow-query statistics cleared"})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @schema_bp.route('/tables/<table_name>/relationships', methods=['GET'])
 def get_table_relationships(table_name):
     """Get relationship information for a table"""
@@ -92,6 +136,7 @@ def get_table_relationships(table_name):
         return jsonify({"error": str(e)}), 500
 
 @schema_bp.route('/models', methods=['GET'])
+@cached_response(SCHEMA)
 def get_model_classes():
     """Get all available model classes from Automap"""
     try:
@@ -117,7 +162,8 @@ def export_schema():
 def refresh_schema():
     """Refresh database schema and return updated information"""
     try:
-        automap_manager = AutomapManager()
+        response_cache.invalidate(SCHEMA)
+        automap_manager = AutomapManager(refresh=True)
         
         # Get fresh schema information
         db_info = automap_manager.get_database_info()
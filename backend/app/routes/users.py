@@ -1,28 +1,28 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, g
 from .. import db
 from ..models import User
+from ..serializers import serialize, serialize_many, requested_fields, load_fields
+from ..tenancy import tenant_required
+from ..pagination import paginate
+from ..permissions import require_permission
+from ..response_cache import cached_response
+from ..bulk import bulk_create_users, BulkRequestError, coerce_role
 
 # Create a blueprint for user routes
 users_bp = Blueprint('users', __name__, url_prefix='/api/users')
 
 @users_bp.route('', methods=['GET'])
+@tenant_required
+@cached_response('users')
 def get_users():
-    """Get all users from the database"""
+    """Get users in the caller's company, paginated with ?page=&per_page=; ?fields= limits the columns"""
     try:
-        users = User.query.all()
-        return jsonify({
-            "users": [
-                {
-                    "id": str(user.id),
-                    "email": user.email,
-                    "name": user.name,
-                    "role": user.role.value,
-                    "company_id": str(user.company_id),
-                    "created_at": user.created_at.isoformat()
-                }
-                for user in users
-            ]
-        })
+        fields = requested_fields(User)
+        query = User.query.order_by(User.created_at, User.id)
+        users, pagination = paginate(load_fields(query, User, fields))
+        return jsonify({"users": serialize_many(User, users, fields), "pagination": pagination})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -34,21 +34,32 @@ def create_user():
         user = User(
             email=data['email'],
             name=data['name'],
-            role=data['role'],
+            role=coerce_role(data.get('role')),
             company_id=data['company_id']
         )
         db.session.add(user)
         db.session.commit()
         return jsonify({
             "message": "User created successfully",
-            "user": {
-                "id": str(user.id),
-                "email": user.email,
-                "name": user.name,
-                "role": user.role.value,
-                "company_id": str(user.company_id)
-            }
+            "user": serialize(user)
         }), 201
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
+
+@users_bp.route('/bulk', methods=['POST'])
+@tenant_required
+@require_permission('user.manage')
+def create_users_bulk():
+    """Create many users in the caller's company in one transaction; body is {"items": [...], "on_conflict": "nothing"|"update"}"""
+    try:
+        data = request.get_json()
+        items = data.get('items') if isinstance(data, dict) else data
+        on_conflict = (data.get('on_conflict') if isinstance(data, dict) else None) or request.args.get('on_conflict', 'nothing')
+        result = bulk_create_users(items, g.tenant_company_id, on_conflict=on_conflict)
+        return jsonify(result), 201 if result['created'] else 200
+    except BulkRequestError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
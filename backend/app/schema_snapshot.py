@@ -0,0 +1,223 @@
+"""
+On-disk snapshot of the reflected schema
+Reflecting the database costs several catalog queries per table and dominated every
+automap_cli run and schema endpoint. The reflected MetaData is pickled to
+SCHEMA_SNAPSHOT_DIR, one file per database (its URL without credentials or driver),
+next to a fingerprint of the catalog computed in a single query. Later loads only run
+that query and reuse the snapshot while the fingerprint matches; any DDL changes it
+and the schema is reflected again. Each process also keeps the last snapshot and its
+automap classes in memory. Postgres and sqlite are fingerprinted; other databases
+are reflected every time.
+"""
+
+import os
+import time
+import pickle
+import hashlib
+import tempfile
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Optional, Set
+
+import sqlalchemy
+from sqlalchemy import MetaData, text
+from sqlalchemy.ext.automap import automap_base
+
+from . import app
+
+logger = logging.getLogger(__name__)
+
+app.config.setdefault('SCHEMA_SNAPSHOT_ENABLED', os.getenv('SCHEMA_SNAPSHOT_ENABLED', 'True').lower() == 'true')
+app.config.setdefault('SCHEMA_SNAPSHOT_DIR', os.getenv('SCHEMA_SNAPSHOT_DIR', os.path.join(os.getcwd(), 'storage', 'schema')))
+
+# Bumped when the payload layout (or what is reflected) changes; older files are ignored
+SNAPSHOT_VERSION = 2
+
+# Tables, columns (type, nullability, default, comment), constraints, indexes and
+# enum labels of the current schema, hashed server-side into one value
+POSTGRES_FINGERPRINT_SQL = """
+SELECT md5(coalesce(string_agg(item, E'\\n' ORDER BY item), '')) FROM (
+    SELECT c.relname || '.' || a.attname || ' ' || format_type(a.atttypid, a.atttypmod)
+           || CASE WHEN a.attnotnull THEN ' not null' ELSE '' END
+           || coalesce(' default ' || pg_get_expr(d.adbin, d.adrelid), '')
+           || coalesce(' comment ' || col_description(c.oid, a.attnum), '') AS item
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+    LEFT JOIN pg_attrdef d ON d.adrelid = c.oid AND d.adnum = a.attnum
+    WHERE n.nspname = current_schema() AND c.relkind IN ('r', 'p', 'v', 'm', 'f')
+    UNION ALL
+    SELECT conrelid::regclass::text || ' ' || conname || ' ' || pg_get_constraintdef(oid)
+    FROM pg_constraint
+    WHERE connamespace = current_schema()::regnamespace
+    UNION ALL
+    SELECT pg_get_indexdef(i.indexrelid)
+    FROM pg_index i
+    JOIN pg_class c ON c.oid = i.indrelid
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname = current_schema()
+    UNION ALL
+    SELECT t.typname || ' ' || e.enumsortorder || ' ' || e.enumlabel
+    FROM pg_enum e
+    JOIN pg_type t ON t.oid = e.enumtypid
+    WHERE t.typnamespace = current_schema()::regnamespace
+) catalog
+"""
+
+SQLITE_FINGERPRINT_SQL = "SELECT type, name, tbl_name, sql FROM sqlite_master ORDER BY type, name"
+
+# Monthly partitions (expenses_2026_01, expenses_default, ...) are reached through their
+# parent; reflecting them as tables would make every sweep read their rows twice
+POSTGRES_PARTITIONS_SQL = """
+SELECT c.relname
+FROM pg_class c
+JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE n.nspname = current_schema() AND c.relispartition
+"""
+
+
+def database_identity(engine) -> str:
+    """Which database a snapshot belongs to: URL without password or driver, sqlite paths made absolute"""
+    url = engine.url.set(drivername=engine.url.get_backend_name())
+    if url.get_backend_name() == 'sqlite' and url.database and url.database != ':memory:':
+        url = url.set(database=os.path.abspath(url.database))
+    return url.render_as_string(hide_password=True)
+
+
+def schema_fingerprint(connection) -> Optional[str]:
+    """Hash of the catalog in one query, or None where no cheap check is implemented"""
+    dialect = connection.dialect.name
+    if dialect == 'postgresql':
+        return connection.execute(text(POSTGRES_FINGERPRINT_SQL)).scalar()
+    if dialect == 'sqlite':
+        digest = hashlib.sha1()
+        for row in connection.execute(text(SQLITE_FINGERPRINT_SQL)):
+            digest.update(repr(tuple(row)).encode())
+        return digest.hexdigest()
+    return None
+
+
+def partition_tables(connection) -> Set[str]:
+    """Names of child partitions in the current schema (Postgres only)"""
+    if connection.dialect.name != 'postgresql':
+        return set()
+    return set(connection.execute(text(POSTGRES_PARTITIONS_SQL)).scalars())
+
+
+def snapshot_path(identity: str) -> str:
+    name = hashlib.sha1(identity.encode()).hexdigest()[:16]
+    return os.path.join(app.config['SCHEMA_SNAPSHOT_DIR'], f"{name}.pickle")
+
+
+class SchemaSnapshot:
+    """Reflected MetaData of one database at one fingerprint, with lazily prepared automap classes"""
+
+    def __init__(self, identity: str, fingerprint: Optional[str], metadata: MetaData, source: str):
+        self.identity = identity
+        self.fingerprint = fingerprint
+        self.metadata = metadata
+        # 'snapshot' or 'reflected'
+        self.source = source
+        self._base = None
+        self._lock = threading.Lock()
+
+    def automap_base(self):
+        """Automap classes over the snapshot's tables, prepared once and shared (read-only) by callers"""
+        if self._base is None:
+            with self._lock:
+                if self._base is None:
+                    base = automap_base(metadata=self.metadata)
+                    base.prepare()
+                    self._base = base
+        return self._base
+
+
+_loaded: Dict[str, SchemaSnapshot] = {}
+_loaded_lock = threading.Lock()
+
+
+def _read_snapshot(identity: str, fingerprint: str) -> Optional[MetaData]:
+    path = snapshot_path(identity)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            # Written by this module into a directory only the app writes to
+            payload = pickle.load(f)
+    except Exception as e:
+        logger.warning("Ignoring unreadable schema snapshot %s: %s", path, e)
+        return None
+    if (
+        payload.get('version') != SNAPSHOT_VERSION
+        or payload.get('sqlalchemy') != sqlalchemy.__version__
+        or payload.get('identity') != identity
+        or payload.get('fingerprint') != fingerprint
+    ):
+        return None
+    return payload['metadata']
+
+
+def _write_snapshot(identity: str, fingerprint: str, metadata: MetaData):
+    path = snapshot_path(identity)
+    payload = {
+        "version": SNAPSHOT_VERSION,
+        "sqlalchemy": sqlalchemy.__version__,
+        "identity": identity,
+        "fingerprint": fingerprint,
+        "created_at": datetime.utcnow().isoformat(),
+        "metadata": metadata,
+    }
+    tmp = None
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Unique per writer and created 0600, so concurrent processes never share a temp file
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except Exception as e:
+        if tmp is not None and os.path.exists(tmp):
+            os.remove(tmp)
+        # The snapshot is only a cache; reflection already succeeded
+        logger.warning("Could not write schema snapshot %s: %s", path, e)
+
+
+def load_schema(connection, refresh: bool = False) -> SchemaSnapshot:
+    """
+    Reflected schema of the connection's database, from memory or the on-disk snapshot
+    when the catalog fingerprint still matches, otherwise reflected (and saved)
+
+    Args:
+        connection: Sync connection (or the sync side of an async one, via run_sync)
+        refresh: Reflect again even if the snapshot is current
+    """
+    started = time.perf_counter()
+    identity = database_identity(connection.engine)
+    enabled = app.config['SCHEMA_SNAPSHOT_ENABLED']
+    fingerprint = schema_fingerprint(connection) if enabled else None
+
+    if fingerprint is not None and not refresh:
+        loaded = _loaded.get(identity)
+        if loaded is not None and loaded.fingerprint == fingerprint:
+            return loaded
+        metadata = _read_snapshot(identity, fingerprint)
+        if metadata is not None:
+            snapshot = SchemaSnapshot(identity, fingerprint, metadata, 'snapshot')
+            with _loaded_lock:
+                _loaded[identity] = snapshot
+            logger.info("Schema of %s loaded from snapshot (%d tables) in %.1f ms",
+                        identity, len(metadata.tables), (time.perf_counter() - started) * 1000)
+            return snapshot
+
+    partitions = partition_tables(connection)
+    metadata = MetaData()
+    metadata.reflect(bind=connection, only=lambda name, _: name not in partitions)
+    snapshot = SchemaSnapshot(identity, fingerprint, metadata, 'reflected')
+    if fingerprint is not None:
+        _write_snapshot(identity, fingerprint, metadata)
+        with _loaded_lock:
+            _loaded[identity] = snapshot
+    logger.info("Schema of %s reflected (%d tables) in %.1f ms",
+                identity, len(metadata.tables), (time.perf_counter() - started) * 1000)
+    return snapshot
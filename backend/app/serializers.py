@@ -0,0 +1,261 @@
+"""
+Model serialization
+Per-model field converters are derived once from the column types, so routes
+don't rebuild dicts by hand; JSON encoding can go through orjson when installed
+"""
+
+import os
+import enum
+import logging
+from decimal import Decimal
+from itertools import islice
+from typing import Dict, List, Any, Callable, Iterable, Iterator, Optional, Sequence, Tuple
+
+from flask import current_app, request
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import Numeric, Date, DateTime, Time, Enum as SQLEnum, Uuid, inspect
+from sqlalchemy.orm import load_only
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# Columns never exposed through the API (secrets and internal lookup keys)
+EXCLUDED_COLUMNS = {'password_hash', 'fingerprint', 'permissions_version'}
+
+
+def _to_str(value):
+    return str(value)
+
+
+def _to_iso(value):
+    return value.isoformat()
+
+
+def _enum_value(value):
+    # Enum columns come back as members; plain String status columns are already str
+    return value.value if isinstance(value, enum.Enum) else value
+
+
+def converter_for(column) -> Optional[Callable[[Any], Any]]:
+    """Pick the JSON-safe converter for a column type, or None when the value passes through"""
+    column_type = column.type
+    if isinstance(column_type, Uuid):
+        return _to_str
+    if isinstance(column_type, Numeric):
+        # Exact decimal string, never a lossy float
+        return _to_str if column_type.asdecimal else None
+    if isinstance(column_type, (Date, DateTime, Time)):
+        return _to_iso
+    if isinstance(column_type, SQLEnum):
+        return _enum_value
+    return None
+
+
+def compile_fields(fields: Sequence[Tuple[str, Optional[Callable]]]) -> Callable[[Any], Dict[str, Any]]:
+    """
+    Build a straight-line function turning an object into a dict for the given fields
+
+    The generated code reads each attribute once and converts it inline, which is
+    what the hand-written dict literals in the routes did, without repeating them
+    per route. Field names are mapped column keys, so they are valid identifiers.
+    """
+    namespace = {}
+    body = []
+    items = []
+    for i, (name, convert) in enumerate(fields):
+        body.append(f"    v{i} = obj.{name}")
+        if convert is None:
+            items.append(f"{name!r}: v{i}")
+        else:
+            namespace[f"c{i}"] = convert
+            items.append(f"{name!r}: None if v{i} is None else c{i}(v{i})")
+    source = "def serialize(obj):\n" + "\n".join(body) + "\n    return {" + ", ".join(items) + "}\n"
+    exec(source, namespace)
+    return namespace['serialize']
+
+
+class ModelSerializer:
+    """Serializer for one model class with its converters resolved and compiled up front"""
+
+    def __init__(self, model, exclude: Iterable[str] = ()):
+        self.model = model
+        excluded = EXCLUDED_COLUMNS | set(exclude)
+        mapper = inspect(model)
+        self.fields: Tuple[Tuple[str, Optional[Callable]], ...] = tuple(
+            (attr.key, converter_for(attr.columns[0]))
+            for attr in mapper.column_attrs
+            if attr.key not in excluded
+        )
+        self.field_names = tuple(name for name, _ in self.fields)
+        # Compiled functions keyed by the selected field names; None means all fields
+        self._compiled = {None: compile_fields(self.fields)}
+
+    def select(self, fields: Optional[Sequence[str]]) -> Tuple[Tuple[str, Optional[Callable]], ...]:
+        """Restrict to the requested fields, keeping model order and ignoring unknown names"""
+        if not fields:
+            return self.fields
+        wanted = set(fields)
+        return tuple(field for field in self.fields if field[0] in wanted)
+
+    def compiled(self, fields: Optional[Sequence[str]] = None) -> Callable[[Any], Dict[str, Any]]:
+        key = frozenset(fields) if fields else None
+        function = self._compiled.get(key)
+        if function is None:
+            function = self._compiled[key] = compile_fields(self.select(fields))
+        return function
+
+    def serialize(self, obj, fields: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        return self.compiled(fields)(obj)
+
+    def serialize_many(self, objs: Iterable, fields: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        return list(map(self.compiled(fields), objs))
+
+    def serialize_row(self, row, fields: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        """Serialize a Core result row or mapping keyed by column name"""
+        mapping = row._mapping if hasattr(row, '_mapping') else row
+        result = {}
+        for name, convert in self.select(fields):
+            if name in mapping:
+                value = mapping[name]
+                result[name] = convert(value) if convert is not None and value is not None else value
+        return result
+
+
+_serializers: Dict[Any, ModelSerializer] = {}
+
+
+def serializer_for(model) -> ModelSerializer:
+    """Cached serializer for a model class"""
+    serializer = _serializers.get(model)
+    if serializer is None:
+        serializer = _serializers[model] = ModelSerializer(model)
+    return serializer
+
+
+def serialize(obj, fields: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    return serializer_for(type(obj)).serialize(obj, fields)
+
+
+def serialize_many(model, objs: Iterable, fields: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+    return serializer_for(model).serialize_many(objs, fields)
+
+
+def requested_fields(*models) -> Optional[List[str]]:
+    """
+    Sparse fieldset from ?fields=id,amount,status, or None for every field
+
+    Raises:
+        ValueError: when a name is not a field of any of the given models
+    """
+    raw = request.args.get('fields')
+    if not raw:
+        return None
+    fields = [name.strip() for name in raw.split(',') if name.strip()]
+    known = set().union(*(serializer_for(model).field_names for model in models))
+    unknown = [name for name in fields if name not in known]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields or None
+
+
+def load_fields(query, model, fields: Optional[Sequence[str]]):
+    """Load only the columns a sparse fieldset needs (the primary key is always loaded)"""
+    if not fields:
+        return query
+    names = [name for name, _ in serializer_for(model).select(fields)]
+    columns = [getattr(model, name) for name in names] or list(inspect(model).primary_key)
+    return query.options(load_only(*columns))
+
+
+def stream_json(key: str, model, query, fields: Optional[Sequence[str]] = None,
+                batch_size: int = 1000, limit: Optional[int] = None,
+                cursor: Optional[Callable[[Any], Dict[str, Any]]] = None) -> Iterator[str]:
+    """
+    {"<key>": [...], "pagination": {...}} as JSON text, one batch of rows at a time
+
+    Rows are fetched with yield_per, so a large listing is never held in memory
+    whole; wrap in stream_with_context when returning it from a view. The first
+    batch is fetched before this returns, so a failing query raises in the view
+    rather than after a 200 has been sent. A failure in a later batch ends the
+    body with an "error" member instead of cutting it off mid-array. With a limit,
+    at most that many rows are sent and pagination.next is cursor(last row) when
+    more remain.
+    """
+    to_dict = serializer_for(model).compiled(fields)
+    rows = iter(query.limit(limit + 1).yield_per(batch_size) if limit is not None else query.yield_per(batch_size))
+    first_batch = list(islice(rows, batch_size))
+
+    def generate():
+        dumps = current_app.json.dumps
+        yield '{' + dumps(key) + ':['
+        sent, last, more, error = 0, None, False, None
+        batch = first_batch
+        try:
+            while batch:
+                if limit is not None and sent + len(batch) > limit:
+                    batch, more = batch[:limit - sent], True
+                if batch:
+                    yield ('' if sent == 0 else ',') + dumps([to_dict(obj) for obj in batch])[1:-1]
+                    sent, last = sent + len(batch), batch[-1]
+                if more:
+                    break
+                batch = list(islice(rows, batch_size))
+        except Exception as e:
+            logger.exception("Streaming %s failed after %d rows", key, sent)
+            error = str(e)
+        tail = {"pagination": {
+            "limit": limit,
+            "count": sent,
+            "next": cursor(last) if more and error is None and cursor is not None else None,
+        }}
+        if error is not None:
+            tail["error"] = error
+        yield ']' + ''.join(',' + dumps(name) + ':' + dumps(value) for name, value in tail.items()) + '}\n'
+
+    return generate()
+
+
+def _orjson_default(value):
+    # orjson already handles UUID; Decimal and (passed-through) dates follow Flask's behaviour
+    if isinstance(value, Decimal):
+        return str(value)
+    return DefaultJSONProvider.default(value)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that encodes with orjson when it is installed"""
+
+    def _orjson_options(self, indent: bool) -> int:
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if orjson is None or set(kwargs) - {'indent', 'separators'}:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=_orjson_default, option=self._orjson_options(bool(kwargs.get('indent')))).decode()
+
+    def response(self, *args: Any, **kwargs: Any):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        body = orjson.dumps(obj, default=_orjson_default, option=self._orjson_options(indent))
+        return self._app.response_class(body + b"\n", mimetype=self.mimetype)
+
+
+def init_json(app):
+    """Install the fast JSON provider unless JSON_ENCODER=json"""
+    if os.getenv('JSON_ENCODER', 'auto').lower() == 'json':
+        return
+    if orjson is None:
+        logger.info("orjson not installed, using the standard json encoder")
+        return
+    app.json = FastJSONProvider(app)
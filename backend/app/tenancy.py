@@ -0,0 +1,134 @@
+"""
+Tenant isolation
+Routes decorated with @tenant_required run with the caller's company_id taken from
+the JWT, and every ORM SELECT issued during that request is filtered to that company
+"""
+
+import uuid
+from functools import wraps
+from typing import Dict, Any, Optional
+
+from flask import g, has_request_context, jsonify
+from flask_jwt_extended import verify_jwt_in_request, get_jwt, get_jwt_identity
+from sqlalchemy import event, select
+from sqlalchemy.orm import with_loader_criteria
+
+from . import db
+from .models import (
+    Company, User, Employee, Expense, Approval, Department, Team, TeamMember, Role, UserRole,
+    RolePermission, ApprovalFlow, ApprovalRule, Receipt, ExpenseRollup, OrgClosure, AuditEvent
+)
+
+COMPANY_CLAIM = 'company_id'
+
+# Models carrying their own company_id column
+COMPANY_SCOPED_MODELS = (
+    User, Employee, Department, Team, Role, ApprovalFlow, ApprovalRule, Receipt, ExpenseRollup, OrgClosure,
+    AuditEvent
+)
+
+
+# Models without a company_id column: the column pointing at their owner, and a query
+# mapping owner ids to companies (the same paths the criteria below filter through)
+OWNER_COMPANIES = {
+    Expense: ('employee_id', lambda ids: select(Employee.id, Employee.company_id).where(Employee.id.in_(ids))),
+    Approval: ('expense_id', lambda ids: (
+        select(Expense.id, Employee.company_id)
+        .join(Employee, Employee.id == Expense.employee_id)
+        .where(Expense.id.in_(ids))
+    )),
+    TeamMember: ('team_id', lambda ids: select(Team.id, Team.company_id).where(Team.id.in_(ids))),
+    UserRole: ('user_id', lambda ids: select(User.id, User.company_id).where(User.id.in_(ids))),
+    RolePermission: ('role_id', lambda ids: select(Role.id, Role.company_id).where(Role.id.in_(ids))),
+}
+
+
+def owner_companies(connection, objects) -> Dict[Any, uuid.UUID]:
+    """
+    Company of each object listed in OWNER_COMPANIES, with one query per model; objects
+    whose owner cannot be found (e.g. deleted in the same flush) are left out
+    """
+    owners: Dict[Any, Dict[Any, list]] = {}
+    for obj in objects:
+        lookup = OWNER_COMPANIES.get(type(obj))
+        if lookup is not None:
+            owner_id = getattr(obj, lookup[0])
+            if owner_id is not None:
+                owners.setdefault(type(obj), {}).setdefault(owner_id, []).append(obj)
+    companies = {}
+    for model, by_owner in owners.items():
+        for owner_id, company_id in connection.execute(OWNER_COMPANIES[model][1](list(by_owner))):
+            for obj in by_owner.get(owner_id, ()):
+                companies[obj] = company_id
+    return companies
+
+
+def tenant_claims(user) -> Dict[str, Any]:
+    """Extra JWT claims for a user, so the tenant is known without a lookup per request"""
+    return {COMPANY_CLAIM: str(user.company_id)}
+
+
+def current_company_id() -> Optional[uuid.UUID]:
+    """The tenant of the current request, if a tenant-scoped route is running"""
+    if not has_request_context():
+        return None
+    return g.get('tenant_company_id')
+
+
+def _resolve_company_id() -> Optional[uuid.UUID]:
+    claim = get_jwt().get(COMPANY_CLAIM)
+    if claim:
+        return uuid.UUID(claim)
+    # Tokens issued before the claim existed: one lookup, then the request is scoped the same way
+    user = db.session.execute(
+        select(User.company_id).where(User.id == uuid.UUID(get_jwt_identity()))
+    ).first()
+    return user.company_id if user else None
+
+
+def tenant_required(f):
+    """Decorator requiring a valid JWT and scoping all queries in the view to its company"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        verify_jwt_in_request()
+        company_id = _resolve_company_id()
+        if company_id is None:
+            return jsonify({"error": "User not found"}), 404
+        g.tenant_company_id = company_id
+        return f(*args, **kwargs)
+
+    return decorated_function
+
+
+@event.listens_for(db.session, 'do_orm_execute')
+def _apply_tenant_criteria(execute_state):
+    """Add company filters to ORM selects while a tenant-scoped request is active"""
+    if (
+        not execute_state.is_select
+        or execute_state.is_column_load
+        or execute_state.is_relationship_load
+        or execute_state.execution_options.get('all_tenants', False)
+    ):
+        return
+    company_id = current_company_id()
+    if company_id is None:
+        return
+
+    options = [
+        with_loader_criteria(model, lambda cls: cls.company_id == company_id, include_aliases=True)
+        for model in COMPANY_SCOPED_MODELS
+    ]
+    options.append(with_loader_criteria(Company, lambda cls: cls.id == company_id, include_aliases=True))
+    options.append(with_loader_criteria(
+        Expense,
+        lambda cls: cls.employee_id.in_(select(Employee.id).where(Employee.company_id == company_id)),
+        include_aliases=True
+    ))
+    options.append(with_loader_criteria(
+        Approval,
+        lambda cls: cls.expense_id.in_(
+            select(Expense.id).join(Employee, Employee.id == Expense.employee_id).where(Employee.company_id == company_id)
+        ),
+        include_aliases=True
+    ))
+    execute_state.statement = execute_state.statement.options(*options)
@@ -6,9 +6,12 @@ Command-line interface for database schema operations using Automap
 
 import argparse
 import json
+import os
 import sys
+import urllib.request
 from app import app
-from app.automap_manager import AutomapManager
+from app.automap_manager import AutomapManager, EXPORT_BATCH_SIZE, MAX_JOBS
+from app.columnar import FORMATS, FILE_EXTENSIONS
 
 
 def print_json(data, indent=2):
@@ -16,6 +19,23 @@ def print_json(data, indent=2):
     print(json.dumps(data, indent=indent, default=str))
 
 
+def refresh_schema():
+    """Re-reflect and rewrite the schema snapshot; later managers in this process reuse it"""
+    with app.app_context():
+        automap_manager = AutomapManager(refresh=True)
+        print(f"🔄 Reflected {len(automap_manager.table_names())} tables")
+
+
+def parse_filters(filters):
+    """Turn repeated key=value arguments into a filter dict"""
+    filter_dict = {}
+    for filter_pair in filters or []:
+        if '=' in filter_pair:
+            key, value = filter_pair.split('=', 1)
+            filter_dict[key] = value
+    return filter_dict
+
+
 def cmd_database_info():
     """Get database information"""
     with app.app_context():
@@ -54,10 +74,28 @@ def cmd_table_schema(table_name):
         print_json(schema)
 
 
-def cmd_table_sample(table_name, limit=5):
-    """Get sample data from a table"""
+def print_sweep(sweep, describe):
+    """Per-table summary lines of a for_each_table result; exits non-zero if any table failed"""
+    for table_name, result in sweep['results'].items():
+        if 'error' in result:
+            print(f"❌ {table_name}: {result['error']}")
+        else:
+            print(f"📋 {table_name}: {describe(result)}")
+    print(f"🧮 {sweep['tables']} tables in {sweep['seconds']}s with {sweep['jobs']} jobs")
+    print_json(sweep)
+    if sweep['errors']:
+        sys.exit(1)
+
+
+def cmd_table_sample(table_name, limit=5, all_tables=False, jobs=1):
+    """Get sample data from a table (or every table)"""
     with app.app_context():
         automap_manager = AutomapManager()
+        if all_tables:
+            sweep = automap_manager.for_each_table('get_table_data_sample', automap_manager.table_names(), jobs, limit=limit)
+            automap_manager.close_session()
+            print_sweep(sweep, lambda result: f"{result['sample_size']} rows sampled")
+            return
         sample = automap_manager.get_table_data_sample(table_name, limit)
         automap_manager.close_session()
         
@@ -67,10 +105,16 @@ def cmd_table_sample(table_name, limit=5):
         print_json(sample)
 
 
-def cmd_table_count(table_name):
-    """Get row count for a table"""
+def cmd_table_count(table_name, all_tables=False, jobs=1):
+    """Get row count for a table (or every table)"""
     with app.app_context():
         automap_manager = AutomapManager()
+        if all_tables:
+            sweep = automap_manager.for_each_table('get_table_row_count', automap_manager.table_names(), jobs)
+            automap_manager.close_session()
+            sweep['total_rows'] = sum(result.get('row_count', 0) for result in sweep['results'].values())
+            print_sweep(sweep, lambda result: f"{result['row_count']} rows")
+            return
         count = automap_manager.get_table_row_count(table_name)
         automap_manager.close_session()
         
@@ -84,24 +128,55 @@ def cmd_query_table(table_name, filters=None, limit=None):
     """Query a table with filters"""
     with app.app_context():
         automap_manager = AutomapManager()
+        result = automap_manager.query_table(table_name, parse_filters(filters), limit)
+        automap_manager.close_session()
         
-        # Parse filters if provided
-        filter_dict = {}
-        if filters:
-            for filter_pair in filters:
-                if '=' in filter_pair:
-                    key, value = filter_pair.split('=', 1)
-                    filter_dict[key] = value
-        
-        result = automap_manager.query_table(table_name, filter_dict, limit)
+        if 'error' in result:
+            print(f"❌ Error: {result['error']}")
+            sys.exit(1)
+        print_json(result)
+
+
+def print_index_suggestions(suggestions):
+    for suggestion in suggestions:
+        print(f"💡 {suggestion['ddl']}")
+        print(f"   existing indexes on {suggestion['table']}: {', '.join(suggestion['existing_indexes']) or 'none'}")
+
+
+def cmd_explain_query(table_name, filters=None, limit=None):
+    """Run a table query once with EXPLAIN and suggest missing indexes"""
+    with app.app_context():
+        automap_manager = AutomapManager()
+        result = automap_manager.explain_query(table_name, parse_filters(filters), limit)
         automap_manager.close_session()
         
         if 'error' in result:
             print(f"❌ Error: {result['error']}")
             sys.exit(1)
+        print(f"⏱️  {result['duration_ms']} ms, {result['rows']} rows")
+        for scan in result['sequential_scans']:
+            print(f"⚠️  Sequential scan on {scan['table']}" + (f" (filter: {scan['filter']})" if scan.get('filter') else ''))
+        print_index_suggestions(result['index_suggestions'])
         print_json(result)
 
 
+def cmd_slow_queries(base_url, token=None, limit=20, sort='total_ms'):
+    """Fetch the slow-query report from a running server"""
+    url = f"{base_url.rstrip('/')}/api/schema/slow-queries?limit={limit}&sort={sort}"
+    request = urllib.request.Request(url, headers={'Authorization': f"Bearer {token}"} if token else {})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        report = json.loads(response.read())
+    
+    print(f"Slow queries (>= {report['threshold_ms']} ms), {report['fingerprints']} fingerprints:")
+    for entry in report['queries']:
+        print(f"🐢 {entry['fingerprint']} {entry['table']} [{', '.join(entry['filter_columns'])}] "
+              f"calls={entry['calls']} slow={entry['slow_calls']} mean={entry['mean_ms']}ms max={entry['max_ms']}ms")
+        for scan in (entry['explain'] or {}).get('sequential_scans', []):
+            print(f"   ⚠️  Sequential scan on {scan['table']}")
+    print_index_suggestions(report['index_suggestions'])
+    print_json(report)
+
+
 def cmd_relationships(table_name):
     """Get relationships for a table"""
     with app.app_context():
@@ -153,8 +228,58 @@ def cmd_export_schema(output_file=None):
             print_json(schema)
 
 
+def cmd_export_data(table_name, output=None, fmt='parquet', filters=None, limit=None,
+                    batch_size=EXPORT_BATCH_SIZE, rows_per_file=None, compression='zstd', all_tables=False, jobs=1):
+    """Stream table rows to Parquet / Arrow IPC files"""
+    with app.app_context():
+        automap_manager = AutomapManager()
+        if all_tables:
+            # One file (or set of files) per table in the output directory
+            output_dir = output or 'export'
+            filter_dict = parse_filters(filters)
+            tables = automap_manager.base.metadata.tables
+            # A filter only makes sense for tables that have the column; others are skipped, not exported whole
+            table_names = [name for name in automap_manager.table_names()
+                           if all(column in tables[name].c for column in filter_dict)]
+            sweep = automap_manager.for_each_table(
+                'export_table_data', table_names, jobs,
+                table_kwargs=lambda name: {"output": os.path.join(output_dir, f"{name}{FILE_EXTENSIONS[fmt]}")},
+                filters=filter_dict, fmt=fmt, limit=limit, batch_size=batch_size,
+                rows_per_file=rows_per_file, compression=compression
+            )
+            automap_manager.close_session()
+            exported = [result for result in sweep['results'].values() if 'error' not in result]
+            sweep['skipped_tables'] = sorted(set(tables) - set(table_names))
+            sweep['rows'] = sum(result['rows'] for result in exported)
+            sweep['bytes'] = sum(result['bytes'] for result in exported)
+            sweep['rows_per_second'] = round(sweep['rows'] / sweep['seconds']) if sweep['seconds'] else None
+            print_sweep(sweep, lambda result: f"{result['rows']} rows, {len(result['files'])} file(s), "
+                                              f"{result['bytes'] / 1024 / 1024:.1f} MB")
+            return
+        result = automap_manager.export_table_data(
+            table_name, output or f"{table_name}{FILE_EXTENSIONS[fmt]}", parse_filters(filters), fmt,
+            limit, batch_size, rows_per_file, compression
+        )
+        automap_manager.close_session()
+        
+        if 'error' in result:
+            print(f"❌ Error: {result['error']}")
+            sys.exit(1)
+        print(f"✅ Exported {result['rows']} rows of {table_name} to {len(result['files'])} {fmt} file(s), "
+              f"{result['bytes'] / 1024 / 1024:.1f} MB in {result['seconds']}s ({result['rows_per_second']} rows/sec)")
+        print_json(result)
+
+
+def add_sweep_arguments(parser):
+    parser.add_argument('--all-tables', action='store_true', help='Run for every table')
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                        help=f'Tables processed in parallel with --all-tables (max {MAX_JOBS})')
+
+
 def main():
     parser = argparse.ArgumentParser(description='SQLAlchemy Automap CLI')
+    parser.add_argument('--refresh', action='store_true',
+                        help='Reflect the database again instead of using the schema snapshot')
     subparsers = parser.add_subparsers(dest='command', help='Available commands')
     
     # Database info command
@@ -169,12 +294,14 @@ def main():
     
     # Table sample command
     sample_parser = subparsers.add_parser('table-sample', help='Get sample data from table')
-    sample_parser.add_argument('table_name', help='Name of the table')
+    sample_parser.add_argument('table_name', nargs='?', help='Name of the table')
     sample_parser.add_argument('--limit', type=int, default=5, help='Number of rows to sample')
+    add_sweep_arguments(sample_parser)
     
     # Table count command
     count_parser = subparsers.add_parser('table-count', help='Get row count for table')
-    count_parser.add_argument('table_name', help='Name of the table')
+    count_parser.add_argument('table_name', nargs='?', help='Name of the table')
+    add_sweep_arguments(count_parser)
     
     # Query table command
     query_parser = subparsers.add_parser('query-table', help='Query table with filters')
@@ -182,6 +309,19 @@ def main():
     query_parser.add_argument('--filter', action='append', help='Filter in format key=value')
     query_parser.add_argument('--limit', type=int, help='Limit number of results')
     
+    # Explain query command
+    explain_parser = subparsers.add_parser('explain-query', help='Show the plan of a table query and suggest indexes')
+    explain_parser.add_argument('table_name', help='Name of the table')
+    explain_parser.add_argument('--filter', action='append', help='Filter in format key=value')
+    explain_parser.add_argument('--limit', type=int, help='Limit number of results')
+    
+    # Slow queries command
+    slow_parser = subparsers.add_parser('slow-queries', help='Slow table queries collected by a running server')
+    slow_parser.add_argument('--url', default=os.getenv('API_URL', 'http://127.0.0.1:8000'), help='Server base URL')
+    slow_parser.add_argument('--token', default=os.getenv('API_TOKEN'), help='Admin access token (default: $API_TOKEN)')
+    slow_parser.add_argument('--limit', type=int, default=20, help='Number of fingerprints to show')
+    slow_parser.add_argument('--sort', default='total_ms', choices=['total_ms', 'max_ms', 'mean_ms', 'calls', 'slow_calls'])
+    
     # Relationships command
     rel_parser = subparsers.add_parser('relationships', help='Get table relationships')
     rel_parser.add_argument('table_name', help='Name of the table')
@@ -193,13 +333,30 @@ def main():
     export_parser = subparsers.add_parser('export', help='Export complete schema')
     export_parser.add_argument('--output', '-o', help='Output file (default: stdout)')
     
+    # Export data command
+    export_data_parser = subparsers.add_parser('export-data', help='Export table rows to Parquet or Arrow IPC')
+    export_data_parser.add_argument('table_name', nargs='?', help='Name of the table')
+    export_data_parser.add_argument('--output', '-o', help='Output file (default: <table>.parquet / <table>.arrow); '
+                                                           'with --all-tables a directory (default: export)')
+    export_data_parser.add_argument('--format', dest='fmt', default='parquet', choices=FORMATS)
+    export_data_parser.add_argument('--filter', action='append', help='Filter in format key=value')
+    export_data_parser.add_argument('--limit', type=int, help='Limit number of rows')
+    export_data_parser.add_argument('--batch-size', type=int, default=EXPORT_BATCH_SIZE, help='Rows fetched and encoded per record batch')
+    export_data_parser.add_argument('--rows-per-file', type=int, help='Split the output into numbered files of this many rows')
+    export_data_parser.add_argument('--compression', default='zstd', help='zstd, lz4 or none; Parquet also takes snappy and gzip')
+    add_sweep_arguments(export_data_parser)
+    
     args = parser.parse_args()
     
     if not args.command:
         parser.print_help()
         sys.exit(1)
+    if getattr(args, 'all_tables', None) is False and not args.table_name:
+        parser.error(f"{args.command}: give a table name or --all-tables")
     
     try:
+        if args.refresh:
+            refresh_schema()
         if args.command == 'db-info':
             cmd_database_info()
         elif args.command == 'list-tables':
@@ -207,17 +364,24 @@ def main():
         elif args.command == 'table-schema':
             cmd_table_schema(args.table_name)
         elif args.command == 'table-sample':
-            cmd_table_sample(args.table_name, args.limit)
+            cmd_table_sample(args.table_name, args.limit, args.all_tables, args.jobs)
         elif args.command == 'table-count':
-            cmd_table_count(args.table_name)
+            cmd_table_count(args.table_name, args.all_tables, args.jobs)
         elif args.command == 'query-table':
             cmd_query_table(args.table_name, args.filter, args.limit)
+        elif args.command == 'explain-query':
+            cmd_explain_query(args.table_name, args.filter, args.limit)
+        elif args.command == 'slow-queries':
+            cmd_slow_queries(args.url, args.token, args.limit, args.sort)
         elif args.command == 'relationships':
             cmd_relationships(args.table_name)
         elif args.command == 'models':
             cmd_model_classes()
         elif args.command == 'export':
             cmd_export_schema(args.output)
+        elif args.command == 'export-data':
+            cmd_export_data(args.table_name, args.output, args.fmt, args.filter, args.limit,
+                            args.batch_size, args.rows_per_file, args.compression, args.all_tables, args.jobs)
     except Exception as e:
         print(f"❌ Error: {e}")
         sys.exit(1)
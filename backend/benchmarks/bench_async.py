@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Threaded vs async serving benchmark
+Starts the gunicorn (threaded) server and the uvicorn async read API with the same
+worker count, then raises the number of concurrent keep-alive clients until
+errors or the p99 latency objective are exceeded
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from load_test import percentile, start_server, stop_server
+
+
+async def _client(host, port, request_bytes, start_at, stop_at, latencies, failures, timeout):
+    reader = writer = None
+    loop = asyncio.get_running_loop()
+    while loop.time() < stop_at:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+            started = loop.time()
+            writer.write(request_bytes)
+            await writer.drain()
+            head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), timeout)
+            status = int(head.split(b' ', 2)[1])
+            length = 0
+            for line in head.split(b'\r\n'):
+                if line.lower().startswith(b'content-length:'):
+                    length = int(line.split(b':', 1)[1])
+            await asyncio.wait_for(reader.readexactly(length), timeout)
+            if started >= start_at:
+                if status >= 500:
+                    failures['http_5xx'] += 1
+                else:
+                    latencies.append(loop.time() - started)
+            if b'connection: close' in head.lower():
+                writer.close()
+                writer = None
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError, IndexError):
+            failures['connection'] += 1
+            if writer is not None:
+                writer.close()
+            writer = None
+            await asyncio.sleep(0.05)
+    if writer is not None:
+        writer.close()
+
+
+async def _run_level(base_url, path, concurrency, duration, warmup, token, timeout):
+    parts = urlsplit(base_url)
+    headers = f"GET {path} HTTP/1.1\r\nHost: {parts.hostname}\r\nConnection: keep-alive\r\n"
+    if token:
+        headers += f"Authorization: Bearer {token}\r\n"
+    request_bytes = (headers + "\r\n").encode()
+    loop = asyncio.get_running_loop()
+    start_at = loop.time() + warmup
+    stop_at = start_at + duration
+    latencies = []
+    failures = {'connection': 0, 'http_5xx': 0}
+    await asyncio.gather(*[
+        _client(parts.hostname, parts.port, request_bytes, start_at, stop_at, latencies, failures, timeout)
+        for _ in range(concurrency)
+    ])
+    latencies.sort()
+    total = len(latencies) + failures['http_5xx']
+    return {
+        "concurrency": concurrency,
+        "rps": round(len(latencies) / duration, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+        "error_rate": round((failures['connection'] + failures['http_5xx']) / max(total + failures['connection'], 1), 4),
+        **failures,
+    }
+
+
+def bench_server(label, base_url, args):
+    print(f"\n{label}")
+    print(f"  {'clients':>8} {'rps':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>8}")
+    levels = []
+    limit = None
+    for concurrency in args.levels:
+        result = asyncio.run(_run_level(base_url, args.endpoint, concurrency, args.duration, args.warmup,
+                                        args.token, args.timeout))
+        levels.append(result)
+        print(f"  {concurrency:>8} {result['rps']:>9} {result['p50_ms']!s:>9} {result['p99_ms']!s:>9} "
+              f"{result['error_rate']:>8.2%}")
+        within_slo = result['error_rate'] < 0.01 and result['p99_ms'] is not None and result['p99_ms'] <= args.slo_ms
+        if within_slo:
+            limit = concurrency
+    print(f"  highest concurrency within p99 <= {args.slo_ms} ms and < 1% errors: {limit}")
+    return {"label": label, "levels": levels, "concurrency_limit": limit}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare concurrency limits of the threaded and async servers')
+    parser.add_argument('--endpoint', default='/api/expenses', help='Path served by both servers')
+    parser.add_argument('--levels', default='16,64,256,512', help='Comma-separated client counts')
+    parser.add_argument('--workers', type=int, default=2, help='Worker processes for both servers')
+    parser.add_argument('--threads', type=int, default=4, help='Threads per gunicorn worker')
+    parser.add_argument('--duration', type=float, default=10, help='Measured seconds per level')
+    parser.add_argument('--warmup', type=float, default=1, help='Unmeasured seconds before each level')
+    parser.add_argument('--timeout', type=float, default=10, help='Per-request timeout in seconds')
+    parser.add_argument('--slo-ms', type=float, default=500, help='p99 latency objective used to find the limit')
+    parser.add_argument('--token', help='Bearer token for authenticated endpoints such as /api/expenses and /api/auth/me')
+    parser.add_argument('--output', help='Write JSON results to this file')
+    args = parser.parse_args()
+    args.levels = [int(level) for level in args.levels.split(',')]
+
+    results = []
+    for label, asgi in ((f"threaded: gunicorn {args.workers}x{args.threads} gthread", False),
+                        (f"async: uvicorn {args.workers} workers", True)):
+        process, base_url = start_server(args.workers, None if asgi else args.threads, asgi=asgi)
+        try:
+            results.append(bench_server(label, base_url, args))
+        finally:
+            stop_server(process)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"endpoint": args.endpoint, "slo_ms": args.slo_ms, "servers": results}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Serialization benchmark
+Compares the old hand-built expense dicts with app.serializers, with and without orjson
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Objects are built in memory; no database connection is made
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+from app import app
+from app.models import Expense
+from app.serializers import serialize_many, FastJSONProvider, orjson
+
+
+def make_expenses(count):
+    today = date.today()
+    employee_ids = [uuid.uuid4() for _ in range(50)]
+    return [
+        Expense(
+            id=uuid.uuid4(),
+            employee_id=employee_ids[i % len(employee_ids)],
+            amount=Decimal(f"{i % 5000}.{i % 100:02d}"),
+            currency='USD',
+            converted_amount=Decimal(f"{i % 4000}.{i % 100:02d}") if i % 3 else None,
+            category=('travel', 'meals', 'lodging', 'supplies')[i % 4],
+            description=f"Expense line {i}",
+            receipt_url=None,
+            date=today - timedelta(days=i % 365),
+            status='pending',
+            current_approver_id=None,
+            created_at=datetime.utcnow()
+        )
+        for i in range(count)
+    ]
+
+
+def legacy_dicts(expenses):
+    """The per-request comprehension get_expenses used before the serializer layer"""
+    return [
+        {
+            "id": str(expense.id),
+            "employee_id": str(expense.employee_id),
+            "amount": float(expense.amount),
+            "currency": expense.currency,
+            "converted_amount": float(expense.converted_amount) if expense.converted_amount else None,
+            "category": expense.category,
+            "description": expense.description,
+            "receipt_url": expense.receipt_url,
+            "date": expense.date.isoformat(),
+            "status": expense.status,
+            "current_approver_id": str(expense.current_approver_id) if expense.current_approver_id else None,
+            "created_at": expense.created_at.isoformat()
+        }
+        for expense in expenses
+    ]
+
+
+def timed(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark expense serialization')
+    parser.add_argument('--rows', type=int, default=50000, help='Number of expenses to serialize')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per case (best time is reported)')
+    args = parser.parse_args()
+
+    expenses = make_expenses(args.rows)
+    fast_provider = FastJSONProvider(app)
+
+    cases = {
+        'legacy dicts + json': lambda: json.dumps({"expenses": legacy_dicts(expenses)}),
+        'serializer + json': lambda: json.dumps({"expenses": serialize_many(Expense, expenses)}),
+    }
+    if orjson is not None:
+        cases['serializer + orjson'] = lambda: fast_provider.dumps({"expenses": serialize_many(Expense, expenses)})
+    cases['serializer only'] = lambda: serialize_many(Expense, expenses)
+    cases['legacy dicts only'] = lambda: legacy_dicts(expenses)
+
+    print(f"Serializing {args.rows} expenses, best of {args.repeat}")
+    results = {}
+    for name, fn in cases.items():
+        seconds = timed(fn, args.repeat)
+        results[name] = {"seconds": round(seconds, 4), "rows_per_second": round(args.rows / seconds)}
+        print(f"  {name:<24} {seconds * 1000:9.1f} ms  {args.rows / seconds:12,.0f} rows/s")
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
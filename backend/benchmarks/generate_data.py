@@ -0,0 +1,562 @@
+#!/usr/bin/env python3
+"""
+Synthetic data generator for load testing
+Fills the 14 core tables with realistic volume: companies of skewed size, users with
+a manager tree, departments, teams, roles and permissions, and millions of expenses
+(skewed per employee) with approval chains whose length depends on the amount.
+
+Columns are sampled with vectorized NumPy, rendered to CSV and loaded with COPY.
+Small tables load in parallel per dependency wave; expenses and their approvals are
+generated and copied in parallel chunks by worker processes. Every chunk draws from
+its own seed, so output is identical for a given --seed regardless of --workers.
+
+    python benchmarks/generate_data.py --reset --companies 50 --users 100000 --expenses 10000000
+
+Postgres is the target; other databases fall back to executemany (fine for small runs).
+"""
+
+import argparse
+import binascii
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Dict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from sqlalchemy import create_engine, select, text, Boolean, Date, DateTime, Integer, Numeric, Uuid
+from sqlalchemy.pool import NullPool
+
+from app import app, db, bcrypt
+from app.models import (
+    Company, Permission, ApprovalFlow, Department, Role, User, ApprovalRule, Employee,
+    RolePermission, Team, UserRole, Expense, TeamMember, Approval, UserRoleEnum
+)
+from app.permissions import sync_permissions, names_for, ROLE_DEFAULTS
+from app.hierarchy import rebuild_closure
+from app.partitions import ensure_partitions
+from app.reports import refresh_all_rollups
+from app.duplicate_detector import normalize_description
+
+PASSWORD = 'synthetic-password-1'
+DOMAIN = 'synthetic.local'
+COUNTRIES = np.array([b'US', b'GB', b'DE', b'IN', b'FR', b'CA'])
+CURRENCIES = np.array([b'USD', b'EUR', b'GBP', b'INR'])
+CURRENCY_WEIGHTS = np.array([0.55, 0.25, 0.12, 0.08])
+CATEGORIES = np.array([b'travel', b'meals', b'lodging', b'software', b'office', b'training', b'transport'])
+STATUSES = np.array([b'pending', b'approved', b'rejected'])
+STATUS_WEIGHTS = np.array([0.2, 0.7, 0.1])
+# Amounts at or above these need a second and a third approver
+CHAIN_THRESHOLDS = (500, 5000)
+HISTORY_DAYS = 3 * 365
+EPOCH = np.datetime64(date.today().isoformat(), 'D')
+
+# Tables loaded together; each wave only references tables from earlier waves
+WAVES = (
+    (Company,),
+    (User,),
+    (ApprovalFlow, Department, Role, ApprovalRule, Team),
+    (Employee, RolePermission, UserRole, TeamMember),
+)
+
+
+# ---------------------------------------------------------------------------
+# Vectorized column helpers
+# ---------------------------------------------------------------------------
+
+def uuid_hex(rng, n: int) -> np.ndarray:
+    """n random version-4 UUIDs as 32-char hex (Postgres accepts the undashed form)"""
+    raw = rng.integers(0, 256, size=(n, 16), dtype=np.uint8)
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80
+    return np.frombuffer(binascii.hexlify(raw.tobytes()), dtype='S32')
+
+
+def numbered(prefix: bytes, numbers: np.ndarray, suffix: bytes = b'') -> np.ndarray:
+    return np.char.add(np.char.add(prefix, numbers.astype('S')), suffix)
+
+
+def pick(rng, starts: np.ndarray, counts: np.ndarray, owners: np.ndarray) -> np.ndarray:
+    """For each owner (company index), a random index in [starts[owner], starts[owner] + counts[owner])"""
+    return starts[owners] + (rng.random(len(owners)) * counts[owners]).astype(np.int64)
+
+
+def timestamps(rng, days_ago: np.ndarray) -> np.ndarray:
+    seconds = (EPOCH - days_ago).astype('datetime64[s]') + rng.integers(8 * 3600, 20 * 3600, len(days_ago))
+    return seconds.astype('S19')
+
+
+def as_csv_field(values: np.ndarray) -> np.ndarray:
+    if values.dtype.kind == 'S':
+        return values
+    if values.dtype.kind == 'b':
+        return np.where(values, b't', b'f')
+    if values.dtype.kind == 'f':
+        return np.char.mod('%.2f', values).astype('S')
+    if values.dtype.kind == 'M':
+        return values.astype('S')
+    return values.astype('S')
+
+
+def to_csv(columns: Dict[str, np.ndarray]) -> bytes:
+    """Join column arrays into CSV lines; empty fields are NULL to COPY ... (FORMAT csv)"""
+    fields = [as_csv_field(values) for values in columns.values()]
+    lines = fields[0]
+    for field in fields[1:]:
+        lines = np.char.add(np.char.add(lines, b','), field)
+    return b'\n'.join(lines.tolist()) + b'\n'
+
+
+def _python_value(column, value: bytes):
+    if value == b'':
+        return None
+    value = value.decode()
+    column_type = column.type
+    if isinstance(column_type, Uuid):
+        return uuid.UUID(hex=value)
+    if isinstance(column_type, DateTime):
+        return datetime.fromisoformat(value)
+    if isinstance(column_type, Date):
+        return date.fromisoformat(value)
+    if isinstance(column_type, Boolean):
+        return value == 't'
+    if isinstance(column_type, Integer):
+        return int(value)
+    if isinstance(column_type, Numeric):
+        return Decimal(value)
+    return value
+
+
+def load(connection, model, columns: Dict[str, np.ndarray]) -> int:
+    """COPY the columns into model's table on a DBAPI connection (executemany off Postgres)"""
+    table = model.__table__
+    if connection.dialect.name == 'postgresql':
+        dbapi_connection = connection.connection
+        with dbapi_connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+                io.BytesIO(to_csv(columns))
+            )
+    else:
+        fields = {name: as_csv_field(values) for name, values in columns.items()}
+        count = len(next(iter(fields.values())))
+        rows = [
+            {name: _python_value(table.c[name], fields[name][i]) for name in fields}
+            for i in range(count)
+        ]
+        if rows:
+            connection.execute(table.insert(), rows)
+    return len(next(iter(columns.values())))
+
+
+def fingerprints(employee_keys: np.ndarray, amount: np.ndarray, currency: np.ndarray,
+                 expense_date: np.ndarray, description: np.ndarray) -> np.ndarray:
+    """expense_fingerprint over column arrays, hashing the amount as COPY loads it"""
+    # Decimal.normalize() of the two-decimal text: drop trailing zeros, then a bare point
+    amount_key = np.char.rstrip(np.char.rstrip(as_csv_field(amount), b'0'), b'.')
+    distinct, inverse = np.unique(description, return_inverse=True)
+    description_key = np.array([normalize_description(value.decode()).encode() for value in distinct])[inverse]
+    keys = employee_keys
+    for field in (amount_key, np.char.upper(currency), expense_date, description_key):
+        keys = np.char.add(np.char.add(keys, b'|'), field)
+    return np.array([hashlib.sha256(key).hexdigest().encode() for key in keys.tolist()], dtype='S64')
+
+
+# ---------------------------------------------------------------------------
+# Organisation tables
+# ---------------------------------------------------------------------------
+
+class Organisation:
+    """Companies, people and their structure, kept as arrays the expense workers index into"""
+
+    def __init__(self, seed: int, companies: int, users: int, password_hash: bytes, permission_ids: Dict[str, bytes]):
+        self.seed = seed
+        self.tables: Dict[type, Dict[str, np.ndarray]] = {}
+        rng = np.random.default_rng([seed, 1])
+        now = np.full(companies, np.datetime64('now', 's')).astype('S19')
+
+        # Company sizes are heavy-tailed; every company gets an admin, a manager and a few employees
+        weights = rng.lognormal(0, 1.0, companies)
+        sizes = np.maximum(5, rng.multinomial(max(users - 5 * companies, 0), weights / weights.sum()) + 5)
+        self.company_ids = uuid_hex(rng, companies)
+        self.user_start = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+        self.tables[Company] = {
+            "id": self.company_ids,
+            "name": numbered(b'Synthetic Company ', np.arange(companies)),
+            "country": COUNTRIES[rng.integers(0, len(COUNTRIES), companies)],
+            "currency_code": CURRENCIES[rng.integers(0, len(CURRENCIES), companies)],
+            "created_at": now,
+        }
+
+        # Users: local index 0 is the admin, 1..managers are managers (1 doubles as finance approver)
+        total = int(sizes.sum())
+        self.user_company = np.repeat(np.arange(companies), sizes)
+        local = np.arange(total) - self.user_start[self.user_company]
+        manager_counts = np.maximum(1, sizes // 8)
+        role = np.where(local == 0, b'admin', np.where(local <= manager_counts[self.user_company], b'manager', b'employee'))
+        self.user_ids = uuid_hex(rng, total)
+        created = timestamps(rng, rng.integers(30, HISTORY_DAYS, total))
+        self.tables[User] = {
+            "id": self.user_ids,
+            "company_id": self.company_ids[self.user_company],
+            "email": numbered(b'user', np.arange(total), b'@' + DOMAIN.encode()),
+            "name": numbered(b'Synthetic User ', np.arange(total)),
+            "password_hash": np.full(total, password_hash),
+            "role": role,
+            "is_active": rng.random(total) < 0.97,
+            "created_at": created,
+        }
+        self.admin_index = self.user_start
+        self.finance_index = self.user_start + 1
+
+        # Managers report to the admin, employees to a manager of their company
+        manager_index = pick(rng, self.user_start + 1, manager_counts, self.user_company)
+        manager_index = np.where(role == b'manager', self.admin_index[self.user_company], manager_index)
+        self.manager_index = np.where(role == b'admin', -1, manager_index)
+
+        departments = np.maximum(1, sizes // 40)
+        department_start = np.concatenate(([0], np.cumsum(departments)[:-1]))
+        department_company = np.repeat(np.arange(companies), departments)
+        department_ids = uuid_hex(rng, len(department_company))
+        self.tables[Department] = {
+            "id": department_ids,
+            "company_id": self.company_ids[department_company],
+            "name": numbered(b'Department ', np.arange(len(department_company))),
+            "manager_id": self.user_ids[pick(rng, self.user_start + 1, manager_counts, department_company)],
+            "created_at": now[department_company],
+        }
+
+        teams = np.maximum(1, sizes // 12)
+        team_start = np.concatenate(([0], np.cumsum(teams)[:-1]))
+        team_company = np.repeat(np.arange(companies), teams)
+        team_ids = uuid_hex(rng, len(team_company))
+        self.tables[Team] = {
+            "id": team_ids,
+            "company_id": self.company_ids[team_company],
+            "name": numbered(b'Team ', np.arange(len(team_company))),
+            "team_lead_id": self.user_ids[pick(rng, self.user_start + 1, manager_counts, team_company)],
+            "created_at": now[team_company],
+        }
+
+        self.employee_ids = uuid_hex(rng, total)
+        has_manager = self.manager_index >= 0
+        self.tables[Employee] = {
+            "id": self.employee_ids,
+            "user_id": self.user_ids,
+            "company_id": self.company_ids[self.user_company],
+            "employee_id": numbered(b'E', np.arange(total)),
+            "department_id": department_ids[pick(rng, department_start, departments, self.user_company)],
+            "manager_id": np.where(has_manager, self.user_ids[np.maximum(self.manager_index, 0)], b''),
+            "hire_date": (EPOCH - rng.integers(30, 10 * 365, total)).astype('S10'),
+            "salary": np.round(rng.lognormal(11.2, 0.4, total), 0),
+            "is_active": self.tables[User]["is_active"],
+            "created_at": created,
+        }
+
+        members = (role != b'admin') & (rng.random(total) < 0.7)
+        member_company = self.user_company[members]
+        self.tables[TeamMember] = {
+            "id": uuid_hex(rng, int(members.sum())),
+            "team_id": team_ids[pick(rng, team_start, teams, member_company)],
+            "user_id": self.user_ids[members],
+            "role": np.where(role[members] == b'manager', b'lead', b'member'),
+            "joined_at": created[members],
+            "is_active": np.full(int(members.sum()), True),
+            "created_at": created[members],
+        }
+
+        # One role per UserRoleEnum per company, granted the resolver's defaults
+        role_names = [member.value.encode() for member in UserRoleEnum]
+        role_ids = uuid_hex(rng, companies * len(role_names)).reshape(companies, len(role_names))
+        self.tables[Role] = {
+            "id": role_ids.ravel(),
+            "company_id": np.repeat(self.company_ids, len(role_names)),
+            "name": np.tile(np.array(role_names), companies),
+            "is_active": np.full(role_ids.size, True),
+            "created_at": np.repeat(now, len(role_names)),
+        }
+        grant_role, grant_permission = [], []
+        for r, member in enumerate(UserRoleEnum):
+            for name in names_for(ROLE_DEFAULTS[member]):
+                grant_role.append(role_ids[:, r])
+                grant_permission.append(np.full(companies, permission_ids[name]))
+        grant_role = np.concatenate(grant_role)
+        self.tables[RolePermission] = {
+            "id": uuid_hex(rng, len(grant_role)),
+            "role_id": grant_role,
+            "permission_id": np.concatenate(grant_permission),
+            "created_at": np.full(len(grant_role), now[0]),
+        }
+        role_column = np.select([role == name for name in role_names], list(range(len(role_names))))
+        self.tables[UserRole] = {
+            "id": uuid_hex(rng, total),
+            "user_id": self.user_ids,
+            "role_id": role_ids[self.user_company, role_column],
+            "assigned_by": self.user_ids[self.admin_index[self.user_company]],
+            "assigned_at": created,
+            "is_active": np.full(total, True),
+            "created_at": created,
+        }
+
+        approver_roles = np.array([b'manager', b'finance', b'cfo'])
+        self.tables[ApprovalFlow] = {
+            "id": uuid_hex(rng, companies * 3),
+            "company_id": np.repeat(self.company_ids, 3),
+            "sequence": np.tile(np.arange(1, 4), companies),
+            "approver_role": np.tile(approver_roles, companies),
+            "is_mandatory": np.tile(np.array([True, True, False]), companies),
+            "created_at": np.repeat(now, 3),
+        }
+        self.tables[ApprovalRule] = {
+            "id": uuid_hex(rng, companies),
+            "company_id": self.company_ids,
+            "rule_type": np.full(companies, b'specific'),
+            "threshold": np.full(companies, float(CHAIN_THRESHOLDS[1])),
+            "specific_approver_id": self.user_ids[self.finance_index],
+            "created_at": now,
+        }
+
+        # Expense volume per employee is heavy-tailed: most file a few, some file a lot
+        activity = rng.lognormal(0, 1.2, total)
+        self.expense_cdf = np.cumsum(activity / activity.sum())
+
+    def expense_context(self):
+        """The arrays expense workers need; passed once to each worker process"""
+        return {
+            "seed": self.seed,
+            "employee_ids": self.employee_ids,
+            # Dashed form, as expense fingerprints spell employee ids
+            "employee_keys": np.array([str(uuid.UUID(hex=value.decode())).encode() for value in self.employee_ids.tolist()]),
+            "approvers": np.stack([
+                self.user_ids[np.where(self.manager_index >= 0, self.manager_index, self.finance_index[self.user_company])],
+                self.user_ids[self.finance_index[self.user_company]],
+                self.user_ids[self.admin_index[self.user_company]],
+            ], axis=1),
+            "expense_cdf": self.expense_cdf,
+        }
+
+
+# ---------------------------------------------------------------------------
+# Expenses and approvals
+# ---------------------------------------------------------------------------
+
+def expense_chunk(context, chunk_number: int, size: int):
+    """Expense and approval columns for one chunk, drawn from the chunk's own seed"""
+    rng = np.random.default_rng([context['seed'], 1000, chunk_number])
+    n = size
+    employee = np.minimum(np.searchsorted(context['expense_cdf'], rng.random(n), side='right'),
+                          len(context['employee_ids']) - 1)
+    ids = uuid_hex(rng, n)
+    amount = np.round(np.minimum(rng.lognormal(4.0, 1.3, n), 50000) + 1, 2)
+    days_ago = rng.integers(0, HISTORY_DAYS, n)
+    created = timestamps(rng, days_ago)
+    status_index = np.searchsorted(np.cumsum(STATUS_WEIGHTS), rng.random(n), side='right')
+    status = STATUSES[np.minimum(status_index, len(STATUSES) - 1)]
+    category = CATEGORIES[rng.integers(0, len(CATEGORIES), n)]
+
+    # Approval chain: 1-3 steps by amount; pending/rejected chains stop at a random step
+    chain = 1 + (amount >= CHAIN_THRESHOLDS[0]) + (amount >= CHAIN_THRESHOLDS[1])
+    stop = (rng.random(n) * chain).astype(np.int64)
+    decisive = np.where(status == b'approved', chain - 1, stop)
+    approvers = context['approvers'][employee]
+    step = np.arange(3)[None, :]
+    exists = step <= decisive[:, None]
+    step_status = np.where(step < decisive[:, None], b'approved', status[:, None])
+
+    currency = CURRENCIES[np.minimum(np.searchsorted(np.cumsum(CURRENCY_WEIGHTS), rng.random(n), side='right'), len(CURRENCIES) - 1)]
+    description = np.char.add(category, b' expense')
+    expense_date = (EPOCH - days_ago).astype('S10')
+    expenses = {
+        "id": ids,
+        "employee_id": context['employee_ids'][employee],
+        "amount": amount,
+        "currency": currency,
+        "category": category,
+        "description": description,
+        "date": expense_date,
+        "status": status,
+        "current_approver_id": np.where(status == b'pending', approvers[np.arange(n), decisive], b''),
+        "created_at": created,
+        # Duplicate detection looks expenses up by fingerprint; COPY bypasses the ORM hook that sets it
+        "fingerprint": fingerprints(context['employee_keys'][employee], amount, currency, expense_date, description),
+    }
+    approval_count = int(exists.sum())
+    acted = np.where(step_status == b'pending', b'', np.broadcast_to(created[:, None], (n, 3)))
+    approvals = {
+        "id": uuid_hex(rng, approval_count),
+        "expense_id": np.broadcast_to(ids[:, None], (n, 3))[exists],
+        "approver_id": approvers[exists],
+        "sequence": np.broadcast_to(step + 1, (n, 3))[exists],
+        "status": step_status[exists],
+        "acted_at": acted[exists],
+        "created_at": np.broadcast_to(created[:, None], (n, 3))[exists],
+    }
+    return expenses, approvals
+
+
+_worker = {}
+
+
+def _init_worker(context, database_url):
+    _worker['context'] = context
+    _worker['engine'] = create_engine(database_url, poolclass=NullPool)
+
+
+def _load_expense_chunk(chunk_number: int, size: int):
+    started = time.perf_counter()
+    expenses, approvals = expense_chunk(_worker['context'], chunk_number, size)
+    with _worker['engine'].begin() as connection:
+        load(connection, Expense, expenses)
+        load(connection, Approval, approvals)
+    return len(expenses['id']), len(approvals['id']), time.perf_counter() - started
+
+
+# ---------------------------------------------------------------------------
+# Driver
+# ---------------------------------------------------------------------------
+
+SECONDARY_INDEX_TABLES = (Expense, Approval)
+
+
+def _drop_secondary_indexes(connection):
+    for model in SECONDARY_INDEX_TABLES:
+        for index in model.__table__.indexes:
+            index.drop(connection, checkfirst=True)
+
+
+def _create_secondary_indexes(connection):
+    for model in SECONDARY_INDEX_TABLES:
+        for index in model.__table__.indexes:
+            index.create(connection, checkfirst=True)
+
+
+def _load_table(engine, model, columns):
+    started = time.perf_counter()
+    with engine.begin() as connection:
+        rows = load(connection, model, columns)
+    return model.__tablename__, rows, time.perf_counter() - started
+
+
+def generate(seed=42, companies=10, users=10000, expenses=1000000, workers=None, chunk_size=200000,
+             reset=False, defer_indexes=True):
+    started = time.perf_counter()
+    timings: Dict[str, float] = {}
+    rows: Dict[str, int] = {}
+    with app.app_context():
+        if reset:
+            db.drop_all()
+        db.create_all()
+        if db.session.scalar(select(User.id).limit(1)) is not None:
+            raise RuntimeError("Database already has users; pass --reset to drop and recreate all tables")
+        sync_permissions()
+        # Monthly partitions for the whole history, so nothing lands in the default partitions
+        with db.engine.begin() as connection:
+            rows['partitions_created'] = len(ensure_partitions(
+                connection, date.today() - timedelta(days=HISTORY_DAYS), date.today()
+            ))
+        permission_ids = {p.name: p.id.hex.encode() for p in Permission.query.all()}
+        rows['permissions'] = len(permission_ids)
+        password_hash = bcrypt.generate_password_hash(PASSWORD)
+        database_url = app.config['SQLALCHEMY_DATABASE_URI']
+        engine = db.engine
+        postgres = engine.dialect.name == 'postgresql'
+        workers = workers or (os.cpu_count() or 1)
+        if not postgres:
+            # sqlite and friends serialize writers; parallel loads would only contend for the lock
+            workers = 1
+
+        phase = time.perf_counter()
+        org = Organisation(seed, companies, users, password_hash, permission_ids)
+        timings['generate_organisation'] = time.perf_counter() - phase
+
+        phase = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for wave in WAVES:
+                for name, count, _ in pool.map(lambda model: _load_table(engine, model, org.tables[model]), wave):
+                    rows[name] = count
+        with engine.begin() as connection:
+            connection.execute(
+                Company.__table__.update()
+                .where(Company.id == User.company_id, User.role == UserRoleEnum.admin)
+                .values(owner_id=User.id)
+            )
+        timings['load_organisation'] = time.perf_counter() - phase
+
+        if postgres and defer_indexes:
+            with engine.begin() as connection:
+                _drop_secondary_indexes(connection)
+
+        phase = time.perf_counter()
+        context = org.expense_context()
+        chunks = [(number, min(chunk_size, expenses - start)) for number, start in enumerate(range(0, expenses, chunk_size))]
+        rows['expenses'] = rows['approvals'] = 0
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(context, database_url)) as pool:
+                results = pool.map(_load_expense_chunk, *zip(*chunks)) if chunks else []
+                for loaded, approvals, elapsed in results:
+                    rows['expenses'] += loaded
+                    rows['approvals'] += approvals
+                    print(f"  {rows['expenses']:>12,} expenses ({loaded / elapsed:,.0f} rows/s per worker)", file=sys.stderr)
+        else:
+            _init_worker(context, database_url)
+            for number, size in chunks:
+                loaded, approvals, _ = _load_expense_chunk(number, size)
+                rows['expenses'] += loaded
+                rows['approvals'] += approvals
+        timings['load_expenses'] = time.perf_counter() - phase
+
+        phase = time.perf_counter()
+        if postgres and defer_indexes:
+            with engine.begin() as connection:
+                _create_secondary_indexes(connection)
+        if postgres:
+            with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+                connection.execute(text('ANALYZE'))
+        timings['indexes_and_analyze'] = time.perf_counter() - phase
+
+        # Derived tables are rebuilt the same way the CLI does after bulk changes
+        phase = time.perf_counter()
+        rows['org_closure'] = rebuild_closure()['closure_rows']
+        rows['expense_rollups'] = refresh_all_rollups()['rollup_rows']
+        timings['derived_tables'] = time.perf_counter() - phase
+
+    elapsed = time.perf_counter() - started
+    return {
+        "seed": seed,
+        "workers": workers,
+        "rows": rows,
+        "timings_seconds": {phase: round(seconds, 2) for phase, seconds in timings.items()},
+        "elapsed_seconds": round(elapsed, 2),
+        "expenses_per_second": round(rows['expenses'] / timings['load_expenses'], 1) if timings['load_expenses'] else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate and bulk-load synthetic data')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed; same seed, same data')
+    parser.add_argument('--companies', type=int, default=10)
+    parser.add_argument('--users', type=int, default=10000, help='Total users (one employee row each)')
+    parser.add_argument('--expenses', type=int, default=1000000, help='Total expenses')
+    parser.add_argument('--workers', type=int, help='Parallel loaders (default: CPU count)')
+    parser.add_argument('--chunk-size', type=int, default=200000, help='Expenses per COPY chunk')
+    parser.add_argument('--reset', action='store_true', help='Drop and recreate all tables first')
+    parser.add_argument('--defer-indexes', action=argparse.BooleanOptionalAction, default=True,
+                        help='Drop expense/approval secondary indexes during the load and rebuild them after')
+    args = parser.parse_args()
+
+    report = generate(args.seed, args.companies, args.users, args.expenses, args.workers, args.chunk_size,
+                      args.reset, args.defer_indexes)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+HTTP load test
+Drives key endpoints with N concurrent keep-alive clients and reports RPS and
+p50/p95/p99 latency; with --workers it starts serve.py once per worker count
+"""
+
+import argparse
+import http.client
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_ENDPOINTS = ['/health', '/api/expenses', '/api/auth/me']
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def login(base_url, email, password):
+    parts = urlsplit(base_url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+    conn.request('POST', '/api/auth/login', body=json.dumps({"email": email, "password": password}),
+                 headers={'Content-Type': 'application/json'})
+    response = conn.getresponse()
+    body = json.loads(response.read() or b'{}')
+    if response.status != 200:
+        raise RuntimeError(f"login failed: {response.status} {body}")
+    return body['access_token']
+
+
+def run_endpoint(base_url, path, concurrency, duration, token=None, warmup=1.0):
+    """Hammer one endpoint; each client thread reuses one connection"""
+    parts = urlsplit(base_url)
+    headers = {'Authorization': f"Bearer {token}"} if token else {}
+    latencies = []
+    statuses = {}
+    errors = [0]
+    lock = threading.Lock()
+    start_at = time.perf_counter() + warmup
+    stop_at = start_at + duration
+
+    def client():
+        conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+        local_latencies = []
+        local_statuses = {}
+        local_errors = 0
+        while True:
+            started = time.perf_counter()
+            if started >= stop_at:
+                break
+            try:
+                conn.request('GET', path, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+                local_errors += 1
+                continue
+            finished = time.perf_counter()
+            if started >= start_at:
+                local_latencies.append(finished - started)
+                local_statuses[status] = local_statuses.get(status, 0) + 1
+        conn.close()
+        with lock:
+            latencies.extend(local_latencies)
+            for status, count in local_statuses.items():
+                statuses[status] = statuses.get(status, 0) + count
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=client, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    ms = lambda value: round(value * 1000, 2) if value is not None else None
+    return {
+        "endpoint": path,
+        "requests": len(latencies),
+        "rps": round(len(latencies) / duration, 1),
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "max_ms": ms(latencies[-1] if latencies else None),
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+        "connection_errors": errors[0],
+    }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_health(base_url, timeout=30):
+    parts = urlsplit(base_url)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=2)
+            conn.request('GET', '/health')
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"server at {base_url} did not become healthy")
+
+
+def start_server(workers, threads=None, asgi=False):
+    port = free_port()
+    command = [sys.executable, os.path.join(BACKEND_DIR, 'serve.py'), '--bind', f"127.0.0.1:{port}",
+               '--workers', str(workers)]
+    if threads is not None:
+        command += ['--threads', str(threads)]
+    if asgi:
+        command.append('--asgi')
+    env = dict(os.environ, GUNICORN_ACCESS_LOG='')
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_for_health(base_url)
+    except RuntimeError:
+        process.kill()
+        raise
+    return process, base_url
+
+
+def stop_server(process, timeout=40):
+    # SIGTERM is gunicorn's graceful shutdown: in-flight requests are drained first
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def print_table(label, results):
+    print(f"\n{label}")
+    print(f"  {'endpoint':<28} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}  statuses")
+    for r in results:
+        print(f"  {r['endpoint']:<28} {r['rps']:>9} {r['p50_ms']!s:>9} {r['p95_ms']!s:>9} {r['p99_ms']!s:>9}  {r['statuses']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the backend HTTP API')
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000', help='Server to test when --workers is not given')
+    parser.add_argument('--endpoint', action='append', help=f"Path to GET (repeatable, default: {' '.join(DEFAULT_ENDPOINTS)})")
+    parser.add_argument('--concurrency', type=int, default=32, help='Concurrent keep-alive clients')
+    parser.add_argument('--duration', type=float, default=10, help='Measured seconds per endpoint')
+    parser.add_argument('--warmup', type=float, default=1, help='Unmeasured seconds before each run')
+    parser.add_argument('--token', help='Bearer token for authenticated endpoints')
+    parser.add_argument('--email', help='Log in with this user to obtain a token')
+    parser.add_argument('--password', help='Password for --email')
+    parser.add_argument('--workers', help='Comma-separated worker counts; starts serve.py for each (e.g. 1,2,4)')
+    parser.add_argument('--threads', type=int, help='Threads per worker when starting servers')
+    parser.add_argument('--output', help='Write JSON results to this file')
+    args = parser.parse_args()
+
+    endpoints = args.endpoint or DEFAULT_ENDPOINTS
+    runs = []
+
+    def measure(base_url, label):
+        token = args.token
+        if token is None and args.email:
+            token = login(base_url, args.email, args.password)
+        results = [
+            run_endpoint(base_url, path, args.concurrency, args.duration, token, args.warmup)
+            for path in endpoints
+        ]
+        print_table(label, results)
+        runs.append({"label": label, "results": results})
+
+    if args.workers:
+        for workers in [int(w) for w in args.workers.split(',')]:
+            process, base_url = start_server(workers, args.threads)
+            try:
+                measure(base_url, f"{workers} worker(s), {args.concurrency} clients")
+            finally:
+                stop_server(process)
+    else:
+        measure(args.base_url, f"{args.base_url}, {args.concurrency} clients")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"concurrency": args.concurrency, "duration": args.duration, "runs": runs}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
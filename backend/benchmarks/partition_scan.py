@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Partition scan benchmark
+Times the date-bounded queries the expense, approval and report paths issue (plus an
+unbounded count as a control) directly against the database, and on Postgres records
+how many partitions each plan touches. Run it once on plain tables and once on
+partitioned ones, then compare:
+
+    python benchmarks/generate_data.py --reset --expenses 10000000
+    FLASK_APP=app.main flask db stamp head && FLASK_APP=app.main flask db downgrade base
+    python benchmarks/partition_scan.py run -o plain.json
+    FLASK_APP=app.main flask db upgrade
+    python benchmarks/partition_scan.py run -o partitioned.json
+    python benchmarks/partition_scan.py compare plain.json partitioned.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+from sqlalchemy import select, func, text
+
+from app import app, db
+from app.models import Expense, Approval, Employee
+from app.partitions import PARTITIONED_TABLES, is_partitioned
+from app.reports import month_start, next_month
+from suite import git_revision
+
+
+def build_queries(connection):
+    """Query name -> statement; bounds are relative to today so runs on the same data match"""
+    this_month = month_start(date.today())
+    last_month = month_start(this_month - timedelta(days=1))
+    quarter_start = month_start(this_month - timedelta(days=92))
+    busiest = connection.execute(
+        select(Expense.employee_id).where(Expense.date >= last_month, Expense.date < this_month)
+        .group_by(Expense.employee_id).order_by(func.count().desc()).limit(1)
+    ).scalar()
+    company = connection.execute(select(Employee.company_id).where(Employee.id == busiest)).scalar()
+
+    return {
+        # Rollup refresh for one (company, month) bucket
+        'month_bucket': (
+            select(Expense.category, Expense.status, func.count(), func.sum(Expense.amount))
+            .join(Employee, Employee.id == Expense.employee_id)
+            .where(Employee.company_id == company, Expense.date >= last_month, Expense.date < this_month)
+            .group_by(Expense.category, Expense.status)
+        ),
+        # Team listing bounded with ?from=/?to=
+        'quarter_listing': (
+            select(Expense.id, Expense.amount, Expense.status, Expense.date)
+            .where(Expense.date >= quarter_start, Expense.date < this_month)
+            .order_by(Expense.date.desc(), Expense.id).limit(50)
+        ),
+        # Near-duplicate window lookup
+        'duplicate_window': (
+            select(Expense.id, Expense.amount, Expense.description)
+            .where(Expense.employee_id == busiest, Expense.date >= last_month, Expense.date < last_month + timedelta(days=7))
+        ),
+        'approvals_last_month': (
+            select(Approval.status, func.count())
+            .where(Approval.created_at >= datetime.combine(last_month, datetime.min.time()),
+                   Approval.created_at < datetime.combine(next_month(last_month), datetime.min.time()))
+            .group_by(Approval.status)
+        ),
+        # Control: nothing to prune, should not get faster
+        'full_count': select(func.count()).select_from(Expense),
+    }
+
+
+def partitions_scanned(connection, statement) -> int:
+    """Distinct relations the Postgres plan reads from the partitioned tables"""
+    compiled = statement.compile(connection, compile_kwargs={"literal_binds": True})
+    plan = connection.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}")).scalar()
+    plan = json.loads(plan) if isinstance(plan, str) else plan
+    relations = set()
+
+    def walk(node):
+        name = node.get('Relation Name')
+        if name and any(name == table or name.startswith(f"{table}_") for table in PARTITIONED_TABLES):
+            relations.add(name)
+        for child in node.get('Plans', []):
+            walk(child)
+
+    walk(plan[0]['Plan'])
+    return len(relations)
+
+
+def run(repeat=5):
+    with app.app_context():
+        with db.engine.connect() as connection:
+            postgres = connection.dialect.name == 'postgresql'
+            queries = build_queries(connection)
+            results = []
+            print(f"  {'query':<22} {'min ms':>9} {'median ms':>10} {'partitions':>11}")
+            for name, statement in queries.items():
+                connection.execute(statement).all()  # warm the cache
+                timings = []
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    connection.execute(statement).all()
+                    timings.append((time.perf_counter() - started) * 1000)
+                result = {
+                    "query": name,
+                    "min_ms": round(min(timings), 2),
+                    "median_ms": round(statistics.median(timings), 2),
+                    "partitions": partitions_scanned(connection, statement) if postgres else None,
+                }
+                results.append(result)
+                print(f"  {name:<22} {result['min_ms']:>9} {result['median_ms']:>10} {result['partitions']!s:>11}")
+
+            return {
+                "created_at": datetime.utcnow().isoformat(),
+                "git_revision": git_revision(),
+                "python": platform.python_version(),
+                "database": connection.dialect.name,
+                "partitioned": {table: bool(is_partitioned(connection, table)) for table in PARTITIONED_TABLES},
+                "rows": {
+                    "expenses": connection.execute(select(func.count()).select_from(Expense)).scalar(),
+                    "approvals": connection.execute(select(func.count()).select_from(Approval)).scalar(),
+                },
+                "repeat": repeat,
+                "results": results,
+            }
+
+
+def cmd_run(args):
+    report = run(args.repeat)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+def cmd_compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    before = {result['query']: result for result in baseline['results']}
+
+    print(f"{baseline['rows']['expenses']:,} expenses, partitioned {baseline['partitioned']} -> {current['partitioned']}")
+    print(f"  {'query':<22} {'before ms':>10} {'after ms':>10} {'speedup':>8} {'partitions':>11}")
+    for result in current['results']:
+        previous = before.get(result['query'])
+        if previous is None:
+            continue
+        speedup = previous['median_ms'] / result['median_ms'] if result['median_ms'] else float('inf')
+        print(f"  {result['query']:<22} {previous['median_ms']:>10} {result['median_ms']:>10} {speedup:>7.1f}x "
+              f"{previous['partitions']!s:>5} -> {result['partitions']!s}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time date-bounded scans on expenses and approvals')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='Time the queries against DATABASE_URL')
+    run_parser.add_argument('--repeat', type=int, default=5, help='Timed executions per query')
+    run_parser.add_argument('--output', '-o', help='Write JSON results to this file')
+
+    compare_parser = subparsers.add_parser('compare', help='Before/after table for two result files')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        cmd_run(args)
+    elif args.command == 'compare':
+        cmd_compare(args)
+
+
+if __name__ == '__main__':
+    main()
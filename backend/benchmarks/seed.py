@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Benchmark data seeder
+Fills an empty database with a deterministic, scaled set of companies, users,
+employees (with a reporting tree), expenses and approval chains. Rows are generated
+from --seed, so two runs at the same scale produce the same data set.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert, func, select
+
+from app import app, db, bcrypt
+from app.models import (
+    Company, User, Employee, Department, Expense, Approval, UserRoleEnum
+)
+from app.permissions import sync_permissions
+from app.hierarchy import rebuild_closure
+from app.partitions import ensure_partitions
+from app.reports import refresh_all_rollups
+
+BENCH_PASSWORD = 'bench-password-1'
+BENCH_DOMAIN = 'bench.local'
+CATEGORIES = ('travel', 'meals', 'lodging', 'software', 'office', 'training', 'transport')
+CURRENCIES = ('USD', 'EUR', 'GBP', 'INR')
+STATUSES = ('pending', 'approved', 'rejected')
+
+SCALES = {
+    # companies, users per company, expenses per employee (mean)
+    'tiny': (1, 20, 5),
+    'small': (2, 100, 20),
+    'medium': (5, 500, 40),
+    'large': (10, 2000, 50),
+}
+
+BATCH_SIZE = 5000
+
+
+def admin_email(company_index):
+    return f"admin-{company_index}@{BENCH_DOMAIN}"
+
+
+def user_email(company_index, user_index):
+    return f"user-{company_index}-{user_index}@{BENCH_DOMAIN}"
+
+
+class Seeder:
+    def __init__(self, companies, users_per_company, expenses_per_employee, seed=42):
+        self.companies = companies
+        self.users_per_company = users_per_company
+        self.expenses_per_employee = expenses_per_employee
+        self.rng = random.Random(seed)
+        self.counts = {}
+
+    def uuid(self):
+        return uuid.UUID(int=self.rng.getrandbits(128), version=4)
+
+    def _insert(self, model, rows):
+        for start in range(0, len(rows), BATCH_SIZE):
+            db.session.execute(insert(model), rows[start:start + BATCH_SIZE])
+        self.counts[model.__tablename__] = self.counts.get(model.__tablename__, 0) + len(rows)
+
+    def run(self):
+        now = datetime.utcnow().replace(microsecond=0)
+        password_hash = bcrypt.generate_password_hash(BENCH_PASSWORD).decode('utf-8')
+        for c in range(self.companies):
+            self._seed_company(c, now, password_hash)
+            db.session.commit()
+        return self.counts
+
+    def _seed_company(self, c, now, password_hash):
+        rng = self.rng
+        company_id = self.uuid()
+        admin_id = self.uuid()
+        self._insert(Company, [{
+            "id": company_id, "name": f"Bench Company {c}", "country": "US",
+            "currency_code": "USD", "owner_id": None, "created_at": now,
+        }])
+
+        users = [{
+            "id": admin_id, "company_id": company_id, "email": admin_email(c), "name": f"Admin {c}",
+            "password_hash": password_hash, "role": UserRoleEnum.admin, "is_active": True, "created_at": now,
+        }]
+        # Roughly one manager per eight people
+        for u in range(1, self.users_per_company):
+            role = UserRoleEnum.manager if u % 8 == 1 else UserRoleEnum.employee
+            users.append({
+                "id": self.uuid(), "company_id": company_id, "email": user_email(c, u), "name": f"User {c}-{u}",
+                "password_hash": password_hash, "role": role, "is_active": True, "created_at": now,
+            })
+        self._insert(User, users)
+        db.session.execute(Company.__table__.update().where(Company.id == company_id).values(owner_id=admin_id))
+
+        departments = [
+            {"id": self.uuid(), "company_id": company_id, "name": f"Department {d}", "created_at": now}
+            for d in range(max(1, self.users_per_company // 50))
+        ]
+        self._insert(Department, departments)
+
+        # Managers report to the admin, everyone else to a manager
+        managers = [user["id"] for user in users if user["role"] == UserRoleEnum.manager] or [admin_id]
+        employees = []
+        manager_of = {}
+        for i, user in enumerate(users):
+            if user["id"] == admin_id:
+                manager_id = None
+            elif user["role"] == UserRoleEnum.manager:
+                manager_id = admin_id
+            else:
+                manager_id = rng.choice(managers)
+            manager_of[user["id"]] = manager_id
+            employees.append({
+                "id": self.uuid(), "user_id": user["id"], "company_id": company_id,
+                "employee_id": f"E{c:02d}{i:06d}", "department_id": rng.choice(departments)["id"],
+                "manager_id": manager_id, "hire_date": date(2020, 1, 1) + timedelta(days=rng.randrange(1500)),
+                "salary": Decimal(rng.randrange(40000, 200000)), "is_active": True, "created_at": now,
+            })
+        self._insert(Employee, employees)
+
+        expenses = []
+        approvals = []
+        today = date.today()
+        for employee in employees:
+            # Skewed: most people file a few expenses, some file many
+            count = min(int(rng.expovariate(1 / self.expenses_per_employee)), self.expenses_per_employee * 10)
+            approver = manager_of[employee["user_id"]] or admin_id
+            for _ in range(count):
+                expense_id = self.uuid()
+                status = rng.choices(STATUSES, weights=(5, 12, 1))[0]
+                expenses.append({
+                    "id": expense_id, "employee_id": employee["id"],
+                    "amount": Decimal(rng.randrange(100, 500000)) / 100,
+                    "currency": rng.choices(CURRENCIES, weights=(10, 4, 2, 1))[0],
+                    "category": rng.choice(CATEGORIES), "description": f"Bench expense {len(expenses)}",
+                    "date": today - timedelta(days=rng.randrange(730)), "status": status,
+                    "current_approver_id": approver if status == 'pending' else None, "created_at": now,
+                })
+                approvals.append({
+                    "id": self.uuid(), "expense_id": expense_id, "approver_id": approver, "sequence": 1,
+                    "status": status, "acted_at": None if status == 'pending' else now, "created_at": now,
+                })
+                if status != 'pending' and approver != admin_id and rng.random() < 0.3:
+                    approvals.append({
+                        "id": self.uuid(), "expense_id": expense_id, "approver_id": admin_id, "sequence": 2,
+                        "status": status, "acted_at": now, "created_at": now,
+                    })
+        self._insert(Expense, expenses)
+        self._insert(Approval, approvals)
+
+
+def seed(scale='small', seed_value=42, reset=False, companies=None, users=None, expenses=None):
+    """Create tables and seed them; refuses to touch a non-empty database unless reset"""
+    preset = SCALES[scale]
+    with app.app_context():
+        if reset:
+            db.drop_all()
+        db.create_all()
+        if db.session.scalar(select(func.count()).select_from(User)):
+            raise RuntimeError("Database already has users; pass --reset to drop and recreate all tables")
+        sync_permissions()
+        with db.engine.begin() as connection:
+            ensure_partitions(connection, date.today() - timedelta(days=730), date.today())
+
+        started = time.perf_counter()
+        seeder = Seeder(companies or preset[0], users or preset[1], expenses or preset[2], seed_value)
+        counts = seeder.run()
+        rebuild_closure()
+        refresh_all_rollups()
+        return {
+            "scale": scale,
+            "seed": seed_value,
+            "rows": counts,
+            "elapsed_seconds": round(time.perf_counter() - started, 2),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Seed a database with deterministic benchmark data')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small', help='Size preset')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed')
+    parser.add_argument('--companies', type=int, help='Override the preset company count')
+    parser.add_argument('--users', type=int, help='Override users per company')
+    parser.add_argument('--expenses', type=int, help='Override mean expenses per employee')
+    parser.add_argument('--reset', action='store_true', help='Drop and recreate all tables first')
+    args = parser.parse_args()
+
+    print(json.dumps(seed(args.scale, args.seed, args.reset, args.companies, args.users, args.expenses), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+API benchmark suite
+Seeds a local database (see seed.py), starts serve.py against it and drives the hot
+paths: login, /me, expense list/create, schema reflect/query/export and admin
+employee operations. Throughput and latency percentiles go to JSON; `compare`
+flags regressions between two result files.
+
+    python benchmarks/suite.py seed --scale small --reset
+    python benchmarks/suite.py run --output before.json
+    python benchmarks/suite.py compare before.json after.json
+"""
+
+import argparse
+import http.client
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from datetime import date, datetime
+from urllib.parse import urlsplit
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+
+from load_test import percentile, start_server, stop_server, BACKEND_DIR
+
+sys.path.insert(0, BACKEND_DIR)
+
+# Scenario name -> (method, path template, auth, concurrency); bodies and path values come from the fixture
+SCENARIOS = {
+    'login': ('POST', '/api/auth/login', None, 4),
+    'me': ('GET', '/api/auth/me', 'admin', 16),
+    'expenses_team': ('GET', '/api/expenses/team?per_page=50', 'manager', 16),
+    'expenses_all_sparse': ('GET', '/api/expenses?fields=id,amount,status', None, 2),
+    'expense_create': ('POST', '/api/expenses', None, 8),
+    'schema_tables': ('GET', '/api/schema/tables', None, 8),
+    'schema_table': ('GET', '/api/schema/tables/expenses', None, 8),
+    'schema_query': ('POST', '/api/schema/tables/expenses/query', None, 8),
+    'schema_export': ('GET', '/api/schema/export', None, 2),
+    'admin_employees': ('GET', '/api/auth/admin/employees', 'admin', 8),
+    'admin_toggle_status': ('POST', '/api/auth/admin/employees/{toggle_user_id}/toggle-status', 'admin', 4),
+}
+
+# Relative change beyond which compare reports a regression
+DEFAULT_THRESHOLD = 0.10
+
+
+def load_fixture():
+    """Credentials and ids the scenarios need, read from the seeded database"""
+    from app import app
+    from app.models import User, Employee, UserRoleEnum
+    from seed import BENCH_PASSWORD, admin_email
+
+    with app.app_context():
+        admin = User.query.filter_by(email=admin_email(0)).first()
+        if admin is None:
+            raise RuntimeError("No benchmark data found; run `suite.py seed` first")
+        manager = User.query.filter_by(company_id=admin.company_id, role=UserRoleEnum.manager).first()
+        target = User.query.filter_by(company_id=admin.company_id, role=UserRoleEnum.employee).first()
+        employee_ids = [
+            str(row.id) for row in
+            Employee.query.filter_by(company_id=admin.company_id).order_by(Employee.id).limit(200)
+        ]
+        return {
+            "password": BENCH_PASSWORD,
+            "admin_email": admin.email,
+            "manager_email": (manager or admin).email,
+            "toggle_user_id": str(target.id),
+            "employee_ids": employee_ids,
+        }
+
+
+def request_body(name, fixture, counter):
+    if name == 'login':
+        return {"email": fixture['admin_email'], "password": fixture['password']}
+    if name == 'expense_create':
+        n = next(counter)
+        return {
+            "employee_id": fixture['employee_ids'][n % len(fixture['employee_ids'])],
+            "amount": f"{10 + n % 990}.{n % 100:02d}",
+            "currency": "USD",
+            "category": "travel",
+            "description": f"Benchmark expense {n}",
+            "date": date.today().isoformat(),
+        }
+    if name == 'schema_query':
+        return {"filters": {"category": "meals", "status": "pending"}, "limit": 50}
+    if SCENARIOS[name][0] == 'POST':
+        return {}
+    return None
+
+
+def run_scenario(base_url, name, fixture, tokens, duration, warmup, concurrency=None):
+    """Drive one scenario with keep-alive clients; returns throughput and latency percentiles"""
+    method, path, auth, default_concurrency = SCENARIOS[name]
+    concurrency = concurrency or default_concurrency
+    path = path.format(**fixture)
+    parts = urlsplit(base_url)
+    headers = {'Content-Type': 'application/json'}
+    if auth:
+        headers['Authorization'] = f"Bearer {tokens[auth]}"
+    counter = itertools.count()
+    latencies, statuses, errors = [], {}, [0]
+    lock = threading.Lock()
+    start_at = time.perf_counter() + warmup
+    stop_at = start_at + duration
+
+    def client():
+        conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=60)
+        local_latencies, local_statuses, local_errors = [], {}, 0
+        while True:
+            started = time.perf_counter()
+            if started >= stop_at:
+                break
+            body = request_body(name, fixture, counter)
+            try:
+                conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+                response = conn.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=60)
+                local_errors += 1
+                continue
+            if started >= start_at:
+                local_latencies.append(time.perf_counter() - started)
+                local_statuses[response.status] = local_statuses.get(response.status, 0) + 1
+        conn.close()
+        with lock:
+            latencies.extend(local_latencies)
+            for status, count in local_statuses.items():
+                statuses[status] = statuses.get(status, 0) + count
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=client, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    ms = lambda value: round(value * 1000, 2) if value is not None else None
+    failed = sum(count for status, count in statuses.items() if status >= 400) + errors[0]
+    return {
+        "scenario": name,
+        "method": method,
+        "path": path,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "rps": round(len(latencies) / duration, 1),
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "max_ms": ms(latencies[-1] if latencies else None),
+        "error_rate": round(failed / max(len(latencies) + errors[0], 1), 4),
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+    }
+
+
+def login(base_url, email, password):
+    parts = urlsplit(base_url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=60)
+    conn.request('POST', '/api/auth/login', body=json.dumps({"email": email, "password": password}),
+                 headers={'Content-Type': 'application/json'})
+    response = conn.getresponse()
+    body = json.loads(response.read() or b'{}')
+    if response.status != 200:
+        raise RuntimeError(f"login as {email} failed: {response.status} {body}")
+    return body['access_token']
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def cmd_run(args):
+    fixture = load_fixture()
+    scenarios = args.scenario or list(SCENARIOS)
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    process = None
+    base_url = args.base_url
+    if base_url is None:
+        process, base_url = start_server(args.workers, args.threads)
+    try:
+        tokens = {
+            'admin': login(base_url, fixture['admin_email'], fixture['password']),
+            'manager': login(base_url, fixture['manager_email'], fixture['password']),
+        }
+        results = []
+        print(f"  {'scenario':<22} {'conc':>5} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>8}")
+        for name in scenarios:
+            result = run_scenario(base_url, name, fixture, tokens, args.duration, args.warmup, args.concurrency)
+            results.append(result)
+            print(f"  {name:<22} {result['concurrency']:>5} {result['rps']:>9} {result['p50_ms']!s:>9} "
+                  f"{result['p95_ms']!s:>9} {result['p99_ms']!s:>9} {result['error_rate']:>8.2%}")
+    finally:
+        if process is not None:
+            stop_server(process)
+
+    report = {
+        "created_at": datetime.utcnow().isoformat(),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "server": {"base_url": args.base_url, "workers": args.workers, "threads": args.threads},
+        "duration": args.duration,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    return report
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """Per-scenario relative changes; latency up or throughput down beyond threshold is a regression"""
+    before = {result['scenario']: result for result in baseline['results']}
+    rows = []
+    for result in current['results']:
+        previous = before.get(result['scenario'])
+        if previous is None:
+            continue
+        changes = {}
+        regressions = []
+        for metric in ('rps', 'p50_ms', 'p95_ms', 'p99_ms'):
+            old, new = previous.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            changes[metric] = round(change, 4)
+            worse = -change if metric == 'rps' else change
+            if worse > threshold:
+                regressions.append(metric)
+        if result['error_rate'] > previous['error_rate'] + 0.01:
+            regressions.append('error_rate')
+        rows.append({"scenario": result['scenario'], "changes": changes, "regressions": regressions})
+    return rows
+
+
+def cmd_compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    rows = compare(baseline, current, args.threshold)
+
+    print(f"{baseline.get('git_revision')} -> {current.get('git_revision')} (threshold {args.threshold:.0%})")
+    print(f"  {'scenario':<22} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for row in rows:
+        cells = ' '.join(f"{row['changes'].get(m, 0):>+8.1%}" for m in ('rps', 'p50_ms', 'p95_ms', 'p99_ms'))
+        flag = f"  ❌ {', '.join(row['regressions'])}" if row['regressions'] else ''
+        print(f"  {row['scenario']:<22} {cells}{flag}")
+    regressed = [row['scenario'] for row in rows if row['regressions']]
+    if regressed:
+        print(f"\n❌ Regressions in: {', '.join(regressed)}")
+        sys.exit(1)
+    print("\n✅ No regressions")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the API hot paths')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    seed_parser = subparsers.add_parser('seed', help='Seed the database (same options as seed.py)')
+    seed_parser.add_argument('--scale', default='small')
+    seed_parser.add_argument('--seed', type=int, default=42)
+    seed_parser.add_argument('--reset', action='store_true', help='Drop and recreate all tables first')
+
+    run_parser = subparsers.add_parser('run', help='Run scenarios and record results')
+    run_parser.add_argument('--scenario', action='append', help=f"Scenario to run (repeatable): {', '.join(SCENARIOS)}")
+    run_parser.add_argument('--base-url', help='Use a running server instead of starting serve.py')
+    run_parser.add_argument('--workers', type=int, default=2, help='Workers when starting serve.py')
+    run_parser.add_argument('--threads', type=int, default=4, help='Threads per worker when starting serve.py')
+    run_parser.add_argument('--concurrency', type=int, help='Override every scenario\'s client count')
+    run_parser.add_argument('--duration', type=float, default=10, help='Measured seconds per scenario')
+    run_parser.add_argument('--warmup', type=float, default=1, help='Unmeasured seconds before each scenario')
+    run_parser.add_argument('--output', '-o', help='Write JSON results to this file')
+
+    compare_parser = subparsers.add_parser('compare', help='Flag regressions between two result files')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                                help='Relative change counted as a regression (default 0.10)')
+    args = parser.parse_args()
+
+    if args.command == 'seed':
+        from seed import seed
+        print(json.dumps(seed(args.scale, args.seed, args.reset), indent=2))
+    elif args.command == 'run':
+        cmd_run(args)
+    elif args.command == 'compare':
+        cmd_compare(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Expense CLI Tool
+Command-line interface for bulk expense operations
+"""
+
+import argparse
+import json
+import sys
+import time
+import uuid
+from datetime import date
+from app import app, db
+from app.expense_import import ExpenseImporter, DEFAULT_CHUNK_SIZE
+from app.reports import refresh_all_rollups
+from app.hierarchy import rebuild_closure
+from app.outbox import dispatch_pending, outbox_stats, outbox_dispatcher
+from app.archive import ExpenseArchiver, archive_status, archived_before, retention_cutoff
+from app.replicas import replica_status
+from app.partitions import maintain_partitions, ensure_partitions, existing_partitions, PARTITIONED_TABLES
+
+
+def print_json(data, indent=2):
+    """Pretty print JSON data"""
+    print(json.dumps(data, indent=indent, default=str))
+
+
+def cmd_import(path, fmt=None, chunk_size=DEFAULT_CHUNK_SIZE, strict=False, check_duplicates=True):
+    """Import expenses from a CSV or XLSX file"""
+    with app.app_context():
+        importer = ExpenseImporter(chunk_size=chunk_size, strict=strict, check_duplicates=check_duplicates)
+        with open(path, 'rb') as f:
+            report = importer.import_stream(f, path, fmt)
+
+        print(f"📥 Processed {report['rows_processed']} rows in {report['elapsed_seconds']}s "
+              f"({report['rows_per_second']} rows/sec via {report['load_method']})")
+        print(f"✅ Imported: {report['rows_imported']}")
+        if report['rows_failed']:
+            print(f"❌ Failed: {report['rows_failed']}")
+        if report['rows_flagged']:
+            print(f"⚠️  Flagged as possible duplicates: {report['rows_flagged']}")
+        print_json(report)
+        if report['rows_failed'] and strict:
+            sys.exit(1)
+
+
+def cmd_refresh_rollups(company_id=None):
+    """Rebuild the spend rollup table (run from cron for scheduled refreshes)"""
+    with app.app_context():
+        # Months holding archived expenses keep their rollups
+        result = refresh_all_rollups(uuid.UUID(company_id) if company_id else None, since=archived_before())
+        print(f"✅ Rebuilt {result['rollup_rows']} rollup rows in {result['elapsed_seconds']}s")
+        print_json(result)
+
+
+def cmd_rebuild_org_chart(company_id=None):
+    """Rebuild the org-chart closure table (after writes that bypassed the ORM)"""
+    with app.app_context():
+        result = rebuild_closure(uuid.UUID(company_id) if company_id else None)
+        print(f"✅ Rebuilt {result['closure_rows']} closure rows for {result['companies']} companies "
+              f"in {result['elapsed_seconds']}s")
+        if result['cycles_broken']:
+            print(f"⚠️  Manager cycles cut at: {', '.join(result['cycles_broken'])}")
+        print_json(result)
+
+
+def cmd_dispatch_outbox(once=False, workers=1, batch_size=None):
+    """Deliver outbox messages; workers in several processes can run side by side"""
+    with app.app_context():
+        if once:
+            result = dispatch_pending(batch_size)
+            print(f"📤 Sent {result['sent']}, retrying {result['retried']}, failed {result['failed']}")
+            print_json({**result, **outbox_stats()})
+            return
+        if batch_size:
+            app.config['OUTBOX_BATCH_SIZE'] = batch_size
+        print(f"📤 Dispatching outbox with {workers} worker(s), Ctrl+C to stop")
+        outbox_dispatcher.start(workers)
+        try:
+            while True:
+                time.sleep(60)
+                print_json(outbox_stats())
+        except KeyboardInterrupt:
+            outbox_dispatcher.stop()
+
+
+def cmd_maintain_partitions(months_ahead=None, first=None, last=None):
+    """Create expense/approval partitions ahead of time (or for a backfill range)"""
+    with app.app_context():
+        if first:
+            with db.engine.begin() as connection:
+                created = ensure_partitions(connection, date.fromisoformat(first),
+                                            date.fromisoformat(last) if last else date.today())
+        else:
+            created = maintain_partitions(months_ahead=months_ahead)
+            created = [name for names in created.values() for name in names]
+        print(f"🗂️  Created {len(created)} partitions")
+        with db.engine.connect() as connection:
+            print_json({
+                "created": created,
+                "partitions": {table: len(existing_partitions(connection, table)) for table in PARTITIONED_TABLES}
+                if connection.dialect.name == 'postgresql' else {},
+            })
+
+
+def cmd_archive(years=None, batch_size=None, delete_chunk=None, throttle=None, max_batches=None, status=False):
+    """Move closed expenses past retention to Parquet; re-running resumes an interrupted run"""
+    with app.app_context():
+        if status:
+            print_json(archive_status())
+            return
+
+        def progress(report):
+            print(f"📦 Batch {report['batch']}: {report['expenses']} expenses through {report['through']} "
+                  f"({report['rows_per_second']} rows/sec, {report['bytes'] / 1024 / 1024:.1f} MB written)")
+
+        cutoff = retention_cutoff(years) if years is not None else None
+        archiver = ExpenseArchiver(cutoff, batch_size, delete_chunk, throttle, progress)
+        result = archiver.run(max_batches)
+        print(f"✅ Archived {result['rows']['expenses']} expenses, {result['rows']['approvals']} approvals "
+              f"dated before {result['cutoff']} ({result['status']})")
+        print_json(result)
+
+
+def cmd_replicas():
+    """Reachability and lag of each configured read replica"""
+    with app.app_context():
+        replicas = replica_status()
+        if not replicas:
+            print("ℹ️  No read replicas configured (set DATABASE_REPLICA_URLS)")
+            return
+        usable = sum(1 for replica in replicas if replica['usable'])
+        print(f"🔁 {usable} of {len(replicas)} replicas usable "
+              f"(max lag {app.config['DATABASE_REPLICA_MAX_LAG']}s)")
+        print_json(replicas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Exes Manen expense CLI')
+    subparsers = parser.add_subparsers(dest='command', help='Available commands')
+
+    # Import command
+    import_parser = subparsers.add_parser('import', help='Bulk import expenses from CSV/XLSX')
+    import_parser.add_argument('path', help='Path to the CSV or XLSX file')
+    import_parser.add_argument('--format', choices=['csv', 'xlsx'], help='File format (default: from extension)')
+    import_parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Rows validated and loaded per chunk')
+    import_parser.add_argument('--strict', action='store_true', help='Roll back the whole import if any row is invalid')
+    import_parser.add_argument('--skip-duplicate-check', action='store_true', help='Do not flag duplicate expenses')
+
+    # Refresh rollups command
+    rollup_parser = subparsers.add_parser('refresh-rollups', help='Rebuild spend report rollups')
+    rollup_parser.add_argument('--company-id', help='Only rebuild rollups for this company')
+
+    # Rebuild org chart command
+    org_parser = subparsers.add_parser('rebuild-org-chart', help='Rebuild the org-chart hierarchy index')
+    org_parser.add_argument('--company-id', help='Only rebuild this company')
+
+    # Dispatch outbox command
+    outbox_parser = subparsers.add_parser('dispatch-outbox', help='Deliver queued emails and other side effects')
+    outbox_parser.add_argument('--once', action='store_true', help='Drain due messages and exit')
+    outbox_parser.add_argument('--workers', type=int, default=1, help='Dispatcher threads')
+    outbox_parser.add_argument('--batch-size', type=int, help='Messages claimed per transaction')
+
+    # Archive command
+    archive_parser = subparsers.add_parser('archive', help='Move old closed expenses to Parquet cold storage')
+    archive_parser.add_argument('--years', type=int, help='Retention in years (default: ARCHIVE_RETENTION_YEARS)')
+    archive_parser.add_argument('--batch-size', type=int, help='Expenses per Parquet batch')
+    archive_parser.add_argument('--delete-chunk', type=int, help='Rows deleted per transaction')
+    archive_parser.add_argument('--throttle', type=float, help='Seconds to pause between delete transactions')
+    archive_parser.add_argument('--max-batches', type=int, help='Stop after this many batches (resume later)')
+    archive_parser.add_argument('--status', action='store_true', help='Show progress of the current or last run')
+
+    # Maintain partitions command
+    partition_parser = subparsers.add_parser('maintain-partitions', help='Create monthly expense/approval partitions')
+    partition_parser.add_argument('--months-ahead', type=int, help='Months to create beyond this one (default: PARTITION_MONTHS_AHEAD)')
+    partition_parser.add_argument('--from', dest='first', help='Backfill: create partitions from this date (YYYY-MM-DD)')
+    partition_parser.add_argument('--to', dest='last', help='Backfill: up to this date (default: today)')
+
+    # Replica status command
+    subparsers.add_parser('replicas', help='Show read replica reachability and lag')
+
+    args = parser.parse_args()
+
+    if not args.command:
+        parser.print_help()
+        sys.exit(1)
+
+    try:
+        if args.command == 'import':
+            cmd_import(args.path, args.format, args.chunk_size, args.strict, not args.skip_duplicate_check)
+        elif args.command == 'refresh-rollups':
+            cmd_refresh_rollups(args.company_id)
+        elif args.command == 'rebuild-org-chart':
+            cmd_rebuild_org_chart(args.company_id)
+        elif args.command == 'dispatch-outbox':
+            cmd_dispatch_outbox(args.once, args.workers, args.batch_size)
+        elif args.command == 'archive':
+            cmd_archive(args.years, args.batch_size, args.delete_chunk, args.throttle, args.max_batches, args.status)
+        elif args.command == 'maintain-partitions':
+            cmd_maintain_partitions(args.months_ahead, args.first, args.last)
+        elif args.command == 'replicas':
+            cmd_replicas()
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
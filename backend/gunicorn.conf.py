@@ -0,0 +1,82 @@
+"""
+Gunicorn settings for production serving (used by serve.py, or `gunicorn -c gunicorn.conf.py app.main:app`)
+Every value can be overridden from the environment
+"""
+
+import glob
+import multiprocessing
+import os
+
+bind = os.getenv('BIND', f"0.0.0.0:{os.getenv('PORT', '8000')}")
+
+# Processes and threads: gthread workers let slow clients and I/O waits overlap
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread' if threads > 1 else 'sync')
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))
+
+# Import the app once in the master so workers fork with models and routes already loaded
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True').lower() == 'true'
+
+# Background threads (outbox dispatcher, partition maintenance) start in post_fork, never in
+# the master: forking a process with live threads and open connections can deadlock the child
+os.environ['DEFER_BACKGROUND_THREADS'] = 'true'
+
+# Workers share metrics through snapshot files here, so /metrics covers every worker
+os.environ.setdefault('METRICS_MULTIPROC_DIR', os.path.join(os.getcwd(), 'storage', 'metrics'))
+
+# A worker silent for `timeout` seconds is killed; on SIGTERM workers get
+# `graceful_timeout` seconds to finish in-flight requests before being killed
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+# Recycle workers periodically to bound memory growth; jitter avoids restarting them all at once
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 1000))
+
+# Set GUNICORN_ACCESS_LOG= (empty) to disable access logging
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-') or None
+errorlog = os.getenv('GUNICORN_ERROR_LOG', '-')
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+
+def on_starting(server):
+    """Start counting from zero: drop metric snapshots left by a previous run"""
+    directory = os.environ['METRICS_MULTIPROC_DIR']
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    # Slow-query statistics live under query-profiler/ unless QUERY_PROFILER_MULTIPROC_DIR moves them
+    profiler_directory = os.getenv('QUERY_PROFILER_MULTIPROC_DIR') or os.path.join(directory, 'query-profiler')
+    for path in glob.glob(os.path.join(directory, '*.json')) + glob.glob(os.path.join(profiler_directory, '*.json')):
+        os.remove(path)
+
+
+def post_fork(server, worker):
+    """Give each worker its own connection pool and background threads"""
+    from app import db
+    from app.main import app, start_background_threads
+    from app.replicas import replica_pool
+
+    with app.app_context():
+        # Connections opened by the master during preload must not be shared across processes
+        db.engine.dispose(close=False)
+        replica_pool.dispose()
+    start_background_threads(app)
+
+
+def worker_exit(server, worker):
+    """Drain buffered audit events and stop dispatchers before the worker goes away"""
+    from app.audit import audit_log
+    from app.metrics import multiprocess_store
+    from app.outbox import outbox_dispatcher
+    from app.partitions import partition_maintainer
+    from app.query_profiler import query_profiler
+
+    outbox_dispatcher.stop(timeout=5)
+    partition_maintainer.stop(timeout=5)
+    audit_log.close()
+    # Keep this worker's counts in the totals after it is gone
+    multiprocess_store.retire()
+    query_profiler.retire()
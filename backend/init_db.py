@@ -5,6 +5,7 @@ Run this script to create all database tables
 """
 
 import os
+from flask_migrate import stamp
 from app import app, db
 from app.models import (
     Company, User, Employee, Expense, Approval, 
@@ -12,6 +13,8 @@ from app.models import (
     ExpenseStatusEnum, ApprovalStatusEnum, 
     ApproverRoleEnum, RuleTypeEnum
 )
+from app.permissions import sync_permissions
+from app.partitions import maintain_partitions
 
 def init_database():
     """Initialize the database with all tables"""
@@ -19,6 +22,21 @@ def init_database():
         # Create all tables
         db.create_all()
         print("✅ Database tables created successfully!")
+
+        # create_all built the current schema; record that so `flask db upgrade` starts from here
+        stamp(directory=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations'))
+        print("🏷️  Database stamped at the latest migration")
+
+        # Monthly partitions for expenses/approvals (Postgres only; no-op elsewhere)
+        created = maintain_partitions()
+        for table, partitions in created.items():
+            if partitions:
+                print(f"🗂️  Created {len(partitions)} {table} partitions")
+
+        # Make sure every permission the resolver knows about exists as a row
+        added = sync_permissions()
+        if added:
+            print(f"🔐 Added {added} permissions")
         
         # Check if we have any data
         company_count = Company.query.count()
@@ -0,0 +1,39 @@
+"""Outbox messages
+
+Revision ID: 0a9f5b3e7c28
+Revises: d7c09e4f2a61
+Create Date: 2026-10-19 12:21:37.558214
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '0a9f5b3e7c28'
+down_revision = 'd7c09e4f2a61'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'outbox_messages',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('topic', sa.String(), nullable=False),
+        sa.Column('payload', sa.Text(), nullable=True),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('available_at', sa.DateTime(), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_outbox_messages_status_available', 'outbox_messages', ['status', 'available_at'])
+
+
+def downgrade():
+    op.drop_index('ix_outbox_messages_status_available', table_name='outbox_messages')
+    op.drop_table('outbox_messages')
@@ -0,0 +1,48 @@
+"""Expense rollups
+
+Revision ID: 2b7d4e91c6a0
+Revises:
+Create Date: 2026-10-19 12:07:02.114530
+
+First revision after the baseline schema that init_db.py creates. Databases created
+by init_db.py are stamped at head; existing baseline databases upgrade from here.
+The table starts empty: run `expense_cli.py refresh-rollups` after upgrading.
+NULLS NOT DISTINCT needs Postgres 15 or later.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '2b7d4e91c6a0'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'expense_rollups',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('company_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('department_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('category', sa.String(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('month', sa.Date(), nullable=False),
+        sa.Column('expense_count', sa.Integer(), nullable=False),
+        sa.Column('total_amount', sa.Numeric(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['company_id'], ['companies.id']),
+        sa.ForeignKeyConstraint(['department_id'], ['departments.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('company_id', 'department_id', 'category', 'status', 'month',
+                            name='uq_expense_rollups_bucket', postgresql_nulls_not_distinct=True),
+    )
+    op.create_index('ix_expense_rollups_company_month', 'expense_rollups', ['company_id', 'month'])
+
+
+def downgrade():
+    op.drop_index('ix_expense_rollups_company_month', table_name='expense_rollups')
+    op.drop_table('expense_rollups')
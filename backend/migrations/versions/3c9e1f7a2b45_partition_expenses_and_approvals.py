@@ -0,0 +1,151 @@
+"""Partition expenses by date and approvals by created_at
+
+Revision ID: 3c9e1f7a2b45
+Revises: 0a9f5b3e7c28
+Create Date: 2026-10-19 10:12:41.418203
+
+Rebuilds the two tables as PARTITION BY RANGE with one partition per month, from the
+oldest row through PARTITION_MONTHS_AHEAD months from now, plus a default partition.
+Rows are copied with INSERT ... SELECT and indexes are built afterwards, so the tables
+are locked for the duration of the copy. Postgres only; other databases are left as is.
+
+"""
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c9e1f7a2b45'
+down_revision = '0a9f5b3e7c28'
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = 3
+
+# table -> (partition key, secondary indexes as of this revision)
+TABLES = {
+    'expenses': ('date', {
+        'ix_expenses_receipt_url': ['receipt_url'],
+        'ix_expenses_current_approver_id': ['current_approver_id'],
+        'ix_expenses_fingerprint': ['fingerprint'],
+        'ix_expenses_employee_currency_date': ['employee_id', 'currency', 'date'],
+    }),
+    'approvals': ('created_at', {
+        'ix_approvals_expense_id': ['expense_id'],
+        'ix_approvals_approver_id': ['approver_id'],
+    }),
+}
+
+# Foreign keys to expenses.id; id alone is not unique on a partitioned table, so they go
+EXPENSE_REFERENCES = [
+    ('approvals', 'expense_id'),
+    ('expense_flags', 'expense_id'),
+    ('expense_flags', 'related_expense_id'),
+]
+
+
+def _month(value):
+    return date(value.year, value.month, 1)
+
+
+def _add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _is_partitioned(bind, table):
+    return bind.execute(sa.text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table))"
+    ), {"table": table}).scalar()
+
+
+def _rename_primary_key(bind, table):
+    """Constraint names are per schema; free the original one for the rebuilt table"""
+    name = sa.inspect(bind).get_pk_constraint(table)['name']
+    if name:
+        op.execute(f'ALTER TABLE {table} RENAME CONSTRAINT {name} TO {table}_pkey')
+
+
+def _partition(bind, table, key, indexes):
+    source = f'{table}_unpartitioned'
+    op.execute(f'ALTER TABLE {table} RENAME TO {source}')
+    _rename_primary_key(bind, source)
+    for name in indexes:
+        op.execute(f'DROP INDEX IF EXISTS {name}')
+    if key == 'created_at':
+        # Part of the primary key from now on, so it cannot stay NULL
+        op.execute(f'UPDATE {source} SET created_at = COALESCE(acted_at, now()) WHERE created_at IS NULL')
+
+    op.execute(f'CREATE TABLE {table} (LIKE {source} INCLUDING DEFAULTS) PARTITION BY RANGE ({key})')
+    op.execute(f'ALTER TABLE {table} ADD PRIMARY KEY (id, {key})')
+    op.execute(f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT')
+
+    oldest = bind.execute(sa.text(f'SELECT min({key}) FROM {source}')).scalar()
+    month = _month(oldest or date.today())
+    last = _add_months(_month(date.today()), MONTHS_AHEAD)
+    while month <= last:
+        upper = _add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE {table}_{month.year:04d}_{month.month:02d} PARTITION OF {table} "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')"
+        )
+        month = upper
+
+    op.execute(f'INSERT INTO {table} SELECT * FROM {source}')
+    op.execute(f'DROP TABLE {source}')
+    for name, columns in indexes.items():
+        op.create_index(name, table, columns)
+    op.execute(f'ANALYZE {table}')
+
+
+def _unpartition(bind, table, key, indexes):
+    source = f'{table}_partitioned'
+    op.execute(f'ALTER TABLE {table} RENAME TO {source}')
+    _rename_primary_key(bind, source)
+    for name in indexes:
+        op.execute(f'DROP INDEX IF EXISTS {name}')
+
+    op.execute(f'CREATE TABLE {table} (LIKE {source} INCLUDING DEFAULTS)')
+    op.execute(f'ALTER TABLE {table} ADD PRIMARY KEY (id)')
+    if key == 'created_at':
+        op.alter_column(table, key, nullable=True)
+    op.execute(f'INSERT INTO {table} SELECT * FROM {source}')
+    # Drops every partition with it
+    op.execute(f'DROP TABLE {source}')
+    for name, columns in indexes.items():
+        op.create_index(name, table, columns)
+    op.execute(f'ANALYZE {table}')
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+    inspector = sa.inspect(bind)
+    for table in {table for table, _ in EXPENSE_REFERENCES}:
+        if not inspector.has_table(table):
+            continue
+        for foreign_key in inspector.get_foreign_keys(table):
+            if foreign_key['referred_table'] == 'expenses':
+                op.drop_constraint(foreign_key['name'], table, type_='foreignkey')
+
+    for table, (key, indexes) in TABLES.items():
+        # Fresh databases created by init_db.py are already partitioned
+        if inspector.has_table(table) and not _is_partitioned(bind, table):
+            _partition(bind, table, key, indexes)
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+    inspector = sa.inspect(bind)
+    for table, (key, indexes) in TABLES.items():
+        if inspector.has_table(table) and _is_partitioned(bind, table):
+            _unpartition(bind, table, key, indexes)
+
+    for table, column in EXPENSE_REFERENCES:
+        if inspector.has_table(table):
+            op.create_foreign_key(f'{table}_{column}_fkey', table, 'expenses', [column], ['id'])
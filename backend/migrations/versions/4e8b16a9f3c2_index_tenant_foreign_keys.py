@@ -0,0 +1,47 @@
+"""Index tenant and hierarchy foreign keys
+
+Revision ID: 4e8b16a9f3c2
+Revises: 9c42e07b1d58
+Create Date: 2026-10-19 12:12:40.227913
+
+Every tenant-scoped query filters on company_id, and the membership subqueries used for
+expenses and approvals join through these columns.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4e8b16a9f3c2'
+down_revision = '9c42e07b1d58'
+branch_labels = None
+depends_on = None
+
+# table -> indexed columns, named ix_<table>_<column> as index=True does
+INDEXED_COLUMNS = {
+    'approval_flows': ['company_id'],
+    'departments': ['company_id', 'manager_id'],
+    'roles': ['company_id'],
+    'users': ['company_id'],
+    'approval_rules': ['company_id'],
+    'employees': ['user_id', 'company_id', 'department_id', 'manager_id'],
+    'role_permissions': ['role_id', 'permission_id'],
+    'teams': ['company_id', 'team_lead_id'],
+    'user_roles': ['user_id', 'role_id'],
+    'expenses': ['current_approver_id'],
+    'team_members': ['team_id', 'user_id'],
+    'approvals': ['expense_id', 'approver_id'],
+}
+
+
+def upgrade():
+    for table, columns in INDEXED_COLUMNS.items():
+        for column in columns:
+            op.create_index(f'ix_{table}_{column}', table, [column])
+
+
+def downgrade():
+    for table, columns in INDEXED_COLUMNS.items():
+        for column in columns:
+            op.drop_index(f'ix_{table}_{column}', table_name=table)
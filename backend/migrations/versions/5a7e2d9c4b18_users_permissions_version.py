@@ -0,0 +1,32 @@
+"""Per-user permissions version
+
+Revision ID: 5a7e2d9c4b18
+Revises: b35d7f2a8e14
+Create Date: 2026-10-19 12:16:52.804215
+
+Bumped whenever a user's role, role grants or permissions change, so every process
+can tell its cached permission bitset is stale without waiting for it to expire.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a7e2d9c4b18'
+down_revision = 'b35d7f2a8e14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('users', sa.Column('permissions_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.drop_column('users', 'permissions_version')
+    else:
+        with op.batch_alter_table('users') as batch_op:
+            batch_op.drop_column('permissions_version')
@@ -0,0 +1,45 @@
+"""Receipts
+
+Revision ID: 6f1a3c85d2e7
+Revises: 2b7d4e91c6a0
+Create Date: 2026-10-19 12:08:31.902847
+
+Content-addressed receipt files per company, and an index on expenses.receipt_url for
+finding other claims of the same receipt.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '6f1a3c85d2e7'
+down_revision = '2b7d4e91c6a0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'receipts',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('company_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('size', sa.BigInteger(), nullable=False),
+        sa.Column('content_type', sa.String(), nullable=True),
+        sa.Column('filename', sa.String(), nullable=True),
+        sa.Column('thumbnail_status', sa.String(), nullable=False),
+        sa.Column('uploaded_by', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['company_id'], ['companies.id']),
+        sa.ForeignKeyConstraint(['uploaded_by'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('company_id', 'sha256', name='uq_receipts_company_sha256'),
+    )
+    op.create_index('ix_expenses_receipt_url', 'expenses', ['receipt_url'])
+
+
+def downgrade():
+    op.drop_index('ix_expenses_receipt_url', table_name='expenses')
+    op.drop_table('receipts')
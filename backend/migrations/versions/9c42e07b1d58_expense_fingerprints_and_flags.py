@@ -0,0 +1,95 @@
+"""Expense fingerprints and flags
+
+Revision ID: 9c42e07b1d58
+Revises: 6f1a3c85d2e7
+Create Date: 2026-10-19 12:09:48.365021
+
+Adds expenses.fingerprint (filled in for existing rows here, in batches, with the same
+function the mapper hooks use), the indexes behind exact and near-duplicate lookups,
+and the expense_flags table.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '9c42e07b1d58'
+down_revision = '6f1a3c85d2e7'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 5000
+
+
+def _backfill_fingerprints(bind):
+    from app.duplicate_detector import expense_fingerprint
+
+    expenses = sa.table(
+        'expenses',
+        sa.column('id', postgresql.UUID(as_uuid=True)),
+        sa.column('employee_id', postgresql.UUID(as_uuid=True)),
+        sa.column('amount', sa.Numeric()),
+        sa.column('currency', sa.String()),
+        sa.column('date', sa.Date()),
+        sa.column('description', sa.Text()),
+        sa.column('fingerprint', sa.String()),
+    )
+    update = (
+        expenses.update()
+        .where(expenses.c.id == sa.bindparam('expense_id'))
+        .values(fingerprint=sa.bindparam('value'))
+    )
+    last_id = None
+    while True:
+        query = (
+            sa.select(expenses.c.id, expenses.c.employee_id, expenses.c.amount, expenses.c.currency,
+                      expenses.c.date, expenses.c.description)
+            .where(expenses.c.fingerprint.is_(None), expenses.c.amount.is_not(None))
+            .order_by(expenses.c.id)
+            .limit(BATCH_SIZE)
+        )
+        if last_id is not None:
+            query = query.where(expenses.c.id > last_id)
+        rows = bind.execute(query).all()
+        if not rows:
+            break
+        bind.execute(update, [
+            {'expense_id': row.id, 'value': expense_fingerprint(
+                row.employee_id, row.amount, row.currency, row.date, row.description
+            )}
+            for row in rows
+        ])
+        last_id = rows[-1].id
+
+
+def upgrade():
+    op.add_column('expenses', sa.Column('fingerprint', sa.String(length=64), nullable=True))
+    _backfill_fingerprints(op.get_bind())
+    op.create_index('ix_expenses_fingerprint', 'expenses', ['fingerprint'])
+    op.create_index('ix_expenses_employee_currency_date', 'expenses', ['employee_id', 'currency', 'date'])
+
+    op.create_table(
+        'expense_flags',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('expense_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('flag_type', sa.String(), nullable=False),
+        sa.Column('related_expense_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('score', sa.Numeric(), nullable=True),
+        sa.Column('details', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['expense_id'], ['expenses.id']),
+        sa.ForeignKeyConstraint(['related_expense_id'], ['expenses.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_expense_flags_expense_id', 'expense_flags', ['expense_id'])
+
+
+def downgrade():
+    op.drop_index('ix_expense_flags_expense_id', table_name='expense_flags')
+    op.drop_table('expense_flags')
+    op.drop_index('ix_expenses_employee_currency_date', table_name='expenses')
+    op.drop_index('ix_expenses_fingerprint', table_name='expenses')
+    with op.batch_alter_table('expenses') as batch_op:
+        batch_op.drop_column('fingerprint')
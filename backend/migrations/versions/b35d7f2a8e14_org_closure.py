@@ -0,0 +1,60 @@
+"""Org-chart closure table
+
+Revision ID: b35d7f2a8e14
+Revises: 4e8b16a9f3c2
+Create Date: 2026-10-19 12:15:09.640318
+
+Filled in here from employees.manager_id the same way `expense_cli.py rebuild-org-chart`
+does; manager cycles are cut where they repeat.
+
+"""
+from collections import defaultdict
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'b35d7f2a8e14'
+down_revision = '4e8b16a9f3c2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    closure = op.create_table(
+        'org_closure',
+        sa.Column('ancestor_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('descendant_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('company_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('depth', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['ancestor_id'], ['users.id']),
+        sa.ForeignKeyConstraint(['descendant_id'], ['users.id']),
+        sa.ForeignKeyConstraint(['company_id'], ['companies.id']),
+        sa.PrimaryKeyConstraint('ancestor_id', 'descendant_id'),
+    )
+    op.create_index('ix_org_closure_company_id', 'org_closure', ['company_id'])
+    op.create_index('ix_org_closure_descendant_depth', 'org_closure', ['descendant_id', 'depth'])
+
+    from app.hierarchy import _closure_rows
+
+    employees = sa.table(
+        'employees',
+        sa.column('company_id', postgresql.UUID(as_uuid=True)),
+        sa.column('user_id', postgresql.UUID(as_uuid=True)),
+        sa.column('manager_id', postgresql.UUID(as_uuid=True)),
+    )
+    parents = defaultdict(dict)
+    for row in op.get_bind().execute(sa.select(employees)):
+        parents[row.company_id][row.user_id] = row.manager_id
+    for company, parent_of in parents.items():
+        rows, _ = _closure_rows(company, parent_of)
+        for start in range(0, len(rows), 5000):
+            op.bulk_insert(closure, rows[start:start + 5000])
+
+
+def downgrade():
+    op.drop_index('ix_org_closure_descendant_depth', table_name='org_closure')
+    op.drop_index('ix_org_closure_company_id', table_name='org_closure')
+    op.drop_table('org_closure')
@@ -0,0 +1,46 @@
+"""Audit events
+
+Revision ID: d7c09e4f2a61
+Revises: 5a7e2d9c4b18
+Create Date: 2026-10-19 12:19:55.071482
+
+Range-partitioned by month on occurred_at on Postgres; the audit writer adds the default
+partition, the monthly ones and the append-only trigger the first time it writes.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7c09e4f2a61'
+down_revision = '5a7e2d9c4b18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'audit_events',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('occurred_at', sa.DateTime(), nullable=False),
+        sa.Column('company_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('actor_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('action', sa.String(), nullable=False),
+        sa.Column('entity_type', sa.String(), nullable=False),
+        sa.Column('entity_id', sa.String(), nullable=True),
+        sa.Column('changes', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('id', 'occurred_at'),
+        postgresql_partition_by='RANGE (occurred_at)',
+    )
+    op.create_index('ix_audit_events_company_occurred', 'audit_events', ['company_id', 'occurred_at'])
+    op.create_index('ix_audit_events_entity', 'audit_events', ['entity_type', 'entity_id'])
+
+
+def downgrade():
+    op.drop_index('ix_audit_events_entity', table_name='audit_events')
+    op.drop_index('ix_audit_events_company_occurred', table_name='audit_events')
+    op.drop_table('audit_events')
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('DROP FUNCTION IF EXISTS audit_events_append_only()')
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 """
 Run the Flask development server
+For production use serve.py (gunicorn, multiple workers)
 """
 
 import os
@@ -19,4 +20,7 @@ if __name__ == "__main__":
     print("🔗 API endpoints available at: http://localhost:8000/api/")
     print()
     
-    app.run(host="0.0.0.0", port=8000, debug=True, threaded=True)
+    print("💡 For production, use: python serve.py --workers 4")
+    print()
+    
+    app.run(host="0.0.0.0", port=8000, debug=os.getenv('FLASK_DEBUG', 'True').lower() == 'true', threaded=True)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Run the backend with gunicorn for production
+Multi-process, preloaded, graceful shutdown on SIGTERM; defaults come from gunicorn.conf.py.
+With --asgi the async read API runs under uvicorn instead.
+"""
+
+import argparse
+import os
+import runpy
+import sys
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:
+    BaseApplication = None
+
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gunicorn.conf.py')
+
+
+def build_application(options):
+    class ExesManenApplication(BaseApplication):
+        """Gunicorn application serving app.main:app with config file plus CLI overrides"""
+
+        def load_config(self):
+            for key, value in runpy.run_path(CONFIG_FILE).items():
+                if key in self.cfg.settings and value is not None:
+                    self.cfg.set(key, value)
+            for key, value in options.items():
+                if value is not None:
+                    self.cfg.set(key, value)
+
+        def load(self):
+            from app.main import app
+            return app
+
+    return ExesManenApplication()
+
+
+def serve_asgi(args):
+    """Run app.async_api under uvicorn worker processes"""
+    try:
+        import uvicorn
+    except ImportError:
+        print("❌ uvicorn is not installed. Install it with: pip install uvicorn starlette asyncpg")
+        sys.exit(1)
+    config = runpy.run_path(CONFIG_FILE)
+    host, _, port = (args.bind or config['bind']).rpartition(':')
+    uvicorn.run(
+        'app.async_api:asgi_app',
+        host=host or '0.0.0.0',
+        port=int(port),
+        workers=args.workers or config['workers'],
+        timeout_keep_alive=config['keepalive'],
+        timeout_graceful_shutdown=args.graceful_timeout or config['graceful_timeout'],
+        access_log=bool(config['accesslog']),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the Exes Manen backend with gunicorn')
+    parser.add_argument('--bind', help='Address to listen on (default: 0.0.0.0:$PORT)')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: $WEB_CONCURRENCY or 2*CPU+1)')
+    parser.add_argument('--threads', type=int, help='Threads per worker (default: $GUNICORN_THREADS or 4)')
+    parser.add_argument('--timeout', type=int, help='Seconds before a silent worker is killed')
+    parser.add_argument('--graceful-timeout', type=int, help='Seconds workers get to drain in-flight requests on shutdown')
+    parser.add_argument('--no-preload', action='store_true', help='Import the app in each worker instead of the master')
+    parser.add_argument('--asgi', action='store_true', help='Serve the async read API (app.async_api) with uvicorn instead')
+    args = parser.parse_args()
+
+    if not os.getenv('DATABASE_URL'):
+        print("⚠️  Warning: DATABASE_URL environment variable not set!")
+
+    if args.asgi:
+        serve_asgi(args)
+        return
+
+    if BaseApplication is None:
+        print("❌ gunicorn is not installed. Install it with: pip install gunicorn")
+        sys.exit(1)
+
+    options = {
+        'bind': args.bind,
+        'workers': args.workers,
+        'threads': args.threads,
+        'timeout': args.timeout,
+        'graceful_timeout': args.graceful_timeout,
+        'preload_app': False if args.no_preload else None,
+    }
+    if args.threads is not None:
+        options['worker_class'] = 'gthread' if args.threads > 1 else 'sync'
+    build_application(options).run()
+
+
+if __name__ == '__main__':
+    main()
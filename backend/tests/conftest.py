@@ -0,0 +1,96 @@
+"""
+Shared fixtures: the app on an in-memory sqlite database, recreated for every test,
+and seeded tenants whose people carry ready-made access tokens
+"""
+
+import os
+
+# Configure before the app is imported; background dispatchers stay off so tests drive them
+os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
+os.environ.setdefault('SECRET_KEY', 'test-secret-key')
+os.environ.setdefault('JWT_SECRET_KEY', 'test-jwt-secret-key-long-enough-for-hs256')
+os.environ['OUTBOX_DISPATCH_IN_PROCESS'] = 'false'
+os.environ['PARTITION_MAINTENANCE_IN_PROCESS'] = 'false'
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from app.main import app as flask_app
+from app import db
+from app.models import Company, User, Employee, UserRoleEnum
+from app.tenancy import tenant_claims
+
+# (name, role, manager) in creation order
+PEOPLE = (
+    ('admin', UserRoleEnum.admin, None),
+    ('manager', UserRoleEnum.manager, 'admin'),
+    ('alice', UserRoleEnum.employee, 'manager'),
+    ('bob', UserRoleEnum.employee, 'manager'),
+)
+
+
+class Tenant:
+    """Ids and tokens of one seeded company; people are keyed by name"""
+
+    def __init__(self, company_id, name):
+        self.company_id = company_id
+        self.name = name
+        self.users = {}
+        self.employees = {}
+        self.tokens = {}
+
+    def headers(self, person):
+        return {'Authorization': f"Bearer {self.tokens[person]}"}
+
+
+def seed_company(name, people=PEOPLE):
+    """Create a company with an employee record per person; call inside an app context"""
+    company = Company(name=name, country='DE', currency_code='EUR')
+    db.session.add(company)
+    db.session.flush()
+    tenant = Tenant(company.id, name)
+    for person, role, manager in people:
+        user = User(email=f"{person}@{name.lower()}.test", name=person.title(), company_id=company.id, role=role)
+        db.session.add(user)
+        db.session.flush()
+        employee = Employee(user_id=user.id, company_id=company.id,
+                            manager_id=tenant.users[manager] if manager else None)
+        db.session.add(employee)
+        db.session.flush()
+        tenant.users[person] = user.id
+        tenant.employees[person] = employee.id
+        tenant.tokens[person] = create_access_token(identity=str(user.id), additional_claims=tenant_claims(user))
+    db.session.commit()
+    return tenant
+
+
+@pytest.fixture
+def app():
+    from app.audit import audit_log
+    from app.hierarchy import org_cache
+    from app.permissions import permission_cache, sync_permissions
+    from app.response_cache import response_cache
+
+    with flask_app.app_context():
+        db.create_all()
+        sync_permissions()
+    yield flask_app
+    permission_cache.invalidate()
+    org_cache.invalidate()
+    response_cache.invalidate()
+    with flask_app.app_context():
+        audit_log.flush()
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def tenants(app):
+    """Two companies with the same cast, so every check can be tried across the tenant boundary"""
+    with app.app_context():
+        return seed_company('Acme'), seed_company('Globex')
@@ -0,0 +1,97 @@
+import pytest
+
+from app import db
+from app.bulk import COMPANY_UNAVAILABLE
+from app.models import Company, Permission, Role, RolePermission, User, UserRole
+
+
+def company(name):
+    return {'name': name, 'country': 'DE', 'currency_code': 'eur'}
+
+
+def grant(tenant, person, permission):
+    role = Role(company_id=tenant.company_id, name=f"{permission} holders", is_active=True)
+    db.session.add(role)
+    db.session.flush()
+    permission_id = Permission.query.filter_by(name=permission).one().id
+    db.session.add_all([
+        RolePermission(role_id=role.id, permission_id=permission_id),
+        UserRole(user_id=tenant.users[person], role_id=role.id, is_active=True),
+    ])
+    db.session.commit()
+
+
+def statuses(response):
+    return [(result['status'], result.get('error')) for result in response.json['results']]
+
+
+def test_company_bulk_without_company_create_only_updates_the_callers_company(client, tenants):
+    acme, _ = tenants
+    response = client.post('/api/companies/bulk', headers=acme.headers('admin'), json={
+        'items': [company('Acme'), company('Globex'), company('Initech')], 'on_conflict': 'update',
+    })
+    assert statuses(response) == [
+        ('updated', None), ('error', COMPANY_UNAVAILABLE), ('error', COMPANY_UNAVAILABLE),
+    ]
+
+
+def test_company_bulk_conflicts_do_not_reveal_other_tenants(app, client, tenants):
+    acme, _ = tenants
+    with app.app_context():
+        grant(acme, 'admin', 'company.create')
+    response = client.post('/api/companies/bulk', headers=acme.headers('admin'), json={
+        'items': [company('Globex'), company('Initech')], 'on_conflict': 'update',
+    })
+    # Another tenant's name fails exactly like a name nobody may use
+    assert statuses(response) == [('error', COMPANY_UNAVAILABLE), ('created', None)]
+    with app.app_context():
+        assert Company.query.filter_by(name='Globex').one().currency_code == 'EUR'
+        assert Company.query.filter_by(name='Initech').count() == 1
+
+
+def test_company_bulk_requires_company_manage(client, tenants):
+    acme, _ = tenants
+    response = client.post('/api/companies/bulk', headers=acme.headers('alice'), json={'items': [company('Initech')]})
+    assert response.status_code == 403
+
+
+def test_user_bulk_creates_users_in_the_callers_company_only(app, client, tenants):
+    acme, globex = tenants
+    response = client.post('/api/users/bulk', headers=acme.headers('admin'), json={'items': [
+        {'email': 'carol@acme.test', 'name': 'Carol'},
+        {'email': 'alice@globex.test', 'name': 'Taken'},
+        {'email': 'dave@acme.test', 'name': 'Dave', 'company_id': str(globex.company_id)},
+    ]})
+    assert [result['status'] for result in response.json['results']] == ['created', 'error', 'error']
+    with app.app_context():
+        assert User.query.filter_by(email='carol@acme.test').one().company_id == acme.company_id
+        assert User.query.filter_by(email='alice@globex.test').one().name == 'Alice'
+
+
+def test_user_bulk_update_leaves_other_tenants_users_alone(app, client, tenants):
+    acme, _ = tenants
+    client.post('/api/users/bulk', headers=acme.headers('admin'), json={
+        'items': [{'email': 'alice@globex.test', 'name': 'Hijacked', 'is_active': False}], 'on_conflict': 'update',
+    })
+    with app.app_context():
+        user = User.query.filter_by(email='alice@globex.test').one()
+        assert (user.name, user.is_active) == ('Alice', True)
+
+
+@pytest.mark.parametrize('value, expected', [('false', False), ('0', False), ('yes', True), (True, True)])
+def test_user_bulk_parses_booleans_strictly(app, client, tenants, value, expected):
+    acme, _ = tenants
+    response = client.post('/api/users/bulk', headers=acme.headers('admin'), json={
+        'items': [{'email': 'erin@acme.test', 'name': 'Erin', 'is_active': value}],
+    })
+    assert response.json['results'][0]['status'] == 'created'
+    with app.app_context():
+        assert User.query.filter_by(email='erin@acme.test').one().is_active is expected
+
+
+def test_user_bulk_rejects_ambiguous_booleans(client, tenants):
+    acme, _ = tenants
+    response = client.post('/api/users/bulk', headers=acme.headers('admin'), json={
+        'items': [{'email': 'erin@acme.test', 'name': 'Erin', 'is_active': 'maybe'}],
+    })
+    assert statuses(response) == [('error', 'is_active must be true or false')]
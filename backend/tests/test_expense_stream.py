@@ -0,0 +1,47 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from app import db
+from app.models import Expense
+
+
+@pytest.fixture
+def created(app, tenants):
+    acme, _ = tenants
+    with app.app_context():
+        expenses = [
+            Expense(employee_id=acme.employees['alice'], amount=Decimal('5.00'), currency='EUR',
+                    category='travel', date=date(2026, 1, 1 + i % 3), status='pending')
+            for i in range(7)
+        ]
+        db.session.add_all(expenses)
+        db.session.commit()
+        return [str(expense.id) for expense in expenses]
+
+
+def test_limit_bounds_the_streamed_body(client, tenants, created):
+    acme, _ = tenants
+    body = client.get('/api/expenses?limit=3', headers=acme.headers('admin')).json
+    assert len(body['expenses']) == 3
+    assert body['pagination']['count'] == 3
+    assert body['pagination']['next'] is not None
+
+
+def test_keyset_pages_cover_every_expense_once_newest_first(client, tenants, created):
+    acme, _ = tenants
+    seen, dates, url = [], [], '/api/expenses?limit=3'
+    while url:
+        body = client.get(url, headers=acme.headers('admin')).json
+        seen += [expense['id'] for expense in body['expenses']]
+        dates += [expense['date'] for expense in body['expenses']]
+        cursor = body['pagination']['next']
+        url = f"/api/expenses?limit=3&before_date={cursor['before_date']}&before_id={cursor['before_id']}" if cursor else None
+    assert sorted(seen) == sorted(created)
+    assert dates == sorted(dates, reverse=True)
+
+
+def test_half_a_cursor_is_rejected(client, tenants, created):
+    acme, _ = tenants
+    assert client.get('/api/expenses?before_date=2026-01-01', headers=acme.headers('admin')).status_code == 400
@@ -0,0 +1,114 @@
+"""
+The migration chain, exercised against a throwaway sqlite file with the real CLI:
+init_db.py builds and stamps the schema, then the chain is walked down to the
+baseline and back up again
+"""
+
+import os
+import subprocess
+import sys
+import uuid
+from datetime import date
+from decimal import Decimal
+
+import pytest
+import sqlalchemy as sa
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+
+from app.duplicate_detector import expense_fingerprint
+from app.models import Company, Employee, Expense, User, UserRoleEnum
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MIGRATIONS = os.path.join(BACKEND, 'migrations')
+# Tables and columns the series adds on top of the baseline schema
+SERIES_TABLES = {'expense_rollups', 'receipts', 'expense_flags', 'org_closure', 'audit_events', 'outbox_messages'}
+
+
+def scripts():
+    config = Config()
+    config.set_main_option('script_location', MIGRATIONS)
+    return ScriptDirectory.from_config(config)
+
+
+def run(database_url, *args):
+    env = dict(os.environ, DATABASE_URL=database_url, FLASK_APP='app.main',
+               OUTBOX_DISPATCH_IN_PROCESS='false', PARTITION_MAINTENANCE_IN_PROCESS='false')
+    result = subprocess.run([sys.executable, *args], cwd=BACKEND, env=env, capture_output=True, text=True, timeout=300)
+    assert result.returncode == 0, result.stdout + result.stderr
+    return result.stdout
+
+
+def core_table(model, *names):
+    """Just the named columns, so rows can be written whatever revision the database is at"""
+    columns = model.__table__.c
+    return sa.table(model.__tablename__, *(sa.column(name, columns[name].type) for name in names))
+
+
+def current_revision(engine):
+    with engine.connect() as connection:
+        return connection.execute(sa.text('SELECT version_num FROM alembic_version')).scalar()
+
+
+@pytest.fixture
+def database(tmp_path):
+    url = f"sqlite:///{tmp_path / 'migrations.db'}"
+    run(url, 'init_db.py')
+    engine = sa.create_engine(url)
+    yield url, engine
+    engine.dispose()
+
+
+def test_revisions_form_a_single_linear_chain():
+    script = scripts()
+    assert len(script.get_bases()) == 1
+    assert len(script.get_heads()) == 1
+    revisions = list(script.walk_revisions())
+    for newer, older in zip(revisions, revisions[1:]):
+        assert newer.down_revision == older.revision
+
+
+def test_init_db_stamps_the_head(database):
+    url, engine = database
+    assert current_revision(engine) == scripts().get_current_head()
+    run(url, '-m', 'flask', 'db', 'upgrade')
+    assert current_revision(engine) == scripts().get_current_head()
+
+
+def test_downgrade_to_baseline_and_upgrade_back_fills_derived_data(database):
+    url, engine = database
+    run(url, '-m', 'flask', 'db', 'downgrade', 'base')
+    inspector = sa.inspect(engine)
+    assert not SERIES_TABLES & set(inspector.get_table_names())
+    assert 'fingerprint' not in {column['name'] for column in inspector.get_columns('expenses')}
+
+    # Data written before the upgrade, with a baseline-only set of columns
+    company_id, manager_id, user_id, employee_id = (uuid.uuid4() for _ in range(4))
+    people = core_table(Employee, 'id', 'user_id', 'company_id', 'manager_id', 'is_active')
+    with engine.begin() as connection:
+        connection.execute(sa.insert(core_table(Company, 'id', 'name', 'country', 'currency_code')),
+                           [{'id': company_id, 'name': 'Acme', 'country': 'DE', 'currency_code': 'EUR'}])
+        connection.execute(sa.insert(core_table(User, 'id', 'email', 'name', 'company_id', 'role', 'is_active')), [
+            {'id': manager_id, 'email': 'manager@acme.test', 'name': 'Manager', 'company_id': company_id,
+             'role': UserRoleEnum.manager, 'is_active': True},
+            {'id': user_id, 'email': 'alice@acme.test', 'name': 'Alice', 'company_id': company_id,
+             'role': UserRoleEnum.employee, 'is_active': True},
+        ])
+        connection.execute(sa.insert(people), [
+            {'id': uuid.uuid4(), 'user_id': manager_id, 'company_id': company_id, 'manager_id': None, 'is_active': True},
+            {'id': employee_id, 'user_id': user_id, 'company_id': company_id, 'manager_id': manager_id, 'is_active': True},
+        ])
+        connection.execute(sa.insert(core_table(
+            Expense, 'id', 'employee_id', 'amount', 'currency', 'category', 'description', 'date', 'status'
+        )), [{'id': uuid.uuid4(), 'employee_id': employee_id, 'amount': Decimal('12.50'), 'currency': 'EUR',
+              'category': 'meals', 'description': 'Team lunch', 'date': date(2026, 3, 1), 'status': 'pending'}])
+
+    run(url, '-m', 'flask', 'db', 'upgrade')
+    assert current_revision(engine) == scripts().get_current_head()
+    assert SERIES_TABLES <= set(sa.inspect(engine).get_table_names())
+    with engine.connect() as connection:
+        fingerprint = connection.execute(sa.text('SELECT fingerprint FROM expenses')).scalar()
+        closure_rows = connection.execute(sa.text('SELECT count(*) FROM org_closure')).scalar()
+    assert fingerprint == expense_fingerprint(employee_id, Decimal('12.50'), 'EUR', date(2026, 3, 1), 'Team lunch')
+    # manager and alice each reach themselves, alice also reaches her manager
+    assert closure_rows == 3
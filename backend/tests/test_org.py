@@ -0,0 +1,36 @@
+def reports(client, tenant, caller, user_id=None):
+    query = f"?user_id={user_id}" if user_id else ''
+    return client.get(f"/api/org/reports{query}", headers=tenant.headers(caller))
+
+
+def test_own_reports_and_chain_need_no_permission(client, tenants):
+    acme, _ = tenants
+    assert {r['user_id'] for r in reports(client, acme, 'manager').json['reports']} == {
+        str(acme.users['alice']), str(acme.users['bob'])
+    }
+    chain = client.get('/api/org/chain', headers=acme.headers('alice')).json
+    assert [m['user_id'] for m in chain['managers']] == [str(acme.users['manager']), str(acme.users['admin'])]
+
+
+def test_employees_cannot_look_at_colleagues(client, tenants):
+    acme, _ = tenants
+    assert reports(client, acme, 'alice', acme.users['manager']).status_code == 403
+    response = client.get(f"/api/org/chain?user_id={acme.users['bob']}", headers=acme.headers('alice'))
+    assert response.status_code == 403
+
+
+def test_managers_see_their_reporting_line(client, tenants):
+    acme, _ = tenants
+    response = client.get(f"/api/org/chain?user_id={acme.users['alice']}", headers=acme.headers('manager'))
+    assert response.status_code == 200
+
+
+def test_org_view_opens_the_whole_company_but_not_other_tenants(client, tenants):
+    acme, globex = tenants
+    assert reports(client, acme, 'admin', acme.users['manager']).json['count'] == 2
+    assert reports(client, acme, 'admin', globex.users['manager']).status_code == 404
+
+
+def test_malformed_user_ids_are_rejected(client, tenants):
+    acme, _ = tenants
+    assert reports(client, acme, 'admin', 'not-a-uuid').status_code == 400
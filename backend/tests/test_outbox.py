@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+from app import db
+from app import outbox
+from app.models import OutboxMessage
+
+WELCOME = dict(employee_email='carol@acme.test', employee_name='Carol', organization_name='Acme', temp_password='S3cret!')
+
+
+@pytest.fixture
+def deliveries(monkeypatch):
+    """Replace the email handlers; each delivery is recorded and succeeds unless listed in `fail`"""
+    sent, fail = [], set()
+
+    def handler(**payload):
+        if payload['employee_email'] in fail:
+            return False
+        sent.append(payload)
+        return True
+
+    for topic in list(outbox.HANDLERS):
+        monkeypatch.setitem(outbox.HANDLERS, topic, handler)
+    return sent, fail
+
+
+def test_messages_are_only_kept_when_the_transaction_commits(app, deliveries):
+    with app.app_context():
+        outbox.enqueue('email.welcome_employee', **WELCOME)
+        db.session.rollback()
+        assert OutboxMessage.query.count() == 0
+
+
+def test_unknown_topics_are_rejected(app):
+    with app.app_context(), pytest.raises(ValueError):
+        outbox.enqueue('sms.welcome', **WELCOME)
+
+
+def test_dispatch_delivers_decrypted_payloads_and_scrubs_them(app, deliveries):
+    sent, _ = deliveries
+    with app.app_context():
+        outbox.enqueue('email.welcome_employee', **WELCOME)
+        db.session.commit()
+        assert 'S3cret!' not in OutboxMessage.query.one().payload
+
+        assert outbox.dispatch_pending()['sent'] == 1
+        message = OutboxMessage.query.one()
+        assert message.status == outbox.SENT
+        assert 'temp_password' not in json.loads(message.payload)
+        # Nothing is due any more
+        assert outbox.dispatch_pending()['claimed'] == 0
+    assert sent == [WELCOME]
+
+
+def test_failures_are_retried_with_backoff_then_given_up(app, deliveries, monkeypatch):
+    _, fail = deliveries
+    fail.add(WELCOME['employee_email'])
+    monkeypatch.setitem(app.config, 'OUTBOX_MAX_ATTEMPTS', 2)
+    with app.app_context():
+        outbox.enqueue('email.welcome_employee', **WELCOME)
+        db.session.commit()
+
+        assert outbox.dispatch_pending()['retried'] == 1
+        message = OutboxMessage.query.one()
+        assert (message.status, message.attempts) == (outbox.PENDING, 1)
+        assert message.available_at > message.created_at
+        # Not due again until the backoff has passed
+        assert outbox.dispatch_pending()['claimed'] == 0
+
+        message.available_at = message.created_at
+        db.session.commit()
+        assert outbox.dispatch_pending()['failed'] == 1
+        message = OutboxMessage.query.one()
+        assert message.status == outbox.FAILED
+        assert 'temp_password' not in json.loads(message.payload)
+
+
+def test_one_failing_message_does_not_hold_back_the_batch(app, deliveries):
+    sent, fail = deliveries
+    fail.add('broken@acme.test')
+    with app.app_context():
+        outbox.enqueue('email.welcome_employee', **dict(WELCOME, employee_email='broken@acme.test'))
+        outbox.enqueue('email.welcome_employee', **WELCOME)
+        db.session.commit()
+        counts = outbox.dispatch_pending()
+    assert (counts['sent'], counts['retried']) == (1, 1)
+    assert [payload['employee_email'] for payload in sent] == [WELCOME['employee_email']]
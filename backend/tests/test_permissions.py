@@ -0,0 +1,81 @@
+import copy
+
+import pytest
+
+from app import db
+from app.models import Permission, Role, RolePermission, User, UserRole, UserRoleEnum
+from app.permissions import (
+    PERMISSION_BITS, ROLE_DEFAULTS, has_permission, mask_for, permission_cache, permissions_for
+)
+
+NEW_USER = {'items': [{'email': 'carol@acme.test', 'name': 'Carol'}]}
+
+
+def grant(tenant, person, permission):
+    role = Role(company_id=tenant.company_id, name=f"{permission} holders", is_active=True)
+    db.session.add(role)
+    db.session.flush()
+    db.session.add_all([
+        RolePermission(role_id=role.id, permission_id=Permission.query.filter_by(name=permission).one().id),
+        UserRole(user_id=tenant.users[person], role_id=role.id, is_active=True),
+    ])
+    db.session.commit()
+
+
+def as_another_process(change):
+    """Commit a change while this process's permission cache keeps what it had"""
+    saved = copy.deepcopy(dict(permission_cache._entries))
+    change()
+    db.session.commit()
+    permission_cache._entries.update(saved)
+
+
+def test_role_defaults():
+    employee, admin = ROLE_DEFAULTS[UserRoleEnum.employee], ROLE_DEFAULTS[UserRoleEnum.admin]
+    assert employee & PERMISSION_BITS['expense.create']
+    assert not employee & PERMISSION_BITS['user.manage']
+    assert not employee & PERMISSION_BITS['org.view']
+    assert admin & PERMISSION_BITS['user.manage']
+    # Platform permissions come only from explicit grants
+    assert not admin & PERMISSION_BITS['company.create']
+
+
+def test_unknown_permission_names_are_rejected():
+    with pytest.raises(ValueError):
+        mask_for(['expense.teleport'])
+
+
+def test_require_permission_denies_missing_permissions(client, tenants):
+    acme, _ = tenants
+    response = client.post('/api/users/bulk', headers=acme.headers('alice'), json=NEW_USER)
+    assert response.status_code == 403
+    assert response.json['required'] == ['user.manage']
+
+
+def test_role_grants_add_to_the_defaults(app, client, tenants):
+    acme, _ = tenants
+    assert client.post('/api/users/bulk', headers=acme.headers('alice'), json=NEW_USER).status_code == 403
+    with app.app_context():
+        grant(acme, 'alice', 'user.manage')
+    assert client.post('/api/users/bulk', headers=acme.headers('alice'), json=NEW_USER).status_code == 201
+
+
+def test_grants_from_another_process_apply_after_revalidation(app, tenants, monkeypatch):
+    acme, _ = tenants
+    alice = str(acme.users['alice'])
+    with app.app_context():
+        assert not has_permission(alice, 'user.manage')
+        monkeypatch.setitem(app.config, 'PERMISSION_REVALIDATE_SECONDS', 3600)
+        as_another_process(lambda: grant(acme, 'alice', 'user.manage'))
+        assert not has_permission(alice, 'user.manage')
+        monkeypatch.setitem(app.config, 'PERMISSION_REVALIDATE_SECONDS', 0)
+        assert has_permission(alice, 'user.manage')
+
+
+def test_deactivated_users_lose_every_permission(app, client, tenants):
+    acme, _ = tenants
+    with app.app_context():
+        db.session.get(User, acme.users['admin']).is_active = False
+        db.session.commit()
+        assert permissions_for(acme.users['admin']) == 0
+    assert client.post('/api/users/bulk', headers=acme.headers('admin'), json=NEW_USER).status_code == 403
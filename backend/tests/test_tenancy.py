@@ -0,0 +1,70 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from app import db
+from app.models import Expense
+
+
+def add_expense(employee_id, amount='10.00', on=date(2026, 3, 1)):
+    expense = Expense(employee_id=employee_id, amount=Decimal(amount), currency='EUR',
+                      category='travel', date=on, status='pending')
+    db.session.add(expense)
+    db.session.commit()
+    return expense.id
+
+
+def expense_body(employee_id):
+    return {'employee_id': str(employee_id), 'amount': '12.50', 'currency': 'EUR',
+            'category': 'meals', 'date': '2026-04-01'}
+
+
+@pytest.fixture
+def expenses(app, tenants):
+    acme, globex = tenants
+    with app.app_context():
+        return {
+            'alice': add_expense(acme.employees['alice']),
+            'bob': add_expense(acme.employees['bob']),
+            'globex': add_expense(globex.employees['alice']),
+        }
+
+
+def test_user_listing_only_shows_the_callers_company(client, tenants):
+    acme, _ = tenants
+    response = client.get('/api/users', headers=acme.headers('alice'))
+    assert response.status_code == 200
+    assert {user['email'] for user in response.json['users']} == {
+        f"{person}@acme.test" for person in acme.users
+    }
+
+
+def test_company_listing_only_shows_the_callers_company(client, tenants):
+    acme, _ = tenants
+    response = client.get('/api/companies', headers=acme.headers('admin'))
+    assert [company['id'] for company in response.json['companies']] == [str(acme.company_id)]
+
+
+def test_expense_listing_requires_a_token(client, tenants):
+    assert client.get('/api/expenses').status_code == 401
+
+
+def test_expense_listing_is_scoped_to_the_company_and_to_own_expenses(client, tenants, expenses):
+    acme, _ = tenants
+    listed = lambda person: {e['id'] for e in client.get('/api/expenses', headers=acme.headers(person)).json['expenses']}
+
+    assert listed('admin') == {str(expenses['alice']), str(expenses['bob'])}
+    assert listed('alice') == {str(expenses['alice'])}
+
+
+def test_creating_an_expense_respects_tenant_and_ownership(client, tenants):
+    acme, globex = tenants
+    post = lambda person, employee_id: client.post('/api/expenses', json=expense_body(employee_id), headers=acme.headers(person))
+
+    assert client.post('/api/expenses', json=expense_body(acme.employees['alice'])).status_code == 401
+    assert post('admin', globex.employees['alice']).status_code == 404
+    assert post('alice', acme.employees['bob']).status_code == 403
+    assert post('alice', acme.employees['alice']).status_code == 201
+    # Admins hold expense.import and may file on behalf of their employees
+    assert post('admin', acme.employees['bob']).status_code == 201